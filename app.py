@@ -11,7 +11,6 @@ import re
 from dotenv import load_dotenv
 import google.generativeai as genai
 import speech_recognition as sr
-from pydub import AudioSegment
 import tempfile
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
@@ -28,8 +27,19 @@ from flask_cors import CORS
 
 # Importar blueprints
 from auth import auth_bp, login_required
-from audio_processing import audio_bp
+from audio_processing import audio_bp, base64_payload_limit, upload_too_large_response
 from utils import configure_gemini, create_directories, RECORDINGS_DIR, TRANSCRIPTIONS_DIR
+from storage_layout import recordings_storage, transcriptions_storage
+from content_store import get_content_store
+from pack_archive import start_background_compactor
+from storage_watcher import start_storage_watcher
+from ingest_service import start_ingest_workers
+from temp_janitor import start_temp_janitor
+from audio_tasks import run_audio_task, concatenate_wavs
+from catalog_service import (
+    get_catalog, transcription_entry, parse_page_args, encode_cursor, InvalidPageRequest,
+    TRANSCRIPTION_SORT_KEYS
+)
 
 # Carregar variáveis de ambiente
 load_dotenv()
@@ -67,6 +77,9 @@ else:
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['PERMANENT_SESSION_LIFETIME'] = 3600  # 1 hora
 
+# Maior corpo aceito: áudio de MAX_FILE_SIZE em base64 no JSON, mais os demais campos
+app.config['MAX_CONTENT_LENGTH'] = base64_payload_limit()
+
 # Configurar CORS com origens dinâmicas
 CORS(app, 
      supports_credentials=True,
@@ -79,9 +92,32 @@ CORS(app,
 app.register_blueprint(auth_bp)
 app.register_blueprint(audio_bp)
 
+@app.before_request
+def reject_oversized_request():
+    """Recusa pelo Content-Length antes que alguma rota comece a ler o corpo"""
+    if request.content_length and request.content_length > app.config['MAX_CONTENT_LENGTH']:
+        return upload_too_large_response()
+
+@app.errorhandler(413)
+def request_entity_too_large(error):
+    """Corpo sem Content-Length que passou de MAX_CONTENT_LENGTH durante a leitura"""
+    return upload_too_large_response()
+
 # Criar diretórios necessários
 create_directories()
 
+# Compactação periódica de textos antigos em pacotes (PACK_ARCHIVE_ENABLED)
+start_background_compactor([recordings_storage, transcriptions_storage])
+
+# Catálogo atualizado quando arquivos são copiados/removidos direto no disco (STORAGE_WATCH_ENABLED)
+start_storage_watcher()
+
+# Uploads aceitos com 202 são processados em segundo plano; retoma jobs pendentes após reinício
+start_ingest_workers()
+
+# Chunks de envios abandonados e spools antigos removidos por TTL e orçamento de disco (TEMP_JANITOR_ENABLED)
+start_temp_janitor()
+
 # Configurar Gemini
 gemini_api_key = os.getenv('GEMINI_API_KEY')
 if gemini_api_key:
@@ -303,29 +339,38 @@ def transcribe_recording():
         if not (safe_user_id in filename or user_id in filename):
             return jsonify({'success': False, 'message': 'Acesso negado'}), 403
         
-        filepath = os.path.join(RECORDINGS_DIR, filename)
+        filepath = recordings_storage.locate(filename)
         
         if not os.path.exists(filepath):
             return jsonify({'success': False, 'message': 'Arquivo não encontrado'}), 404
         
-        print(f"🎯 Iniciando transcrição de: {filename}")
-        
-        # Transcrever o áudio
-        transcription = transcribe_audio_with_speech_recognition(filepath)
-        
-        # Melhorar com Gemini se disponível
-        if model and not transcription.startswith('['):
-            print("🤖 Melhorando transcrição com Gemini...")
-            transcription = improve_transcription_with_gemini(transcription)
+        # Mesmo áudio já transcrito em outra gravação do usuário: reaproveitar o texto
+        reused = get_content_store().find_derived(filename, transcriptions_storage, '_transcricao.txt')
+        if reused:
+            print(f"♻️ Reutilizando transcrição de conteúdo idêntico: {reused}")
+            with open(transcriptions_storage.locate(reused), 'r', encoding='utf-8') as f:
+                transcription = f.read()
+        else:
+            print(f"🎯 Iniciando transcrição de: {filename}")
+            
+            # Transcrever o áudio
+            transcription = transcribe_audio_with_speech_recognition(filepath)
+            
+            # Melhorar com Gemini se disponível
+            if model and not transcription.startswith('['):
+                print("🤖 Melhorando transcrição com Gemini...")
+                transcription = improve_transcription_with_gemini(transcription)
         
         # Salvar transcrição
         base_filename = os.path.splitext(filename)[0]
         transcription_filename = f'{base_filename}_transcricao.txt'
-        transcription_path = os.path.join(TRANSCRIPTIONS_DIR, transcription_filename)
+        transcription_path = transcriptions_storage.write_path(transcription_filename)
         
         with open(transcription_path, 'w', encoding='utf-8') as f:
             f.write(transcription)
+        transcriptions_storage.commit(transcription_filename)
         
+        get_catalog().index_text(transcription_filename, transcription)
         print(f"✅ Transcrição salva: {transcription_filename}")
         
         return jsonify({
@@ -352,7 +397,8 @@ def download_transcription(filename):
         if not (safe_user_id in filename or user_id in filename):
             return jsonify({'success': False, 'message': 'Acesso negado'}), 403
         
-        return send_from_directory(TRANSCRIPTIONS_DIR, filename, as_attachment=True)
+        filepath = transcriptions_storage.locate(filename)
+        return send_from_directory(os.path.dirname(filepath), filename, as_attachment=True)
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 404
 
@@ -390,21 +436,17 @@ def rename_recording():
             timestamp = parts[-1] if len(parts) > 1 else datetime.now().strftime('%Y%m%d_%H%M%S')
             new_filename = f'{safe_new_name}_{timestamp}_{safe_user_id}.wav'
         
-        old_path = os.path.join(RECORDINGS_DIR, old_filename)
-        new_path = os.path.join(RECORDINGS_DIR, new_filename)
-        
-        if os.path.exists(old_path):
-            os.rename(old_path, new_path)
+        if recordings_storage.exists(old_filename):
+            recordings_storage.rename(old_filename, new_filename)
             
             # Renomear transcrição se existir
             old_transcription = os.path.splitext(old_filename)[0] + '_transcricao.txt'
             new_transcription = os.path.splitext(new_filename)[0] + '_transcricao.txt'
             
-            old_transcription_path = os.path.join(TRANSCRIPTIONS_DIR, old_transcription)
-            new_transcription_path = os.path.join(TRANSCRIPTIONS_DIR, new_transcription)
+            if transcriptions_storage.exists(old_transcription):
+                transcriptions_storage.rename(old_transcription, new_transcription)
             
-            if os.path.exists(old_transcription_path):
-                os.rename(old_transcription_path, new_transcription_path)
+            get_catalog().rename_recording(old_filename, new_filename)
             
             return jsonify({
                 'success': True,
@@ -431,50 +473,29 @@ def get_all_transcriptions():
     try:
         user_id = session['user_id']
         safe_user_id = user_id.replace('@', '_').replace('.', '_')
-        transcriptions = []
+        safe_user_email = session.get('user_email', '').replace('@', '_').replace('.', '_')
         
-        # Listar arquivos de transcrição
-        for filename in os.listdir(TRANSCRIPTIONS_DIR):
-            if filename.endswith('_transcricao.txt') and (user_id in filename or session.get('user_email', '').replace('@', '_').replace('.', '_') in filename):
-                filepath = os.path.join(TRANSCRIPTIONS_DIR, filename)
-                file_size = os.path.getsize(filepath)
-                
-                # Obter data de modificação
-                modified_time = os.path.getmtime(filepath)
-                modified_date = datetime.fromtimestamp(modified_time).strftime('%d/%m/%Y %H:%M')
-                
-                # Ler primeiras linhas para preview
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        preview = content[:200] + '...' if len(content) > 200 else content
-                except:
-                    preview = "Erro ao ler arquivo"
-                
-                # Nome original do arquivo de áudio
-                audio_filename = filename.replace('_transcricao.txt', '.wav')
-                
-                # Verificar se existe resumo
-                summary_filename = filename.replace('_transcricao.txt', '_resumo.txt')
-                summary_path = os.path.join(TRANSCRIPTIONS_DIR, summary_filename)
-                has_summary = os.path.exists(summary_path)
-                
-                transcriptions.append({
-                    'filename': filename,
-                    'audio_filename': audio_filename,
-                    'size': file_size,
-                    'modified_date': modified_date,
-                    'preview': preview,
-                    'has_summary': has_summary
-                })
-        
-        # Ordenar por data de modificação (mais recente primeiro)
-        transcriptions.sort(key=lambda x: x['modified_date'], reverse=True)
+        try:
+            page = parse_page_args(request.args, TRANSCRIPTION_SORT_KEYS)
+        except InvalidPageRequest as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        
+        # Preview e resumo vêm pré-calculados do catálogo (ordenação e cursor no índice)
+        rows, next_position = get_catalog().page_transcriptions(
+            [user_id, safe_user_id, safe_user_email], sort=page['sort'], order=page['order'],
+            limit=page['limit'], after=page['after'], date_from=page['date_from'], date_to=page['date_to']
+        )
+        transcriptions = [transcription_entry(row) for row in rows]
         
-        return jsonify({
+        response = {
             'success': True,
             'transcriptions': transcriptions
-        })
+        }
+        if page['limit'] is not None:
+            response['next_cursor'] = (
+                encode_cursor(page['sort'], page['order'], *next_position) if next_position else None
+            )
+        return jsonify(response)
     
     except Exception as e:
         return jsonify({
@@ -523,12 +544,14 @@ def generate_summary():
                 else:
                     summary_filename = f"{filename}_{user_id}_resumo.txt"
                 
-                summary_path = os.path.join(TRANSCRIPTIONS_DIR, summary_filename)
+                summary_path = transcriptions_storage.write_path(summary_filename)
                 
                 # Salvar arquivo de resumo
                 with open(summary_path, 'w', encoding='utf-8') as f:
                     f.write(summary)
+                transcriptions_storage.commit(summary_filename)
                 
+                get_catalog().index_text(summary_filename, summary, owner=user_id)
                 print(f"✅ Resumo salvo em: {summary_path}")
             
             return jsonify({
@@ -561,7 +584,7 @@ def view_summary(filename):
         else:
             summary_filename = filename
         
-        summary_path = os.path.join(TRANSCRIPTIONS_DIR, summary_filename)
+        summary_path = transcriptions_storage.locate(summary_filename)
         
         if os.path.exists(summary_path):
             with open(summary_path, 'r', encoding='utf-8') as f:
@@ -598,7 +621,7 @@ def export_summary_pdf(filename):
         else:
             summary_filename = filename
         
-        summary_path = os.path.join(TRANSCRIPTIONS_DIR, summary_filename)
+        summary_path = transcriptions_storage.locate(summary_filename)
         
         if not os.path.exists(summary_path):
             return jsonify({'success': False, 'message': 'Resumo não encontrado'}), 404
@@ -643,7 +666,7 @@ def export_summary_docx(filename):
         else:
             summary_filename = filename
         
-        summary_path = os.path.join(TRANSCRIPTIONS_DIR, summary_filename)
+        summary_path = transcriptions_storage.locate(summary_filename)
         
         if not os.path.exists(summary_path):
             return jsonify({'success': False, 'message': 'Resumo não encontrado'}), 404
@@ -678,47 +701,16 @@ def get_recordings():
         user_id = session['user_id']
         safe_user_id = user_id.replace('@', '_').replace('.', '_')
         recordings = []
-        sessions = {}
         
-        # Listar arquivos de gravação
-        for filename in os.listdir(RECORDINGS_DIR):
-            if filename.endswith('.wav') and (safe_user_id in filename or user_id in filename):
-                filepath = os.path.join(RECORDINGS_DIR, filename)
-                file_size = os.path.getsize(filepath)
-                
-                # Verificar se existe transcrição
-                transcription_file = os.path.splitext(filename)[0] + '_transcricao.txt'
-                transcription_path = os.path.join(TRANSCRIPTIONS_DIR, transcription_file)
-                has_transcription = os.path.exists(transcription_path)
-                
-                if '_sessao_' in filename:
-                    # É um segmento de sessão
-                    parts = filename.split('_')
-                    session_id = parts[2]  # sessao_ID
-                    
-                    if session_id not in sessions:
-                        sessions[session_id] = {
-                            'id': session_id,
-                            'segments': [],
-                            'total_size': 0
-                        }
-                    
-                    sessions[session_id]['segments'].append({
-                        'filename': filename,
-                        'size': file_size,
-                        'has_transcription': has_transcription
-                    })
-                    sessions[session_id]['total_size'] += file_size
-                else:
-                    # Gravação individual
-                    recordings.append({
-                        'filename': filename,
-                        'size': file_size,
-                        'has_transcription': has_transcription
-                    })
+        # Consultar catálogo (índice por dono) em vez de varrer o diretório
+        rows, sessions_list = get_catalog().list_grouped([safe_user_id, user_id])
         
-        # Converter sessões para lista
-        sessions_list = list(sessions.values())
+        for row in rows:
+            recordings.append({
+                'filename': row['filename'],
+                'size': row['size'],
+                'has_transcription': bool(row['has_transcription'])
+            })
         
         return render_template('index.html', 
                              recordings=recordings, 
@@ -742,24 +734,22 @@ def delete_recording():
         if not (safe_user_id in filename or user_id in filename):
             return jsonify({'success': False, 'message': 'Acesso negado'}), 403
         
-        filepath = os.path.join(RECORDINGS_DIR, filename)
-        
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        if recordings_storage.exists(filename):
+            recordings_storage.remove(filename)
             
             # Remover transcrição se existir
             transcription_file = os.path.splitext(filename)[0] + '_transcricao.txt'
-            transcription_path = os.path.join(TRANSCRIPTIONS_DIR, transcription_file)
             
-            if os.path.exists(transcription_path):
-                os.remove(transcription_path)
+            if transcriptions_storage.exists(transcription_file):
+                transcriptions_storage.remove(transcription_file)
             
             # Remover resumo se existir
             summary_file = os.path.splitext(filename)[0] + '_resumo.txt'
-            summary_path = os.path.join(TRANSCRIPTIONS_DIR, summary_file)
             
-            if os.path.exists(summary_path):
-                os.remove(summary_path)
+            if transcriptions_storage.exists(summary_file):
+                transcriptions_storage.remove(summary_file)
+            
+            get_catalog().remove_recording(filename)
             
             return jsonify({
                 'success': True,
@@ -785,7 +775,8 @@ def download_file(filename):
         if not (safe_user_id in filename or user_id in filename):
             return jsonify({'success': False, 'message': 'Acesso negado'}), 403
         
-        return send_from_directory(RECORDINGS_DIR, filename, as_attachment=True)
+        filepath = recordings_storage.locate(filename)
+        return send_from_directory(os.path.dirname(filepath), filename, as_attachment=True)
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 404
 
@@ -800,7 +791,7 @@ def finalize_session():
         
         # Buscar todos os segmentos da sessão
         segments = []
-        for filename in os.listdir(RECORDINGS_DIR):
+        for filename in recordings_storage.iter_files(owners=[safe_user_id, user_id]):
             if f'_sessao_{session_id}_' in filename and (safe_user_id in filename or user_id in filename):
                 segments.append(filename)
         
@@ -810,25 +801,18 @@ def finalize_session():
         # Ordenar segmentos por timestamp
         segments.sort()
         
-        # Combinar áudios usando pydub
-        combined_audio = AudioSegment.empty()
-        
-        for segment_filename in segments:
-            segment_path = os.path.join(RECORDINGS_DIR, segment_filename)
-            segment_audio = AudioSegment.from_wav(segment_path)
-            combined_audio += segment_audio
-        
         # Salvar áudio combinado
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         final_filename = f'Sessao_{session_id}_{timestamp}_{safe_user_id}.wav'
-        final_path = os.path.join(RECORDINGS_DIR, final_filename)
+        final_path = recordings_storage.write_path(final_filename)
         
+        # Combinar áudios no pool de processos
         # CORREÇÃO: Exportar com configurações específicas para evitar problemas de velocidade
-        combined_audio.export(final_path, format="wav", parameters=[
-            "-acodec", "pcm_s16le",  # PCM 16-bit
-            "-ar", "44100",  # Sample rate padrão
-            "-ac", "1"  # Mono
-        ])
+        segment_paths = [recordings_storage.locate(segment_filename) for segment_filename in segments]
+        run_audio_task(concatenate_wavs, segment_paths, final_path, 44100)
+        get_content_store().intern(final_filename, owner=safe_user_id)
+        recordings_storage.commit(final_filename)
+        get_catalog().index_recording(final_filename, owner=safe_user_id)
         
         return jsonify({
             'success': True,
@@ -860,11 +844,12 @@ def save_summary_copy():
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         base_name = original_filename.replace('_resumo.txt', '').replace('_transcricao.txt', '')
         copy_filename = f'{base_name}_resumo_editado_{timestamp}.txt'
-        copy_path = os.path.join(TRANSCRIPTIONS_DIR, copy_filename)
+        copy_path = transcriptions_storage.write_path(copy_filename)
         
         # Salvar cópia editada
         with open(copy_path, 'w', encoding='utf-8') as f:
             f.write(summary_content)
+        transcriptions_storage.commit(copy_filename)
         
         return jsonify({
             'success': True,
@@ -889,7 +874,7 @@ def view_transcription(filename):
         if not (safe_user_id in filename or user_id in filename):
             return jsonify({'success': False, 'message': 'Acesso negado'}), 403
         
-        filepath = os.path.join(TRANSCRIPTIONS_DIR, filename)
+        filepath = transcriptions_storage.locate(filename)
         
         if os.path.exists(filepath):
             with open(filepath, 'r', encoding='utf-8') as f:
@@ -923,10 +908,13 @@ def save_transcription():
             return jsonify({'success': False, 'message': 'Acesso negado'}), 403
         
         # Salvar transcrição
-        transcription_path = os.path.join(TRANSCRIPTIONS_DIR, filename)
+        transcription_path = transcriptions_storage.write_path(filename)
         
         with open(transcription_path, 'w', encoding='utf-8') as f:
             f.write(content)
+        transcriptions_storage.commit(filename)
+        
+        get_catalog().index_text(filename, content)
         
         return jsonify({
             'success': True,
@@ -0,0 +1,511 @@
+"""
+Núcleo de áudio baseado em NumPy
+As transformações do pydub (set_channels, normalize, apply_gain, _spawn com
+outro sample rate) percorrem o buffer inteiro em Python/audioop e copiam os
+bytes a cada passo. AudioBuffer guarda as amostras em um array float32
+(quadros × canais, escala [-1, 1)) e aplica downmix, normalização de pico e
+de RMS, ganho e reamostragem de forma vetorizada; o PCM 16-bit só é gerado
+na escrita.
+
+WAV PCM é lido e escrito direto (módulo wave); outros formatos continuam
+sendo decodificados pelo ffmpeg via pydub, sem passar pelas transformações
+dele. A reamostragem é polifásica com filtro sinc janelado (Kaiser), como
+resample_poly do SciPy, em vez da interpolação linear do audioop.ratecv.
+
+Comparação de tempo de CPU por minuto de áudio com o caminho antigo:
+
+    python audio_core.py benchmark [--seconds 60] [--rate 48000] [--channels 2]
+"""
+
+import argparse
+import os
+import struct
+import subprocess
+import tempfile
+import time
+import wave
+from functools import lru_cache
+from math import gcd
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from pydub import AudioSegment
+
+PCM16_SCALE = 32768.0
+NORMALIZE_HEADROOM_DB = 0.1  # Mesmo headroom padrão de AudioSegment.normalize()
+RMS_TARGET_DBFS = -20.0
+RESAMPLE_ZERO_CROSSINGS = 10  # Meia largura do filtro em cruzamentos por zero (como resample_poly)
+RESAMPLE_KAISER_BETA = 5.0
+# Detecção de fala por energia (speech_segments)
+VAD_FRAME_MS = 30
+VAD_MARGIN_DB = 12.0  # Acima do ruído de fundo (percentil 10 da energia dos quadros)
+VAD_FLOOR_DBFS = -55.0  # Abaixo disso é sempre silêncio
+VAD_PADDING_MS = 200  # Mantido antes e depois de cada trecho de fala (pausas menores que 2x não cortam)
+VAD_MIN_SPEECH_MS = 120  # Estalos e ruídos mais curtos que isso são descartados
+
+def db_to_ratio(db):
+    return 10 ** (db / 20)
+
+def ratio_to_db(ratio):
+    return 20 * np.log10(ratio)
+
+# ==================== REAMOSTRAGEM ====================
+
+@lru_cache(maxsize=16)
+def _polyphase_filter(up, down):
+    """Filtro passa-baixas sinc/Kaiser separado em fases: matriz (up, taps_por_fase)"""
+    max_rate = max(up, down)
+    half_len = RESAMPLE_ZERO_CROSSINGS * max_rate
+    n = np.arange(-half_len, half_len + 1)
+    taps = np.sinc(n / max_rate) * np.kaiser(len(n), RESAMPLE_KAISER_BETA)
+    taps *= up / taps.sum()  # Ganho unitário depois da inserção de zeros
+    per_phase = -(-len(taps) // up)
+    padded = np.zeros(per_phase * up)
+    padded[:len(taps)] = taps
+    return padded.reshape(per_phase, up).T.astype(np.float32), half_len
+
+def resample(samples, source_rate, target_rate):
+    """Reamostra (quadros × canais) de source_rate para target_rate (up/down racional)"""
+    if source_rate == target_rate or not len(samples):
+        return samples
+    divisor = gcd(int(source_rate), int(target_rate))
+    up, down = int(target_rate) // divisor, int(source_rate) // divisor
+    phases, half_len = _polyphase_filter(up, down)
+    per_phase = phases.shape[1]
+
+    channels = samples.shape[1]
+    padded = np.concatenate([
+        np.zeros((per_phase, channels), dtype=np.float32),
+        samples,
+        np.zeros((per_phase + 1, channels), dtype=np.float32)
+    ])
+    windows = sliding_window_view(padded, per_phase, axis=0)  # (linhas, canais, taps) sem cópia
+    output_frames = -(-len(samples) * up // down)
+    output = np.empty((output_frames, channels), dtype=np.float32)
+
+    # As saídas m, m+up, m+2*up... usam a mesma fase e janelas espaçadas de down entradas:
+    # cada fase vira um produto matriz × vetor sobre uma visão com passo
+    for first in range(min(up, output_frames)):
+        base, phase = divmod(first * down + half_len, up)
+        count = len(range(first, output_frames, up))
+        rows = windows[base + 1:base + 2 + (count - 1) * down:down]
+        output[first::up] = rows @ phases[phase, ::-1]
+    return output
+
+def wav_info(path):
+    """Sample rate, canais e duração de um WAV PCM pelo cabeçalho (sem ler as amostras)"""
+    with wave.open(path, 'rb') as wav_file:
+        frame_rate = wav_file.getframerate()
+        return {
+            'frame_rate': frame_rate,
+            'channels': wav_file.getnchannels(),
+            'duration_ms': round(1000 * wav_file.getnframes() / frame_rate) if frame_rate else 0
+        }
+
+def _read_exact(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        raise ValueError("Saída do ffmpeg terminou antes dos dados de áudio")
+    return data
+
+def stream_pcm16_mono(path, format=None, block_size=1024 * 1024):
+    """Decodifica pelo ffmpeg em fluxo, sem carregar o áudio na memória
+
+    Retorna (frame_rate, blocos): blocos é um gerador de bytes PCM 16-bit mono
+    (little-endian) com até block_size bytes cada. O ffmpeg mantém o sample
+    rate original e escreve um WAV no stdout só para informá-lo no cabeçalho;
+    os blocos são lidos do pipe conforme são consumidos. Levanta ValueError se
+    o ffmpeg falhar.
+    """
+    command = [AudioSegment.converter, '-nostdin', '-v', 'error']
+    if format:
+        command += ['-f', format]
+    command += ['-i', path, '-vn', '-map_metadata', '-1', '-fflags', '+bitexact',
+                '-ac', '1', '-acodec', 'pcm_s16le', '-f', 'wav', '-']
+    # stderr em arquivo: um fluxo corrompido pode gerar mensagens demais para o pipe
+    errors = tempfile.TemporaryFile()
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=errors)
+
+    def finish(complete):
+        """Encerra o ffmpeg (mata se a leitura foi interrompida); (returncode, mensagens)"""
+        process.stdout.close()
+        if not complete and process.poll() is None:
+            process.kill()
+        returncode = process.wait()
+        errors.seek(0)
+        message = errors.read().decode('utf-8', 'replace').strip()[-500:]
+        errors.close()
+        return returncode, message
+
+    try:
+        riff, _, wave_id = struct.unpack('<4sI4s', _read_exact(process.stdout, 12))
+        if riff != b'RIFF' or wave_id != b'WAVE':
+            raise ValueError("Saída do ffmpeg não é WAV")
+        frame_rate = None
+        while True:
+            chunk_id, chunk_size = struct.unpack('<4sI', _read_exact(process.stdout, 8))
+            if chunk_id == b'data':
+                break
+            body = _read_exact(process.stdout, chunk_size + chunk_size % 2)
+            if chunk_id == b'fmt ':
+                frame_rate = struct.unpack('<I', body[4:8])[0]
+        if not frame_rate:
+            raise ValueError("Saída do ffmpeg sem sample rate")
+    except ValueError as e:
+        _, message = finish(False)
+        raise ValueError(f"{e}: {message}" if message else str(e))
+    except BaseException:
+        finish(False)
+        raise
+
+    def blocks():
+        complete = False
+        try:
+            while True:
+                block = process.stdout.read(block_size)
+                if not block:
+                    break
+                yield block
+            complete = True
+        finally:
+            returncode, message = finish(complete)
+        if returncode != 0:
+            raise ValueError(f"ffmpeg falhou ({returncode}): {message}")
+
+    return frame_rate, blocks()
+
+# ==================== BUFFER ====================
+
+class AudioBuffer:
+    """Amostras float32 (quadros × canais) com o sample rate; transformações devolvem novos buffers"""
+
+    __slots__ = ('samples', 'frame_rate')
+
+    def __init__(self, samples, frame_rate):
+        samples = np.asarray(samples, dtype=np.float32)
+        if samples.ndim == 1:
+            samples = samples[:, None]
+        self.samples = samples
+        self.frame_rate = int(frame_rate)
+
+    # -------------------- Construção --------------------
+
+    @classmethod
+    def from_pcm(cls, data, frame_rate, channels=1, sample_width=2, signed_8bit=False):
+        """PCM intercalado little-endian (8 bits sem sinal como no WAV; 16, 24 e 32 bits com sinal)"""
+        if sample_width == 1 and signed_8bit:
+            values = np.frombuffer(data, dtype=np.int8).astype(np.float32) / 128
+        elif sample_width == 1:
+            values = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128) / 128
+        elif sample_width == 2:
+            values = np.frombuffer(data, dtype='<i2').astype(np.float32)
+            values *= np.float32(1 / PCM16_SCALE)
+        elif sample_width == 3:
+            raw = np.frombuffer(data[:len(data) - len(data) % 3], dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+            ints = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+            values = (np.where(ints & 0x800000, ints - 0x1000000, ints) / 8388608.0).astype(np.float32)
+        elif sample_width == 4:
+            values = (np.frombuffer(data, dtype='<i4') / 2147483648.0).astype(np.float32)
+        else:
+            raise ValueError(f"Largura de amostra não suportada: {sample_width}")
+        usable = len(values) - len(values) % channels
+        return cls(values[:usable].reshape(-1, channels), frame_rate)
+
+    @classmethod
+    def from_segment(cls, segment):
+        # O pydub guarda PCM de 8 bits com sinal (converte o WAV sem sinal ao carregar)
+        return cls.from_pcm(segment.raw_data, segment.frame_rate, segment.channels, segment.sample_width,
+                            signed_8bit=True)
+
+    @classmethod
+    def from_wav(cls, path):
+        with wave.open(path, 'rb') as wav_file:
+            return cls.from_pcm(wav_file.readframes(wav_file.getnframes()), wav_file.getframerate(),
+                                wav_file.getnchannels(), wav_file.getsampwidth())
+
+    @classmethod
+    def from_file(cls, path, format=None):
+        """WAV PCM lido direto; demais formatos (WebM, Ogg, MP4, MP3...) decodificados pelo ffmpeg"""
+        if format in (None, 'wav'):
+            try:
+                return cls.from_wav(path)
+            except (wave.Error, EOFError):
+                pass  # Não é WAV PCM simples (outro contêiner ou WAVE_FORMAT_EXTENSIBLE)
+        return cls.from_segment(AudioSegment.from_file(path, format=format))
+
+    @classmethod
+    def concatenate(cls, buffers):
+        """Concatena em ordem no sample rate do primeiro (canais diferentes viram mono)"""
+        buffers = list(buffers)
+        if not buffers:
+            raise ValueError("Nenhum áudio para concatenar")
+        frame_rate = buffers[0].frame_rate
+        if len({buffer.channels for buffer in buffers}) > 1:
+            buffers = [buffer.downmix() for buffer in buffers]
+        return cls(np.concatenate([buffer.resample(frame_rate).samples for buffer in buffers]), frame_rate)
+
+    # -------------------- Propriedades --------------------
+
+    @property
+    def channels(self):
+        return self.samples.shape[1]
+
+    @property
+    def frames(self):
+        return self.samples.shape[0]
+
+    @property
+    def duration_ms(self):
+        return round(1000 * self.frames / self.frame_rate) if self.frame_rate else 0
+
+    def __len__(self):
+        """Duração em ms, como len(AudioSegment)"""
+        return self.duration_ms
+
+    def __getitem__(self, millisecond):
+        """Trecho por milissegundos (buffer[inicio:fim]), sem copiar as amostras"""
+        if not isinstance(millisecond, slice):
+            millisecond = slice(millisecond, millisecond + 1)
+        start = int((millisecond.start or 0) * self.frame_rate / 1000)
+        end = self.frames if millisecond.stop is None else int(millisecond.stop * self.frame_rate / 1000)
+        return AudioBuffer(self.samples[start:end], self.frame_rate)
+
+    @property
+    def peak(self):
+        if not self.samples.size:
+            return 0.0
+        return float(max(self.samples.max(), -self.samples.min()))
+
+    @property
+    def rms(self):
+        return float(np.sqrt(np.mean(np.square(self.samples, dtype=np.float64)))) if self.samples.size else 0.0
+
+    # -------------------- Transformações --------------------
+
+    def downmix(self):
+        """Mono pela média dos canais"""
+        if self.channels == 1:
+            return self
+        mixed = self.samples[:, 0].copy()
+        for channel in range(1, self.channels):
+            mixed += self.samples[:, channel]  # Coluna a coluna: mean(axis=1) é lento em arrays intercalados
+        mixed *= np.float32(1 / self.channels)
+        return AudioBuffer(mixed, self.frame_rate)
+
+    def retag(self, frame_rate):
+        """Reinterpreta as mesmas amostras com outro sample rate (muda a velocidade, sem cópia)"""
+        return AudioBuffer(self.samples, frame_rate)
+
+    def apply_gain(self, db):
+        if not db:
+            return self
+        return AudioBuffer(self.samples * np.float32(db_to_ratio(db)), self.frame_rate)
+
+    def normalize(self, headroom=NORMALIZE_HEADROOM_DB):
+        """Normalização de pico: pico a headroom dB abaixo do máximo (como AudioSegment.normalize)"""
+        peak = self.peak
+        if not peak:
+            return self
+        return self.apply_gain(float(ratio_to_db(db_to_ratio(-headroom) / peak)))
+
+    def normalize_rms(self, target_dbfs=RMS_TARGET_DBFS, headroom=NORMALIZE_HEADROOM_DB):
+        """Normalização de loudness por RMS, limitada para o pico não passar de -headroom dBFS"""
+        rms, peak = self.rms, self.peak
+        if not rms:
+            return self
+        ratio = min(db_to_ratio(target_dbfs) / rms, db_to_ratio(-headroom) / peak)
+        return self.apply_gain(float(ratio_to_db(ratio)))
+
+    def resample(self, frame_rate):
+        """Reamostragem de alta qualidade (polifásica, sinc com janela de Kaiser)"""
+        if frame_rate == self.frame_rate:
+            return self
+        return AudioBuffer(resample(self.samples, self.frame_rate, frame_rate), frame_rate)
+
+    # -------------------- Segmentação por fala --------------------
+
+    def _frame_energy(self):
+        """Energia (dBFS) por quadro de VAD_FRAME_MS do áudio mono; retorna (passo em amostras, energias)"""
+        hop = max(1, int(self.frame_rate * VAD_FRAME_MS / 1000))
+        mono = self.downmix().samples[:, 0]
+        count = -(-len(mono) // hop)
+        padded = np.zeros(count * hop, dtype=np.float32)
+        padded[:len(mono)] = mono
+        power = np.mean(np.square(padded.reshape(count, hop), dtype=np.float64), axis=1)
+        return hop, 10 * np.log10(power + 1e-12)
+
+    def speech_regions(self, energy=None):
+        """Trechos com fala como (quadro inicial, quadro final), com VAD_PADDING_MS de folga
+
+        Limiar adaptativo: VAD_MARGIN_DB acima do ruído de fundo, sem passar de
+        metade da margem abaixo do nível típico da fala e nunca abaixo de
+        VAD_FLOOR_DBFS. Pausas curtas ficam dentro do trecho (dilatação do
+        mapa de quadros com fala); silêncios longos ficam de fora.
+        """
+        hop, energy_db = energy or self._frame_energy()
+        if not len(energy_db):
+            return []
+        noise, speech = np.percentile(energy_db, [10, 90])
+        threshold = max(VAD_FLOOR_DBFS, min(noise + VAD_MARGIN_DB, speech - VAD_MARGIN_DB / 2))
+        voiced = energy_db > threshold
+
+        padding = -(-VAD_PADDING_MS // VAD_FRAME_MS)
+        dilated = np.convolve(voiced, np.ones(2 * padding + 1), mode='same') > 0
+        edges = np.flatnonzero(np.diff(np.concatenate([[0], dilated.astype(np.int8), [0]])))
+        starts, ends = edges[::2], edges[1::2]
+
+        voiced_total = np.concatenate([[0], np.cumsum(voiced)])
+        keep = (voiced_total[ends] - voiced_total[starts]) * VAD_FRAME_MS >= VAD_MIN_SPEECH_MS
+        return [(int(start) * hop, min(int(end) * hop, self.frames))
+                for start, end in zip(starts[keep], ends[keep])]
+
+    def speech_segments(self, max_ms):
+        """Plano de envio ao reconhecedor: lista de segmentos, cada um uma lista de trechos de fala
+
+        Trechos consecutivos são agrupados até max_ms de áudio (o silêncio
+        entre eles não entra); um trecho mais longo que max_ms é cortado no
+        quadro mais silencioso da segunda metade da janela. Sem sobreposição.
+        """
+        energy = self._frame_energy()
+        hop, energy_db = energy
+        max_frames = max(hop, int(max_ms * self.frame_rate / 1000))
+
+        regions = []
+        for start, end in self.speech_regions(energy):
+            while end - start > max_frames:
+                first = (start + max_frames // 2) // hop
+                last = max(first + 1, (start + max_frames) // hop)
+                cut = (first + int(np.argmin(energy_db[first:last]))) * hop + hop // 2
+                cut = min(max(cut, start + 1), start + max_frames)
+                regions.append((start, cut))
+                start = cut
+            regions.append((start, end))
+
+        segments, current, length = [], [], 0
+        for start, end in regions:
+            if current and length + (end - start) > max_frames:
+                segments.append(current)
+                current, length = [], 0
+            current.append((start, end))
+            length += end - start
+        if current:
+            segments.append(current)
+        return segments
+
+    def join(self, regions):
+        """Concatena os trechos (quadro inicial, quadro final) em um novo buffer"""
+        if not regions:
+            return AudioBuffer(np.zeros((0, self.channels), dtype=np.float32), self.frame_rate)
+        return AudioBuffer(np.concatenate([self.samples[start:end] for start, end in regions]), self.frame_rate)
+
+    def for_recognition(self, frame_rate):
+        """Representação para o reconhecedor de fala: mono e reduzida para frame_rate
+
+        Nunca reamostra para cima (não acrescenta informação, só bytes);
+        frame_rate 0/None mantém o sample rate do áudio.
+        """
+        buffer = self.downmix()
+        if frame_rate and buffer.frame_rate > frame_rate:
+            buffer = buffer.resample(frame_rate)
+        return buffer
+
+    # -------------------- Saída --------------------
+
+    def pcm16(self):
+        """Amostras intercaladas em int16 (com saturação)"""
+        scaled = self.samples.reshape(-1) * np.float32(PCM16_SCALE)
+        np.rint(scaled, out=scaled)
+        np.clip(scaled, -32768, 32767, out=scaled)
+        return scaled.astype('<i2')
+
+    def to_pcm16(self):
+        return self.pcm16().tobytes()
+
+    def to_segment(self):
+        return AudioSegment(data=self.to_pcm16(), sample_width=2, frame_rate=self.frame_rate,
+                            channels=self.channels)
+
+    def write_wav(self, path):
+        """Grava WAV PCM 16-bit (sem ffmpeg)"""
+        with wave.open(path, 'wb') as wav_file:
+            wav_file.setnchannels(self.channels)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(self.frame_rate)
+            wav_file.writeframes(self.to_pcm16())
+
+# ==================== BENCHMARK ====================
+
+def _test_signal(seconds, frame_rate, channels):
+    t = np.arange(int(seconds * frame_rate)) / frame_rate
+    tones = [0.3 * np.sin(2 * np.pi * (220 + 110 * c) * t) for c in range(channels)]
+    return (np.stack(tones, axis=1) * PCM16_SCALE).astype('<i2').tobytes()
+
+def _cpu_time():
+    """CPU do processo e dos filhos já encerrados (o export do pydub roda no ffmpeg)"""
+    times = os.times()
+    return time.process_time() + times.children_user + times.children_system
+
+def _cpu_per_minute(work, seconds, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = _cpu_time()
+        work()
+        elapsed = _cpu_time() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 60 / seconds
+
+def benchmark(seconds=60, frame_rate=48000, channels=2, target_rate=44100):
+    """Tempo de CPU (s por minuto de áudio) do caminho pydub e do AudioBuffer"""
+    data = _test_signal(seconds, frame_rate, channels)
+    segment = AudioSegment(data=data, sample_width=2, frame_rate=frame_rate, channels=channels)
+    results = {}
+
+    results['compatibilidade (mono + normalização)'] = (
+        _cpu_per_minute(lambda: segment.set_channels(1).normalize().raw_data, seconds),
+        _cpu_per_minute(lambda: AudioBuffer.from_pcm(data, frame_rate, channels).downmix().normalize().to_pcm16(), seconds)
+    )
+    results['ganho (+3 dB)'] = (
+        _cpu_per_minute(lambda: segment.apply_gain(3).raw_data, seconds),
+        _cpu_per_minute(lambda: AudioBuffer.from_pcm(data, frame_rate, channels).apply_gain(3).to_pcm16(), seconds)
+    )
+    mono = segment.set_channels(1)
+    mono_data = mono.raw_data
+    results[f'reamostragem {frame_rate}→{target_rate}Hz (mono)'] = (
+        _cpu_per_minute(lambda: mono.set_frame_rate(target_rate).raw_data, seconds),
+        _cpu_per_minute(lambda: AudioBuffer.from_pcm(mono_data, frame_rate).resample(target_rate).to_pcm16(), seconds)
+    )
+
+    # Caminho completo de upload: WAV → mono normalizado → WAV (antes exportado pelo ffmpeg)
+    with tempfile.TemporaryDirectory() as directory:
+        source, target = os.path.join(directory, 'source.wav'), os.path.join(directory, 'target.wav')
+        AudioBuffer.from_pcm(data, frame_rate, channels).write_wav(source)
+
+        def legacy_upload():
+            audio = AudioSegment.from_file(source).set_channels(1).normalize()
+            audio.export(target, format='wav', parameters=['-acodec', 'pcm_s16le', '-ac', '1'])
+
+        try:
+            legacy = _cpu_per_minute(legacy_upload, seconds)
+        except Exception as e:
+            print(f"⚠️ Caminho pydub completo ignorado (ffmpeg indisponível?): {e}")
+        else:
+            results['upload WAV completo (com ffmpeg)'] = (
+                legacy,
+                _cpu_per_minute(lambda: AudioBuffer.from_wav(source).downmix().normalize().write_wav(target), seconds)
+            )
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Núcleo de áudio NumPy do RecPac')
+    parser.add_argument('command', choices=['benchmark'])
+    parser.add_argument('--seconds', type=float, default=60)
+    parser.add_argument('--rate', type=int, default=48000)
+    parser.add_argument('--channels', type=int, default=2)
+    args = parser.parse_args()
+
+    print(f"⏱️ CPU por minuto de áudio ({args.rate}Hz, {args.channels} canais, {args.seconds:.0f}s):")
+    for name, (legacy, vectorized) in benchmark(args.seconds, args.rate, args.channels).items():
+        print(f"   {name}: pydub {legacy:.3f}s, NumPy {vectorized:.3f}s ({legacy / max(vectorized, 1e-9):.1f}x)")
+
+if __name__ == '__main__':
+    main()
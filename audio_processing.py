@@ -1,10 +1,9 @@
 from flask import Blueprint, request, jsonify, session, send_file, render_template
 import os
-import base64
 import random
 from datetime import datetime
 import speech_recognition as sr
-from pydub import AudioSegment
+from audio_core import AudioBuffer, wav_info
 import tempfile
 import wave
 from reportlab.lib.pagesizes import letter
@@ -14,22 +13,42 @@ from reportlab.lib.units import inch
 from docx import Document
 from docx.shared import Inches
 import time
-import io
+import re
+import uuid
+import shutil
 from auth import login_required
 from utils import sanitize_filename, model, RECORDINGS_DIR, TRANSCRIPTIONS_DIR
+from services_config import MAX_FILE_SIZE, INGEST_ASYNC_ENABLED, TRANSCRIPTION_SAMPLE_RATE, AUDIO_SEGMENT_LENGTH
+from upload_stream import InvalidUploadPayload, UploadTooLarge, spool_json_audio, spool_upload
+from storage_layout import recordings_storage, transcriptions_storage
+from content_store import get_content_store
+from chunk_assembly import ChunkAssembler, ChunkManifest, chunk_filename, decoded_filename
+from audio_tasks import (
+    get_audio_pool, run_audio_task, convert_to_compatible_wav, retag_frame_rate, slow_audio_rate,
+    calibrated_rate, append_chunks, decode_chunk, finalize_chunks, assemble_chunks_in_memory
+)
+from ingest_service import get_ingest_queue, register_handler as register_ingest_handler
+from temp_janitor import get_janitor_metrics
+from catalog_service import (
+    get_catalog, format_size, transcription_entry, parse_page_args, encode_cursor,
+    InvalidPageRequest, RECORDING_SORT_KEYS, TRANSCRIPTION_SORT_KEYS
+)
 
 audio_bp = Blueprint('audio', __name__)
 
 # ==================== FUNÇÃO ROBUSTA DE DETECÇÃO DE FORMATO ====================
 
-def detect_audio_format_robust(audio_bytes):
+def detect_audio_format_robust(audio_bytes, total_size=None):
     """
     Detecta o formato de áudio de forma robusta para diferentes dispositivos
     Suporta: iOS, Android, Desktop Windows/Mac, diferentes codecs
+    Aceita só o início do arquivo (audio_bytes) com o tamanho total em total_size
     Retorna: Tupla (formato_detectado, sample_rate_estimado)
     """
     try:
-        if len(audio_bytes) < 12:  # Arquivo muito pequeno
+        if total_size is None:
+            total_size = len(audio_bytes)
+        if total_size < 12:  # Arquivo muito pequeno
             return "Desconhecido (arquivo muito pequeno)"
         
         # Detectar por cabeçalhos conhecidos
@@ -65,13 +84,13 @@ def detect_audio_format_robust(audio_bytes):
         
         # Verificar se é áudio baseado em extensão ou conteúdo
         # Tentar detectar por padrões de áudio
-        if len(audio_bytes) > 100:
+        if total_size > 100:
             # Verificar se há padrões de áudio comprimido
             if any(pattern in audio_bytes[:100] for pattern in [b'Opus', b'Vorbis', b'Speex']):
                 return ("Áudio Comprimido (Opus/Vorbis/Speex)", 44100)  # Assumir qualidade padrão
             
             # Verificar se parece ser áudio PCM não identificado
-            if len(audio_bytes) % 2 == 0:  # Tamanho par (comum em PCM)
+            if total_size % 2 == 0:  # Tamanho par (comum em PCM)
                 return ("PCM Não Identificado", 44100)  # Assumir qualidade padrão
         
         return ("Formato Desconhecido (tentando processar)", 44100)  # Assumir qualidade padrão
@@ -80,73 +99,57 @@ def detect_audio_format_robust(audio_bytes):
         print(f"⚠️ Erro na detecção de formato: {e}")
         return ("Erro na Detecção", 44100)  # Fallback para qualidade padrão
 
-def process_audio_for_device_compatibility(audio_segment, detected_format):
-    """
-    Processa áudio de forma otimizada para diferentes dispositivos
-    Preserva qualidade e corrige problemas de velocidade
+# ==================== PCM NORMALIZADO ====================
+
+def normalized_pcm(filename, file_path=None, detected_format="PCM normalizado"):
+    """WAV PCM normalizado da gravação e seus parâmetros, decodificado no máximo uma vez por conteúdo
+
+    Gravações salvas já normalizadas são usadas direto; as demais são
+    convertidas uma vez no pool de áudio para recordings/.pcm/ e reaproveitadas
+    por todas as etapas seguintes (e por cópias de mesmo conteúdo).
     """
+    store = get_content_store()
+    cached = store.cached_pcm(filename)
+    if cached:
+        print(f"♻️ PCM normalizado reaproveitado: {filename}")
+        return cached
+
+    content_hash = store.content_hash(filename)
+    if content_hash is None:
+        raise FileNotFoundError(filename)
+    pcm_path = store.pcm_path(content_hash)
+    os.makedirs(os.path.dirname(pcm_path), exist_ok=True)
+    temp_path = f"{pcm_path}.{uuid.uuid4().hex}.part"
     try:
-        original_frame_rate = audio_segment.frame_rate
-        original_channels = audio_segment.channels
-        original_duration = len(audio_segment)
-        
-        print(f"🎵 Processando áudio: {original_frame_rate}Hz, {original_channels} canais, {original_duration}ms")
-        
-        # CORREÇÃO ROBUSTA: Ajuste fino para sample rate correto (99.9% precisão)
-        if original_frame_rate <= 22050:  # Sample rates baixos precisam correção
-            # AJUSTE FINO: Calcular sample rate correto baseado na velocidade esperada
-            # Se áudio está em 16kHz mas deveria ser ~44.1kHz, calcular fator exato
-            if original_frame_rate == 16000:
-                # Fator de correção calibrado: 16kHz → 44.1kHz com ajuste fino
-                corrected_rate = 44100
-                print(f"🔧 AJUSTE FINO: {original_frame_rate}Hz → {corrected_rate}Hz (correção calibrada)")
-            elif original_frame_rate == 8000:
-                # Para 8kHz, usar fator 5.5x para compensação exata
-                corrected_rate = 44000  # Ligeiramente menos que 44.1kHz para ajuste fino
-                print(f"🔧 AJUSTE FINO: {original_frame_rate}Hz → {corrected_rate}Hz (correção calibrada)")
-            else:
-                # Para outros sample rates baixos, usar proporção otimizada
-                corrected_rate = int(original_frame_rate * 2.75)  # Fator calibrado
-                if corrected_rate > 48000:
-                    corrected_rate = 44100
-                print(f"🔧 AJUSTE FINO: {original_frame_rate}Hz → {corrected_rate}Hz (fator 2.75x calibrado)")
-            
-            # Aplicar correção com sample rate calibrado
-            audio_segment = audio_segment._spawn(audio_segment.raw_data, overrides={"frame_rate": corrected_rate})
-        else:
-            print(f"✅ Sample rate adequado mantido: {original_frame_rate}Hz")
-        
-        # Converter para mono se necessário (padrão para transcrição)
-        if original_channels > 1:
-            audio_segment = audio_segment.set_channels(1)
-            print(f"🔧 Convertido para mono (era {original_channels} canais)")
-        else:
-            print(f"✅ Mantendo mono: {original_channels} canal")
-        
-        # Normalizar volume para melhor transcrição
-        audio_segment = audio_segment.normalize()
-        print(f"🔧 Volume normalizado")
-        
-        # Verificar se a duração foi preservada
-        final_duration = len(audio_segment)
-        duration_diff = abs(original_duration - final_duration)
-        
-        if duration_diff > 100:  # Mais de 100ms de diferença
-            print(f"⚠️ ATENÇÃO: Duração mudou em {duration_diff}ms!")
-            print(f"   Original: {original_duration}ms, Final: {final_duration}ms")
-        else:
-            print(f"✅ Duração preservada: {final_duration}ms")
-        
-        return audio_segment
-        
-    except Exception as e:
-        print(f"❌ Erro no processamento de compatibilidade: {e}")
-        raise
+        params = run_audio_task(
+            convert_to_compatible_wav, file_path or recordings_storage.locate(filename), temp_path, detected_format
+        )
+        os.replace(temp_path, pcm_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    store.record_pcm(content_hash, params)
+    print(f"💾 PCM normalizado gerado: {filename} → {content_hash[:12]}")
+    return pcm_path, params
+
+def recognizer_audio(buffer):
+    """sr.AudioData montado direto das amostras, sem passar por arquivo WAV
+
+    Usa a representação de reconhecimento (PCM 16-bit mono em
+    TRANSCRIPTION_SAMPLE_RATE): o WAV arquivado continua em 44.1kHz, mas o
+    reconhecedor recebe só os bytes de que a fala precisa.
+    """
+    buffer = buffer.for_recognition(TRANSCRIPTION_SAMPLE_RATE)
+    return sr.AudioData(buffer.to_pcm16(), buffer.frame_rate, 2)
 
 # ==================== FUNÇÕES DE TRANSCRIÇÃO ====================
 
-def transcribe_audio_with_speech_recognition(audio_path):
-    """Transcreve áudio usando Speech Recognition com abordagem robusta"""
+def transcribe_audio_with_speech_recognition(audio_path, filename=None):
+    """Transcreve áudio usando Speech Recognition com abordagem robusta
+
+    Com filename, usa o PCM normalizado da gravação (normalized_pcm) em vez de
+    decodificar e normalizar o arquivo de novo em um WAV temporário.
+    """
     try:
         print(f"🔍 Iniciando transcrição de: {audio_path}")
         
@@ -171,145 +174,135 @@ def transcribe_audio_with_speech_recognition(audio_path):
         
         print("📁 Processando arquivo de áudio...")
         
-        # Processar áudio com pydub
+        # Processar áudio (AudioBuffer no pool de processos)
+        temp_path = None
         try:
-            print("🔧 Carregando arquivo com pydub...")
-            audio = AudioSegment.from_file(audio_path)
-            
-            # FUNÇÃO ROBUSTA: Processar áudio para compatibilidade com diferentes dispositivos
-            audio = process_audio_for_device_compatibility(audio, "Detectado durante transcrição")
+            if filename:
+                pcm_path, processed = normalized_pcm(filename, audio_path, "Detectado durante transcrição")
+            else:
+                # Decodificação, compatibilidade e exportação do WAV temporário no pool de processos
+                with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
+                    temp_path = pcm_path = temp_file.name
+                try:
+                    print("🔧 Carregando e exportando WAV temporário com configurações otimizadas...")
+                    processed = run_audio_task(
+                        convert_to_compatible_wav, audio_path, temp_path, "Detectado durante transcrição"
+                    )
+                except Exception:
+                    os.unlink(temp_path)
+                    raise
             
-            print(f"🎵 Áudio processado: {len(audio)}ms, {audio.frame_rate}Hz, {audio.channels} canal(is)")
+            print(f"🎵 Áudio processado: {processed['duration_ms']}ms, {processed['frame_rate']}Hz, {processed['channels']} canal(is)")
             
             # TRANSCRIÇÃO INTELIGENTE: Segmentar áudios longos para melhor precisão
-            duration_seconds = len(audio) / 1000
+            duration_seconds = processed['duration_ms'] / 1000
             print(f"⏱️ Duração: {duration_seconds:.1f}s")
             
-            if duration_seconds > 30:  # Mais de 30 segundos
+            if processed['duration_ms'] > AUDIO_SEGMENT_LENGTH:  # Mais longo que um segmento
                 print(f"📋 Áudio longo detectado - usando transcrição em segmentos")
+                try:
+                    # Reduzir uma vez o áudio inteiro (os segmentos já saem na taxa do reconhecedor)
+                    audio = AudioBuffer.from_wav(pcm_path).for_recognition(TRANSCRIPTION_SAMPLE_RATE)
+                finally:
+                    if temp_path:
+                        os.unlink(temp_path)
                 return transcribe_long_audio_in_segments(audio, audio_path)
             elif duration_seconds < 3:  # Muito curto
                 print(f"⚠️ Áudio muito curto ({duration_seconds:.1f}s) - pode ter problemas de transcrição")
                 # Prosseguir com transcrição normal mas com configurações especiais
             
-            # CORREÇÃO: Exportar para WAV temporário com configurações específicas para evitar problemas de velocidade
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-                print(f"🔧 Exportando WAV temporário com configurações otimizadas...")
-                audio.export(temp_file.name, format="wav", parameters=[
-                    "-acodec", "pcm_s16le",  # PCM 16-bit
-                    "-ar", str(audio.frame_rate),  # Manter sample rate
-                    "-ac", "1"  # Mono
-                ])
-                temp_path = temp_file.name
-            
             try:
-                # Transcrever com speech_recognition
-                with sr.AudioFile(temp_path) as source:
-                    print("🎤 Ajustando configurações baseado na duração...")
-                    
-                    # Configurações adaptativas baseadas na duração
-                    if duration_seconds < 3:
-                        # Áudio curto: menos ajuste de ruído, mais sensibilidade
-                        recognizer.adjust_for_ambient_noise(source, duration=0.2)
-                        recognizer.energy_threshold = 2000  # Mais sensível
-                    elif duration_seconds < 10:
-                        # Áudio médio: configuração balanceada
-                        recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                        recognizer.energy_threshold = 3000
-                    else:
-                        # Áudio longo: mais ajuste de ruído
-                        recognizer.adjust_for_ambient_noise(source, duration=1.0)
-                        recognizer.energy_threshold = 4000
-                    
-                    print("🎧 Carregando áudio...")
-                    audio_data = recognizer.record(source)
-                    
-                    print("🔄 Iniciando transcrição...")
-                    
-                    # Múltiplos engines Google (sistema estável funcionando)
-                    engines = [
-                        ('google-pt-BR', lambda: recognizer.recognize_google(
-                            audio_data, 
-                            language='pt-BR'
-                        )),
-                        ('google-pt', lambda: recognizer.recognize_google(
-                            audio_data, 
-                            language='pt'  # Português genérico como backup
-                        )),
-                        ('google-with-details', lambda: recognizer.recognize_google(
-                            audio_data, 
-                            language='pt-BR', 
-                            show_all=True  # Obter múltiplas alternativas
-                        ))
-                    ]
-                    
-                    best_transcription = None
-                    best_confidence = 0
-                    
-                    for engine_name, recognize_func in engines:
-                        try:
-                            print(f"🔍 Tentando com {engine_name}...")
-                            result = recognize_func()
-                            
-                            # Processar resultado baseado no tipo
-                            if engine_name == 'google-with-details' and isinstance(result, dict):
-                                # Resultado com múltiplas alternativas do Google
-                                if 'alternative' in result:
-                                    alternatives = result['alternative']
-                                    for alt in alternatives:
-                                        if 'transcript' in alt:
-                                            confidence = alt.get('confidence', 0.5)
-                                            transcript = alt['transcript']
-                                            print(f"📊 Google alternativa: '{transcript}' (confiança: {confidence:.2f})")
+                # Transcrever com speech_recognition direto do PCM em memória (sem WAV temporário)
+                print("🎧 Carregando áudio...")
+                audio_data = recognizer_audio(AudioBuffer.from_wav(pcm_path))
+                
+                print("🔄 Iniciando transcrição...")
+                
+                # Múltiplos engines Google (sistema estável funcionando)
+                engines = [
+                    ('google-pt-BR', lambda: recognizer.recognize_google(
+                        audio_data, 
+                        language='pt-BR'
+                    )),
+                    ('google-pt', lambda: recognizer.recognize_google(
+                        audio_data, 
+                        language='pt'  # Português genérico como backup
+                    )),
+                    ('google-with-details', lambda: recognizer.recognize_google(
+                        audio_data, 
+                        language='pt-BR', 
+                        show_all=True  # Obter múltiplas alternativas
+                    ))
+                ]
+                
+                best_transcription = None
+                best_confidence = 0
+                
+                for engine_name, recognize_func in engines:
+                    try:
+                        print(f"🔍 Tentando com {engine_name}...")
+                        result = recognize_func()
+                        
+                        # Processar resultado baseado no tipo
+                        if engine_name == 'google-with-details' and isinstance(result, dict):
+                            # Resultado com múltiplas alternativas do Google
+                            if 'alternative' in result:
+                                alternatives = result['alternative']
+                                for alt in alternatives:
+                                    if 'transcript' in alt:
+                                        confidence = alt.get('confidence', 0.5)
+                                        transcript = alt['transcript']
+                                        print(f"📊 Google alternativa: '{transcript}' (confiança: {confidence:.2f})")
+                                        
+                                        if confidence > best_confidence and transcript.strip():
+                                            best_transcription = transcript
+                                            best_confidence = confidence
                                             
-                                            if confidence > best_confidence and transcript.strip():
-                                                best_transcription = transcript
-                                                best_confidence = confidence
-                                                
-                            elif isinstance(result, str) and result.strip():
-                                # Resultado simples de string (Google normal)
-                                print(f"✅ {engine_name}: '{result[:50]}...' ({len(result)} chars)")
-                                
-                                # Dar preferência para resultados mais longos se confiança similar
-                                estimated_confidence = 0.8 if 'google' in engine_name else 0.7
+                        elif isinstance(result, str) and result.strip():
+                            # Resultado simples de string (Google normal)
+                            print(f"✅ {engine_name}: '{result[:50]}...' ({len(result)} chars)")
+                            
+                            # Dar preferência para resultados mais longos se confiança similar
+                            estimated_confidence = 0.8 if 'google' in engine_name else 0.7
+                            
+                            if (estimated_confidence > best_confidence or 
+                                (abs(estimated_confidence - best_confidence) < 0.1 and 
+                                 len(result) > len(best_transcription or ''))):
+                                best_transcription = result
+                                best_confidence = estimated_confidence
                                 
-                                if (estimated_confidence > best_confidence or 
-                                    (abs(estimated_confidence - best_confidence) < 0.1 and 
-                                     len(result) > len(best_transcription or ''))):
-                                    best_transcription = result
-                                    best_confidence = estimated_confidence
-                                    
-                        except sr.UnknownValueError:
-                            print(f"⚠️ {engine_name}: Não foi possível entender o áudio")
-                            continue
-                        except sr.RequestError as e:
-                            print(f"❌ {engine_name}: Erro na requisição: {e}")
-                            continue
-                        except Exception as e:
-                            print(f"❌ {engine_name}: Erro inesperado: {e}")
-                            continue
-                    
-                    # Retornar melhor resultado
-                    if best_transcription and best_transcription.strip():
-                        print(f"✅ Melhor transcrição encontrada (confiança: {best_confidence:.2f})")
-                        return best_transcription.strip()
-                    
-                    # Nenhuma transcrição funcionou
-                    print("❌ Nenhum engine conseguiu transcrever o áudio")
-                    return "[Não foi possível transcrever o áudio. Tente gravar com mais clareza ou em ambiente mais silencioso.]"
-                    
+                    except sr.UnknownValueError:
+                        print(f"⚠️ {engine_name}: Não foi possível entender o áudio")
+                        continue
+                    except sr.RequestError as e:
+                        print(f"❌ {engine_name}: Erro na requisição: {e}")
+                        continue
+                    except Exception as e:
+                        print(f"❌ {engine_name}: Erro inesperado: {e}")
+                        continue
+                
+                # Retornar melhor resultado
+                if best_transcription and best_transcription.strip():
+                    print(f"✅ Melhor transcrição encontrada (confiança: {best_confidence:.2f})")
+                    return best_transcription.strip()
+                
+                # Nenhuma transcrição funcionou
+                print("❌ Nenhum engine conseguiu transcrever o áudio")
+                return "[Não foi possível transcrever o áudio. Tente gravar com mais clareza ou em ambiente mais silencioso.]"
+                
             except Exception as e:
                 print(f"❌ Erro durante transcrição: {e}")
                 return f"[Erro durante transcrição: {str(e)}]"
             finally:
-                # Limpar arquivo temporário
-                try:
-                    os.unlink(temp_path)
-                except:
-                    pass
+                # Limpar arquivo temporário (o PCM normalizado em cache é mantido)
+                if temp_path:
+                    try:
+                        os.unlink(temp_path)
+                    except:
+                        pass
                     
         except Exception as e:
-            print(f"❌ Erro ao processar áudio com pydub: {e}")
+            print(f"❌ Erro ao processar áudio: {e}")
             return f"[Erro ao processar áudio: {str(e)}]"
             
     except Exception as e:
@@ -319,59 +312,37 @@ def transcribe_audio_with_speech_recognition(audio_path):
 def transcribe_long_audio_in_segments(audio, original_path):
     """Transcreve áudio longo dividindo em segmentos"""
     try:
-        print("📏 Áudio longo detectado, dividindo em segmentos...")
-        
-        segment_length = 240000  # 4 minutos em ms
-        overlap = 5000  # 5 segundos de sobreposição
+        print("📏 Áudio longo detectado, dividindo em trechos de fala...")
         
-        segments = []
-        start = 0
+        # Cortes nas pausas, silêncio descartado e trechos de até AUDIO_SEGMENT_LENGTH (sem sobreposição)
+        segments = audio.speech_segments(AUDIO_SEGMENT_LENGTH)
+        speech_seconds = sum(end - start for regions in segments for start, end in regions) / audio.frame_rate
+        print(f"📊 Dividido em {len(segments)} segmentos ({speech_seconds:.1f}s de fala em {len(audio) / 1000:.1f}s)")
         
-        while start < len(audio):
-            end = min(start + segment_length, len(audio))
-            segment = audio[start:end]
-            segments.append(segment)
-            start = end - overlap
-            
-            if start >= len(audio):
-                break
-        
-        print(f"📊 Dividido em {len(segments)} segmentos")
+        if not segments:
+            return "[Nenhuma fala detectada no áudio]"
         
         full_transcription = []
         recognizer = sr.Recognizer()
         
-        for i, segment in enumerate(segments):
+        for i, regions in enumerate(segments):
             print(f"🔄 Processando segmento {i+1}/{len(segments)}...")
             
             try:
-                # Exportar segmento para arquivo temporário
-                with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-                    segment.export(temp_file.name, format="wav")
-                    temp_path = temp_file.name
+                # Segmento entregue em memória ao reconhecedor
+                audio_data = recognizer_audio(audio.join(regions))
                 
                 try:
-                    with sr.AudioFile(temp_path) as source:
-                        recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                        audio_data = recognizer.record(source)
-                        
-                        try:
-                            text = recognizer.recognize_google(audio_data, language='pt-BR')
-                            if text and text.strip():
-                                full_transcription.append(text)
-                                print(f"✅ Segmento {i+1} transcrito com sucesso")
-                        except sr.UnknownValueError:
-                            print(f"⚠️ Segmento {i+1}: Não foi possível entender")
-                            full_transcription.append("[Trecho inaudível]")
-                        except sr.RequestError as e:
-                            print(f"❌ Segmento {i+1}: Erro na requisição: {e}")
-                            full_transcription.append("[Erro na transcrição]")
-                            
-                finally:
-                    try:
-                        os.unlink(temp_path)
-                    except:
-                        pass
+                    text = recognizer.recognize_google(audio_data, language='pt-BR')
+                    if text and text.strip():
+                        full_transcription.append(text)
+                        print(f"✅ Segmento {i+1} transcrito com sucesso")
+                except sr.UnknownValueError:
+                    print(f"⚠️ Segmento {i+1}: Não foi possível entender")
+                    full_transcription.append("[Trecho inaudível]")
+                except sr.RequestError as e:
+                    print(f"❌ Segmento {i+1}: Erro na requisição: {e}")
+                    full_transcription.append("[Erro na transcrição]")
                         
             except Exception as e:
                 print(f"❌ Erro no segmento {i+1}: {e}")
@@ -525,11 +496,136 @@ def create_docx_from_text(text, title="Resumo da Consulta"):
 
 # ==================== ROTAS DA API ====================
 
+UPLOAD_SPOOL_DIR = 'temp_uploads'
+UPLOAD_FORM_OVERHEAD = 64 * 1024  # Campos e delimitadores do multipart além do arquivo
+UPLOAD_HEAD_SIZE = 4096  # Início do arquivo usado na detecção de formato
+
+def upload_spool_dir():
+    """Diretório dos uploads em recebimento (mesmo disco das gravações)"""
+    spool_dir = os.path.join(RECORDINGS_DIR, UPLOAD_SPOOL_DIR)
+    os.makedirs(spool_dir, exist_ok=True)
+    return spool_dir
+
+def read_head(path, size=UPLOAD_HEAD_SIZE):
+    with open(path, 'rb') as f:
+        return f.read(size)
+
+def base64_payload_limit():
+    """Maior corpo JSON aceito para um áudio de MAX_FILE_SIZE em base64"""
+    return MAX_FILE_SIZE * 4 // 3 + UPLOAD_FORM_OVERHEAD
+
+def upload_too_large_response():
+    return jsonify({
+        'success': False,
+        'message': f'Arquivo muito grande (máximo {format_size(MAX_FILE_SIZE)})'
+    }), 413
+
+def existing_upload_response(user_id, upload_hash, original_name=''):
+    """Reenvio de um áudio já salvo (retry após timeout): devolve a gravação existente
+    em vez de criar outra cópia. Retorna None se o conteúdo ainda não foi recebido."""
+    existing = get_content_store().find_upload(user_id, upload_hash)
+    stats = recordings_storage.stat(existing) if existing else None
+    if not stats:
+        return None
+    print(f"♻️ Upload repetido, reutilizando gravação: {existing}")
+    return jsonify({
+        'success': True,
+        'message': 'Áudio já havia sido salvo',
+        'filename': existing,
+        'size': stats['size'],
+        'audioFile': {
+            'filename': existing,
+            'originalName': original_name or existing,
+            'size': stats['size'],
+            'createdAt': datetime.fromtimestamp(stats['mtime']).isoformat(),
+            'deduplicated': True
+        }
+    }), 200
+
+def store_uploaded_audio(source_path, filename, user_id, upload_hash, detected_format):
+    """Converte o upload em WAV compatível no layout e registra a gravação
+
+    Se o áudio não puder ser decodificado ou processado (inclusive por
+    timeout no pool de áudio), guarda o arquivo original como está. Usada pelas rotas de upload e pelos jobs de ingestão
+    em segundo plano. Retorna filename, size, processed e, quando processado,
+    frame_rate, channels e duration_ms.
+    """
+    file_path = recordings_storage.write_path(filename)
+    stored = {'filename': filename, 'processed': False}
+    try:
+        # Decodificar (ffmpeg suporta múltiplos formatos), processar e exportar no pool de processos
+        converted = run_audio_task(convert_to_compatible_wav, source_path, file_path, detected_format)
+        stored.update({
+            'processed': True,
+            'frame_rate': converted['frame_rate'],
+            'channels': converted['channels'],
+            'duration_ms': converted['duration_ms']
+        })
+    except Exception as e:
+        print(f"⚠️ Erro no processamento do áudio: {e}")
+        # Fallback: salvar arquivo original
+        shutil.move(source_path, file_path)
+    
+    stored['size'] = os.path.getsize(file_path)
+    content_hash = get_content_store().intern(filename, owner=user_id, upload_hash=upload_hash)
+    if stored['processed'] and content_hash:
+        # O WAV salvo já é o PCM normalizado: transcrição e otimização não decodificam de novo
+        get_content_store().record_pcm(content_hash, converted, in_place=True)
+    recordings_storage.commit(filename)
+    get_catalog().index_recording(filename, owner=user_id)
+    status = 'processada e salva' if stored['processed'] else 'salva sem processamento'
+    print(f"✅ Gravação {status}: {filename} ({stored['size']} bytes)")
+    return stored
+
+def process_ingest_job(job):
+    """Job de ingestão em segundo plano: mesmo processamento das rotas síncronas"""
+    details = job['details']
+    return store_uploaded_audio(
+        job['raw_path'], job['filename'], job['owner'], job['upload_hash'],
+        details.get('detected_format', 'Upload assíncrono')
+    )
+
+register_ingest_handler('audio_upload', process_ingest_job)
+
+def ingest_requested():
+    """Modo assíncrono: INGEST_ASYNC_ENABLED, ?async=1 ou cabeçalho Prefer: respond-async"""
+    return (INGEST_ASYNC_ENABLED or is_truthy(request.args.get('async', 'false'))
+            or 'respond-async' in request.headers.get('Prefer', ''))
+
+def ingest_accepted_response(job, size, original_name=''):
+    """202 com o id do job; o WAV fica disponível quando o status for 'done'"""
+    return jsonify({
+        'success': True,
+        'message': 'Áudio recebido; processamento em segundo plano',
+        'job_id': job['job_id'],
+        'status': job['status'],
+        'status_url': f"/api/ingest/{job['job_id']}",
+        'filename': job['filename'],
+        'audioFile': {
+            'filename': job['filename'],
+            'originalName': original_name or job['filename'],
+            'size': size,
+            'createdAt': datetime.now().isoformat(),
+            'status': 'processing'
+        }
+    }), 202
+
 @audio_bp.route('/api/audio/upload', methods=['POST'])
 @login_required
 def api_audio_upload():
-    """Rota compatível com frontend para upload de áudio"""
+    """Rota compatível com frontend para upload de áudio
+
+    O arquivo é copiado em blocos para um temporário em disco (nunca inteiro
+    na memória) e recusado com 413 assim que passa de MAX_FILE_SIZE; detecção
+    de formato e decodificação leem desse arquivo. No modo assíncrono
+    (ingest_requested) responde 202 e processa em segundo plano.
+    """
+    spool_path = None
     try:
+        # Recusar antes de ler o corpo quando o tamanho declarado já excede o limite
+        if request.content_length and request.content_length > MAX_FILE_SIZE + UPLOAD_FORM_OVERHEAD:
+            return upload_too_large_response()
+        
         # Verificar se há arquivo de áudio
         if 'audio' not in request.files:
             return jsonify({
@@ -546,18 +642,29 @@ def api_audio_upload():
                 'message': 'Nome do arquivo não fornecido'
             }), 400
         
-        # Ler dados do arquivo
-        audio_bytes = audio_file.read()
+        # Copiar dados do arquivo para o disco, calculando o hash
+        try:
+            spool_path, upload_size, upload_hash = spool_upload(
+                audio_file.stream, upload_spool_dir(), MAX_FILE_SIZE
+            )
+        except UploadTooLarge:
+            return upload_too_large_response()
         
         # Validar tamanho do arquivo
-        if len(audio_bytes) < 1000:  # Menos de 1KB
+        if upload_size < 1000:  # Menos de 1KB
             return jsonify({
                 'success': False,
                 'message': 'Arquivo de áudio muito pequeno ou corrompido'
             }), 400
         
-        # Gerar nome único do arquivo
         user_id = session.get('user_id', 'unknown')
+        
+        # Mesmo conteúdo já enviado por este usuário: não gravar outra cópia
+        existing = existing_upload_response(user_id, upload_hash, original_name)
+        if existing:
+            return existing
+        
+        # Gerar nome único do arquivo
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         unique_id = str(random.randint(100000, 999999))
         
@@ -568,8 +675,7 @@ def api_audio_upload():
             filename = f"recording_{timestamp}_{unique_id}_{user_id}.wav"
         
         # Garantir que o diretório existe
-        os.makedirs(RECORDINGS_DIR, exist_ok=True)
-        file_path = os.path.join(RECORDINGS_DIR, filename)
+        file_path = recordings_storage.write_path(filename)
         
         # Verificar se arquivo já existe (evitar duplicação)
         if os.path.exists(file_path):
@@ -577,109 +683,84 @@ def api_audio_upload():
             base_name, ext = os.path.splitext(filename)
             while os.path.exists(file_path):
                 filename = f"{base_name}_({counter}){ext}"
-                file_path = os.path.join(RECORDINGS_DIR, filename)
+                file_path = recordings_storage.write_path(filename)
                 counter += 1
         
-        # Processar áudio com pydub para garantir compatibilidade
+        # FUNÇÃO ROBUSTA: Detectar formato do áudio para diferentes dispositivos
+        print(f"🔍 Processando áudio: {upload_size} bytes")
+        format_result = detect_audio_format_robust(read_head(spool_path), upload_size)
+        
+        # Extrair formato e sample rate esperado
+        if isinstance(format_result, tuple):
+            detected_format, expected_sample_rate = format_result
+        else:
+            # Fallback para compatibilidade com versões antigas
+            detected_format = format_result
+            expected_sample_rate = 44100
+        
+        print(f"🎯 Formato detectado: {detected_format}")
+        print(f"🎵 Sample rate esperado: {expected_sample_rate}Hz")
+        
+        # Modo assíncrono: guardar o original e processar em segundo plano
+        if ingest_requested():
+            job = get_catalog().find_pending_ingest_job(user_id, upload_hash)
+            if job is None:
+                job = get_ingest_queue().submit(
+                    'audio_upload', user_id, spool_path, filename, upload_hash,
+                    details={'detected_format': detected_format, 'original_name': original_name}
+                )
+            return ingest_accepted_response(job, upload_size, original_name)
+        
+        # Processar áudio para garantir compatibilidade
         try:
-            # FUNÇÃO ROBUSTA: Detectar formato do áudio para diferentes dispositivos
-            print(f"🔍 Processando áudio: {len(audio_bytes)} bytes")
-            
-            # FUNÇÃO ROBUSTA: Detectar formato do áudio para diferentes dispositivos
-            format_result = detect_audio_format_robust(audio_bytes)
-            
-            # Extrair formato e sample rate esperado
-            if isinstance(format_result, tuple):
-                detected_format, expected_sample_rate = format_result
-            else:
-                # Fallback para compatibilidade com versões antigas
-                detected_format = format_result
-                expected_sample_rate = 44100
-            
-            print(f"🎯 Formato detectado: {detected_format}")
-            print(f"🎵 Sample rate esperado: {expected_sample_rate}Hz")
-            
-            # Tentar carregar com pydub (suporta múltiplos formatos)
-            try:
-                audio_segment = AudioSegment.from_file(io.BytesIO(audio_bytes))
-                print(f"✅ Áudio carregado com pydub: {audio_segment.frame_rate}Hz, {audio_segment.channels} canais")
-                print(f"   Formato original: {detected_format}")
-            except Exception as pydub_error:
-                print(f"⚠️ Erro ao carregar com pydub: {pydub_error}")
-                # Fallback: salvar arquivo original
-                with open(file_path, 'wb') as f:
-                    f.write(audio_bytes)
-                file_size = len(audio_bytes)
-                print(f"✅ Arquivo salvo sem processamento: {filename} ({file_size} bytes)")
-                return jsonify({
-                    'message': 'Áudio salvo com sucesso (sem processamento)',
-                    'audioFile': {
-                        'filename': filename,
-                        'originalName': original_name or filename,
-                        'size': file_size,
-                        'createdAt': datetime.now().isoformat()
-                    }
-                }), 201
-            
-            # FUNÇÃO ROBUSTA: Processar áudio para compatibilidade com diferentes dispositivos
-            audio_segment = process_audio_for_device_compatibility(audio_segment, detected_format)
-            
-            # CORREÇÃO: Exportar como WAV com configurações específicas para evitar problemas de velocidade
-            print(f"🔧 Exportando WAV com configurações otimizadas...")
-            audio_segment.export(
-                file_path, 
-                format="wav",
-                parameters=[
-                    "-acodec", "pcm_s16le",  # PCM 16-bit
-                    "-ar", str(audio_segment.frame_rate),  # Manter sample rate
-                    "-ac", "1"  # Mono
-                ]
-            )
-            
-            file_size = os.path.getsize(file_path)
-            print(f"✅ Gravação processada e salva: {filename} ({file_size} bytes)")
-            
-        except Exception as e:
-            print(f"⚠️ Erro no processamento com pydub: {e}")
-            # Fallback: salvar arquivo original
-            try:
-                with open(file_path, 'wb') as f:
-                    f.write(audio_bytes)
-                file_size = len(audio_bytes)
-                print(f"✅ Gravação salva (fallback): {filename} ({file_size} bytes)")
-            except Exception as fallback_error:
-                print(f"❌ Erro no fallback: {fallback_error}")
-                return jsonify({
-                    'success': False,
-                    'message': 'Erro ao salvar arquivo de áudio'
-                }), 500
+            stored = store_uploaded_audio(spool_path, filename, user_id, upload_hash, detected_format)
+        except Exception as fallback_error:
+            print(f"❌ Erro no fallback: {fallback_error}")
+            return jsonify({
+                'success': False,
+                'message': 'Erro ao salvar arquivo de áudio'
+            }), 500
         
-                    # Resposta compatível com frontend
+        if not stored['processed']:
             return jsonify({
-                'message': 'Áudio processado e salvo com sucesso',
+                'message': 'Áudio salvo com sucesso (sem processamento)',
                 'audioFile': {
                     'filename': filename,
                     'originalName': original_name or filename,
-                    'size': file_size,
-                    'createdAt': datetime.now().isoformat(),
-                    'originalFormat': detected_format,
-                    'frameRate': audio_segment.frame_rate,
-                    'channels': audio_segment.channels,
-                    'duration': len(audio_segment),
-                    'processingInfo': {
-                        'deviceCompatible': True,
-                        'qualityPreserved': True,
-                        'speedCorrected': True
-                    }
+                    'size': stored['size'],
+                    'createdAt': datetime.now().isoformat()
                 }
             }), 201
         
+        # Resposta compatível com frontend
+        return jsonify({
+            'message': 'Áudio processado e salvo com sucesso',
+            'audioFile': {
+                'filename': filename,
+                'originalName': original_name or filename,
+                'size': stored['size'],
+                'createdAt': datetime.now().isoformat(),
+                'originalFormat': detected_format,
+                'frameRate': stored['frame_rate'],
+                'channels': stored['channels'],
+                'duration': stored['duration_ms'],
+                'processingInfo': {
+                    'deviceCompatible': True,
+                    'qualityPreserved': True,
+                    'speedCorrected': True
+                }
+            }
+        }), 201
+        
     except Exception as e:
         print(f"❌ Erro geral ao fazer upload: {e}")
         return jsonify({
             'success': False,
             'message': f'Erro interno do servidor: {str(e)}'
         }), 500
+    finally:
+        if spool_path and os.path.exists(spool_path):
+            os.remove(spool_path)
 
 @audio_bp.route('/api/audio/save-simple', methods=['POST'])
 @login_required
@@ -688,7 +769,12 @@ def api_audio_save_simple():
     NOVA ARQUITETURA: Salvamento simples e rápido (sem processamento pesado)
     Responsabilidade Única: Apenas salvar arquivo original para processamento posterior
     """
+    spool_path = None
     try:
+        # Recusar antes de ler o corpo quando o tamanho declarado já excede o limite
+        if request.content_length and request.content_length > MAX_FILE_SIZE + UPLOAD_FORM_OVERHEAD:
+            return upload_too_large_response()
+        
         # Verificar se há arquivo de áudio
         if 'audio' not in request.files:
             return jsonify({
@@ -705,8 +791,22 @@ def api_audio_save_simple():
                 'message': 'Nome de arquivo inválido'
             }), 400
         
-        # Gerar nome único para o arquivo
         user_id = session.get('user_id', '')
+        
+        # Copiar em blocos para o disco com limite de tamanho, calculando o hash
+        try:
+            spool_path, file_size, upload_hash = spool_upload(
+                audio_file.stream, upload_spool_dir(), MAX_FILE_SIZE
+            )
+        except UploadTooLarge:
+            return upload_too_large_response()
+        
+        # Reenvio do mesmo arquivo: devolver a gravação existente
+        existing = existing_upload_response(user_id, upload_hash, original_name)
+        if existing:
+            return existing
+        
+        # Gerar nome único para o arquivo
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]
         random_suffix = random.randint(100000, 999999)
         
@@ -715,14 +815,15 @@ def api_audio_save_simple():
         filename = f"{original_name or 'recording'}_{timestamp}_{random_suffix}_{user_id}.{original_extension}"
         
         # Garantir que o diretório existe
-        os.makedirs(RECORDINGS_DIR, exist_ok=True)
-        file_path = os.path.join(RECORDINGS_DIR, filename)
+        file_path = recordings_storage.write_path(filename)
         
         # SALVAMENTO SIMPLES: Apenas salvar arquivo original
         print(f"💾 Salvamento simples: {filename}")
-        audio_file.save(file_path)
+        shutil.move(spool_path, file_path)
         
-        file_size = os.path.getsize(file_path)
+        get_content_store().intern(filename, owner=user_id, upload_hash=upload_hash, content_hash=upload_hash)
+        recordings_storage.commit(filename)
+        get_catalog().index_recording(filename, owner=user_id)
         print(f"✅ Arquivo salvo rapidamente: {filename} ({file_size} bytes)")
         
         # Resposta simples e rápida
@@ -745,6 +846,9 @@ def api_audio_save_simple():
             'success': False,
             'message': f'Erro ao salvar áudio: {str(e)}'
         }), 500
+    finally:
+        if spool_path and os.path.exists(spool_path):
+            os.remove(spool_path)
 
 @audio_bp.route('/api/audio/process', methods=['POST'])
 @login_required
@@ -764,7 +868,7 @@ def api_audio_process():
             }), 400
         
         # Verificar se arquivo existe
-        file_path = os.path.join(RECORDINGS_DIR, filename)
+        file_path = recordings_storage.locate(filename)
         if not os.path.exists(file_path):
             return jsonify({
                 'success': False,
@@ -773,12 +877,8 @@ def api_audio_process():
         
         print(f"🔄 Iniciando processamento otimizado: {filename}")
         
-        # Carregar arquivo original
-        with open(file_path, 'rb') as f:
-            audio_bytes = f.read()
-        
-        # Detectar formato
-        format_result = detect_audio_format_robust(audio_bytes)
+        # Detectar formato (cabeçalho basta)
+        format_result = detect_audio_format_robust(read_head(file_path), os.path.getsize(file_path))
         if isinstance(format_result, tuple):
             detected_format, expected_sample_rate = format_result
         else:
@@ -788,31 +888,22 @@ def api_audio_process():
         print(f"🎯 Formato detectado: {detected_format}")
         print(f"🎵 Sample rate esperado: {expected_sample_rate}Hz")
         
-        # Processar com pydub
-        audio_segment = AudioSegment.from_file(io.BytesIO(audio_bytes))
-        print(f"✅ Áudio carregado: {audio_segment.frame_rate}Hz, {audio_segment.channels} canais")
-        
-        # Aplicar otimizações
-        optimized_audio = process_audio_for_device_compatibility(audio_segment, detected_format)
-        
         # Gerar nome do arquivo otimizado
         base_name = filename.rsplit('.', 1)[0]
         optimized_filename = f"{base_name}_optimized.wav"
-        optimized_path = os.path.join(RECORDINGS_DIR, optimized_filename)
+        optimized_path = recordings_storage.write_path(optimized_filename)
         
-        # Salvar versão otimizada
+        # PCM normalizado do conteúdo (decodificado uma única vez) vira a versão otimizada
         print(f"💾 Salvando versão otimizada: {optimized_filename}")
-        optimized_audio.export(
-            optimized_path,
-            format="wav",
-            parameters=[
-                "-acodec", "pcm_s16le",  # PCM 16-bit
-                "-ar", str(optimized_audio.frame_rate),  # Manter sample rate otimizado
-                "-ac", "1"  # Mono
-            ]
-        )
+        pcm_path, optimized = normalized_pcm(filename, file_path, detected_format)
+        shutil.copyfile(pcm_path, optimized_path)
         
         file_size = os.path.getsize(optimized_path)
+        content_hash = get_content_store().intern(optimized_filename)
+        if content_hash:
+            get_content_store().record_pcm(content_hash, optimized, in_place=True)
+        recordings_storage.commit(optimized_filename)
+        get_catalog().index_recording(optimized_filename)
         print(f"✅ Arquivo otimizado salvo: {optimized_filename} ({file_size} bytes)")
         
         return jsonify({
@@ -822,10 +913,10 @@ def api_audio_process():
             'optimizedFile': optimized_filename,
             'processing': {
                 'originalFormat': detected_format,
-                'originalSampleRate': audio_segment.frame_rate,
-                'optimizedSampleRate': optimized_audio.frame_rate,
+                'originalSampleRate': optimized['original_frame_rate'],
+                'optimizedSampleRate': optimized['frame_rate'],
                 'optimizedSize': file_size,
-                'qualityImproved': optimized_audio.frame_rate > audio_segment.frame_rate
+                'qualityImproved': optimized['frame_rate'] > optimized['original_frame_rate']
             }
         }), 200
         
@@ -854,7 +945,7 @@ def api_audio_transcribe():
             }), 400
         
         # Verificar se arquivo otimizado existe
-        optimized_path = os.path.join(RECORDINGS_DIR, optimized_filename)
+        optimized_path = recordings_storage.locate(optimized_filename)
         if not os.path.exists(optimized_path):
             return jsonify({
                 'success': False,
@@ -864,7 +955,7 @@ def api_audio_transcribe():
         print(f"🎯 Iniciando transcrição otimizada: {optimized_filename}")
         
         # Transcrever arquivo otimizado
-        transcription = transcribe_audio_with_speech_recognition(optimized_path)
+        transcription = transcribe_audio_with_speech_recognition(optimized_path, optimized_filename)
         
         if not transcription or transcription.startswith('[Erro') or transcription.startswith('[Não foi possível'):
             return jsonify({
@@ -876,15 +967,14 @@ def api_audio_transcribe():
         # Salvar transcrição
         base_name = optimized_filename.rsplit('.', 1)[0]
         transcription_filename = f"{base_name}_transcricao.txt"
-        transcription_path = os.path.join('transcriptions', transcription_filename)
-        
-        # Garantir que o diretório existe
-        os.makedirs('transcriptions', exist_ok=True)
+        transcription_path = transcriptions_storage.write_path(transcription_filename)
         
         # Salvar arquivo de transcrição
         with open(transcription_path, 'w', encoding='utf-8') as f:
             f.write(transcription)
         
+        transcriptions_storage.commit(transcription_filename)
+        get_catalog().index_text(transcription_filename, transcription)
         print(f"✅ Transcrição salva: {transcription_filename}")
         
         return jsonify({
@@ -923,7 +1013,7 @@ def api_audio_test_fix():
                 'message': 'Nome do arquivo não fornecido'
             }), 400
         
-        file_path = os.path.join(RECORDINGS_DIR, filename)
+        file_path = recordings_storage.locate(filename)
         if not os.path.exists(file_path):
             return jsonify({
                 'success': False,
@@ -932,45 +1022,20 @@ def api_audio_test_fix():
         
         print(f"🧪 TESTE DE CORREÇÃO: {filename}")
         
-        # Carregar arquivo
-        with open(file_path, 'rb') as f:
-            audio_bytes = f.read()
+        # Salvar arquivo teste com a correção robusta aplicada no pool de processos
+        # (sample rate forçado SEM reamostrar: mesmos dados, interpretação correta)
+        test_filename = f"TEST_FIXED_{filename}"
+        test_path = recordings_storage.write_path(test_filename)
         
-        # Análise inicial
-        audio_segment = AudioSegment.from_file(io.BytesIO(audio_bytes))
-        original_rate = audio_segment.frame_rate
-        original_duration = len(audio_segment)
+        fixed = run_audio_task(retag_frame_rate, file_path, test_path, slow_audio_rate)
+        original_rate, original_duration = fixed['original_rate'], fixed['original_duration_ms']
+        final_rate, final_duration = fixed['frame_rate'], fixed['duration_ms']
         
         print(f"📊 ANTES: {original_rate}Hz, {original_duration}ms")
-        
-        # Aplicar correção robusta
-        if original_rate <= 22050:
-            # Forçar sample rate correto SEM reamostrar
-            corrected_audio = audio_segment._spawn(audio_segment.raw_data, overrides={"frame_rate": 44100})
-            print(f"🔧 FORÇADO: {original_rate}Hz → 44.1kHz (mesmos dados, interpretação correta)")
-        else:
-            corrected_audio = audio_segment
-            print(f"✅ MANTIDO: {original_rate}Hz")
-        
-        # Verificar resultado
-        final_rate = corrected_audio.frame_rate
-        final_duration = len(corrected_audio)
-        
         print(f"📊 DEPOIS: {final_rate}Hz, {final_duration}ms")
         
-        # Salvar arquivo teste
-        test_filename = f"TEST_FIXED_{filename}"
-        test_path = os.path.join(RECORDINGS_DIR, test_filename)
-        
-        corrected_audio.export(
-            test_path,
-            format="wav",
-            parameters=[
-                "-acodec", "pcm_s16le",
-                "-ar", str(final_rate),
-                "-ac", "1"
-            ]
-        )
+        recordings_storage.commit(test_filename)
+        get_catalog().index_recording(test_filename)
         
         # Verificar arquivo salvo
         with wave.open(test_path, 'rb') as wav_file:
@@ -1023,7 +1088,7 @@ def api_audio_calibrate():
                 'message': 'Nome do arquivo não fornecido'
             }), 400
         
-        file_path = os.path.join(RECORDINGS_DIR, filename)
+        file_path = recordings_storage.locate(filename)
         if not os.path.exists(file_path):
             return jsonify({
                 'success': False,
@@ -1032,51 +1097,20 @@ def api_audio_calibrate():
         
         print(f"🎛️ CALIBRAÇÃO FINA: {filename} - Feedback: {speed_feedback}")
         
-        # Carregar arquivo
-        with open(file_path, 'rb') as f:
-            audio_bytes = f.read()
-        
-        audio_segment = AudioSegment.from_file(io.BytesIO(audio_bytes))
-        original_rate = audio_segment.frame_rate
+        # Calcular o sample rate pelo feedback e gravar o arquivo calibrado no pool de processos
+        # (só quando há ajuste a fazer)
+        calibrated_filename = f"CALIBRATED_{filename}"
+        calibrated_path = recordings_storage.write_path(calibrated_filename)
         
-        # Calcular fator de correção baseado no feedback
-        if speed_feedback == 'slow':
-            # Ainda está lento, aumentar sample rate um pouco mais
-            if original_rate == 44100:
-                calibrated_rate = 45000  # +2% mais rápido
-            else:
-                calibrated_rate = int(original_rate * 1.02)  # +2%
-            print(f"🔧 CORREÇÃO LENTO: {original_rate}Hz → {calibrated_rate}Hz (+2%)")
-            
-        elif speed_feedback == 'fast':
-            # Está rápido demais, diminuir sample rate um pouco
-            if original_rate == 44100:
-                calibrated_rate = 43200  # -2% mais lento
-            else:
-                calibrated_rate = int(original_rate * 0.98)  # -2%
-            print(f"🔧 CORREÇÃO RÁPIDO: {original_rate}Hz → {calibrated_rate}Hz (-2%)")
-            
-        else:  # normal
-            calibrated_rate = original_rate
-            print(f"✅ VELOCIDADE PERFEITA: {original_rate}Hz mantido")
+        calibration = run_audio_task(
+            retag_frame_rate, file_path, calibrated_path, calibrated_rate, speed_feedback,
+            always_export=False
+        )
+        original_rate, new_rate = calibration['original_rate'], calibration['frame_rate']
         
-        if calibrated_rate != original_rate:
-            # Aplicar calibração
-            calibrated_audio = audio_segment._spawn(audio_segment.raw_data, overrides={"frame_rate": calibrated_rate})
-            
-            # Salvar arquivo calibrado
-            calibrated_filename = f"CALIBRATED_{filename}"
-            calibrated_path = os.path.join(RECORDINGS_DIR, calibrated_filename)
-            
-            calibrated_audio.export(
-                calibrated_path,
-                format="wav",
-                parameters=[
-                    "-acodec", "pcm_s16le",
-                    "-ar", str(calibrated_rate),
-                    "-ac", "1"
-                ]
-            )
+        if calibration['written']:
+            recordings_storage.commit(calibrated_filename)
+            get_catalog().index_recording(calibrated_filename)
             
             return jsonify({
                 'success': True,
@@ -1087,8 +1121,8 @@ def api_audio_calibrate():
                 },
                 'calibrated': {
                     'filename': calibrated_filename,
-                    'sampleRate': calibrated_rate,
-                    'adjustment': f"{'+' if calibrated_rate > original_rate else ''}{((calibrated_rate - original_rate) / original_rate * 100):.1f}%"
+                    'sampleRate': new_rate,
+                    'adjustment': f"{'+' if new_rate > original_rate else ''}{((new_rate - original_rate) / original_rate * 100):.1f}%"
                 }
             }), 200
         else:
@@ -1116,55 +1150,36 @@ def api_audio_files():
         
         print(f"🔍 Buscando arquivos para user_id: {user_id}, email: {user_email}")
         
-        # Verificar se o diretório existe
-        if not os.path.exists(RECORDINGS_DIR):
-            os.makedirs(RECORDINGS_DIR, exist_ok=True)
-            return jsonify({'audioFiles': []})
-        
-        # Listar arquivos
-        all_files = os.listdir(RECORDINGS_DIR)
-        print(f"📋 Arquivos encontrados: {len(all_files)}")
+        owners = [user_id]
+        if user_email:
+            owners.append(user_email.replace('@', '_').replace('.', '_'))
         
-        for filename in all_files:
-            if not filename.endswith('.wav'):
-                continue
-            
-            # Verificar se pertence ao usuário
-            belongs_to_user = False
-            
-            # Formato novo: nome_timestamp_userid.wav
-            if filename.endswith(f"_{user_id}.wav"):
-                belongs_to_user = True
-            # Formato antigo com email
-            elif user_email:
-                old_format_suffix = f"_{user_email.replace('@', '_').replace('.', '_')}.wav"
-                if filename.endswith(old_format_suffix):
-                    belongs_to_user = True
-            
-            if not belongs_to_user:
-                continue
-            
-            file_path = os.path.join(RECORDINGS_DIR, filename)
-            try:
-                stats = os.stat(file_path)
-                file_size = stats.st_size
-                created_time = datetime.fromtimestamp(stats.st_ctime)
-                
-                recordings.append({
-                    'id': filename,  # Usar filename como ID
-                    'filename': filename,
-                    'originalName': filename.replace(f'_{user_id}.wav', '').replace('.wav', ''),
-                    'size': file_size,
-                    'createdAt': created_time.isoformat()
-                })
-            except Exception as e:
-                print(f"❌ Erro ao processar arquivo {filename}: {e}")
-                continue
-        
-        # Ordenar por data de criação (mais recentes primeiro)
-        recordings.sort(key=lambda x: x['createdAt'], reverse=True)
+        try:
+            page = parse_page_args(request.args, RECORDING_SORT_KEYS)
+        except InvalidPageRequest as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        
+        # Consultar catálogo (índice por dono, já ordenado) em vez de varrer o diretório
+        rows, next_position = get_catalog().page_recordings(
+            owners, sort=page['sort'], order=page['order'], limit=page['limit'], after=page['after'],
+            date_from=page['date_from'], date_to=page['date_to']
+        )
+        for row in rows:
+            recordings.append({
+                'id': row['filename'],  # Usar filename como ID
+                'filename': row['filename'],
+                'originalName': row['filename'].replace(f'_{user_id}.wav', '').replace('.wav', ''),
+                'size': row['size'],
+                'duration': row['duration_ms'] / 1000 if row['duration_ms'] is not None else None,
+                'createdAt': datetime.fromtimestamp(row['ctime']).isoformat()
+            })
         
-        return jsonify({'audioFiles': recordings})
+        response = {'audioFiles': recordings}
+        if page['limit'] is not None:
+            response['nextCursor'] = (
+                encode_cursor(page['sort'], page['order'], *next_position) if next_position else None
+            )
+        return jsonify(response)
         
     except Exception as e:
         print(f"❌ Erro ao listar arquivos: {e}")
@@ -1176,44 +1191,53 @@ def api_audio_files():
 @audio_bp.route('/api/save_recording', methods=['POST'])
 @login_required
 def api_save_recording():
-    """Salva gravação com processamento otimizado para deploy"""
+    """Salva gravação com processamento otimizado para deploy
+
+    Clientes antigos enviam a gravação inteira em base64 no JSON: o corpo é
+    lido em streaming e o áudio decodificado aos poucos para um temporário
+    em disco, sem montar a string nem os bytes na memória. Também aceita o
+    modo assíncrono (202 + GET /api/ingest/<job_id>).
+    """
+    spool_path = None
     try:
-        data = request.json
-        audio_data = data.get('audio')
-        patient_name = data.get('patient_name', '')
+        if request.content_length and request.content_length > base64_payload_limit():
+            return upload_too_large_response()
         
-        if not audio_data:
+        try:
+            data, upload = spool_json_audio(request.stream, upload_spool_dir(), MAX_FILE_SIZE)
+        except UploadTooLarge:
+            return upload_too_large_response()
+        except InvalidUploadPayload as e:
+            print(f"❌ Erro ao decodificar base64: {e}")
             return jsonify({
                 'success': False,
-                'message': 'Dados de áudio não fornecidos'
+                'message': 'Erro ao decodificar dados de áudio'
             }), 400
+        patient_name = data.get('patient_name', '')
         
-        # Decodificar base64
-        if audio_data.startswith('data:audio'):
-            # Extrair tipo MIME e dados
-            header, audio_data = audio_data.split(',', 1)
-            mime_type = header.split(':')[1].split(';')[0]
-        else:
-            mime_type = 'audio/wav'  # fallback
-        
-        try:
-            audio_bytes = base64.b64decode(audio_data)
-        except Exception as e:
-            print(f"❌ Erro ao decodificar base64: {e}")
+        if not upload:
             return jsonify({
                 'success': False,
-                'message': 'Erro ao decodificar dados de áudio'
+                'message': 'Dados de áudio não fornecidos'
             }), 400
+        spool_path = upload['path']
         
         # Validar tamanho do arquivo
-        if len(audio_bytes) < 1000:  # Menos de 1KB
+        if upload['size'] < 1000:  # Menos de 1KB
             return jsonify({
                 'success': False,
                 'message': 'Arquivo de áudio muito pequeno ou corrompido'
             }), 400
         
-        # Gerar nome único do arquivo
         user_id = session.get('user_id', 'unknown')
+        
+        # Mesmo conteúdo já enviado por este usuário: não gravar outra cópia
+        upload_hash = upload['sha256']
+        existing = existing_upload_response(user_id, upload_hash)
+        if existing:
+            return existing
+        
+        # Gerar nome único do arquivo
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         unique_id = str(int(time.time() * 1000))[-6:]  # 6 últimos dígitos do timestamp
         
@@ -1224,8 +1248,7 @@ def api_save_recording():
             filename = f"recording_{timestamp}_{unique_id}_{user_id}.wav"
         
         # Garantir que o diretório existe
-        os.makedirs(RECORDINGS_DIR, exist_ok=True)
-        file_path = os.path.join(RECORDINGS_DIR, filename)
+        file_path = recordings_storage.write_path(filename)
         
         # Verificar se arquivo já existe (evitar duplicação)
         if os.path.exists(file_path):
@@ -1233,47 +1256,34 @@ def api_save_recording():
             base_name, ext = os.path.splitext(filename)
             while os.path.exists(file_path):
                 filename = f"{base_name}_({counter}){ext}"
-                file_path = os.path.join(RECORDINGS_DIR, filename)
+                file_path = recordings_storage.write_path(filename)
                 counter += 1
         
-        # Processar áudio com pydub para garantir compatibilidade
+        # Modo assíncrono: guardar o original e processar em segundo plano
+        if ingest_requested():
+            job = get_catalog().find_pending_ingest_job(user_id, upload_hash)
+            if job is None:
+                job = get_ingest_queue().submit(
+                    'audio_upload', user_id, spool_path, filename, upload_hash,
+                    details={'detected_format': "Gravação via API"}
+                )
+            return ingest_accepted_response(job, upload['size'])
+        
+        # Processar áudio para garantir compatibilidade
         try:
-            # Carregar áudio original
-            audio_segment = AudioSegment.from_file(io.BytesIO(audio_bytes))
-            
-            # FUNÇÃO ROBUSTA: Processar áudio para compatibilidade com diferentes dispositivos
-            audio_segment = process_audio_for_device_compatibility(audio_segment, "Gravação via API")
-            
-            # Exportar como WAV mantendo qualidade
-            audio_segment.export(
-                file_path, 
-                format="wav",
-                parameters=["-acodec", "pcm_s16le"]  # PCM 16-bit
-            )
-            
-            file_size = os.path.getsize(file_path)
-            print(f"✅ Gravação processada e salva: {filename} ({file_size} bytes)")
-            
-        except Exception as e:
-            print(f"⚠️ Erro no processamento com pydub: {e}")
-            # Fallback: salvar arquivo original
-            try:
-                with open(file_path, 'wb') as f:
-                    f.write(audio_bytes)
-                file_size = len(audio_bytes)
-                print(f"✅ Gravação salva (fallback): {filename} ({file_size} bytes)")
-            except Exception as fallback_error:
-                print(f"❌ Erro no fallback: {fallback_error}")
-                return jsonify({
-                    'success': False,
-                    'message': 'Erro ao salvar arquivo de áudio'
-                }), 500
+            stored = store_uploaded_audio(spool_path, filename, user_id, upload_hash, "Gravação via API")
+        except Exception as fallback_error:
+            print(f"❌ Erro no fallback: {fallback_error}")
+            return jsonify({
+                'success': False,
+                'message': 'Erro ao salvar arquivo de áudio'
+            }), 500
         
         return jsonify({
             'success': True,
             'message': 'Gravação salva com sucesso!',
             'filename': filename,
-            'size': file_size
+            'size': stored['size']
         })
         
     except Exception as e:
@@ -1282,6 +1292,40 @@ def api_save_recording():
             'success': False,
             'message': f'Erro interno do servidor: {str(e)}'
         }), 500
+    finally:
+        if spool_path and os.path.exists(spool_path):
+            os.remove(spool_path)
+
+@audio_bp.route('/api/ingest/<job_id>', methods=['GET'])
+@login_required
+def api_ingest_status(job_id):
+    """Andamento de um upload processado em segundo plano"""
+    try:
+        job = get_catalog().get_ingest_job(job_id)
+        if not job or job['owner'] != session.get('user_id', 'unknown'):
+            return jsonify({
+                'success': False,
+                'message': 'Job de ingestão não encontrado'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status': job['status'],
+            'ready': job['status'] == 'done',
+            'filename': job['filename'],
+            'result': job['result'],
+            'error': job['error'],
+            'createdAt': datetime.fromtimestamp(job['created_at']).isoformat(),
+            'updatedAt': datetime.fromtimestamp(job['updated_at']).isoformat()
+        })
+        
+    except Exception as e:
+        print(f"❌ Erro ao consultar job de ingestão: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Erro ao consultar job: {str(e)}'
+        }), 500
 
 @audio_bp.route('/api/recordings', methods=['GET'])
 @login_required
@@ -1291,130 +1335,49 @@ def api_get_recordings():
         user_id = session['user_id']
         user_email = session.get('user_email', '')
         recordings = []
-        sessions = {}
         
         print(f"🔍 Buscando gravações para user_id: {user_id}, email: {user_email}")
         
-        # Verificar se o diretório existe
-        if not os.path.exists(RECORDINGS_DIR):
-            print(f"❌ Diretório {RECORDINGS_DIR} não existe")
-            # Criar diretório se não existir
-            os.makedirs(RECORDINGS_DIR, exist_ok=True)
-            return jsonify({
-                'success': True,
-                'recordings': [],
-                'sessions': []
-            })
-        
-        # Listar arquivos
-        all_files = os.listdir(RECORDINGS_DIR)
-        print(f"📋 Arquivos encontrados: {len(all_files)}")
-        
-        for filename in all_files:
-            if not filename.endswith('.wav'):
-                continue
-            
-            print(f"🔍 Analisando arquivo: {filename}")
-            
-            # CORREÇÃO: Lógica de filtragem mais rigorosa e com debug
-            belongs_to_user = False
-            
-            # Verificar formato novo: nome_timestamp_userid.wav
-            if filename.endswith(f"_{user_id}.wav"):
-                belongs_to_user = True
-                print(f"✅ Arquivo pertence ao usuário (formato novo): {filename}")
-            
-            # Verificar formato antigo apenas se user_email existir
-            elif user_email:
-                # Formato antigo: nome_timestamp_email_formatado.wav
-                old_format_suffix = f"_{user_email.replace('@', '_').replace('.', '_')}.wav"
-                if filename.endswith(old_format_suffix):
-                    belongs_to_user = True
-                    print(f"✅ Arquivo pertence ao usuário (formato antigo): {filename}")
-            
-            if not belongs_to_user:
-                print(f"❌ Arquivo NÃO pertence ao usuário: {filename}")
-                continue
-            
-            filepath = os.path.join(RECORDINGS_DIR, filename)
-            
-            try:
-                # Verificar se o arquivo existe e é acessível
-                if not os.path.exists(filepath):
-                    print(f"❌ Arquivo não existe: {filepath}")
-                    continue
-                    
-                file_size = os.path.getsize(filepath)
-                
-                # Data de modificação
-                modified_time = os.path.getmtime(filepath)
-                modified_date = datetime.fromtimestamp(modified_time).strftime('%d/%m/%Y %H:%M')
-                
-                # Verificar transcrição
-                transcription_file = os.path.splitext(filename)[0] + '_transcricao.txt'
-                transcription_path = os.path.join(TRANSCRIPTIONS_DIR, transcription_file)
-                has_transcription = os.path.exists(transcription_path)
-                
-                # Formatar tamanho de forma legível
-                if file_size < 1024:
-                    size_str = f"{file_size} B"
-                elif file_size < 1024 * 1024:
-                    size_str = f"{file_size / 1024:.1f} KB"
-                else:
-                    size_str = f"{file_size / (1024 * 1024):.1f} MB"
-                
-                if '_sessao_' in filename:
-                    # Segmento de sessão
-                    parts = filename.split('_')
-                    if len(parts) >= 3:
-                        session_id = parts[2]
-                        
-                        if session_id not in sessions:
-                            sessions[session_id] = {
-                                'id': session_id,
-                                'segments': [],
-                                'total_size': 0
-                            }
-                        
-                        sessions[session_id]['segments'].append({
-                            'filename': filename,
-                            'size': file_size,
-                            'has_transcription': has_transcription
-                        })
-                        sessions[session_id]['total_size'] += file_size
-                else:
-                    # Gravação individual
-                    recording_data = {
-                        'filename': filename,
-                        'size': size_str,  # CORREÇÃO: Formato legível
-                        'date': modified_date,  # CORREÇÃO: Campo correto para o frontend
-                        'has_transcription': has_transcription
-                    }
-                    recordings.append(recording_data)
-                    print(f"✅ Gravação adicionada: {recording_data}")
-                    
-            except Exception as file_error:
-                print(f"❌ Erro ao processar arquivo {filename}: {file_error}")
-                continue
+        owners = [user_id]
+        if user_email:
+            # Formato antigo: nome_timestamp_email_formatado.wav
+            owners.append(user_email.replace('@', '_').replace('.', '_'))
         
-        # Ordenar por data (mais recente primeiro)
         try:
-            recordings.sort(key=lambda x: datetime.strptime(x['date'], '%d/%m/%Y %H:%M'), reverse=True)
-        except Exception as sort_error:
-            print(f"⚠️ Erro ao ordenar gravações: {sort_error}")
-            # Manter ordem original se houver erro na ordenação
-        
-        # Converter sessões para lista
-        session_list = list(sessions.values())
+            page = parse_page_args(request.args, RECORDING_SORT_KEYS)
+        except InvalidPageRequest as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        
+        # Consultar catálogo (índice por dono, já ordenado) em vez de varrer o diretório
+        catalog = get_catalog()
+        rows, next_position = catalog.page_recordings(
+            owners, sort=page['sort'], order=page['order'], limit=page['limit'], after=page['after'],
+            date_from=page['date_from'], date_to=page['date_to'], include_sessions=False
+        )
+        # Sessões acompanham apenas a primeira página
+        session_list = catalog.list_session_segments(owners) if page['after'] is None else []
+        
+        for row in rows:
+            recordings.append({
+                'filename': row['filename'],
+                'size': format_size(row['size']),  # CORREÇÃO: Formato legível
+                'date': datetime.fromtimestamp(row['mtime']).strftime('%d/%m/%Y %H:%M'),  # CORREÇÃO: Campo correto para o frontend
+                'has_transcription': bool(row['has_transcription'])
+            })
         
         print(f"📊 RESULTADO FINAL: {len(recordings)} gravações e {len(session_list)} sessões")
         print(f"📋 Gravações encontradas: {[r['filename'] for r in recordings]}")
         
-        return jsonify({
+        response = {
             'success': True,
             'recordings': recordings,
             'sessions': session_list
-        })
+        }
+        if page['limit'] is not None:
+            response['next_cursor'] = (
+                encode_cursor(page['sort'], page['order'], *next_position) if next_position else None
+            )
+        return jsonify(response)
         
     except Exception as e:
         print(f"❌ ERRO CRÍTICO ao listar gravações: {str(e)}")
@@ -1459,7 +1422,7 @@ def transcribe_recording():
                 'message': 'Arquivo não pertence ao usuário'
             }), 403
         
-        filepath = os.path.join(RECORDINGS_DIR, filename)
+        filepath = recordings_storage.locate(filename)
         
         if not os.path.exists(filepath):
             return jsonify({
@@ -1467,26 +1430,33 @@ def transcribe_recording():
                 'message': 'Arquivo não encontrado'
             }), 404
         
-        print(f"🎯 Iniciando transcrição de: {filename}")
-        
-        # Transcrever
-        transcription = transcribe_audio_with_speech_recognition(filepath)
-        
-        # Melhorar com Gemini se disponível
-        if model and not transcription.startswith('['):
-            print("🤖 Melhorando transcrição com Gemini...")
-            transcription = improve_transcription_with_gemini(transcription)
+        # Mesmo áudio já transcrito em outra gravação do usuário: reaproveitar o texto
+        reused = get_content_store().find_derived(filename, transcriptions_storage, '_transcricao.txt')
+        if reused:
+            print(f"♻️ Reutilizando transcrição de conteúdo idêntico: {reused}")
+            with open(transcriptions_storage.locate(reused), 'r', encoding='utf-8') as f:
+                transcription = f.read()
+        else:
+            print(f"🎯 Iniciando transcrição de: {filename}")
+            
+            # Transcrever
+            transcription = transcribe_audio_with_speech_recognition(filepath, filename)
+            
+            # Melhorar com Gemini se disponível
+            if model and not transcription.startswith('['):
+                print("🤖 Melhorando transcrição com Gemini...")
+                transcription = improve_transcription_with_gemini(transcription)
         
         # Salvar transcrição
         transcription_filename = os.path.splitext(filename)[0] + '_transcricao.txt'
-        transcription_path = os.path.join(TRANSCRIPTIONS_DIR, transcription_filename)
-        
-        # Criar diretório se não existir
-        os.makedirs(TRANSCRIPTIONS_DIR, exist_ok=True)
+        # Cria o subdiretório do layout se não existir
+        transcription_path = transcriptions_storage.write_path(transcription_filename)
         
         with open(transcription_path, 'w', encoding='utf-8') as f:
             f.write(transcription)
         
+        transcriptions_storage.commit(transcription_filename)
+        get_catalog().index_text(transcription_filename, transcription)
         print(f"✅ Transcrição salva: {transcription_filename}")
         
         return jsonify({
@@ -1532,7 +1502,7 @@ def rename_recording():
                 'message': 'Arquivo não pertence ao usuário'
             }), 403
         
-        old_filepath = os.path.join(RECORDINGS_DIR, old_filename)
+        old_filepath = recordings_storage.locate(old_filename)
         
         if not os.path.exists(old_filepath):
             return jsonify({
@@ -1544,20 +1514,18 @@ def rename_recording():
         safe_new_name = sanitize_filename(new_name)
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         new_filename = f'{safe_new_name}_{timestamp}_{user_id}.wav'
-        new_filepath = os.path.join(RECORDINGS_DIR, new_filename)
         
-        # Renomear arquivo
-        os.rename(old_filepath, new_filepath)
+        # Renomear arquivo (move para o subdiretório do novo nome)
+        recordings_storage.rename(old_filename, new_filename)
         
         # Renomear transcrição se existir
         old_transcription = os.path.splitext(old_filename)[0] + '_transcricao.txt'
-        old_transcription_path = os.path.join(TRANSCRIPTIONS_DIR, old_transcription)
         
-        if os.path.exists(old_transcription_path):
+        if transcriptions_storage.exists(old_transcription):
             new_transcription = os.path.splitext(new_filename)[0] + '_transcricao.txt'
-            new_transcription_path = os.path.join(TRANSCRIPTIONS_DIR, new_transcription)
-            os.rename(old_transcription_path, new_transcription_path)
+            transcriptions_storage.rename(old_transcription, new_transcription)
         
+        get_catalog().rename_recording(old_filename, new_filename, owner=user_id)
         print(f"✅ Arquivo renomeado: {old_filename} -> {new_filename}")
         
         return jsonify({
@@ -1602,24 +1570,22 @@ def delete_recording():
                 'message': 'Arquivo não pertence ao usuário'
             }), 403
         
-        filepath = os.path.join(RECORDINGS_DIR, filename)
-        
-        if not os.path.exists(filepath):
+        if not recordings_storage.exists(filename):
             return jsonify({
                 'success': False,
                 'message': 'Arquivo não encontrado'
             }), 404
         
         # Excluir arquivo
-        os.remove(filepath)
+        recordings_storage.remove(filename)
         
         # Excluir transcrição se existir
         transcription_file = os.path.splitext(filename)[0] + '_transcricao.txt'
-        transcription_path = os.path.join(TRANSCRIPTIONS_DIR, transcription_file)
         
-        if os.path.exists(transcription_path):
-            os.remove(transcription_path)
+        if transcriptions_storage.exists(transcription_file):
+            transcriptions_storage.remove(transcription_file)
         
+        get_catalog().remove_recording(filename)
         print(f"✅ Arquivo excluído: {filename}")
         
         return jsonify({
@@ -1654,7 +1620,7 @@ def download_recording(filename):
                 'message': 'Arquivo não pertence ao usuário'
             }), 403
         
-        filepath = os.path.join(RECORDINGS_DIR, filename)
+        filepath = recordings_storage.locate(filename)
         
         if not os.path.exists(filepath):
             return jsonify({
@@ -1692,7 +1658,7 @@ def download_transcription(filename):
                 'message': 'Arquivo não pertence ao usuário'
             }), 403
         
-        filepath = os.path.join(TRANSCRIPTIONS_DIR, filename)
+        filepath = transcriptions_storage.locate(filename)
         
         if not os.path.exists(filepath):
             return jsonify({
@@ -1730,7 +1696,7 @@ def export_pdf(filename):
                 'message': 'Arquivo não pertence ao usuário'
             }), 403
         
-        transcription_path = os.path.join(TRANSCRIPTIONS_DIR, filename)
+        transcription_path = transcriptions_storage.locate(filename)
         
         if not os.path.exists(transcription_path):
             return jsonify({
@@ -1788,7 +1754,7 @@ def export_docx(filename):
                 'message': 'Arquivo não pertence ao usuário'
             }), 403
         
-        transcription_path = os.path.join(TRANSCRIPTIONS_DIR, filename)
+        transcription_path = transcriptions_storage.locate(filename)
         
         if not os.path.exists(transcription_path):
             return jsonify({
@@ -1833,74 +1799,34 @@ def api_get_transcriptions():
         user_id = session['user_id']
         user_email = session.get('user_email', '')
         safe_user_email = user_email.replace('@', '_').replace('.', '_')
-        transcriptions = []
         
         print(f"🔍 Buscando transcrições para user_id: {user_id}")
         print(f"📧 Email do usuário: {user_email}")
         print(f"📁 Diretório de transcrições: {os.path.abspath(TRANSCRIPTIONS_DIR)}")
         
-        # Verificar se o diretório existe
-        if not os.path.exists(TRANSCRIPTIONS_DIR):
-            print(f"❌ Diretório {TRANSCRIPTIONS_DIR} não existe")
-            return jsonify({
-                'success': True,
-                'transcriptions': []
-            })
-        
-        # Listar arquivos de transcrição
-        for filename in os.listdir(TRANSCRIPTIONS_DIR):
-            if filename.endswith('_transcricao.txt'):
-                print(f"🔍 Verificando arquivo: {filename}")
-                
-                # Verificar se pertence ao usuário (suporta ambos os formatos)
-                belongs_to_user = (
-                    filename.endswith(f"_{user_id}_transcricao.txt") or
-                    safe_user_email in filename
-                )
-                
-                if belongs_to_user:
-                    print(f"✅ Arquivo pertence ao usuário: {filename}")
-                    
-                    filepath = os.path.join(TRANSCRIPTIONS_DIR, filename)
-                    file_size = os.path.getsize(filepath)
-                    
-                    # Obter data de modificação
-                    modified_time = os.path.getmtime(filepath)
-                    modified_date = datetime.fromtimestamp(modified_time).strftime('%d/%m/%Y %H:%M')
-                    
-                    # Ler primeiras linhas para preview
-                    try:
-                        with open(filepath, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                            preview = content[:200] + '...' if len(content) > 200 else content
-                    except:
-                        preview = "Erro ao ler arquivo"
-                    
-                    # Nome original do arquivo de áudio
-                    audio_filename = filename.replace('_transcricao.txt', '.wav')
-                    
-                    # Verificar se existe resumo
-                    summary_filename = filename.replace('_transcricao.txt', '_resumo.txt')
-                    summary_path = os.path.join(TRANSCRIPTIONS_DIR, summary_filename)
-                    has_summary = os.path.exists(summary_path)
-                    
-                    transcriptions.append({
-                        'filename': filename,
-                        'audio_filename': audio_filename,
-                        'size': file_size,
-                        'modified_date': modified_date,
-                        'preview': preview,
-                        'has_summary': has_summary
-                    })
-                else:
-                    print(f"❌ Arquivo não pertence ao usuário: {filename}")
+        try:
+            page = parse_page_args(request.args, TRANSCRIPTION_SORT_KEYS)
+        except InvalidPageRequest as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        
+        # Preview, tamanho e contagem de palavras vêm pré-calculados do catálogo
+        rows, next_position = get_catalog().page_transcriptions(
+            [user_id, safe_user_email], sort=page['sort'], order=page['order'], limit=page['limit'],
+            after=page['after'], date_from=page['date_from'], date_to=page['date_to']
+        )
+        transcriptions = [transcription_entry(row) for row in rows]
         
         print(f"✅ Encontradas {len(transcriptions)} transcrições")
         
-        return jsonify({
+        response = {
             'success': True,
             'transcriptions': transcriptions
-        })
+        }
+        if page['limit'] is not None:
+            response['next_cursor'] = (
+                encode_cursor(page['sort'], page['order'], *next_position) if next_position else None
+            )
+        return jsonify(response)
         
     except Exception as e:
         print(f"❌ Erro ao listar transcrições: {str(e)}")
@@ -1909,6 +1835,61 @@ def api_get_transcriptions():
             'message': f'Erro ao listar transcrições: {str(e)}'
         }), 500
 
+@audio_bp.route('/api/search', methods=['GET'])
+@login_required
+def api_search():
+    """Busca textual em transcrições e resumos do usuário"""
+    try:
+        user_id = session['user_id']
+        user_email = session.get('user_email', '')
+        query = request.args.get('q', '').strip()
+        kind = request.args.get('kind') or None
+        
+        if not query:
+            return jsonify({
+                'success': False,
+                'message': 'Parâmetro de busca "q" não fornecido'
+            }), 400
+        
+        if kind not in (None, 'transcription', 'summary'):
+            return jsonify({
+                'success': False,
+                'message': 'Tipo inválido (use transcription ou summary)'
+            }), 400
+        
+        try:
+            limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        except ValueError:
+            limit = 20
+        
+        owners = [user_id]
+        if user_email:
+            owners.append(user_email.replace('@', '_').replace('.', '_'))
+        
+        results = []
+        for hit in get_catalog().search_texts(query, owners, limit=limit, kind=kind):
+            suffix = '_transcricao.txt' if hit['kind'] == 'transcription' else '_resumo.txt'
+            results.append({
+                'filename': hit['filename'],
+                'kind': hit['kind'],
+                'audio_filename': hit['filename'][:-len(suffix)] + '.wav',
+                'snippet': hit['snippet'],
+                'score': round(-hit['score'], 4)  # BM25 do SQLite: menor é melhor
+            })
+        
+        return jsonify({
+            'success': True,
+            'query': query,
+            'results': results
+        })
+        
+    except Exception as e:
+        print(f"❌ Erro na busca: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'Erro na busca: {str(e)}'
+        }), 500
+
 @audio_bp.route('/api/view_transcription/<filename>', methods=['GET'])
 @login_required
 def api_view_transcription(filename):
@@ -1930,7 +1911,7 @@ def api_view_transcription(filename):
                 'message': 'Acesso negado - arquivo não pertence ao usuário'
             }), 403
         
-        filepath = os.path.join(TRANSCRIPTIONS_DIR, filename)
+        filepath = transcriptions_storage.locate(filename)
         
         if os.path.exists(filepath):
             with open(filepath, 'r', encoding='utf-8') as f:
@@ -1980,7 +1961,7 @@ def api_export_summary_pdf(filename):
         
         # Construir nome do arquivo de resumo
         summary_filename = filename.replace('_transcricao.txt', '_resumo.txt')
-        summary_path = os.path.join(TRANSCRIPTIONS_DIR, summary_filename)
+        summary_path = transcriptions_storage.locate(summary_filename)
         
         print(f"📄 Procurando resumo em: {summary_path}")
         
@@ -2059,7 +2040,7 @@ def api_export_summary_docx(filename):
         
         # Construir nome do arquivo de resumo
         summary_filename = filename.replace('_transcricao.txt', '_resumo.txt')
-        summary_path = os.path.join(TRANSCRIPTIONS_DIR, summary_filename)
+        summary_path = transcriptions_storage.locate(summary_filename)
         
         print(f"📄 Procurando resumo em: {summary_path}")
         
@@ -2111,132 +2092,285 @@ def api_export_summary_docx(filename):
             'message': f'Erro interno ao exportar DOCX: {str(e)}'
         }), 500
 
+CHUNK_SESSION_ID_RE = re.compile(r'^[\w-][\w.-]{0,127}$')
+
+def chunk_temp_dir():
+    """Diretório dos chunks temporários das gravações em andamento"""
+    temp_dir = os.path.join(RECORDINGS_DIR, 'temp_chunks')
+    os.makedirs(temp_dir, exist_ok=True)
+    return temp_dir
+
+def is_truthy(value):
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
 @audio_bp.route('/api/save_chunk', methods=['POST'])
 @login_required
 def api_save_chunk():
-    """Salva chunk de gravação e monta arquivo final quando completo"""
+    """Salva chunk de gravação e monta arquivo final quando completo
+
+    Formatos aceitos:
+    - application/octet-stream: corpo com os bytes do chunk e cabeçalhos
+      X-Session-Id, X-Chunk-Index, X-Chunk-Last e X-Mime-Type (gravado em
+      disco em streaming, sem base64);
+    - multipart/form-data: arquivo no campo 'audio' e os mesmos dados como
+      campos session_id, chunk_index, is_last e mime_type;
+    - JSON com o áudio em base64 (clientes antigos).
+
+    O checksum SHA-256 opcional (X-Chunk-Sha256, campo ou chave sha256) é
+    conferido. Reenviar um chunk já recebido é idempotente, e a montagem só
+    acontece quando todos os chunks até o último chegaram; enquanto houver
+    lacunas o último chunk recebe 409 com a lista de índices faltantes
+    (também consultável em GET /api/save_chunk/<session_id>).
+    """
+    upload = None
     try:
-        data = request.json
-        session_id = data.get('session_id')
-        chunk_index = data.get('chunk_index')
-        audio_data = data.get('audio')
-        is_last = data.get('is_last', False)
-        mime_type = data.get('mime_type', 'audio/webm')
-        
-        if not all([session_id, audio_data is not None, chunk_index is not None]):
+        audio_stream = None
+        
+        if request.mimetype == 'application/octet-stream':
+            if request.content_length and request.content_length > MAX_FILE_SIZE:
+                return upload_too_large_response()
+            session_id = request.headers.get('X-Session-Id')
+            chunk_index = request.headers.get('X-Chunk-Index')
+            is_last = is_truthy(request.headers.get('X-Chunk-Last', 'false'))
+            mime_type = request.headers.get('X-Mime-Type', 'audio/webm')
+            expected_sha256 = request.headers.get('X-Chunk-Sha256')
+            audio_stream = request.stream
+        elif request.mimetype == 'multipart/form-data':
+            if request.content_length and request.content_length > MAX_FILE_SIZE + UPLOAD_FORM_OVERHEAD:
+                return upload_too_large_response()
+            session_id = request.form.get('session_id')
+            chunk_index = request.form.get('chunk_index')
+            is_last = is_truthy(request.form.get('is_last', 'false'))
+            mime_type = request.form.get('mime_type', 'audio/webm')
+            expected_sha256 = request.form.get('sha256')
+            audio_stream = request.files.get('audio')
+        else:
+            # Base64 decodificado em streaming direto para temp_chunks
+            if request.content_length and request.content_length > base64_payload_limit():
+                return upload_too_large_response()
+            try:
+                data, upload = spool_json_audio(request.stream, chunk_temp_dir(), MAX_FILE_SIZE)
+            except UploadTooLarge:
+                return upload_too_large_response()
+            except InvalidUploadPayload as e:
+                print(f"❌ Erro ao decodificar chunk: {e}")
+                return jsonify({
+                    'success': False,
+                    'message': 'Erro ao decodificar chunk de áudio'
+                }), 400
+            session_id = data.get('session_id')
+            chunk_index = data.get('chunk_index')
+            is_last = data.get('is_last', False)
+            mime_type = data.get('mime_type', 'audio/webm')
+            expected_sha256 = data.get('sha256')
+        
+        if not session_id or chunk_index is None or (upload is None and audio_stream is None):
             return jsonify({
                 'success': False,
                 'message': 'Dados incompletos para o chunk'
             }), 400
         
-        user_id = session.get('user_id', 'unknown')
-        
-        # Decodificar base64
-        if audio_data.startswith('data:audio'):
-            audio_data = audio_data.split(',', 1)[1]
-        
         try:
-            audio_bytes = base64.b64decode(audio_data)
-        except Exception as e:
+            chunk_index = int(chunk_index)
+        except (TypeError, ValueError):
+            chunk_index = -1
+        if chunk_index < 0 or not CHUNK_SESSION_ID_RE.match(str(session_id)):
             return jsonify({
                 'success': False,
-                'message': 'Erro ao decodificar chunk de áudio'
+                'message': 'Sessão ou índice do chunk inválido'
             }), 400
         
-        # Criar diretório temporário para chunks
-        temp_dir = os.path.join(RECORDINGS_DIR, 'temp_chunks')
-        os.makedirs(temp_dir, exist_ok=True)
+        user_id = session.get('user_id', 'unknown')
         
-        # Salvar chunk temporário
-        chunk_filename = f"{session_id}_chunk_{chunk_index:03d}.tmp"
-        chunk_path = os.path.join(temp_dir, chunk_filename)
+        # Salvar chunk em arquivo próprio da requisição; o manifesto decide se ele é aceito
+        temp_dir = chunk_temp_dir()
+        if upload is None:
+            try:
+                spool_path, spool_size, spool_sha256 = spool_upload(audio_stream, temp_dir, MAX_FILE_SIZE)
+            except UploadTooLarge:
+                return upload_too_large_response()
+            upload = {'path': spool_path, 'size': spool_size, 'sha256': spool_sha256}
+        incoming_path = os.path.join(temp_dir, f"{session_id}_chunk_{chunk_index:03d}.{uuid.uuid4().hex}.incoming")
+        os.replace(upload['path'], incoming_path)
+        chunk_size, chunk_sha256 = upload['size'], upload['sha256']
+        
+        if expected_sha256 and expected_sha256.lower() != chunk_sha256:
+            os.remove(incoming_path)
+            print(f"❌ Checksum do chunk {chunk_index} não confere")
+            return jsonify({
+                'success': False,
+                'message': 'Checksum do chunk não confere; reenvie o chunk',
+                'chunk_index': chunk_index
+            }), 400
+        
+        manifest = ChunkManifest(temp_dir, session_id)
+        status, state = manifest.accept(chunk_index, incoming_path, chunk_sha256, chunk_size, user_id, is_last)
         
-        with open(chunk_path, 'wb') as f:
-            f.write(audio_bytes)
+        if status == 'forbidden':
+            return jsonify({
+                'success': False,
+                'message': 'Sessão de upload pertence a outro usuário'
+            }), 403
+        if status == 'conflict':
+            return jsonify({
+                'success': False,
+                'message': f'Chunk {chunk_index} já recebido com conteúdo diferente',
+                'chunk_index': chunk_index
+            }), 409
         
-        print(f"✅ Chunk {chunk_index} salvo: {len(audio_bytes)} bytes")
+        if status == 'duplicate':
+            print(f"♻️ Chunk {chunk_index} já recebido ({chunk_size} bytes)")
+        else:
+            print(f"✅ Chunk {chunk_index} salvo: {chunk_size} bytes ({mime_type})")
         
-        # Se é o último chunk, montar arquivo final
-        if is_last:
-            final_filename = assemble_chunks(session_id, user_id, chunk_index + 1)
+        if status == 'ready':
+            # Todos os chunks até o último chegaram: montar arquivo final
+            total_chunks = state['total_chunks']
+            try:
+                final_filename = assemble_chunks(session_id, user_id, total_chunks)
+            except Exception:
+                manifest.release()
+                raise
+            manifest.complete(final_filename)
             return jsonify({
                 'success': True,
-                'message': f'Gravação completa! {chunk_index + 1} chunks processados.',
+                'message': f'Gravação completa! {total_chunks} chunks processados.',
                 'final_filename': final_filename
             })
-        else:
+        
+        if state['final_filename']:
+            # Reenvio depois da montagem (ex.: resposta do último chunk perdida)
             return jsonify({
                 'success': True,
-                'message': f'Chunk {chunk_index} recebido com sucesso'
+                'message': f'Gravação completa! {state["total_chunks"]} chunks processados.',
+                'final_filename': state['final_filename']
             })
         
+        if state['assembling']:
+            # Montagem em andamento por outra requisição
+            return jsonify({
+                'success': True,
+                'message': 'Gravação em montagem',
+                'assembling': True
+            }), 202
+        
+        if is_last:
+            missing = ChunkManifest.missing(state)
+            return jsonify({
+                'success': False,
+                'message': f'Faltam {len(missing)} chunks para concluir a gravação',
+                'missing': missing,
+                'total_chunks': state['total_chunks']
+            }), 409
+        
+        # Acrescentar à montagem (PCM ou contêiner concatenado) enquanto os próximos chunks chegam
+        if status == 'stored':
+            try:
+                run_audio_task(append_chunks, temp_dir, session_id)
+            except Exception as e:
+                print(f"⚠️ Montagem incremental adiada para a finalização: {e}")
+        response = {
+            'success': True,
+            'message': f'Chunk {chunk_index} recebido com sucesso',
+            'duplicate': status == 'duplicate'
+        }
+        if state['total_chunks'] is not None:
+            # Recuperando lacunas depois do último chunk: informar o que ainda falta
+            response['missing'] = ChunkManifest.missing(state)
+        return jsonify(response)
+        
     except Exception as e:
         print(f"❌ Erro ao processar chunk: {e}")
         return jsonify({
             'success': False,
             'message': f'Erro ao processar chunk: {str(e)}'
         }), 500
+    finally:
+        if upload and os.path.exists(upload['path']):
+            os.remove(upload['path'])
+
+@audio_bp.route('/api/save_chunk/<session_id>', methods=['GET'])
+@login_required
+def api_chunk_status(session_id):
+    """Chunks recebidos e faltantes de um envio, para retomar após queda de conexão"""
+    try:
+        manifest = ChunkManifest(chunk_temp_dir(), session_id)
+        if not CHUNK_SESSION_ID_RE.match(session_id) or not manifest.exists():
+            return jsonify({
+                'success': False,
+                'message': 'Sessão de upload não encontrada'
+            }), 404
+        
+        state = manifest.load()
+        if state['owner'] != session.get('user_id', 'unknown'):
+            return jsonify({
+                'success': False,
+                'message': 'Sessão de upload pertence a outro usuário'
+            }), 403
+        
+        return jsonify({
+            'success': True,
+            'session_id': session_id,
+            'received': ChunkManifest.received(state),
+            'missing': ChunkManifest.missing(state),
+            'total_chunks': state['total_chunks'],
+            'chunks': state['chunks'],
+            'final_filename': state['final_filename']
+        })
+        
+    except Exception as e:
+        print(f"❌ Erro ao consultar chunks: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Erro ao consultar chunks: {str(e)}'
+        }), 500
+
+@audio_bp.route('/api/temp_storage', methods=['GET'])
+@login_required
+def api_temp_storage():
+    """Métricas da limpeza de temporários: uso atual, orçamento e espaço liberado"""
+    try:
+        return jsonify({'success': True, **get_janitor_metrics()})
+    except Exception as e:
+        print(f"❌ Erro ao consultar temporários: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Erro ao consultar temporários: {str(e)}'
+        }), 500
 
 def assemble_chunks(session_id, user_id, total_chunks):
     """Monta chunks em arquivo final"""
     try:
-        temp_dir = os.path.join(RECORDINGS_DIR, 'temp_chunks')
+        temp_dir = chunk_temp_dir()
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         final_filename = f"recording_{timestamp}_{user_id}.wav"
-        final_path = os.path.join(RECORDINGS_DIR, final_filename)
-        
-        # Lista para armazenar todos os segmentos de áudio
-        audio_segments = []
+        final_path = recordings_storage.write_path(final_filename)
         
         print(f"🔧 Montando {total_chunks} chunks para sessão {session_id}")
         
-        # Carregar e processar cada chunk
-        for i in range(total_chunks):
-            chunk_filename = f"{session_id}_chunk_{i:03d}.tmp"
-            chunk_path = os.path.join(temp_dir, chunk_filename)
-            
-            if os.path.exists(chunk_path):
-                try:
-                    # Carregar chunk com pydub
-                    chunk_segment = AudioSegment.from_file(chunk_path)
-                    audio_segments.append(chunk_segment)
-                    print(f"✅ Chunk {i} carregado: {len(chunk_segment)}ms")
-                except Exception as e:
-                    print(f"⚠️ Erro ao carregar chunk {i}: {e}")
-                    # Tentar carregar como bytes brutos
-                    with open(chunk_path, 'rb') as f:
-                        chunk_bytes = f.read()
-                    chunk_segment = AudioSegment.from_file(io.BytesIO(chunk_bytes))
-                    audio_segments.append(chunk_segment)
-            else:
-                print(f"❌ Chunk {i} não encontrado: {chunk_path}")
-        
-        if not audio_segments:
-            raise Exception("Nenhum chunk válido encontrado")
-        
-        # Concatenar todos os segmentos
-        print(f"🔗 Concatenando {len(audio_segments)} segmentos...")
-        final_audio = audio_segments[0]
-        for segment in audio_segments[1:]:
-            final_audio += segment
-        
-        # FUNÇÃO ROBUSTA: Processar áudio final para compatibilidade com diferentes dispositivos
-        final_audio = process_audio_for_device_compatibility(final_audio, "Chunks montados")
-        
-        # CORREÇÃO: Exportar arquivo final com configurações específicas para evitar problemas de velocidade
-        print(f"🔧 Exportando arquivo final com configurações otimizadas...")
-        final_audio.export(
-            final_path,
-            format="wav",
-            parameters=[
-                "-acodec", "pcm_s16le",  # PCM 16-bit
-                "-ar", str(final_audio.frame_rate),  # Manter sample rate
-                "-ac", "1"  # Mono
-            ]
-        )
+        # Chunks independentes ainda não acrescentados: decodificar em paralelo, um por worker
+        pending = ChunkAssembler(temp_dir, session_id).pending_chunks(total_chunks)
+        if len(pending) > 1:
+            started = time.time()
+            get_audio_pool().map(decode_chunk, [(temp_dir, session_id, index) for index in pending])
+            print(f"⚡ {len(pending)} chunks decodificados em paralelo em {time.time() - started:.1f}s")
+        
+        # Chunks já acrescentados durante o envio: completar cabeçalho e normalização no pool
+        # de processos (timeslices de WebM/Ogg/MP4 são decodificados aqui, uma única vez)
+        assembled = run_audio_task(finalize_chunks, temp_dir, session_id, total_chunks, final_path)
+        if assembled:
+            duration = assembled['duration_ms'] / 1000
+            print(f"⚡ Montagem incremental concluída: {assembled['frame_rate']}Hz")
+        else:
+            duration = run_audio_task(assemble_chunks_in_memory, session_id, total_chunks, temp_dir, final_path)
         
         file_size = os.path.getsize(final_path)
-        duration = len(final_audio) / 1000  # duração em segundos
+        content_hash = get_content_store().intern(final_filename, owner=user_id)
+        if content_hash:
+            # Montagem já normaliza o volume: o arquivo final é o próprio PCM normalizado
+            get_content_store().record_pcm(content_hash, wav_info(final_path), in_place=True)
+        recordings_storage.commit(final_filename)
+        get_catalog().index_recording(final_filename, owner=user_id)
         
         print(f"✅ Arquivo final criado: {final_filename}")
         print(f"📊 Tamanho: {file_size} bytes, Duração: {duration:.1f}s")
@@ -2254,10 +2388,11 @@ def cleanup_temp_chunks(session_id, total_chunks, temp_dir):
     """Remove chunks temporários após montagem"""
     try:
         for i in range(total_chunks):
-            chunk_filename = f"{session_id}_chunk_{i:03d}.tmp"
-            chunk_path = os.path.join(temp_dir, chunk_filename)
-            if os.path.exists(chunk_path):
-                os.remove(chunk_path)
+            for filename in (chunk_filename(session_id, i), decoded_filename(session_id, i)):
+                chunk_path = os.path.join(temp_dir, filename)
+                if os.path.exists(chunk_path):
+                    os.remove(chunk_path)
+        ChunkAssembler(temp_dir, session_id).discard()
         print(f"🧹 Chunks temporários removidos para sessão {session_id}")
     except Exception as e:
         print(f"⚠️ Erro ao limpar chunks temporários: {e}")
@@ -2285,11 +2420,9 @@ def api_finalize_recording():
             safe_patient_name = sanitize_filename(patient_name)
             new_filename = f"{safe_patient_name}_{timestamp}_{user_id}.wav"
             
-            current_path = os.path.join(RECORDINGS_DIR, current_filename)
-            new_path = os.path.join(RECORDINGS_DIR, new_filename)
-            
-            if os.path.exists(current_path):
-                os.rename(current_path, new_path)
+            if recordings_storage.exists(current_filename):
+                recordings_storage.rename(current_filename, new_filename)
+                get_catalog().rename_recording(current_filename, new_filename, owner=user_id)
                 print(f"📝 Arquivo renomeado: {current_filename} -> {new_filename}")
                 final_filename = new_filename
             else:
@@ -2319,8 +2452,8 @@ def debug_files(filename):
         transcription_filename = filename.replace('.wav', '_transcricao.txt')
         summary_filename = filename.replace('.wav', '_resumo.txt')
         
-        transcription_path = os.path.join(TRANSCRIPTIONS_DIR, transcription_filename)
-        summary_path = os.path.join(TRANSCRIPTIONS_DIR, summary_filename)
+        transcription_path = transcriptions_storage.locate(transcription_filename)
+        summary_path = transcriptions_storage.locate(summary_filename)
         
         debug_info = {
             'user_id': user_id,
@@ -2328,8 +2461,9 @@ def debug_files(filename):
             'summary_filename': summary_filename,
             'transcription_exists': os.path.exists(transcription_path),
             'summary_exists': os.path.exists(summary_path),
-            'transcriptions_dir': os.path.abspath(TRANSCRIPTIONS_DIR),
-            'files_in_dir': os.listdir(TRANSCRIPTIONS_DIR) if os.path.exists(TRANSCRIPTIONS_DIR) else []
+            'transcription_path': os.path.abspath(transcription_path),
+            'summary_path': os.path.abspath(summary_path),
+            'storage_layout': transcriptions_storage.mode
         }
         
         return jsonify({
@@ -0,0 +1,472 @@
+"""
+Transformações de áudio executadas em um pool de processos dedicado
+Decodificação (ffmpeg via pydub), normalização, downmix e escrita de WAV
+(AudioBuffer, de audio_core) são pesadas em CPU; nas threads do Flask elas disputam o GIL e
+travam listagens e downloads enquanto houver uploads em andamento. Aqui elas
+rodam em processos separados (AUDIO_POOL_WORKERS, 0 = na própria thread),
+com timeout por tarefa (AUDIO_TASK_TIMEOUT) e cancelamento.
+
+As tarefas recebem e devolvem caminhos e dicionários pequenos (nada de
+buffers de áudio atravessando processos). Os workers são iniciados com
+`python -c` importando só este módulo, para não executar de novo o app.py
+(que inicia observador e fila de ingestão) em cada processo. Um worker que
+estoura o timeout ou é cancelado é encerrado e substituído: é a única forma
+de interromper uma decodificação em andamento.
+
+Este módulo deve continuar leve (audio_core, chunk_assembly): nada de
+Flask, catálogo ou layout de armazenamento.
+"""
+
+import atexit
+import os
+import pickle
+import queue
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_core import AudioBuffer
+from chunk_assembly import ChunkAssembler, chunk_filename
+from services_config import AUDIO_POOL_WORKERS, AUDIO_TASK_TIMEOUT
+
+POLL_INTERVAL = 0.5  # Segundos entre verificações de cancelamento
+WORKER_START_CODE = 'import audio_tasks; audio_tasks.worker_main()'
+
+class AudioTaskError(Exception):
+    """Falha do pool de áudio (worker encerrado, resultado ilegível)"""
+
+class AudioTaskTimeout(AudioTaskError):
+    """A tarefa passou do tempo limite e o worker foi encerrado"""
+
+class AudioTaskCancelled(AudioTaskError):
+    """A tarefa foi cancelada e o worker foi encerrado"""
+
+# ==================== TRANSFORMAÇÕES ====================
+
+def correct_device_format(audio_segment):
+    """
+    Corrige o sample rate rotulado incorretamente e converte para mono
+    (parte da compatibilidade que pode ser aplicada trecho a trecho, sem normalizar)
+    """
+    original_frame_rate = audio_segment.frame_rate
+    original_channels = audio_segment.channels
+
+    # CORREÇÃO ROBUSTA: Ajuste fino para sample rate correto (99.9% precisão)
+    if original_frame_rate <= 22050:  # Sample rates baixos precisam correção
+        # AJUSTE FINO: Calcular sample rate correto baseado na velocidade esperada
+        # Se áudio está em 16kHz mas deveria ser ~44.1kHz, calcular fator exato
+        if original_frame_rate == 16000:
+            # Fator de correção calibrado: 16kHz → 44.1kHz com ajuste fino
+            corrected_rate = 44100
+            print(f"🔧 AJUSTE FINO: {original_frame_rate}Hz → {corrected_rate}Hz (correção calibrada)")
+        elif original_frame_rate == 8000:
+            # Para 8kHz, usar fator 5.5x para compensação exata
+            corrected_rate = 44000  # Ligeiramente menos que 44.1kHz para ajuste fino
+            print(f"🔧 AJUSTE FINO: {original_frame_rate}Hz → {corrected_rate}Hz (correção calibrada)")
+        else:
+            # Para outros sample rates baixos, usar proporção otimizada
+            corrected_rate = int(original_frame_rate * 2.75)  # Fator calibrado
+            if corrected_rate > 48000:
+                corrected_rate = 44100
+            print(f"🔧 AJUSTE FINO: {original_frame_rate}Hz → {corrected_rate}Hz (fator 2.75x calibrado)")
+
+        # Aplicar correção com sample rate calibrado
+        audio_segment = audio_segment.retag(corrected_rate)
+    else:
+        print(f"✅ Sample rate adequado mantido: {original_frame_rate}Hz")
+
+    # Converter para mono se necessário (padrão para transcrição)
+    if original_channels > 1:
+        audio_segment = audio_segment.downmix()
+        print(f"🔧 Convertido para mono (era {original_channels} canais)")
+    else:
+        print(f"✅ Mantendo mono: {original_channels} canal")
+
+    return audio_segment
+
+def process_audio_for_device_compatibility(audio_segment, detected_format):
+    """
+    Processa áudio de forma otimizada para diferentes dispositivos
+    Preserva qualidade e corrige problemas de velocidade
+    """
+    try:
+        original_frame_rate = audio_segment.frame_rate
+        original_channels = audio_segment.channels
+        original_duration = len(audio_segment)
+
+        print(f"🎵 Processando áudio: {original_frame_rate}Hz, {original_channels} canais, {original_duration}ms")
+
+        audio_segment = correct_device_format(audio_segment)
+
+        # Normalizar volume para melhor transcrição
+        audio_segment = audio_segment.normalize()
+        print(f"🔧 Volume normalizado")
+
+        # Verificar se a duração foi preservada
+        final_duration = len(audio_segment)
+        duration_diff = abs(original_duration - final_duration)
+
+        if duration_diff > 100:  # Mais de 100ms de diferença
+            print(f"⚠️ ATENÇÃO: Duração mudou em {duration_diff}ms!")
+            print(f"   Original: {original_duration}ms, Final: {final_duration}ms")
+        else:
+            print(f"✅ Duração preservada: {final_duration}ms")
+
+        return audio_segment
+
+    except Exception as e:
+        print(f"❌ Erro no processamento de compatibilidade: {e}")
+        raise
+
+def export_wav(audio_segment, target_path, frame_rate=None):
+    """Grava PCM 16-bit mono (configuração que evita problemas de velocidade), sem ffmpeg"""
+    audio_segment.downmix().resample(frame_rate or audio_segment.frame_rate).write_wav(target_path)
+
+# ==================== TAREFAS (executadas no pool) ====================
+
+def convert_to_compatible_wav(source_path, target_path, detected_format):
+    """Decodifica, aplica a compatibilidade de dispositivo e exporta WAV em target_path"""
+    audio_segment = AudioBuffer.from_file(source_path)
+    print(f"✅ Áudio carregado: {audio_segment.frame_rate}Hz, {audio_segment.channels} canais")
+    print(f"   Formato original: {detected_format}")
+    original = {'original_frame_rate': audio_segment.frame_rate, 'original_channels': audio_segment.channels}
+
+    audio_segment = process_audio_for_device_compatibility(audio_segment, detected_format)
+
+    print(f"🔧 Exportando WAV com configurações otimizadas...")
+    export_wav(audio_segment, target_path)
+    return dict(original,
+                frame_rate=audio_segment.frame_rate,
+                channels=audio_segment.channels,
+                duration_ms=len(audio_segment))
+
+def slow_audio_rate(original_rate):
+    """Regra do teste de correção: reinterpretar sample rates baixos como 44.1kHz"""
+    if original_rate <= 22050:
+        print(f"🔧 FORÇADO: {original_rate}Hz → 44.1kHz (mesmos dados, interpretação correta)")
+        return 44100
+    print(f"✅ MANTIDO: {original_rate}Hz")
+    return original_rate
+
+def calibrated_rate(original_rate, speed_feedback):
+    """Regra da calibração fina: ±2% no sample rate conforme o feedback de velocidade"""
+    if speed_feedback == 'slow':
+        # Ainda está lento, aumentar sample rate um pouco mais
+        if original_rate == 44100:
+            rate = 45000  # +2% mais rápido
+        else:
+            rate = int(original_rate * 1.02)  # +2%
+        print(f"🔧 CORREÇÃO LENTO: {original_rate}Hz → {rate}Hz (+2%)")
+        return rate
+
+    if speed_feedback == 'fast':
+        # Está rápido demais, diminuir sample rate um pouco
+        if original_rate == 44100:
+            rate = 43200  # -2% mais lento
+        else:
+            rate = int(original_rate * 0.98)  # -2%
+        print(f"🔧 CORREÇÃO RÁPIDO: {original_rate}Hz → {rate}Hz (-2%)")
+        return rate
+
+    print(f"✅ VELOCIDADE PERFEITA: {original_rate}Hz mantido")
+    return original_rate
+
+def retag_frame_rate(source_path, target_path, rate_rule, *rule_args, always_export=True):
+    """Reinterpreta as amostras com o sample rate dado por rate_rule(original_rate, *rule_args)
+
+    Os dados não são reamostrados (só a velocidade muda). Sem always_export o
+    arquivo só é gravado quando o sample rate muda.
+    """
+    audio_segment = AudioBuffer.from_file(source_path)
+    result = {
+        'original_rate': audio_segment.frame_rate,
+        'original_duration_ms': len(audio_segment),
+        'written': False
+    }
+    rate = rate_rule(audio_segment.frame_rate, *rule_args)
+    audio_segment = audio_segment.retag(rate)
+    if always_export or rate != result['original_rate']:
+        export_wav(audio_segment, target_path, rate)
+        result['written'] = True
+    result.update(frame_rate=audio_segment.frame_rate, duration_ms=len(audio_segment))
+    return result
+
+def concatenate_wavs(paths, target_path, frame_rate=44100, skip_errors=False):
+    """Concatena WAVs em ordem e exporta mono em frame_rate; não grava nada se não houver áudio"""
+    buffers = []
+    for path in paths:
+        try:
+            buffers.append(AudioBuffer.from_file(path, format='wav'))
+        except Exception as e:
+            if not skip_errors:
+                raise
+            print(f"Erro ao processar segmento {os.path.basename(path)}: {e}")
+
+    if not buffers:
+        return {'segments': 0, 'duration_ms': 0}
+    # Cada segmento é reamostrado uma vez para frame_rate antes de juntar
+    combined_audio = AudioBuffer.concatenate([buffer.resample(frame_rate) for buffer in buffers])
+    if len(combined_audio) > 0:
+        export_wav(combined_audio, target_path, frame_rate)
+    return {'segments': len(buffers), 'duration_ms': len(combined_audio)}
+
+def append_chunks(temp_dir, session_id):
+    """Acrescenta à montagem incremental os chunks já disponíveis em ordem"""
+    ChunkAssembler(temp_dir, session_id, prepare=correct_device_format).append_available()
+
+def decode_chunk(temp_dir, session_id, index):
+    """Decodifica um chunk para o PCM preparado que a finalização apenas concatena"""
+    return ChunkAssembler(temp_dir, session_id, prepare=correct_device_format).decode_chunk(index)
+
+def finalize_chunks(temp_dir, session_id, total_chunks, final_path):
+    """Conclui a montagem incremental; None quando é preciso montar em memória"""
+    assembler = ChunkAssembler(temp_dir, session_id, prepare=correct_device_format)
+    return assembler.finalize(total_chunks, final_path)
+
+def assemble_chunks_in_memory(session_id, total_chunks, temp_dir, final_path):
+    """Montagem completa: decodifica todos os chunks, concatena e exporta (duração em segundos)"""
+    # Lista para armazenar todos os segmentos de áudio
+    audio_segments = []
+
+    # Carregar e processar cada chunk
+    for i in range(total_chunks):
+        chunk_path = os.path.join(temp_dir, chunk_filename(session_id, i))
+
+        if os.path.exists(chunk_path):
+            try:
+                chunk_segment = AudioBuffer.from_file(chunk_path)
+                audio_segments.append(chunk_segment)
+                print(f"✅ Chunk {i} carregado: {len(chunk_segment)}ms")
+            except Exception as e:
+                print(f"⚠️ Erro ao carregar chunk {i}: {e}")
+                raise
+        else:
+            print(f"❌ Chunk {i} não encontrado: {chunk_path}")
+
+    if not audio_segments:
+        raise Exception("Nenhum chunk válido encontrado")
+
+    # Concatenar todos os segmentos
+    print(f"🔗 Concatenando {len(audio_segments)} segmentos...")
+    final_audio = AudioBuffer.concatenate(audio_segments)
+
+    # FUNÇÃO ROBUSTA: Processar áudio final para compatibilidade com diferentes dispositivos
+    final_audio = process_audio_for_device_compatibility(final_audio, "Chunks montados")
+
+    # CORREÇÃO: Exportar arquivo final com configurações específicas para evitar problemas de velocidade
+    print(f"🔧 Exportando arquivo final com configurações otimizadas...")
+    export_wav(final_audio, final_path)
+    return len(final_audio) / 1000
+
+# ==================== POOL DE PROCESSOS ====================
+
+def worker_main():
+    """Laço do processo worker: lê (função, args, kwargs) do stdin e responde no stdout"""
+    requests = sys.stdin.buffer
+    replies = os.fdopen(os.dup(sys.stdout.fileno()), 'wb')
+    # Prints das tarefas vão para o stderr herdado (mesmo log do servidor), não para o canal de respostas
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    while True:
+        try:
+            fn, args, kwargs = pickle.load(requests)
+        except EOFError:
+            break
+        try:
+            reply = (True, fn(*args, **kwargs))
+        except Exception as e:
+            reply = (False, e)
+        try:
+            data = pickle.dumps(reply)
+        except Exception as e:
+            data = pickle.dumps((False, AudioTaskError(f"Resultado não serializável: {e}")))
+        sys.stdout.flush()
+        replies.write(data)
+        replies.flush()
+
+class _Worker:
+    """Processo worker com uma thread que lê as respostas para uma fila"""
+
+    def __init__(self):
+        module_dir = os.path.dirname(os.path.abspath(__file__))
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [module_dir, env.get('PYTHONPATH')]))
+        self.process = subprocess.Popen(
+            [sys.executable, '-c', WORKER_START_CODE],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env
+        )
+        self.replies = queue.Queue()
+        self._reader = threading.Thread(target=self._read, name='audio-task-reader', daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        while True:
+            try:
+                reply = pickle.load(self.process.stdout)
+            except EOFError:
+                self.replies.put(None)
+                return
+            except Exception as e:
+                reply = (False, AudioTaskError(f"Resposta ilegível do worker: {e}"))
+            self.replies.put(reply)
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def send(self, fn, args, kwargs):
+        pickle.dump((fn, args, kwargs), self.process.stdin)
+        self.process.stdin.flush()
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except Exception:
+            self.kill()
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.wait(timeout=5)
+        except Exception:
+            pass
+
+class AudioTaskPool:
+    """Pool de processos com timeout e cancelamento por tarefa"""
+
+    def __init__(self, workers=AUDIO_POOL_WORKERS, timeout=AUDIO_TASK_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self._idle = []
+        self._busy = set()
+        self._slots = threading.BoundedSemaphore(max(workers, 1))
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+
+    def run(self, fn, *args, timeout=None, cancel_event=None, **kwargs):
+        """Executa fn(*args, **kwargs) em um worker e devolve o resultado
+
+        fn deve ser uma função de nível de módulo (serializável por pickle).
+        Exceções da tarefa são relançadas aqui. timeout (segundos, padrão
+        AUDIO_TASK_TIMEOUT, 0 = sem limite) conta também a espera por um
+        worker livre; ao estourar, o worker é encerrado e AudioTaskTimeout é
+        lançada. Se cancel_event (threading.Event) for sinalizado, o mesmo
+        acontece com AudioTaskCancelled.
+        """
+        if self.workers <= 0:
+            return fn(*args, **kwargs)
+
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout if timeout else None
+        name = getattr(fn, '__name__', str(fn))
+
+        while not self._slots.acquire(timeout=POLL_INTERVAL):
+            self._check(name, deadline, cancel_event)
+
+        worker = None
+        try:
+            self._check(name, deadline, cancel_event)
+            worker = self._checkout()
+            worker.send(fn, args, kwargs)
+            while True:
+                try:
+                    reply = worker.replies.get(timeout=POLL_INTERVAL)
+                    break
+                except queue.Empty:
+                    self._check(name, deadline, cancel_event)
+
+            if reply is None:
+                raise AudioTaskError(f"Worker de áudio terminou durante {name}")
+            self._checkin(worker)
+            worker = None
+
+            ok, value = reply
+            if not ok:
+                raise value
+            return value
+        finally:
+            if worker is not None:
+                # Timeout, cancelamento ou falha de comunicação: o worker pode estar no meio da tarefa
+                self._discard(worker)
+            self._slots.release()
+
+    def map(self, fn, args_list, timeout=None, cancel_event=None):
+        """Executa fn(*args) para cada tupla de args_list em paralelo nos workers
+
+        Devolve os resultados na ordem de args_list; a exceção de uma tarefa
+        entra no lugar do seu resultado (as demais continuam). O timeout vale
+        por tarefa.
+        """
+        def run_one(args):
+            try:
+                return self.run(fn, *args, timeout=timeout, cancel_event=cancel_event)
+            except Exception as e:
+                return e
+
+        if self.workers <= 1 or len(args_list) <= 1:
+            return [run_one(args) for args in args_list]
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(args_list)),
+                                thread_name_prefix='audio-map') as executor:
+            return list(executor.map(run_one, args_list))
+
+    def _check(self, name, deadline, cancel_event):
+        if self._closed.is_set() or (cancel_event is not None and cancel_event.is_set()):
+            print(f"🛑 Tarefa de áudio {name} cancelada")
+            raise AudioTaskCancelled(f"Tarefa de áudio {name} cancelada")
+        if deadline is not None and time.monotonic() > deadline:
+            print(f"⏱️ Tarefa de áudio {name} excedeu o tempo limite; worker encerrado")
+            raise AudioTaskTimeout(f"Tarefa de áudio {name} excedeu o tempo limite")
+
+    def _checkout(self):
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.alive():
+                    self._busy.add(worker)
+                    return worker
+                worker.kill()
+            worker = _Worker()
+            self._busy.add(worker)
+            return worker
+
+    def _checkin(self, worker):
+        with self._lock:
+            self._busy.discard(worker)
+            if self._closed.is_set() or not worker.alive():
+                worker.kill()
+            else:
+                self._idle.append(worker)
+
+    def _discard(self, worker):
+        with self._lock:
+            self._busy.discard(worker)
+        worker.kill()
+
+    def shutdown(self):
+        """Cancela as tarefas em andamento e encerra os workers"""
+        self._closed.set()
+        with self._lock:
+            idle, busy = self._idle, list(self._busy)
+            self._idle = []
+        for worker in idle:
+            worker.close()
+        for worker in busy:
+            worker.kill()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_audio_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = AudioTaskPool()
+                atexit.register(_pool.shutdown)
+    return _pool
+
+def run_audio_task(fn, *args, **kwargs):
+    """Atalho para get_audio_pool().run(...)"""
+    return get_audio_pool().run(fn, *args, **kwargs)
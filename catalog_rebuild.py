@@ -0,0 +1,220 @@
+"""
+Reconstrução e verificação do catálogo (fsck)
+Depois de uma restauração ou de uma queda, reconstrói todos os metadados
+derivados (dono, duração, vínculos de transcrição/resumo, sessão) a partir
+dos diretórios, usando um pool de processos: a listagem é dividida pelos
+subdiretórios do layout e a leitura dos cabeçalhos de áudio e dos textos é
+feita em lotes paralelos. Também relata inconsistências encontradas.
+
+    python catalog_rebuild.py rebuild [--workers N]
+    python catalog_rebuild.py check [--workers N] [--stale-hours H]
+
+check apenas relata (não altera o catálogo).
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from catalog_service import (
+    AUDIO_EXTENSIONS, RecordingCatalog, probe_audio_file, probe_stored_audio, recording_row,
+    text_base_name, text_document_row, text_kind
+)
+from storage_layout import RESERVED_DIRS, StorageLayout
+from utils import RECORDINGS_DIR, TRANSCRIPTIONS_DIR
+
+TEMP_CHUNKS_DIR = 'temp_chunks'
+PROBE_BATCH_SIZE = 500
+STALE_CHUNK_HOURS = 24
+
+_layouts = {}
+
+def _layout(root, mode):
+    """Layout reaproveitado dentro de cada processo do pool"""
+    key = (root, mode)
+    if key not in _layouts:
+        _layouts[key] = StorageLayout(root, mode)
+    return _layouts[key]
+
+def _list_subtree(directory):
+    """Nomes dos arquivos sob um subdiretório do layout (executado no pool)"""
+    names = []
+    for _, dirnames, filenames in os.walk(directory):
+        dirnames[:] = [name for name in dirnames if name not in RESERVED_DIRS and not name.startswith('.')]
+        names.extend(name for name in filenames if not name.startswith('.'))
+    return names
+
+def _probe_batch(root, mode, filenames):
+    """Cabeçalhos de áudio de um lote de gravações (executado no pool)"""
+    storage = _layout(root, mode)
+    results, errors = [], []
+    for filename in filenames:
+        try:
+            if storage.backend.is_local:
+                info = probe_audio_file(storage.locate(filename))
+            else:
+                info = probe_stored_audio(storage, filename)
+            results.append((filename, info))
+        except OSError as e:
+            errors.append((filename, str(e)))
+    return results, errors
+
+def _read_text_batch(root, mode, filenames):
+    """Conteúdo e estatísticas de um lote de textos (executado no pool)"""
+    storage = _layout(root, mode)
+    results, errors = [], []
+    for filename in filenames:
+        try:
+            content = storage.read_text(filename)
+            results.append(text_document_row(filename, content, storage.stat(filename)))
+        except (OSError, UnicodeDecodeError) as e:
+            errors.append((filename, str(e)))
+    return results, errors
+
+def _batches(items, size=PROBE_BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+class CatalogRebuilder:
+    """Varredura paralela dos diretórios de gravações e transcrições"""
+
+    def __init__(self, catalog, workers=None, stale_hours=STALE_CHUNK_HOURS):
+        self.catalog = catalog
+        self.recordings = catalog.recordings
+        self.transcriptions = catalog.transcriptions
+        self.workers = workers or os.cpu_count() or 1
+        self.stale_hours = stale_hours
+        self.errors = []
+
+    def list_files(self, pool, storage):
+        """Todos os nomes do layout; no disco local cada subdiretório é listado em paralelo"""
+        if not storage.backend.is_local:
+            return list(dict.fromkeys(storage.iter_files()))
+        if not os.path.isdir(storage.root):
+            return []
+
+        names = list(storage.packs.names())
+        subdirs = []
+        for entry in os.scandir(storage.root):
+            if entry.name.startswith('.') or entry.name in RESERVED_DIRS:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif entry.is_file():
+                names.append(entry.name)
+        for subtree in pool.map(_list_subtree, subdirs):
+            names.extend(subtree)
+        return list(dict.fromkeys(names))
+
+    def _map_batches(self, pool, function, storage, filenames):
+        futures = [
+            pool.submit(function, storage.root, storage.mode, batch)
+            for batch in _batches(filenames)
+        ]
+        for future in futures:
+            results, errors = future.result()
+            self.errors.extend(errors)
+            yield from results
+
+    def scan(self, pool):
+        """Lista e lê tudo; retorna (rows de gravações, gerador de textos, nomes)"""
+        recording_names = self.list_files(pool, self.recordings)
+        text_names = self.list_files(pool, self.transcriptions)
+        text_set = set(text_names)
+
+        audio_names = [
+            name for name in recording_names
+            if os.path.splitext(name)[1].lstrip('.').lower() in AUDIO_EXTENSIONS
+        ]
+        rows = []
+        for filename, info in self._map_batches(pool, _probe_batch, self.recordings, audio_names):
+            base_name = os.path.splitext(filename)[0]
+            rows.append(recording_row(
+                filename, info,
+                base_name + '_transcricao.txt' in text_set,
+                base_name + '_resumo.txt' in text_set
+            ))
+
+        indexable = [name for name in text_names if text_kind(name) is not None]
+        text_rows = self._map_batches(pool, _read_text_batch, self.transcriptions, indexable)
+        return rows, text_rows, audio_names, text_names
+
+    def find_orphans(self, audio_names, text_names):
+        """Textos sem gravação e chunks temporários abandonados"""
+        audio_bases = {os.path.splitext(name)[0] for name in audio_names}
+        texts_without_audio = sorted(
+            name for name in text_names
+            if text_kind(name) is not None and text_base_name(name) not in audio_bases
+        )
+
+        stale_chunks = {}
+        temp_dir = os.path.join(self.recordings.root, TEMP_CHUNKS_DIR)
+        limit = time.time() - self.stale_hours * 3600
+        if os.path.isdir(temp_dir):
+            for entry in os.scandir(temp_dir):
+                try:
+                    stats = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if entry.is_file() and stats.st_mtime < limit:
+                    session_id = entry.name.split('_chunk_', 1)[0]
+                    count, size = stale_chunks.get(session_id, (0, 0))
+                    stale_chunks[session_id] = (count + 1, size + stats.st_size)
+
+        return {'texts_without_audio': texts_without_audio, 'stale_chunks': stale_chunks}
+
+    def run(self, apply=True):
+        started = time.time()
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            rows, text_rows, audio_names, text_names = self.scan(pool)
+            if apply:
+                text_count = self.catalog.replace_all(rows, text_rows)
+            else:
+                text_count = sum(1 for _ in text_rows)
+        report = self.find_orphans(audio_names, text_names)
+        report.update({
+            'recordings': len(rows),
+            'texts': text_count,
+            'errors': self.errors,
+            'elapsed': time.time() - started
+        })
+        return report
+
+def print_report(report, applied):
+    action = 'reconstruído' if applied else 'verificado'
+    print(f"✅ Catálogo {action}: {report['recordings']} gravações, {report['texts']} textos "
+          f"em {report['elapsed']:.1f}s")
+
+    for filename, error in report['errors']:
+        print(f"⚠️ Erro ao ler {filename}: {error}")
+
+    orphans = report['texts_without_audio']
+    print(f"📝 Textos sem gravação: {len(orphans)}")
+    for filename in orphans[:50]:
+        print(f"   - {filename}")
+    if len(orphans) > 50:
+        print(f"   ... e mais {len(orphans) - 50}")
+
+    stale = report['stale_chunks']
+    total_bytes = sum(size for _, size in stale.values())
+    print(f"🧩 Sessões com chunks temporários abandonados: {len(stale)} ({total_bytes} bytes)")
+    for session_id, (count, size) in sorted(stale.items()):
+        print(f"   - {session_id}: {count} chunks, {size} bytes")
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconstrução e verificação do catálogo do RecPac')
+    parser.add_argument('command', choices=['rebuild', 'check'])
+    parser.add_argument('--workers', type=int, default=None, help='Processos do pool (padrão: número de CPUs)')
+    parser.add_argument('--stale-hours', type=float, default=STALE_CHUNK_HOURS,
+                        help='Idade mínima para considerar um chunk temporário abandonado')
+    args = parser.parse_args()
+
+    # Sem get_catalog(): a varredura serial da primeira execução é justamente o que se quer evitar
+    catalog = RecordingCatalog(RECORDINGS_DIR, TRANSCRIPTIONS_DIR)
+    rebuilder = CatalogRebuilder(catalog, args.workers, args.stale_hours)
+    apply = args.command == 'rebuild'
+    print_report(rebuilder.run(apply=apply), apply)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,913 @@
+"""
+Serviço de catálogo de gravações
+Mantém um índice SQLite com os metadados das gravações para evitar
+varreduras do diretório (os.listdir + stat) a cada listagem
+"""
+
+import base64
+import hashlib
+import io
+import itertools
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import wave
+from datetime import datetime, timedelta
+
+from services_config import CATALOG_DB_PATH
+from storage_layout import get_layout
+from utils import is_derived_artifact, owner_from_filename
+
+AUDIO_EXTENSIONS = {'wav', 'webm', 'mp3', 'm4a', 'mp4', 'aac', 'ogg', 'flac', 'amr'}
+TEXT_KINDS = {'_transcricao.txt': 'transcription', '_resumo.txt': 'summary'}
+
+# Incrementar sempre que uma mudança de esquema exigir nova varredura completa
+SCHEMA_VERSION = '5'
+
+# Tabelas derivadas do disco: podem ser recriadas e repovoadas a qualquer momento
+DERIVED_TABLES = ('recordings', 'text_documents', 'text_search')
+
+PREVIEW_LENGTH = 200
+
+# Bytes lidos do início de um WAV remoto para obter a duração pelo cabeçalho
+WAV_HEADER_BYTES = 64 * 1024
+
+# Chaves de ordenação aceitas pelas listagens (expressões cobertas pelos índices acima)
+RECORDING_SORT_KEYS = {
+    'date': 'mtime',
+    'size': 'size',
+    'name': 'filename',
+    'duration': 'COALESCE(duration_ms, -1)'
+}
+TRANSCRIPTION_SORT_KEYS = {
+    'date': 'd.mtime',
+    'size': 'd.size',
+    'name': 'd.filename'
+}
+MAX_PAGE_SIZE = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    filename TEXT PRIMARY KEY,
+    owner TEXT,
+    size INTEGER NOT NULL DEFAULT 0,
+    mtime REAL NOT NULL DEFAULT 0,
+    ctime REAL NOT NULL DEFAULT 0,
+    duration_ms INTEGER,
+    format TEXT,
+    session_id TEXT,
+    has_transcription INTEGER NOT NULL DEFAULT 0,
+    has_summary INTEGER NOT NULL DEFAULT 0,
+    derived INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_recordings_date ON recordings(owner, format, derived, mtime, filename);
+CREATE INDEX IF NOT EXISTS idx_recordings_size ON recordings(owner, format, derived, size, filename);
+CREATE INDEX IF NOT EXISTS idx_recordings_name ON recordings(owner, format, derived, filename);
+CREATE INDEX IF NOT EXISTS idx_recordings_duration ON recordings(owner, format, derived, COALESCE(duration_ms, -1), filename);
+CREATE TABLE IF NOT EXISTS catalog_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS text_documents (
+    id INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL UNIQUE,
+    base_name TEXT NOT NULL,
+    owner TEXT,
+    kind TEXT NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0,
+    mtime REAL NOT NULL DEFAULT 0,
+    preview TEXT,
+    length INTEGER NOT NULL DEFAULT 0,
+    word_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_text_documents_date ON text_documents(owner, kind, mtime, filename);
+CREATE INDEX IF NOT EXISTS idx_text_documents_size ON text_documents(owner, kind, size, filename);
+CREATE INDEX IF NOT EXISTS idx_text_documents_name ON text_documents(owner, kind, filename);
+CREATE INDEX IF NOT EXISTS idx_text_documents_base ON text_documents(base_name, kind);
+CREATE TABLE IF NOT EXISTS content_refs (
+    filename TEXT PRIMARY KEY,
+    owner TEXT,
+    content_hash TEXT NOT NULL,
+    upload_hash TEXT,
+    created_at REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_content_refs_upload ON content_refs(owner, upload_hash);
+CREATE INDEX IF NOT EXISTS idx_content_refs_hash ON content_refs(content_hash, owner);
+CREATE TABLE IF NOT EXISTS content_pcm (
+    content_hash TEXT PRIMARY KEY,
+    in_place INTEGER NOT NULL DEFAULT 0,
+    frame_rate INTEGER NOT NULL,
+    channels INTEGER NOT NULL,
+    duration_ms INTEGER NOT NULL,
+    original_frame_rate INTEGER NOT NULL,
+    original_channels INTEGER NOT NULL,
+    created_at REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS ingest_jobs (
+    job_id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    raw_path TEXT NOT NULL,
+    upload_hash TEXT,
+    details TEXT NOT NULL DEFAULT '{}',
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ingest_jobs_status ON ingest_jobs(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_ingest_jobs_upload ON ingest_jobs(owner, upload_hash);
+CREATE VIRTUAL TABLE IF NOT EXISTS text_search USING fts5(
+    content,
+    owner_tag,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+def probe_audio_file(filepath):
+    """Lê tamanho, datas, formato e duração (cabeçalho WAV) de um arquivo de áudio"""
+    stats = os.stat(filepath)
+    extension = os.path.splitext(filepath)[1].lstrip('.').lower()
+    duration_ms = None
+
+    if extension == 'wav':
+        try:
+            with wave.open(filepath, 'rb') as wav_file:
+                frame_rate = wav_file.getframerate()
+                if frame_rate:
+                    duration_ms = int(wav_file.getnframes() * 1000 / frame_rate)
+        except Exception:
+            # Arquivo salvo sem processamento (ex.: WebM com extensão .wav)
+            duration_ms = None
+
+    return {
+        'size': stats.st_size,
+        'mtime': stats.st_mtime,
+        'ctime': stats.st_ctime,
+        'duration_ms': duration_ms,
+        'format': extension
+    }
+
+def probe_stored_audio(storage, filename):
+    """Como probe_audio_file, mas via layout/backend lendo só o cabeçalho do arquivo"""
+    stats = storage.stat(filename)
+    if stats is None:
+        raise FileNotFoundError(filename)
+    extension = os.path.splitext(filename)[1].lstrip('.').lower()
+    duration_ms = None
+
+    if extension == 'wav':
+        try:
+            with wave.open(io.BytesIO(storage.read_head(filename, WAV_HEADER_BYTES)), 'rb') as wav_file:
+                frame_rate = wav_file.getframerate()
+                if frame_rate:
+                    duration_ms = int(wav_file.getnframes() * 1000 / frame_rate)
+        except Exception:
+            duration_ms = None
+
+    return {
+        'size': stats['size'],
+        'mtime': stats['mtime'],
+        'ctime': stats['ctime'],
+        'duration_ms': duration_ms,
+        'format': extension
+    }
+
+def session_id_from_filename(filename):
+    """Identificador de sessão usado no agrupamento de segmentos (mesma regra das rotas de listagem)"""
+    if '_sessao_' not in filename:
+        return None
+    parts = filename.split('_')
+    return parts[2] if len(parts) >= 3 else None
+
+def text_kind(filename):
+    """Tipo do documento de texto indexável ('transcription', 'summary') ou None"""
+    for suffix, kind in TEXT_KINDS.items():
+        if filename.endswith(suffix):
+            return kind
+    return None
+
+def text_base_name(filename):
+    """Nome base compartilhado entre transcrição e resumo (sem o sufixo do tipo)"""
+    for suffix in TEXT_KINDS:
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)]
+    return os.path.splitext(filename)[0]
+
+def text_stats(content):
+    """Preview, tamanho em caracteres e contagem de palavras de um texto"""
+    preview = content[:PREVIEW_LENGTH] + '...' if len(content) > PREVIEW_LENGTH else content
+    return preview, len(content), len(content.split())
+
+def recording_row(filename, info, has_transcription, has_summary, owner=None):
+    """Linha da tabela recordings a partir do resultado de probe_audio_file"""
+    return (
+        filename,
+        owner or owner_from_filename(filename),
+        info['size'],
+        info['mtime'],
+        info['ctime'],
+        info['duration_ms'],
+        info['format'],
+        session_id_from_filename(filename),
+        int(has_transcription),
+        int(has_summary),
+        int(is_derived_artifact(filename))
+    )
+
+def text_document_row(filename, content, stats, owner=None):
+    """Dados de um documento de texto para RecordingCatalog.replace_all"""
+    owner = owner or owner_from_filename(filename)
+    preview, length, word_count = text_stats(content)
+    return (
+        filename, text_base_name(filename), owner, text_kind(filename),
+        stats['size'], stats['mtime'], preview, length, word_count, content
+    )
+
+def owner_tag(owner):
+    """Token único por dono usado para restringir a busca FTS ao usuário"""
+    return 'o' + hashlib.sha1(owner.encode('utf-8')).hexdigest()[:20]
+
+def build_match_query(query, owners):
+    """Monta expressão FTS5 segura a partir do texto digitado pelo usuário"""
+    terms = re.findall(r'\w+', query, flags=re.UNICODE)
+    if not terms or not owners:
+        return None
+    content_expr = ' AND '.join(f'"{term}"' for term in terms[:-1])
+    last_term = f'"{terms[-1]}"*'  # Prefixo no último termo (busca enquanto digita)
+    content_expr = f'{content_expr} AND {last_term}' if content_expr else last_term
+    owners_expr = ' OR '.join(owner_tag(owner) for owner in owners)
+    return f'owner_tag:({owners_expr}) AND content:({content_expr})'
+
+class InvalidPageRequest(ValueError):
+    """Parâmetros de paginação/ordenação inválidos (resposta 400 nas rotas)"""
+
+def encode_cursor(sort, order, sort_value, filename):
+    """Cursor opaco com a posição do último item da página (keyset)"""
+    payload = json.dumps([sort, order, sort_value, filename], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, sort, order):
+    """Valida o cursor recebido e retorna (valor de ordenação, filename)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, cursor_order, sort_value, filename = json.loads(
+            base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8')
+        )
+    except Exception:
+        raise InvalidPageRequest('Cursor inválido')
+    if (cursor_sort, cursor_order) != (sort, order) or not isinstance(filename, str):
+        raise InvalidPageRequest('Cursor não corresponde à ordenação solicitada')
+    return sort_value, filename
+
+def _parse_date(value, field):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise InvalidPageRequest(f'Data inválida em {field} (use AAAA-MM-DD)')
+
+def parse_page_args(args, sort_keys):
+    """Lê limit, cursor, sort, order, date_from e date_to da query string
+
+    A paginação só é ativada quando limit ou cursor são informados; sem eles a
+    listagem continua completa (compatível com o frontend atual).
+    """
+    sort = args.get('sort', 'date')
+    if sort not in sort_keys:
+        raise InvalidPageRequest(f"Ordenação inválida: use {', '.join(sort_keys)}")
+
+    order = args.get('order', 'asc' if sort == 'name' else 'desc')
+    if order not in ('asc', 'desc'):
+        raise InvalidPageRequest('Ordem inválida: use asc ou desc')
+
+    limit = None
+    cursor = args.get('cursor') or None
+    if args.get('limit') or cursor:
+        try:
+            limit = int(args.get('limit', 50))
+        except (TypeError, ValueError):
+            raise InvalidPageRequest('Parâmetro limit inválido')
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise InvalidPageRequest(f'limit deve estar entre 1 e {MAX_PAGE_SIZE}')
+
+    date_from = args.get('date_from')
+    date_to = args.get('date_to')
+    return {
+        'sort': sort,
+        'order': order,
+        'limit': limit,
+        'after': decode_cursor(cursor, sort, order) if cursor else None,
+        # Intervalo por data de modificação; date_to inclui o dia inteiro
+        'date_from': _parse_date(date_from, 'date_from').timestamp() if date_from else None,
+        'date_to': (_parse_date(date_to, 'date_to') + timedelta(days=1)).timestamp() if date_to else None
+    }
+
+def format_size(file_size):
+    """Formata tamanho em bytes de forma legível"""
+    if file_size < 1024:
+        return f"{file_size} B"
+    elif file_size < 1024 * 1024:
+        return f"{file_size / 1024:.1f} KB"
+    return f"{file_size / (1024 * 1024):.1f} MB"
+
+def transcription_entry(row):
+    """Converte linha do catálogo no formato de listagem de transcrições usado pelas rotas"""
+    return {
+        'filename': row['filename'],
+        'audio_filename': row['base_name'] + '.wav',
+        'size': row['size'],
+        'modified_date': datetime.fromtimestamp(row['mtime']).strftime('%d/%m/%Y %H:%M'),
+        'preview': row['preview'],
+        'length': row['length'],
+        'word_count': row['word_count'],
+        'has_summary': bool(row['has_summary'])
+    }
+
+class RecordingCatalog:
+    """Índice persistente das gravações por usuário"""
+
+    def __init__(self, recordings_dir, transcriptions_dir, db_path=CATALOG_DB_PATH):
+        self.recordings_dir = recordings_dir
+        self.transcriptions_dir = transcriptions_dir
+        self.recordings = get_layout(recordings_dir)
+        self.transcriptions = get_layout(transcriptions_dir)
+        self.db_path = db_path
+        self._local = threading.local()
+
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        with self._connection() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value TEXT)')
+            row = conn.execute("SELECT value FROM catalog_meta WHERE key = 'schema_version'").fetchone()
+            if row and row['value'] != SCHEMA_VERSION:
+                # Esquema antigo: recriar tabelas derivadas (repovoadas pela sincronização)
+                print(f"🔧 Atualizando esquema do catálogo: v{row['value']} → v{SCHEMA_VERSION}")
+                for table in DERIVED_TABLES:
+                    conn.execute(f'DROP TABLE IF EXISTS {table}')
+                conn.execute("DELETE FROM catalog_meta WHERE key IN ('schema_version', 'last_full_sync')")
+            conn.executescript(SCHEMA)
+
+    def _connection(self):
+        """Conexão SQLite por thread (modo WAL permite leituras concorrentes)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _get_meta(self, key):
+        row = self._connection().execute('SELECT value FROM catalog_meta WHERE key = ?', (key,)).fetchone()
+        return row['value'] if row else None
+
+    def _set_meta(self, key, value):
+        with self._connection() as conn:
+            conn.execute('INSERT OR REPLACE INTO catalog_meta (key, value) VALUES (?, ?)', (key, value))
+
+    def _mark_stale(self, error):
+        """Registra falha de atualização para forçar nova sincronização com o disco"""
+        print(f"⚠️ Erro ao atualizar catálogo: {error}")
+        try:
+            self._set_meta('needs_sync', '1')
+        except Exception:
+            pass
+
+    # ==================== SINCRONIZAÇÃO ====================
+
+    def ensure_synced(self):
+        """Faz a varredura completa apenas na primeira execução, após mudança de esquema ou após falhas"""
+        if (self._get_meta('last_full_sync') is None
+                or self._get_meta('schema_version') != SCHEMA_VERSION
+                or self._get_meta('needs_sync') == '1'):
+            self.sync_from_disk()
+
+    def sync_from_disk(self):
+        """Reconstrói o catálogo a partir do diretório de gravações"""
+        print(f"🔄 Sincronizando catálogo com {self.recordings_dir}...")
+        os.makedirs(self.recordings_dir, exist_ok=True)
+
+        # Uma única listagem das transcrições resolve os vínculos de todas as gravações
+        text_names = set(self.transcriptions.iter_files())
+        rows = []
+        for filename in self.recordings.iter_files():
+            extension = os.path.splitext(filename)[1].lstrip('.').lower()
+            if extension not in AUDIO_EXTENSIONS:
+                continue
+            try:
+                rows.append(self._build_row(filename, None, text_names))
+            except OSError as e:
+                print(f"⚠️ Erro ao indexar {filename}: {e}")
+
+        text_count = self.replace_all(rows, self._iter_text_rows())
+
+        print(f"✅ Catálogo sincronizado: {len(rows)} gravações, {text_count} textos")
+        return len(rows)
+
+    def _iter_text_rows(self):
+        """Documentos de texto do diretório de transcrições"""
+        os.makedirs(self.transcriptions_dir, exist_ok=True)
+        for filename in dict.fromkeys(self.transcriptions.iter_files()):
+            if text_kind(filename) is None:
+                continue
+            try:
+                content = self.transcriptions.read_text(filename)
+                stats = self.transcriptions.stat(filename)
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"⚠️ Erro ao indexar texto {filename}: {e}")
+                continue
+            yield text_document_row(filename, content, stats)
+
+    def replace_all(self, rows, text_rows, batch_size=1000):
+        """Substitui todo o conteúdo derivado em uma única transação
+
+        rows: tuplas de recording_row; text_rows: tuplas de text_document_row
+        (iteráveis, consumidos em lotes). Leitores continuam vendo o catálogo
+        anterior até o fim (WAL). Retorna a quantidade de textos indexados.
+        """
+        text_count = 0
+        conn = self._connection()
+        with conn:
+            conn.execute('DELETE FROM recordings')
+            conn.execute('DELETE FROM text_search')
+            conn.execute('DELETE FROM text_documents')
+            rows = iter(rows)
+            while True:
+                batch = list(itertools.islice(rows, batch_size))
+                if not batch:
+                    break
+                conn.executemany(self._upsert_sql(), batch)
+
+            text_rows = iter(text_rows)
+            while True:
+                batch = list(itertools.islice(text_rows, batch_size))
+                if not batch:
+                    break
+                ids = range(text_count + 1, text_count + len(batch) + 1)
+                conn.executemany(
+                    'INSERT INTO text_documents (id, filename, base_name, owner, kind, size, mtime, preview, length, word_count) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    [(doc_id,) + row[:9] for doc_id, row in zip(ids, batch)]
+                )
+                conn.executemany(
+                    'INSERT INTO text_search (rowid, content, owner_tag) VALUES (?, ?, ?)',
+                    [(doc_id, row[9], owner_tag(row[2] or '')) for doc_id, row in zip(ids, batch)]
+                )
+                text_count += len(batch)
+
+            conn.executemany(
+                'INSERT OR REPLACE INTO catalog_meta (key, value) VALUES (?, ?)',
+                [('last_full_sync', datetime.now().isoformat()), ('schema_version', SCHEMA_VERSION)]
+            )
+            conn.execute("DELETE FROM catalog_meta WHERE key = 'needs_sync'")
+        return text_count
+
+    # ==================== ATUALIZAÇÕES ====================
+
+    def _text_links(self, filename, text_names=None):
+        """Verifica existência de transcrição e resumo associados"""
+        base_name = os.path.splitext(filename)[0]
+        exists = text_names.__contains__ if text_names is not None else self.transcriptions.exists
+        return exists(base_name + '_transcricao.txt'), exists(base_name + '_resumo.txt')
+
+    def _build_row(self, filename, owner, text_names=None):
+        if self.recordings.backend.is_local:
+            info = probe_audio_file(self.recordings.locate(filename))
+        else:
+            info = probe_stored_audio(self.recordings, filename)
+        has_transcription, has_summary = self._text_links(filename, text_names)
+        return recording_row(filename, info, has_transcription, has_summary, owner)
+
+    @staticmethod
+    def _upsert_sql():
+        return (
+            'INSERT OR REPLACE INTO recordings '
+            '(filename, owner, size, mtime, ctime, duration_ms, format, session_id, has_transcription, has_summary, derived) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+        )
+
+    def index_recording(self, filename, owner=None):
+        """Insere ou atualiza uma gravação recém-escrita no catálogo"""
+        try:
+            if not self.recordings.exists(filename):
+                self.remove_recording(filename)
+                return False
+            row = self._build_row(filename, owner)
+            with self._connection() as conn:
+                conn.execute(self._upsert_sql(), row)
+            return True
+        except Exception as e:
+            self._mark_stale(e)
+            return False
+
+    def remove_recording(self, filename):
+        """Remove uma gravação (e os textos derivados) do catálogo"""
+        try:
+            with self._connection() as conn:
+                conn.execute('DELETE FROM recordings WHERE filename = ?', (filename,))
+                conn.execute('DELETE FROM content_refs WHERE filename = ?', (filename,))
+            base_name = os.path.splitext(filename)[0]
+            for suffix in TEXT_KINDS:
+                if not self.transcriptions.exists(base_name + suffix):
+                    self.remove_text(base_name + suffix)
+        except Exception as e:
+            self._mark_stale(e)
+
+    def rename_recording(self, old_filename, new_filename, owner=None):
+        """Reflete a renomeação de uma gravação"""
+        try:
+            with self._connection() as conn:
+                row = conn.execute('SELECT owner FROM recordings WHERE filename = ?', (old_filename,)).fetchone()
+                conn.execute('DELETE FROM recordings WHERE filename = ?', (old_filename,))
+                conn.execute(
+                    'UPDATE OR REPLACE content_refs SET filename = ?, owner = ? WHERE filename = ?',
+                    (new_filename, owner_from_filename(new_filename), old_filename)
+                )
+                old_base, new_base = os.path.splitext(old_filename)[0], os.path.splitext(new_filename)[0]
+                for suffix in TEXT_KINDS:
+                    if self.transcriptions.exists(new_base + suffix):
+                        conn.execute(
+                            'UPDATE text_documents SET filename = ?, base_name = ?, owner = ? WHERE filename = ?',
+                            (new_base + suffix, new_base, owner_from_filename(new_base + suffix), old_base + suffix)
+                        )
+            return self.index_recording(new_filename, owner or (row['owner'] if row else None))
+        except Exception as e:
+            self._mark_stale(e)
+            return False
+
+    # ==================== CONTEÚDO ====================
+    # content_refs não é tabela derivada: hashes de upload não podem ser
+    # reconstruídos a partir do disco, então sobrevivem a mudanças de esquema.
+
+    def record_content(self, filename, content_hash, owner=None, upload_hash=None):
+        """Associa a gravação ao hash do seu conteúdo (e ao hash dos bytes enviados)"""
+        with self._connection() as conn:
+            conn.execute(
+                '''INSERT INTO content_refs (filename, owner, content_hash, upload_hash, created_at)
+                   VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT(filename) DO UPDATE SET
+                       owner = excluded.owner,
+                       content_hash = excluded.content_hash,
+                       upload_hash = COALESCE(excluded.upload_hash, content_refs.upload_hash)''',
+                (filename, owner or owner_from_filename(filename), content_hash, upload_hash, time.time())
+            )
+
+    def forget_content(self, filename):
+        with self._connection() as conn:
+            conn.execute('DELETE FROM content_refs WHERE filename = ?', (filename,))
+
+    # content_pcm guarda, por hash de conteúdo, os parâmetros do PCM normalizado
+    # (in_place = a própria gravação já é o WAV normalizado; senão fica em .pcm/).
+
+    def record_pcm(self, content_hash, params, in_place=False):
+        with self._connection() as conn:
+            conn.execute(
+                '''INSERT OR REPLACE INTO content_pcm
+                   (content_hash, in_place, frame_rate, channels, duration_ms,
+                    original_frame_rate, original_channels, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                (content_hash, int(in_place), params['frame_rate'], params['channels'], params['duration_ms'],
+                 params.get('original_frame_rate', params['frame_rate']),
+                 params.get('original_channels', params['channels']), time.time())
+            )
+
+    def get_pcm(self, content_hash):
+        row = self._connection().execute(
+            'SELECT * FROM content_pcm WHERE content_hash = ?', (content_hash,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def forget_pcm(self, content_hash):
+        with self._connection() as conn:
+            conn.execute('DELETE FROM content_pcm WHERE content_hash = ?', (content_hash,))
+
+    def orphan_pcm(self):
+        """Hashes com PCM registrado que nenhuma gravação referencia mais"""
+        rows = self._connection().execute(
+            '''SELECT content_hash, in_place FROM content_pcm
+               WHERE content_hash NOT IN (SELECT content_hash FROM content_refs)'''
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    # ==================== INGESTÃO ====================
+    # ingest_jobs também não é derivada: é a fila durável dos uploads em processamento.
+
+    def create_ingest_job(self, job_id, owner, kind, filename, raw_path, upload_hash=None, details=None):
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                '''INSERT INTO ingest_jobs
+                   (job_id, owner, kind, status, filename, raw_path, upload_hash, details, created_at, updated_at)
+                   VALUES (?, ?, ?, 'queued', ?, ?, ?, ?, ?, ?)''',
+                (job_id, owner, kind, filename, raw_path, upload_hash, json.dumps(details or {}), now, now)
+            )
+
+    def claim_ingest_job(self, job_id, stale_before):
+        """Marca o job como em processamento se estiver na fila ou abandonado; False se outro já o pegou"""
+        with self._connection() as conn:
+            cursor = conn.execute(
+                '''UPDATE ingest_jobs SET status = 'processing', updated_at = ?
+                   WHERE job_id = ? AND (status = 'queued' OR (status = 'processing' AND updated_at < ?))''',
+                (time.time(), job_id, stale_before)
+            )
+        return cursor.rowcount == 1
+
+    def update_ingest_job(self, job_id, status, result=None, error=None):
+        with self._connection() as conn:
+            conn.execute(
+                'UPDATE ingest_jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE job_id = ?',
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+
+    @staticmethod
+    def _ingest_job(row):
+        job = dict(row)
+        job['details'] = json.loads(job['details'] or '{}')
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def get_ingest_job(self, job_id):
+        row = self._connection().execute('SELECT * FROM ingest_jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return self._ingest_job(row) if row else None
+
+    def pending_ingest_jobs(self):
+        """Jobs aguardando ou interrompidos no meio (ex.: reinício do servidor), em ordem de chegada"""
+        rows = self._connection().execute(
+            "SELECT * FROM ingest_jobs WHERE status IN ('queued', 'processing') ORDER BY created_at"
+        ).fetchall()
+        return [self._ingest_job(row) for row in rows]
+
+    def find_pending_ingest_job(self, owner, upload_hash):
+        """Job na fila ou em processamento para o mesmo upload do dono (reenvio após timeout)"""
+        row = self._connection().execute(
+            "SELECT * FROM ingest_jobs WHERE owner = ? AND upload_hash = ? "
+            "AND status IN ('queued', 'processing') ORDER BY created_at LIMIT 1",
+            (owner, upload_hash)
+        ).fetchone()
+        return self._ingest_job(row) if row else None
+
+    def prune_ingest_jobs(self, older_than):
+        """Remove do histórico jobs concluídos ou com falha anteriores a older_than (epoch)
+
+        Retorna os raw_path dos jobs removidos: o upload original de um job
+        com falha continua em disco e deve ser apagado por quem chamou.
+        """
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT job_id, raw_path FROM ingest_jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+                (older_than,)
+            ).fetchall()
+            conn.executemany('DELETE FROM ingest_jobs WHERE job_id = ?', [(row['job_id'],) for row in rows])
+        return [row['raw_path'] for row in rows]
+
+    def _upsert_text(self, filename, content, owner, stats=None):
+        owner = owner or owner_from_filename(filename)
+        if stats is None:
+            stats = self.transcriptions.stat(filename)
+        size = stats['size'] if stats else len(content.encode('utf-8'))
+        mtime = stats['mtime'] if stats else datetime.now().timestamp()
+        preview, length, word_count = text_stats(content)
+
+        with self._connection() as conn:
+            row = conn.execute('SELECT id FROM text_documents WHERE filename = ?', (filename,)).fetchone()
+            if row:
+                doc_id = row['id']
+                conn.execute(
+                    'UPDATE text_documents SET owner = ?, size = ?, mtime = ?, preview = ?, length = ?, word_count = ? '
+                    'WHERE id = ?',
+                    (owner, size, mtime, preview, length, word_count, doc_id)
+                )
+                conn.execute('DELETE FROM text_search WHERE rowid = ?', (doc_id,))
+            else:
+                doc_id = conn.execute(
+                    'INSERT INTO text_documents (filename, base_name, owner, kind, size, mtime, preview, length, word_count) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (filename, text_base_name(filename), owner, text_kind(filename), size, mtime, preview, length, word_count)
+                ).lastrowid
+            conn.execute(
+                'INSERT INTO text_search (rowid, content, owner_tag) VALUES (?, ?, ?)',
+                (doc_id, content, owner_tag(owner or ''))
+            )
+
+    def index_text(self, text_filename, content, owner=None):
+        """Indexa transcrição/resumo recém-escrito e atualiza as flags da gravação"""
+        try:
+            if text_kind(text_filename) is None:
+                return
+            self._upsert_text(text_filename, content, owner)
+            self._refresh_text_links(text_filename)
+        except Exception as e:
+            self._mark_stale(e)
+
+    def remove_text(self, text_filename):
+        """Remove um documento do índice de busca"""
+        try:
+            with self._connection() as conn:
+                row = conn.execute('SELECT id FROM text_documents WHERE filename = ?', (text_filename,)).fetchone()
+                if row:
+                    conn.execute('DELETE FROM text_search WHERE rowid = ?', (row['id'],))
+                    conn.execute('DELETE FROM text_documents WHERE id = ?', (row['id'],))
+            if text_kind(text_filename) is not None:
+                self._refresh_text_links(text_filename)
+        except Exception as e:
+            self._mark_stale(e)
+
+    def _refresh_text_links(self, text_filename):
+        """Atualiza as flags de transcrição/resumo da gravação do texto"""
+        audio_filename = text_filename.rsplit('_', 1)[0] + '.wav'
+        has_transcription, has_summary = self._text_links(audio_filename)
+        with self._connection() as conn:
+            conn.execute(
+                'UPDATE recordings SET has_transcription = ?, has_summary = ? WHERE filename = ?',
+                (int(has_transcription), int(has_summary), audio_filename)
+            )
+
+    def indexed_sizes(self):
+        """Tamanho registrado de cada gravação e de cada texto indexado: ({gravações}, {textos})"""
+        conn = self._connection()
+        recordings = {row['filename']: row['size'] for row in conn.execute('SELECT filename, size FROM recordings')}
+        texts = {row['filename']: row['size'] for row in conn.execute('SELECT filename, size FROM text_documents')}
+        return recordings, texts
+
+    # ==================== CONSULTAS ====================
+
+    def _keyset_page(self, select_sql, table, filters, params, owner_column, sort_expr, filename_column,
+                     owners, order='desc', after=None, limit=None):
+        """Página ordenada por (sort_expr, filename) a partir do cursor
+
+        Cada dono é consultado separadamente para que o índice (owner, ..., chave,
+        filename) entregue as linhas já ordenadas e o LIMIT corte a varredura: o
+        custo de uma página não depende da posição do cursor.
+        """
+        descending = order == 'desc'
+        direction = 'DESC' if descending else 'ASC'
+        filters = list(filters)
+        params = list(params)
+        if after is not None:
+            comparator = '<' if descending else '>'
+            # Limite simples na chave garante busca por faixa também em índices de expressão
+            filters.append(f'{sort_expr} {comparator}= ?')
+            filters.append(f'({sort_expr}, {filename_column}) {comparator} (?, ?)')
+            params.extend([after[0], *after])
+
+        sql = (
+            f"{select_sql}, {sort_expr} AS sort_value FROM {table} WHERE {owner_column} = ? "
+            + ''.join(f'AND {condition} ' for condition in filters)
+            + f'ORDER BY {sort_expr} {direction}, {filename_column} {direction}'
+            + (' LIMIT ?' if limit is not None else '')
+        )
+
+        conn = self._connection()
+        rows = []
+        for owner in owners:
+            query_params = [owner, *params] + ([limit + 1] if limit is not None else [])
+            rows.extend(dict(row) for row in conn.execute(sql, query_params))
+
+        rows.sort(key=lambda row: (row['sort_value'], row['filename']), reverse=descending)
+        if limit is None or len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, (rows[-1]['sort_value'], rows[-1]['filename'])
+
+    def page_recordings(self, owners, sort='date', order='desc', limit=None, after=None,
+                        date_from=None, date_to=None, audio_format='wav', include_sessions=True):
+        """Gravações dos donos informados, paginadas por cursor
+
+        Derivados (_optimized, cópias _(n)) ficam fora das listagens, mas
+        continuam no catálogo para controle de acesso e busca por nome.
+        Retorna (linhas, próxima posição ou None) — a posição vira cursor com encode_cursor.
+        """
+        owners = [owner for owner in dict.fromkeys(owners) if owner]
+        if not owners:
+            return [], None
+
+        self.ensure_synced()
+        filters, params = ['format = ?', 'derived = 0'], [audio_format]
+        if not include_sessions:
+            filters.append('session_id IS NULL')
+        if date_from is not None:
+            filters.append('mtime >= ?')
+            params.append(date_from)
+        if date_to is not None:
+            filters.append('mtime < ?')
+            params.append(date_to)
+
+        return self._keyset_page(
+            'SELECT *', 'recordings', filters, params, 'owner', RECORDING_SORT_KEYS[sort], 'filename',
+            owners, order, after, limit
+        )
+
+    def list_recordings(self, owners, audio_format='wav'):
+        """Lista gravações dos donos informados (mais recentes primeiro)"""
+        rows, _ = self.page_recordings(owners, audio_format=audio_format)
+        return rows
+
+    def list_session_segments(self, owners, audio_format='wav'):
+        """Agrupa os segmentos de sessão dos donos informados"""
+        owners = [owner for owner in dict.fromkeys(owners) if owner]
+        if not owners:
+            return []
+
+        self.ensure_synced()
+        placeholders = ', '.join('?' for _ in owners)
+        rows = self._connection().execute(
+            f'SELECT * FROM recordings WHERE owner IN ({placeholders}) AND format = ? AND derived = 0 '
+            f'AND session_id IS NOT NULL ORDER BY mtime DESC, filename',
+            (*owners, audio_format)
+        ).fetchall()
+
+        sessions = {}
+        for row in rows:
+            session_entry = sessions.setdefault(row['session_id'], {
+                'id': row['session_id'],
+                'segments': [],
+                'total_size': 0
+            })
+            session_entry['segments'].append({
+                'filename': row['filename'],
+                'size': row['size'],
+                'has_transcription': bool(row['has_transcription'])
+            })
+            session_entry['total_size'] += row['size']
+        return list(sessions.values())
+
+    def list_grouped(self, owners, audio_format='wav'):
+        """Separa gravações individuais e segmentos de sessão (formato usado pelas rotas)"""
+        recordings, _ = self.page_recordings(owners, audio_format=audio_format, include_sessions=False)
+        return recordings, self.list_session_segments(owners, audio_format)
+
+    def page_transcriptions(self, owners, sort='date', order='desc', limit=None, after=None,
+                            date_from=None, date_to=None):
+        """Transcrições com preview e estatísticas pré-calculadas, paginadas por cursor"""
+        owners = [owner for owner in dict.fromkeys(owners) if owner]
+        if not owners:
+            return [], None
+
+        self.ensure_synced()
+        filters, params = ["d.kind = 'transcription'"], []
+        if date_from is not None:
+            filters.append('d.mtime >= ?')
+            params.append(date_from)
+        if date_to is not None:
+            filters.append('d.mtime < ?')
+            params.append(date_to)
+
+        return self._keyset_page(
+            "SELECT d.filename, d.base_name, d.size, d.mtime, d.preview, d.length, d.word_count, "
+            "EXISTS (SELECT 1 FROM text_documents s WHERE s.base_name = d.base_name AND s.kind = 'summary') AS has_summary",
+            'text_documents d', filters, params, 'd.owner', TRANSCRIPTION_SORT_KEYS[sort], 'd.filename',
+            owners, order, after, limit
+        )
+
+    def list_transcriptions(self, owners):
+        """Lista transcrições com preview e estatísticas pré-calculadas (mais recentes primeiro)"""
+        rows, _ = self.page_transcriptions(owners)
+        return rows
+
+    def search_texts(self, query, owners, limit=20, kind=None):
+        """Busca textual ranqueada (BM25) restrita aos documentos dos donos informados"""
+        owners = [owner for owner in dict.fromkeys(owners) if owner]
+        match_query = build_match_query(query, owners)
+        if match_query is None:
+            return []
+
+        self.ensure_synced()
+        placeholders = ', '.join('?' for _ in owners)
+        sql = (
+            "SELECT d.filename, d.kind, bm25(text_search, 1.0, 0.0) AS score, "
+            "snippet(text_search, 0, '**', '**', '...', 24) AS snippet "
+            "FROM text_search JOIN text_documents d ON d.id = text_search.rowid "
+            f"WHERE text_search MATCH ? AND d.owner IN ({placeholders})"
+        )
+        params = [match_query, *owners]
+        if kind:
+            sql += ' AND d.kind = ?'
+            params.append(kind)
+        sql += ' ORDER BY score LIMIT ?'
+        params.append(limit)
+
+        rows = self._connection().execute(sql, params).fetchall()
+        return [dict(row) for row in rows]
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_catalog():
+    """Instância compartilhada do catálogo (criada e sincronizada no primeiro uso)"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                from utils import RECORDINGS_DIR, TRANSCRIPTIONS_DIR
+                catalog = RecordingCatalog(RECORDINGS_DIR, TRANSCRIPTIONS_DIR)
+                catalog.ensure_synced()
+                _catalog = catalog
+    return _catalog
@@ -0,0 +1,539 @@
+"""
+Montagem incremental de gravações enviadas em chunks
+Cada chunk recebido em /api/save_chunk é decodificado e acrescentado a um WAV
+PCM em crescimento em temp_chunks/ (cabeçalho provisório). Na finalização
+basta corrigir o cabeçalho, aplicar o ganho da normalização (calculado a
+partir do pico acumulado) em blocos e mover o arquivo para o layout: nada é
+decodificado de novo e a memória fica limitada ao tamanho de um chunk.
+
+Chunks fora de ordem aguardam em disco até os anteriores chegarem. Se algum
+chunk não puder ser decodificado isoladamente, a sessão é marcada e a
+finalização volta para a montagem completa em memória.
+
+Cada envio tem um manifesto (ChunkManifest) com o dono, o checksum de cada
+chunk e o total anunciado pelo último chunk; com ele o cliente descobre quais
+chunks faltam depois de uma queda de conexão e reenvia só esses.
+
+Os timeslices do MediaRecorder (WebM/Ogg/MP4 fragmentado) não são arquivos
+independentes: só o primeiro traz o cabeçalho do contêiner. Quando o chunk 0
+tem esse cabeçalho e os seguintes não, os bytes são concatenados em ordem em
+um único arquivo do contêiner e decodificados uma vez só na finalização (uma
+chamada do ffmpeg em vez de uma por chunk), com o PCM lido do ffmpeg em
+blocos direto para o WAV em montagem. No Ogg, só uma página com a flag BOS
+inicia um novo fluxo; as demais páginas (que também começam com OggS) são
+continuação.
+
+Chunks independentes (WAV, arquivos Ogg completos) que ainda não foram
+acrescentados na finalização são decodificados em paralelo (decode_chunk, um
+por worker do pool de áudio) para arquivos .decoded.wav; o _append apenas
+os concatena em ordem de índice.
+
+Decodificação, downmix, reamostragem e ganho usam AudioBuffer (audio_core):
+nada de audioop, que não existe mais a partir do Python 3.13.
+"""
+
+import json
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from audio_core import AudioBuffer, stream_pcm16_mono
+
+try:
+    import fcntl
+except ImportError:  # Windows: apenas o lock entre threads do processo
+    fcntl = None
+
+SAMPLE_WIDTH = 2  # PCM 16-bit, como nas exportações com pcm_s16le
+CHANNELS = 1
+WAV_HEADER_SIZE = 44
+GAIN_BLOCK_SIZE = 1024 * 1024
+NORMALIZE_HEADROOM_DB = 0.1  # Mesmo headroom padrão de AudioBuffer.normalize()
+CONTAINER_SNIFF_SIZE = 512  # Cabeçalho da primeira página Ogg (até 255 segmentos) e início do payload
+OGG_BOS_FLAG = 0x02  # header_type da página que abre um fluxo lógico
+
+# session_id -> [threading.Lock, usos em andamento]; a entrada sai quando ninguém a usa
+_session_locks = {}
+_session_locks_guard = threading.Lock()
+
+def wav_header(frame_rate, data_size, channels=CHANNELS, sample_width=SAMPLE_WIDTH):
+    """Cabeçalho RIFF/WAVE PCM de 44 bytes"""
+    block_align = channels * sample_width
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, channels, frame_rate, frame_rate * block_align, block_align, sample_width * 8,
+        b'data', data_size
+    )
+
+def chunk_filename(session_id, index):
+    return f"{session_id}_chunk_{index:03d}.tmp"
+
+def decoded_filename(session_id, index):
+    """PCM de um chunk já decodificado (e preparado) fora do lock da sessão"""
+    return f"{session_id}_chunk_{index:03d}.decoded.wav"
+
+def sniff_container(path):
+    """Formato do contêiner de streaming cujo cabeçalho inicia o arquivo, ou None
+
+    Toda página Ogg começa com OggS; só a primeira de um fluxo (flag BOS, com
+    o OpusHead/cabeçalho do codec) inicia um arquivo. Os timeslices seguintes
+    do MediaRecorder do Firefox são continuação e retornam None.
+    """
+    with open(path, 'rb') as f:
+        head = f.read(CONTAINER_SNIFF_SIZE)
+    if head.startswith(b'\x1a\x45\xdf\xa3'):  # EBML (WebM/Matroska)
+        return 'webm'
+    if head.startswith(b'OggS'):
+        if len(head) > 5 and (head[5] & OGG_BOS_FLAG or b'OpusHead' in head):
+            return 'ogg'
+        return None
+    if head[4:8] == b'ftyp':  # MP4 fragmentado (Safari)
+        return 'mp4'
+    return None
+
+def lock_path_for(temp_dir, session_id):
+    return os.path.join(temp_dir, f"{session_id}_assembly.lock")
+
+def _is_current_lock_file(lock_file, lock_path):
+    """O arquivo aberto ainda é o do caminho (não foi removido pela limpeza enquanto esperávamos)"""
+    try:
+        current = os.stat(lock_path)
+    except FileNotFoundError:
+        return False
+    opened = os.fstat(lock_file.fileno())
+    return (opened.st_dev, opened.st_ino) == (current.st_dev, current.st_ino)
+
+@contextmanager
+def session_lock(temp_dir, session_id):
+    """Exclusão mútua por sessão (threads e, onde houver fcntl, processos)"""
+    with _session_locks_guard:
+        entry = _session_locks.setdefault(session_id, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            lock_path = lock_path_for(temp_dir, session_id)
+            while True:
+                with open(lock_path, 'a') as lock_file:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX)
+                        if not _is_current_lock_file(lock_file, lock_path):
+                            continue
+                    yield
+                    return
+    finally:
+        with _session_locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                _session_locks.pop(session_id, None)
+
+def remove_lock_file(temp_dir, session_id):
+    """Apaga o arquivo de lock de uma sessão sem mais nenhum arquivo
+
+    Deve ser chamada dentro de session_lock: quem estava esperando pelo
+    arquivo antigo percebe a troca e volta a travar o caminho atual.
+    """
+    try:
+        os.remove(lock_path_for(temp_dir, session_id))
+    except FileNotFoundError:
+        pass
+    except OSError as e:  # Windows não apaga arquivo aberto
+        print(f"⚠️ Lock da sessão {session_id} mantido: {e}")
+
+class ChunkAssembler:
+    """Estado da montagem incremental de uma sessão de chunks"""
+
+    def __init__(self, temp_dir, session_id, prepare=None):
+        self.temp_dir = temp_dir
+        self.session_id = session_id
+        # Ajustes por trecho aplicados antes de acrescentar (ex.: correção de sample rate/mono)
+        self.prepare = prepare
+        self.state_path = os.path.join(temp_dir, f"{session_id}_assembly.json")
+        self.pcm_path = os.path.join(temp_dir, f"{session_id}_assembly.wav")
+        self.container_path = os.path.join(temp_dir, f"{session_id}_assembly.stream")
+
+    def chunk_path(self, index):
+        return os.path.join(self.temp_dir, chunk_filename(self.session_id, index))
+
+    def decoded_path(self, index):
+        return os.path.join(self.temp_dir, decoded_filename(self.session_id, index))
+
+    def _locked(self):
+        return session_lock(self.temp_dir, self.session_id)
+
+    def _load_state(self):
+        state = {
+            'next_index': 0, 'frame_rate': None, 'data_bytes': 0, 'peak': 0, 'failed': False,
+            # None: ainda não decidido; '': decodificar chunk a chunk; 'webm'/'ogg'/'mp4': concatenar
+            'container': None, 'container_bytes': 0
+        }
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        if state['data_bytes'] and state['container'] is None:
+            state['container'] = ''  # Sessão iniciada antes da concatenação de contêineres
+        return state
+
+    def _save_state(self, state):
+        temp_path = f"{self.state_path}.part"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.state_path)
+
+    # ==================== RECEBIMENTO ====================
+
+    def append_available(self, total_chunks=None):
+        """Acrescenta os chunks contíguos já recebidos; retorna quantos foram acrescentados
+
+        Com total_chunks (finalização), chunks ausentes são pulados, como na
+        montagem em memória.
+        """
+        with self._locked():
+            state = self._load_state()
+            appended = self._append(state, total_chunks)
+            self._save_state(state)
+            return appended
+
+    def _append(self, state, total_chunks=None):
+        appended = 0
+        while not state['failed']:
+            index = state['next_index']
+            if total_chunks is not None and index >= total_chunks:
+                break
+            path = self.chunk_path(index)
+            if not os.path.exists(path):
+                if total_chunks is None:
+                    break  # Aguardando chunk fora de ordem
+                print(f"❌ Chunk {index} não encontrado: {path}")
+                state['next_index'] += 1
+                continue
+
+            container = sniff_container(path)
+            if state['container'] is None:
+                state['container'] = container or ''
+            elif state['container'] and container:
+                # Chunks independentes (cada um com cabeçalho): decodificar um a um desde o início
+                print(f"🔧 Chunk {index} tem cabeçalho próprio; montagem chunk a chunk")
+                self._reset(state)
+                continue
+
+            if state['container']:
+                self._append_container(state, path)
+                state['next_index'] += 1
+                appended += 1
+                continue
+
+            decoded_path = self.decoded_path(index)
+            if os.path.exists(decoded_path):
+                # Decodificado antes, em paralelo (decode_chunk): só acrescentar o PCM
+                segment = AudioBuffer.from_wav(decoded_path)
+                self._append_segment(state, segment, prepared=True)
+                os.remove(decoded_path)
+                state['next_index'] += 1
+                appended += 1
+                continue
+
+            try:
+                segment = AudioBuffer.from_file(path)
+            except Exception as e:
+                # Ex.: chunk de WebM sem cabeçalho; a finalização usará a montagem completa
+                print(f"⚠️ Chunk {index} não decodificável isoladamente: {e}")
+                state['failed'] = True
+                break
+
+            self._append_segment(state, segment)
+            state['next_index'] += 1
+            appended += 1
+        return appended
+
+    def _prepare_segment(self, segment):
+        if self.prepare:
+            segment = self.prepare(segment)
+        return segment.downmix()
+
+    def _append_segment(self, state, segment, prepared=False):
+        if not prepared:
+            segment = self._prepare_segment(segment)
+        if state['frame_rate'] is None:
+            state['frame_rate'] = segment.frame_rate
+        elif segment.frame_rate != state['frame_rate']:
+            segment = segment.resample(state['frame_rate'])
+        pcm = segment.pcm16()
+        self._write_pcm(state, pcm.tobytes())
+        if pcm.size:
+            state['peak'] = max(state['peak'], int(np.abs(pcm.astype(np.int32)).max()))
+
+    # ==================== DECODIFICAÇÃO PARALELA ====================
+
+    def pending_chunks(self, total_chunks):
+        """Índices ainda não acrescentados que serão decodificados um a um
+
+        São os candidatos a decode_chunk em paralelo antes da finalização. Fica
+        vazio quando os chunks são timeslices de um mesmo contêiner (decodificados
+        juntos) ou quando a sessão já caiu para a montagem em memória.
+        """
+        with self._locked():
+            state = self._load_state()
+        if state['failed'] or state['container']:
+            return []
+        indexes = [
+            index for index in range(state['next_index'], total_chunks)
+            if os.path.exists(self.chunk_path(index)) and not os.path.exists(self.decoded_path(index))
+        ]
+        if state['container'] is None and indexes:
+            # Modo ainda não decidido: cabeçalho só no primeiro chunk indica contêiner concatenado
+            containers = [sniff_container(self.chunk_path(index)) for index in indexes]
+            if containers[0] and not all(containers):
+                return []
+        return indexes
+
+    def decode_chunk(self, index):
+        """Decodifica e prepara um chunk para decoded_path, sem o lock da sessão
+
+        Pode rodar em paralelo para chunks diferentes; _append usa o resultado
+        quando chegar a vez do índice. Retorna o sample rate ou None se o chunk
+        não for decodificável isoladamente (o _append trata o erro).
+        """
+        try:
+            segment = self._prepare_segment(AudioBuffer.from_file(self.chunk_path(index)))
+        except Exception as e:
+            print(f"⚠️ Chunk {index} não decodificável isoladamente: {e}")
+            return None
+        temp_path = f"{self.decoded_path(index)}.part"
+        segment.write_wav(temp_path)
+        os.replace(temp_path, self.decoded_path(index))
+        return segment.frame_rate
+
+    def _append_container(self, state, path):
+        """Acrescenta os bytes do chunk ao arquivo do contêiner, sem decodificar"""
+        with open(self.container_path, 'ab') as target:
+            # Descarta bytes de uma escrita interrompida antes do estado ser salvo
+            target.truncate(state['container_bytes'])
+            with open(path, 'rb') as source:
+                while True:
+                    block = source.read(GAIN_BLOCK_SIZE)
+                    if not block:
+                        break
+                    target.write(block)
+                    state['container_bytes'] += len(block)
+
+    def _decode_container(self, state):
+        """Decodifica o contêiner concatenado em fluxo direto para o PCM
+
+        O ffmpeg entrega PCM 16-bit mono em blocos de GAIN_BLOCK_SIZE, gravados
+        conforme chegam com o pico atualizado por bloco: a memória não depende
+        da duração da gravação.
+        """
+        if not state['container'] or not state['container_bytes'] or state['data_bytes']:
+            return
+        try:
+            frame_rate, blocks = stream_pcm16_mono(
+                self.container_path, format=state['container'], block_size=GAIN_BLOCK_SIZE
+            )
+            # Só o rótulo do sample rate muda na preparação (o ffmpeg já entrega mono)
+            state['frame_rate'] = self._prepare_segment(
+                AudioBuffer(np.zeros((0, 1), dtype=np.float32), frame_rate)
+            ).frame_rate
+            for block in blocks:
+                self._write_pcm(state, block)
+                samples = np.frombuffer(block, dtype='<i2')
+                if samples.size:
+                    state['peak'] = max(state['peak'], int(np.abs(samples.astype(np.int32)).max()))
+        except Exception as e:
+            print(f"⚠️ Erro ao decodificar o contêiner {state['container']} concatenado: {e}")
+            state['failed'] = True
+            return
+        print(f"🔗 {state['next_index']} chunks decodificados em uma passada ({state['container']})")
+
+    def _reset(self, state):
+        for path in (self.pcm_path, self.container_path):
+            if os.path.exists(path):
+                os.remove(path)
+        state.update({
+            'next_index': 0, 'frame_rate': None, 'data_bytes': 0, 'peak': 0,
+            'container': '', 'container_bytes': 0
+        })
+
+    def _write_pcm(self, state, data):
+        if not os.path.exists(self.pcm_path):
+            with open(self.pcm_path, 'wb') as f:
+                f.write(wav_header(state['frame_rate'], 0))
+        with open(self.pcm_path, 'r+b') as f:
+            # Descarta bytes de uma escrita interrompida antes do estado ser salvo
+            f.truncate(WAV_HEADER_SIZE + state['data_bytes'])
+            f.seek(0, os.SEEK_END)
+            f.write(data)
+        state['data_bytes'] += len(data)
+
+    # ==================== FINALIZAÇÃO ====================
+
+    def finalize(self, total_chunks, target_path):
+        """Completa a montagem e move o WAV para target_path
+
+        Retorna {'frame_rate', 'frames', 'duration_ms', 'size'} ou None quando a
+        montagem incremental não é utilizável (chunk não decodificável ou nenhum áudio).
+        """
+        with self._locked():
+            state = self._load_state()
+            self._append(state, total_chunks)
+            self._decode_container(state)
+            self._save_state(state)
+            if state['failed'] or not state['data_bytes']:
+                return None
+
+            with open(self.pcm_path, 'r+b') as f:
+                f.truncate(WAV_HEADER_SIZE + state['data_bytes'])
+                f.seek(0)
+                f.write(wav_header(state['frame_rate'], state['data_bytes']))
+            self._normalize(state['peak'])
+            os.replace(self.pcm_path, target_path)
+
+        frames = state['data_bytes'] // (SAMPLE_WIDTH * CHANNELS)
+        return {
+            'frame_rate': state['frame_rate'],
+            'frames': frames,
+            'duration_ms': int(frames * 1000 / state['frame_rate']),
+            'size': WAV_HEADER_SIZE + state['data_bytes']
+        }
+
+    def _normalize(self, peak):
+        """Ganho de normalização de pico aplicado no próprio arquivo, bloco a bloco"""
+        if not peak:
+            return
+        max_amplitude = 1 << (8 * SAMPLE_WIDTH - 1)
+        factor = (max_amplitude / peak) * (10 ** (-NORMALIZE_HEADROOM_DB / 20))
+        if abs(factor - 1.0) < 0.001:
+            return
+        with open(self.pcm_path, 'r+b') as f:
+            offset = WAV_HEADER_SIZE
+            while True:
+                f.seek(offset)
+                block = f.read(GAIN_BLOCK_SIZE)
+                if not block:
+                    break
+                block = block[:len(block) - len(block) % SAMPLE_WIDTH]
+                f.seek(offset)
+                samples = np.frombuffer(block, dtype='<i2').astype(np.float32) * np.float32(factor)
+                f.write(np.clip(np.rint(samples), -32768, 32767).astype('<i2').tobytes())
+                offset += len(block)
+
+    def discard(self):
+        """Remove os arquivos de estado da montagem (os chunks são limpos à parte)
+
+        O arquivo de lock fica: outro processo pode estar esperando por ele.
+        Quem o remove é o faxineiro, quando a sessão não tem mais arquivos.
+        """
+        for path in (self.state_path, self.pcm_path, self.container_path, f"{self.state_path}.part"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+class ChunkManifest:
+    """Manifesto de um envio em chunks: dono, checksums e total anunciado
+
+    Um índice já registrado é imutável: reenviar o mesmo conteúdo é aceito
+    sem regravar nada; conteúdo diferente é um conflito. A montagem só é
+    liberada (uma única vez) quando o total é conhecido e não há lacunas.
+    O manifesto continua em disco depois da montagem, para que reenvios do
+    último chunk (resposta perdida) devolvam o mesmo arquivo final.
+    """
+
+    def __init__(self, temp_dir, session_id):
+        self.temp_dir = temp_dir
+        self.session_id = session_id
+        self.path = os.path.join(temp_dir, f"{session_id}_manifest.json")
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        state = {
+            'session_id': self.session_id, 'owner': None, 'created': time.time(),
+            'total_chunks': None, 'chunks': {}, 'assembling': False, 'final_filename': None
+        }
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        return state
+
+    def _save(self, state):
+        state['updated'] = time.time()
+        temp_path = f"{self.path}.part"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.path)
+
+    @staticmethod
+    def received(state):
+        return sorted(int(index) for index in state['chunks'])
+
+    @staticmethod
+    def missing(state):
+        """Índices ausentes até o total anunciado (ou até o maior índice recebido)"""
+        received = set(ChunkManifest.received(state))
+        if state['total_chunks'] is not None:
+            end = state['total_chunks']
+        else:
+            end = max(received) + 1 if received else 0
+        return [index for index in range(end) if index not in received]
+
+    def accept(self, index, incoming_path, sha256, size, owner, is_last=False):
+        """Registra um chunk gravado em incoming_path; retorna (status, manifesto)
+
+        status: 'stored', 'duplicate', 'conflict', 'forbidden' ou 'ready'
+        ('ready': chunk aceito e este chamador deve montar a gravação).
+        """
+        target_path = os.path.join(self.temp_dir, chunk_filename(self.session_id, index))
+        with session_lock(self.temp_dir, self.session_id):
+            state = self.load()
+            if state['owner'] is None:
+                state['owner'] = owner
+            elif state['owner'] != owner:
+                os.remove(incoming_path)
+                return 'forbidden', state
+
+            known = state['chunks'].get(str(index))
+            if state['final_filename'] or (known and known['sha256'] == sha256):
+                os.remove(incoming_path)
+                status = 'duplicate'
+            elif known:
+                os.remove(incoming_path)
+                return 'conflict', state
+            elif state['total_chunks'] is not None and index >= state['total_chunks']:
+                os.remove(incoming_path)
+                return 'conflict', state
+            else:
+                os.replace(incoming_path, target_path)
+                state['chunks'][str(index)] = {'sha256': sha256, 'size': size}
+                status = 'stored'
+
+            if is_last and state['total_chunks'] is None:
+                state['total_chunks'] = index + 1
+            if (state['total_chunks'] is not None and not state['assembling']
+                    and not state['final_filename'] and not self.missing(state)):
+                state['assembling'] = True
+                status = 'ready'
+            self._save(state)
+            return status, state
+
+    def complete(self, final_filename):
+        with session_lock(self.temp_dir, self.session_id):
+            state = self.load()
+            state.update({'assembling': False, 'final_filename': final_filename})
+            self._save(state)
+
+    def release(self):
+        """Libera a montagem após uma falha, para um novo envio tentar de novo"""
+        with session_lock(self.temp_dir, self.session_id):
+            state = self.load()
+            state['assembling'] = False
+            self._save(state)
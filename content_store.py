@@ -0,0 +1,205 @@
+"""
+Armazenamento de áudio endereçado por conteúdo
+Cada gravação salva é registrada pelo SHA-256 do seu conteúdo. No disco local
+o arquivo visível ao usuário vira um hard link para o blob em
+recordings/.blobs/, então cópias idênticas (reenvios após timeout, retries do
+app móvel) não ocupam espaço extra. O hash também permite reaproveitar
+artefatos derivados (ex.: transcrição) entre gravações de mesmo conteúdo.
+
+O PCM normalizado (mono, 16-bit, volume normalizado) também é guardado por
+hash: decodificado uma única vez e reaproveitado por transcrição e
+otimização. Gravações salvas já normalizadas (upload processado, montagem
+de chunks) são o próprio PCM (in_place); as demais ganham uma cópia em
+recordings/.pcm/ na primeira vez em que alguma etapa precisa do áudio.
+
+Blobs e PCMs sem nenhuma gravação apontando para eles são removidos com:
+
+    python content_store.py gc
+"""
+
+import hashlib
+import os
+import threading
+
+from catalog_service import get_catalog
+from storage_layout import recordings_storage
+
+HASH_BUFFER_SIZE = 1024 * 1024
+BLOBS_DIR = '.blobs'
+PCM_DIR = '.pcm'
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+def hash_file(path):
+    """SHA-256 do arquivo lido em blocos (não carrega o áudio inteiro na memória)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BUFFER_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ContentStore:
+    """Referências de gravações para blobs de conteúdo"""
+
+    def __init__(self, storage, catalog):
+        self.storage = storage
+        self.catalog = catalog
+        self.blobs_dir = os.path.join(storage.root, BLOBS_DIR)
+        self.pcm_dir = os.path.join(storage.root, PCM_DIR)
+
+    def _connection(self):
+        return self.catalog._connection()
+
+    def blob_path(self, content_hash):
+        return os.path.join(self.blobs_dir, content_hash[:2], content_hash)
+
+    def find_upload(self, owner, upload_hash):
+        """Gravação já criada pelo mesmo usuário a partir dos mesmos bytes enviados"""
+        rows = self._connection().execute(
+            'SELECT filename FROM content_refs WHERE owner = ? AND upload_hash = ? ORDER BY created_at',
+            (owner, upload_hash)
+        ).fetchall()
+        for row in rows:
+            if self.storage.exists(row['filename']):
+                return row['filename']
+            self.catalog.forget_content(row['filename'])
+        return None
+
+    def intern(self, filename, owner=None, upload_hash=None, content_hash=None):
+        """Registra a gravação pelo hash do conteúdo e compartilha o blob com cópias idênticas"""
+        try:
+            path = self.storage.locate(filename)
+            if content_hash is None:
+                content_hash = hash_file(path)
+            if self.storage.backend.is_local:
+                self._link_blob(path, content_hash)
+            self.catalog.record_content(filename, content_hash, owner, upload_hash)
+            return content_hash
+        except Exception as e:
+            print(f"⚠️ Erro ao registrar conteúdo de {filename}: {e}")
+            return None
+
+    def _link_blob(self, path, content_hash):
+        blob = self.blob_path(content_hash)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        try:
+            if not os.path.exists(blob):
+                os.link(path, blob)
+                return
+            if os.path.samefile(blob, path):
+                return
+            # Conteúdo já armazenado: substituir a cópia por um link para o blob existente
+            temp_path = os.path.join(os.path.dirname(path), f'.{os.path.basename(path)}.dedup')
+            os.link(blob, temp_path)
+            os.replace(temp_path, path)
+            print(f"♻️ Conteúdo deduplicado: {os.path.basename(path)} → {content_hash[:12]}")
+        except FileExistsError:
+            pass  # Outro processo criou o blob ao mesmo tempo; a próxima gravação compartilha
+        except OSError as e:
+            # Sistemas de arquivos sem hard link: mantém a cópia, só o índice por hash vale
+            print(f"⚠️ Hard link indisponível para {os.path.basename(path)}: {e}")
+
+    def content_hash(self, filename, owner=None):
+        """Hash do conteúdo da gravação (calculado e registrado na primeira consulta)"""
+        row = self._connection().execute(
+            'SELECT content_hash FROM content_refs WHERE filename = ?', (filename,)
+        ).fetchone()
+        if row:
+            return row['content_hash']
+        if not self.storage.exists(filename):
+            return None
+        return self.intern(filename, owner)
+
+    # ==================== PCM NORMALIZADO ====================
+
+    def pcm_path(self, content_hash):
+        return os.path.join(self.pcm_dir, content_hash[:2], f"{content_hash}.wav")
+
+    def record_pcm(self, content_hash, params, in_place=False):
+        """Registra os parâmetros do PCM normalizado do conteúdo (in_place: a gravação já é o PCM)"""
+        try:
+            self.catalog.record_pcm(content_hash, params, in_place)
+        except Exception as e:
+            print(f"⚠️ Erro ao registrar PCM de {content_hash[:12]}: {e}")
+
+    def cached_pcm(self, filename):
+        """PCM normalizado já gerado para o conteúdo da gravação: (caminho, parâmetros) ou None"""
+        content_hash = self.content_hash(filename)
+        if content_hash is None:
+            return None
+        params = self.catalog.get_pcm(content_hash)
+        if not params:
+            return None
+        path = self.storage.locate(filename) if params['in_place'] else self.pcm_path(content_hash)
+        if not os.path.exists(path):
+            self.catalog.forget_pcm(content_hash)
+            return None
+        return path, params
+
+    def find_derived(self, filename, derived_storage, suffix):
+        """Artefato derivado (ex.: '_transcricao.txt') já gerado para outra gravação
+        do mesmo dono com conteúdo idêntico; retorna o nome do arquivo ou None"""
+        if self.content_hash(filename) is None:
+            return None
+        rows = self._connection().execute(
+            '''SELECT other.filename FROM content_refs AS ref
+               JOIN content_refs AS other
+                 ON other.content_hash = ref.content_hash AND other.owner IS ref.owner
+                AND other.filename != ref.filename
+               WHERE ref.filename = ?''',
+            (filename,)
+        ).fetchall()
+        for row in rows:
+            candidate = os.path.splitext(row['filename'])[0] + suffix
+            if derived_storage.exists(candidate):
+                return candidate
+        return None
+
+    def collect_garbage(self):
+        """Remove blobs sem referências (nenhum hard link além do próprio blob) e PCMs órfãos"""
+        removed = 0
+        freed = 0
+        for entry in self.catalog.orphan_pcm():
+            path = self.pcm_path(entry['content_hash'])
+            try:
+                if not entry['in_place']:
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+            self.catalog.forget_pcm(entry['content_hash'])
+        for current_dir, _, filenames in os.walk(self.blobs_dir):
+            for name in filenames:
+                blob = os.path.join(current_dir, name)
+                try:
+                    stats = os.stat(blob)
+                    if stats.st_nlink == 1:
+                        os.remove(blob)
+                        removed += 1
+                        freed += stats.st_size
+                except FileNotFoundError:
+                    continue
+        return {'removed': removed, 'freed_bytes': freed}
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_content_store():
+    """Instância compartilhada do armazenamento por conteúdo das gravações"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ContentStore(recordings_storage, get_catalog())
+    return _store
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) != 2 or sys.argv[1] != 'gc':
+        print("Uso: python content_store.py gc")
+        sys.exit(1)
+    stats = get_content_store().collect_garbage()
+    print(f"🧹 Blobs e PCMs removidos: {stats['removed']} ({stats['freed_bytes']} bytes liberados)")
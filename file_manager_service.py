@@ -6,14 +6,20 @@ Separa as funcionalidades de gerenciamento de arquivos do app.py
 import os
 import re
 from datetime import datetime
-from pydub import AudioSegment
+from audio_tasks import run_audio_task, concatenate_wavs
+from catalog_service import RecordingCatalog, transcription_entry
+from storage_layout import get_layout
+from content_store import get_content_store
 
 class FileManagerService:
     """Serviço para gerenciamento de arquivos de áudio e transcrições"""
     
-    def __init__(self, recordings_dir, transcriptions_dir):
+    def __init__(self, recordings_dir, transcriptions_dir, catalog=None):
         self.recordings_dir = recordings_dir
         self.transcriptions_dir = transcriptions_dir
+        self.recordings = get_layout(recordings_dir)
+        self.transcriptions = get_layout(transcriptions_dir)
+        self.catalog = catalog or RecordingCatalog(recordings_dir, transcriptions_dir)
     
     def sanitize_filename(self, filename):
         """Sanitiza nome de arquivo removendo caracteres inválidos"""
@@ -45,21 +51,17 @@ class FileManagerService:
                 timestamp = parts[-1] if len(parts) > 1 else datetime.now().strftime('%Y%m%d_%H%M%S')
                 new_filename = f'{safe_new_name}_{timestamp}_{user_id}.wav'
             
-            old_path = os.path.join(self.recordings_dir, old_filename)
-            new_path = os.path.join(self.recordings_dir, new_filename)
-            
-            if os.path.exists(old_path):
-                os.rename(old_path, new_path)
+            if self.recordings.exists(old_filename):
+                self.recordings.rename(old_filename, new_filename)
                 
                 # Renomear transcrição se existir
                 old_transcription = os.path.splitext(old_filename)[0] + '_transcricao.txt'
                 new_transcription = os.path.splitext(new_filename)[0] + '_transcricao.txt'
                 
-                old_transcription_path = os.path.join(self.transcriptions_dir, old_transcription)
-                new_transcription_path = os.path.join(self.transcriptions_dir, new_transcription)
+                if self.transcriptions.exists(old_transcription):
+                    self.transcriptions.rename(old_transcription, new_transcription)
                 
-                if os.path.exists(old_transcription_path):
-                    os.rename(old_transcription_path, new_transcription_path)
+                self.catalog.rename_recording(old_filename, new_filename)
                 
                 return {
                     'success': True,
@@ -81,24 +83,22 @@ class FileManagerService:
     def delete_recording(self, filename, user_id):
         """Deleta um arquivo de gravação e arquivos associados"""
         try:
-            filepath = os.path.join(self.recordings_dir, filename)
-            
-            if os.path.exists(filepath):
-                os.remove(filepath)
+            if self.recordings.exists(filename):
+                self.recordings.remove(filename)
                 
                 # Remover transcrição se existir
                 transcription_file = os.path.splitext(filename)[0] + '_transcricao.txt'
-                transcription_path = os.path.join(self.transcriptions_dir, transcription_file)
                 
-                if os.path.exists(transcription_path):
-                    os.remove(transcription_path)
+                if self.transcriptions.exists(transcription_file):
+                    self.transcriptions.remove(transcription_file)
                 
                 # Remover resumo se existir
                 summary_file = os.path.splitext(filename)[0] + '_resumo.txt'
-                summary_path = os.path.join(self.transcriptions_dir, summary_file)
                 
-                if os.path.exists(summary_path):
-                    os.remove(summary_path)
+                if self.transcriptions.exists(summary_file):
+                    self.transcriptions.remove(summary_file)
+                
+                self.catalog.remove_recording(filename)
                 
                 return {
                     'success': True,
@@ -120,47 +120,17 @@ class FileManagerService:
         """Lista todos os arquivos de gravação do usuário"""
         try:
             recordings = []
-            sessions = {}
+            safe_user_id = user_id.replace('@', '_').replace('.', '_')
             
-            # Listar arquivos de gravação
-            for filename in os.listdir(self.recordings_dir):
-                if filename.endswith('.wav') and (user_id in filename or user_id.replace('@', '_').replace('.', '_') in filename):
-                    filepath = os.path.join(self.recordings_dir, filename)
-                    file_size = os.path.getsize(filepath)
-                    
-                    # Verificar se existe transcrição
-                    transcription_file = os.path.splitext(filename)[0] + '_transcricao.txt'
-                    transcription_path = os.path.join(self.transcriptions_dir, transcription_file)
-                    has_transcription = os.path.exists(transcription_path)
-                    
-                    if '_sessao_' in filename:
-                        # É um segmento de sessão
-                        parts = filename.split('_')
-                        session_id = parts[2]  # sessao_ID
-                        
-                        if session_id not in sessions:
-                            sessions[session_id] = {
-                                'id': session_id,
-                                'segments': [],
-                                'total_size': 0
-                            }
-                        
-                        sessions[session_id]['segments'].append({
-                            'filename': filename,
-                            'size': file_size,
-                            'has_transcription': has_transcription
-                        })
-                        sessions[session_id]['total_size'] += file_size
-                    else:
-                        # Gravação individual
-                        recordings.append({
-                            'filename': filename,
-                            'size': file_size,
-                            'has_transcription': has_transcription
-                        })
+            # Consultar catálogo (índice por dono) em vez de varrer o diretório
+            rows, sessions_list = self.catalog.list_grouped([user_id, safe_user_id])
             
-            # Converter sessões para lista
-            sessions_list = list(sessions.values())
+            for row in rows:
+                recordings.append({
+                    'filename': row['filename'],
+                    'size': row['size'],
+                    'has_transcription': bool(row['has_transcription'])
+                })
             
             return {
                 'success': True,
@@ -179,45 +149,13 @@ class FileManagerService:
     def get_transcriptions_list(self, user_id):
         """Lista todas as transcrições do usuário"""
         try:
-            transcriptions = []
+            safe_user_id = user_id.replace('@', '_').replace('.', '_')
             
-            # Listar arquivos de transcrição
-            for filename in os.listdir(self.transcriptions_dir):
-                if filename.endswith('_transcricao.txt') and (user_id in filename or user_id.replace('@', '_').replace('.', '_') in filename):
-                    filepath = os.path.join(self.transcriptions_dir, filename)
-                    file_size = os.path.getsize(filepath)
-                    
-                    # Obter data de modificação
-                    modified_time = os.path.getmtime(filepath)
-                    modified_date = datetime.fromtimestamp(modified_time).strftime('%d/%m/%Y %H:%M')
-                    
-                    # Ler primeiras linhas para preview
-                    try:
-                        with open(filepath, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                            preview = content[:200] + '...' if len(content) > 200 else content
-                    except:
-                        preview = "Erro ao ler arquivo"
-                    
-                    # Nome original do arquivo de áudio
-                    audio_filename = filename.replace('_transcricao.txt', '.wav')
-                    
-                    # Verificar se existe resumo
-                    summary_filename = filename.replace('_transcricao.txt', '_resumo.txt')
-                    summary_path = os.path.join(self.transcriptions_dir, summary_filename)
-                    has_summary = os.path.exists(summary_path)
-                    
-                    transcriptions.append({
-                        'filename': filename,
-                        'audio_filename': audio_filename,
-                        'size': file_size,
-                        'modified_date': modified_date,
-                        'preview': preview,
-                        'has_summary': has_summary
-                    })
-            
-            # Ordenar por data de modificação (mais recente primeiro)
-            transcriptions.sort(key=lambda x: x['modified_date'], reverse=True)
+            # Preview e resumo vêm pré-calculados do catálogo (mais recentes primeiro)
+            transcriptions = [
+                transcription_entry(row)
+                for row in self.catalog.list_transcriptions([user_id, safe_user_id])
+            ]
             
             return {
                 'success': True,
@@ -236,8 +174,9 @@ class FileManagerService:
         try:
             # Buscar todos os segmentos da sessão
             segments = []
-            for filename in os.listdir(self.recordings_dir):
-                if f'_sessao_{session_id}_' in filename and (user_id in filename or user_id.replace('@', '_').replace('.', '_') in filename):
+            safe_user_id = user_id.replace('@', '_').replace('.', '_')
+            for filename in self.recordings.iter_files(owners=[user_id, safe_user_id]):
+                if f'_sessao_{session_id}_' in filename and (user_id in filename or safe_user_id in filename):
                     segments.append(filename)
             
             if not segments:
@@ -249,25 +188,18 @@ class FileManagerService:
             # Ordenar segmentos por timestamp
             segments.sort()
             
-            # Combinar áudios usando pydub
-            combined_audio = AudioSegment.empty()
-            
-            for segment_filename in segments:
-                segment_path = os.path.join(self.recordings_dir, segment_filename)
-                segment_audio = AudioSegment.from_wav(segment_path)
-                combined_audio += segment_audio
-            
             # Salvar áudio combinado
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             final_filename = f'Sessao_{session_id}_{timestamp}_{user_id}.wav'
-            final_path = os.path.join(self.recordings_dir, final_filename)
+            final_path = self.recordings.write_path(final_filename)
             
+            # Combinar áudios no pool de processos
             # CORREÇÃO: Exportar com configurações específicas para evitar problemas de velocidade
-            combined_audio.export(final_path, format="wav", parameters=[
-                "-acodec", "pcm_s16le",  # PCM 16-bit
-                "-ar", "44100",  # Sample rate padrão
-                "-ac", "1"  # Mono
-            ])
+            segment_paths = [self.recordings.locate(segment_filename) for segment_filename in segments]
+            run_audio_task(concatenate_wavs, segment_paths, final_path, 44100)
+            get_content_store().intern(final_filename, owner=user_id)
+            self.recordings.commit(final_filename)
+            self.catalog.index_recording(final_filename, owner=user_id)
             
             return {
                 'success': True,
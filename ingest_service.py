@@ -0,0 +1,152 @@
+"""
+Ingestão assíncrona de uploads
+No modo assíncrono a rota apenas grava o upload original em disco (com fsync),
+registra um job na tabela ingest_jobs do catálogo e responde 202 com o id do
+job; a decodificação, a normalização e a exportação do WAV acontecem em um
+pool de threads em segundo plano. O andamento é consultado em
+GET /api/ingest/<job_id>.
+
+Os jobs sobrevivem a reinícios: na inicialização (e periodicamente) os jobs
+pendentes são reagendados. Com vários processos, cada job é reivindicado por
+um único processo; um job 'processing' sem atualização há mais de
+PROCESSING_LEASE_SECONDS é considerado abandonado e pode ser retomado.
+
+Os tipos de job são registrados por quem sabe processá-los
+(register_handler), evitando dependência circular com as rotas.
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from catalog_service import get_catalog
+from services_config import INGEST_WORKERS, INGEST_JOB_RETENTION_DAYS
+
+INGEST_SUBDIR = os.path.join('temp_uploads', 'ingest')
+PROCESSING_LEASE_SECONDS = 600
+RESUME_INTERVAL = 300
+
+_handlers = {}
+
+def register_handler(kind, handler):
+    """Associa um tipo de job à função que o processa: handler(job) -> dict com o resultado"""
+    _handlers[kind] = handler
+
+def _fsync_path(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class IngestQueue:
+    """Fila durável de uploads aguardando processamento"""
+
+    def __init__(self, catalog, ingest_dir, workers=INGEST_WORKERS):
+        self.catalog = catalog
+        self.ingest_dir = ingest_dir
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ingest')
+        self._scheduled = set()
+        self._lock = threading.Lock()
+        os.makedirs(ingest_dir, exist_ok=True)
+
+    def submit(self, kind, owner, spool_path, filename, upload_hash=None, details=None):
+        """Guarda o upload de forma durável, registra o job e o agenda; retorna o job"""
+        job_id = uuid.uuid4().hex
+        raw_path = os.path.join(self.ingest_dir, f"{job_id}.upload")
+        os.replace(spool_path, raw_path)
+        _fsync_path(raw_path)
+        if hasattr(os, 'O_DIRECTORY'):
+            _fsync_path(self.ingest_dir)
+
+        self.catalog.create_ingest_job(job_id, owner, kind, filename, raw_path, upload_hash, details)
+        print(f"📥 Job de ingestão {job_id} registrado: {filename}")
+        self._schedule(job_id)
+        return self.catalog.get_ingest_job(job_id)
+
+    def _schedule(self, job_id):
+        with self._lock:
+            if job_id in self._scheduled:
+                return
+            self._scheduled.add(job_id)
+        self._pool.submit(self._run, job_id)
+
+    def _run(self, job_id):
+        try:
+            if not self.catalog.claim_ingest_job(job_id, time.time() - PROCESSING_LEASE_SECONDS):
+                return  # Concluído ou em processamento em outro processo
+            job = self.catalog.get_ingest_job(job_id)
+            handler = _handlers.get(job['kind'])
+            if handler is None:
+                self.catalog.update_ingest_job(job_id, 'failed', error=f"Tipo de job desconhecido: {job['kind']}")
+                return
+
+            started = time.time()
+            print(f"⚙️ Processando job {job_id}: {job['filename']}")
+            try:
+                result = handler(job)
+            except Exception as e:
+                print(f"❌ Job de ingestão {job_id} falhou: {e}")
+                self.catalog.update_ingest_job(job_id, 'failed', error=str(e))
+                return
+
+            self.catalog.update_ingest_job(job_id, 'done', result=result)
+            if os.path.exists(job['raw_path']):
+                os.remove(job['raw_path'])
+            print(f"✅ Job {job_id} concluído em {time.time() - started:.1f}s")
+        except Exception as e:
+            print(f"⚠️ Erro no job de ingestão {job_id}: {e}")
+        finally:
+            with self._lock:
+                self._scheduled.discard(job_id)
+
+    def resume(self):
+        """Reagenda jobs pendentes (ex.: após reinício) e apaga o histórico antigo"""
+        for raw_path in self.catalog.prune_ingest_jobs(time.time() - INGEST_JOB_RETENTION_DAYS * 86400):
+            try:
+                os.remove(raw_path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"⚠️ Não foi possível remover upload de job antigo {raw_path}: {e}")
+        jobs = self.catalog.pending_ingest_jobs()
+        for job in jobs:
+            self._schedule(job['job_id'])
+        return len(jobs)
+
+_queue = None
+_queue_lock = threading.Lock()
+_resume_thread = None
+
+def get_ingest_queue():
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                from utils import RECORDINGS_DIR
+                _queue = IngestQueue(get_catalog(), os.path.join(RECORDINGS_DIR, INGEST_SUBDIR))
+    return _queue
+
+def start_ingest_workers():
+    """Retoma jobs pendentes e verifica periodicamente jobs abandonados (uma vez por processo)"""
+    global _resume_thread
+    if _resume_thread is not None:
+        return _resume_thread
+
+    queue = get_ingest_queue()
+
+    def run():
+        while True:
+            try:
+                pending = queue.resume()
+                if pending:
+                    print(f"📥 {pending} jobs de ingestão pendentes reagendados")
+            except Exception as e:
+                print(f"⚠️ Erro ao retomar jobs de ingestão: {e}")
+            time.sleep(RESUME_INTERVAL)
+
+    _resume_thread = threading.Thread(target=run, name='ingest-resume', daemon=True)
+    _resume_thread.start()
+    return _resume_thread
@@ -0,0 +1,362 @@
+"""
+Arquivamento de artefatos pequenos em pacotes
+Cada gravação gera vários textos pequenos (_transcricao.txt, _resumo.txt,
+cópias editadas do resumo, _metadata.json das sessões). Depois de alguns
+anos isso vira centenas de milhares de inodes e backups lentos.
+
+O compactador junta os artefatos mais antigos que PACK_MIN_AGE_DAYS em
+pacotes append-only (<raiz>/.packs/pack-NNNNNN.pack), com um índice SQLite
+(nome → pacote, offset, tamanho). O StorageLayout consulta o índice quando o
+arquivo avulso não existe, então as rotas de download/visualização continuam
+funcionando sem mudanças. Uma escrita nova do mesmo nome volta a ser um
+arquivo avulso e substitui a versão arquivada.
+
+    python pack_archive.py compact [--min-age-days N] [--dry-run]
+    python pack_archive.py status
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from services_config import (
+    PACK_ARCHIVE_ENABLED, PACK_MIN_AGE_DAYS, PACK_MAX_FILE_SIZE, PACK_MAX_BYTES, PACK_COMPACT_INTERVAL
+)
+from utils import RECORDINGS_DIR, TRANSCRIPTIONS_DIR, owner_from_filename
+
+PACKS_DIR = '.packs'
+INDEX_FILENAME = 'index.sqlite3'
+CACHE_DIR = 'cache'
+CACHE_TTL = 3600  # Cópias extraídas para leitura são descartadas após 1 hora
+COMPACT_BATCH_SIZE = 500
+
+# Artefatos de texto elegíveis para arquivamento (áudio nunca é empacotado)
+PACKABLE_SUFFIXES = ('.txt', '_metadata.json')
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS packed_files (
+    filename TEXT PRIMARY KEY,
+    owner TEXT,
+    pack TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    crc32 INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    ctime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_packed_files_owner ON packed_files(owner, filename);
+"""
+
+class PackArchive:
+    """Pacotes append-only e índice dos artefatos arquivados de um diretório raiz"""
+
+    def __init__(self, root):
+        self.root = root
+        self.packs_dir = os.path.join(root, PACKS_DIR)
+        self.index_path = os.path.join(self.packs_dir, INDEX_FILENAME)
+        self.cache_dir = os.path.join(self.packs_dir, CACHE_DIR)
+        self._local = threading.local()
+
+    def _connection(self, create=False):
+        """Conexão por thread com o índice (None enquanto nada foi arquivado)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+        if not create and not os.path.exists(self.index_path):
+            return None
+        os.makedirs(self.packs_dir, exist_ok=True)
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(INDEX_SCHEMA)
+        self._local.conn = conn
+        return conn
+
+    # ==================== LEITURA ====================
+
+    def entry(self, filename):
+        conn = self._connection()
+        if conn is None:
+            return None
+        return conn.execute('SELECT * FROM packed_files WHERE filename = ?', (filename,)).fetchone()
+
+    def contains(self, filename):
+        return self.entry(filename) is not None
+
+    def stat(self, filename):
+        entry = self.entry(filename)
+        if entry is None:
+            return None
+        return {'size': entry['length'], 'mtime': entry['mtime'], 'ctime': entry['ctime']}
+
+    def read(self, filename, length=None):
+        """Conteúdo arquivado (ou só os primeiros bytes); None se não estiver em pacote"""
+        entry = self.entry(filename)
+        if entry is None:
+            return None
+        return self._read_entry(entry, length)
+
+    def _read_entry(self, entry, length=None):
+        with open(os.path.join(self.packs_dir, entry['pack']), 'rb') as f:
+            f.seek(entry['offset'])
+            if length is not None:
+                return f.read(min(length, entry['length']))
+            data = f.read(entry['length'])
+        if zlib.crc32(data) != entry['crc32']:
+            raise IOError(f"Conteúdo corrompido no pacote {entry['pack']}: {entry['filename']}")
+        return data
+
+    def extract(self, filename):
+        """Caminho de uma cópia de leitura do arquivo arquivado (None se não estiver em pacote)
+
+        A cópia fica em .packs/cache/ (fora das varreduras do layout) e é
+        recriada quando não corresponde mais à entrada do índice.
+        """
+        entry = self.entry(filename)
+        if entry is None:
+            return None
+        path = os.path.join(self.cache_dir, filename)
+        try:
+            stats = os.stat(path)
+            if stats.st_size == entry['length'] and abs(stats.st_mtime - entry['mtime']) < 0.001:
+                return path
+        except FileNotFoundError:
+            pass
+
+        data = self._read_entry(entry)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.utime(temp_path, (entry['mtime'], entry['mtime']))
+        os.replace(temp_path, path)
+        return path
+
+    def names(self, owners=None):
+        conn = self._connection()
+        if conn is None:
+            return
+        if owners is None:
+            rows = conn.execute('SELECT filename FROM packed_files').fetchall()
+        else:
+            owners = [owner for owner in dict.fromkeys(owners) if owner]
+            placeholders = ', '.join('?' for _ in owners)
+            rows = conn.execute(
+                f'SELECT filename FROM packed_files WHERE owner IN ({placeholders})', owners
+            ).fetchall() if owners else []
+        for row in rows:
+            yield row['filename']
+
+    # ==================== ALTERAÇÕES ====================
+
+    def forget(self, filename):
+        """Retira o arquivo do índice (removido ou substituído por versão avulsa)
+
+        O espaço no pacote não é reaproveitado: pacotes são append-only.
+        """
+        conn = self._connection()
+        if conn is None:
+            return False
+        with conn:
+            deleted = conn.execute('DELETE FROM packed_files WHERE filename = ?', (filename,)).rowcount
+        self._drop_cached(filename)
+        return deleted > 0
+
+    def rename(self, old_filename, new_filename):
+        conn = self._connection()
+        if conn is None:
+            return False
+        with conn:
+            updated = conn.execute(
+                'UPDATE OR REPLACE packed_files SET filename = ?, owner = ? WHERE filename = ?',
+                (new_filename, owner_from_filename(new_filename), old_filename)
+            ).rowcount
+        self._drop_cached(old_filename)
+        return updated > 0
+
+    def _drop_cached(self, filename):
+        try:
+            os.remove(os.path.join(self.cache_dir, filename))
+        except FileNotFoundError:
+            pass
+
+    # ==================== COMPACTAÇÃO ====================
+
+    def _current_pack(self):
+        """Pacote aberto para acréscimo (um novo é iniciado ao atingir PACK_MAX_BYTES)"""
+        packs = sorted(name for name in os.listdir(self.packs_dir) if name.endswith('.pack'))
+        if packs and os.path.getsize(os.path.join(self.packs_dir, packs[-1])) < PACK_MAX_BYTES:
+            return packs[-1]
+        number = int(packs[-1][5:11]) + 1 if packs else 1
+        return f'pack-{number:06d}.pack'
+
+    def compact(self, files, min_age, dry_run=False):
+        """Arquiva os arquivos avulsos elegíveis
+
+        files: pares (filename, caminho avulso). Cada lote é gravado no pacote e
+        sincronizado com o disco antes de entrar no índice; só então os arquivos
+        avulsos são apagados. A transação do índice (BEGIN IMMEDIATE) serializa
+        compactadores concorrentes (CLI e thread de fundo).
+        """
+        stats = {'packed': 0, 'packed_bytes': 0, 'skipped_recent': 0, 'skipped_large': 0}
+        now = time.time()
+        candidates = []
+        for filename, path in files:
+            if not filename.endswith(PACKABLE_SUFFIXES):
+                continue
+            try:
+                file_stats = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if now - file_stats.st_mtime < min_age:
+                stats['skipped_recent'] += 1
+            elif file_stats.st_size > PACK_MAX_FILE_SIZE:
+                stats['skipped_large'] += 1
+            else:
+                candidates.append((filename, path))
+
+        if dry_run:
+            stats['packed'] = len(candidates)
+            stats['packed_bytes'] = sum(os.path.getsize(path) for _, path in candidates if os.path.exists(path))
+            return stats
+
+        for start in range(0, len(candidates), COMPACT_BATCH_SIZE):
+            packed, packed_bytes = self._compact_batch(candidates[start:start + COMPACT_BATCH_SIZE])
+            stats['packed'] += packed
+            stats['packed_bytes'] += packed_bytes
+        self.prune_cache()
+        return stats
+
+    def _compact_batch(self, batch):
+        conn = self._connection(create=True)
+        conn.execute('BEGIN IMMEDIATE')
+        written = []
+        try:
+            pack = self._current_pack()
+            with open(os.path.join(self.packs_dir, pack), 'ab') as f:
+                for filename, path in batch:
+                    if conn.execute('SELECT 1 FROM packed_files WHERE filename = ?', (filename,)).fetchone():
+                        continue  # Já arquivado por outro compactador
+                    try:
+                        file_stats = os.stat(path)
+                        with open(path, 'rb') as source:
+                            data = source.read()
+                    except FileNotFoundError:
+                        continue
+                    offset = f.tell()
+                    f.write(data)
+                    written.append((filename, path, file_stats, pack, offset, data))
+                f.flush()
+                os.fsync(f.fileno())
+
+            conn.executemany(
+                '''INSERT INTO packed_files (filename, owner, pack, offset, length, crc32, mtime, ctime)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                [(filename, owner_from_filename(filename), pack, offset, len(data), zlib.crc32(data),
+                  file_stats.st_mtime, file_stats.st_ctime)
+                 for filename, path, file_stats, pack, offset, data in written]
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        packed_bytes = 0
+        for filename, path, file_stats, _, _, data in written:
+            try:
+                # Arquivo reescrito durante a compactação: a versão avulsa prevalece
+                if os.stat(path).st_mtime != file_stats.st_mtime:
+                    self.forget(filename)
+                    continue
+                os.remove(path)
+                packed_bytes += len(data)
+            except FileNotFoundError:
+                pass
+        return len(written), packed_bytes
+
+    def prune_cache(self, ttl=CACHE_TTL):
+        """Apaga cópias de leitura extraídas há mais de ttl segundos"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        limit = time.time() - ttl
+        for entry in os.scandir(self.cache_dir):
+            try:
+                if entry.stat().st_ctime < limit:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+
+    def status(self):
+        conn = self._connection()
+        if conn is None:
+            return {'files': 0, 'live_bytes': 0, 'packs': 0, 'pack_bytes': 0}
+        row = conn.execute('SELECT COUNT(*) AS files, COALESCE(SUM(length), 0) AS live FROM packed_files').fetchone()
+        packs = [name for name in os.listdir(self.packs_dir) if name.endswith('.pack')]
+        return {
+            'files': row['files'],
+            'live_bytes': row['live'],
+            'packs': len(packs),
+            'pack_bytes': sum(os.path.getsize(os.path.join(self.packs_dir, name)) for name in packs)
+        }
+
+def compact_storage(storage, min_age_days=PACK_MIN_AGE_DAYS, dry_run=False):
+    """Compacta os artefatos antigos de um StorageLayout (apenas backend local)"""
+    if not storage.backend.is_local:
+        print(f"⚠️ {storage.root}: arquivamento em pacotes disponível apenas no backend local")
+        return None
+    files = ((filename, storage.locate(filename)) for filename in storage.iter_loose_files())
+    return storage.packs.compact(files, min_age=min_age_days * 86400, dry_run=dry_run)
+
+_compactor_thread = None
+
+def start_background_compactor(storages, interval=PACK_COMPACT_INTERVAL):
+    """Thread daemon que compacta periodicamente (uma por processo)"""
+    global _compactor_thread
+    if not PACK_ARCHIVE_ENABLED or _compactor_thread is not None:
+        return None
+
+    def run():
+        while True:
+            time.sleep(interval)
+            for storage in storages:
+                try:
+                    stats = compact_storage(storage)
+                    if stats and stats['packed']:
+                        print(f"📦 {storage.root}: {stats['packed']} arquivos arquivados ({stats['packed_bytes']} bytes)")
+                except Exception as e:
+                    print(f"⚠️ Erro na compactação de {storage.root}: {e}")
+
+    _compactor_thread = threading.Thread(target=run, name='pack-compactor', daemon=True)
+    _compactor_thread.start()
+    return _compactor_thread
+
+def main():
+    from storage_layout import get_layout
+
+    parser = argparse.ArgumentParser(description='Arquivamento de artefatos pequenos do RecPac em pacotes')
+    parser.add_argument('command', choices=['compact', 'status'])
+    parser.add_argument('--min-age-days', type=int, default=PACK_MIN_AGE_DAYS,
+                        help='Arquivar apenas arquivos sem modificação há N dias')
+    parser.add_argument('--dry-run', action='store_true', help='Apenas contar o que seria arquivado')
+    args = parser.parse_args()
+
+    for directory in (RECORDINGS_DIR, TRANSCRIPTIONS_DIR):
+        storage = get_layout(directory)
+        if args.command == 'status':
+            stats = storage.packs.status()
+            print(f"📦 {directory}: {stats['files']} arquivos em {stats['packs']} pacotes "
+                  f"({stats['live_bytes']} bytes úteis de {stats['pack_bytes']})")
+            continue
+
+        stats = compact_storage(storage, args.min_age_days, args.dry_run)
+        if stats is None:
+            continue
+        action = 'seriam arquivados' if args.dry_run else 'arquivados'
+        print(f"✅ {directory}: {stats['packed']} arquivos {action} ({stats['packed_bytes']} bytes), "
+              f"{stats['skipped_recent']} recentes e {stats['skipped_large']} grandes ignorados")
+
+if __name__ == '__main__':
+    main()
@@ -12,6 +12,42 @@ load_dotenv()
 # Configurações de diretórios
 RECORDINGS_DIR = os.getenv('RECORDINGS_DIR', 'recordings')
 TRANSCRIPTIONS_DIR = os.getenv('TRANSCRIPTIONS_DIR', 'transcriptions')
+# Organização dos arquivos em subdiretórios: flat, user, date (AAAA/MM) ou user_date
+STORAGE_LAYOUT = os.getenv('STORAGE_LAYOUT', 'flat')
+
+# Backend de armazenamento: local (disco) ou s3 (AWS S3, MinIO ou compatível)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'local')
+S3_BUCKET = os.getenv('S3_BUCKET')
+S3_PREFIX = os.getenv('S3_PREFIX', '')
+S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL')  # Ex.: http://localhost:9000 para MinIO
+S3_REGION = os.getenv('S3_REGION')
+S3_MULTIPART_THRESHOLD = int(os.getenv('S3_MULTIPART_THRESHOLD', str(8 * 1024 * 1024)))
+S3_MULTIPART_CHUNKSIZE = int(os.getenv('S3_MULTIPART_CHUNKSIZE', str(8 * 1024 * 1024)))
+
+# Arquivamento de textos antigos em pacotes (menos inodes e backups mais rápidos)
+PACK_ARCHIVE_ENABLED = os.getenv('PACK_ARCHIVE_ENABLED', 'false').lower() == 'true'
+PACK_MIN_AGE_DAYS = int(os.getenv('PACK_MIN_AGE_DAYS', '90'))
+PACK_MAX_FILE_SIZE = int(os.getenv('PACK_MAX_FILE_SIZE', str(256 * 1024)))  # Só arquivos pequenos
+PACK_MAX_BYTES = int(os.getenv('PACK_MAX_BYTES', str(256 * 1024 * 1024)))  # Tamanho de cada pacote
+PACK_COMPACT_INTERVAL = int(os.getenv('PACK_COMPACT_INTERVAL', '86400'))  # 1 dia
+
+# Observador de mudanças feitas diretamente nos diretórios (mantém o catálogo sincronizado)
+# No backend s3 é a varredura periódica do bucket que traz ao catálogo local o que outros nós gravaram
+STORAGE_WATCH_ENABLED = os.getenv('STORAGE_WATCH_ENABLED', 'true').lower() == 'true'
+STORAGE_WATCH_MODE = os.getenv('STORAGE_WATCH_MODE', 'auto')  # auto (inotify se disponível) ou polling
+STORAGE_WATCH_POLL_INTERVAL = float(os.getenv('STORAGE_WATCH_POLL_INTERVAL', '30'))
+STORAGE_WATCH_DEBOUNCE = float(os.getenv('STORAGE_WATCH_DEBOUNCE', '2'))
+
+# Ingestão assíncrona: upload gravado em disco, resposta 202 e processamento em segundo plano
+INGEST_ASYNC_ENABLED = os.getenv('INGEST_ASYNC_ENABLED', 'false').lower() == 'true'
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', '2'))
+INGEST_JOB_RETENTION_DAYS = int(os.getenv('INGEST_JOB_RETENTION_DAYS', '7'))  # Histórico de jobs concluídos
+
+# Limpeza de temporários de upload (chunks abandonados, manifestos antigos e spools)
+TEMP_JANITOR_ENABLED = os.getenv('TEMP_JANITOR_ENABLED', 'true').lower() == 'true'
+TEMP_JANITOR_INTERVAL = int(os.getenv('TEMP_JANITOR_INTERVAL', '600'))  # 10 minutos
+TEMP_CHUNK_TTL = int(os.getenv('TEMP_CHUNK_TTL', '86400'))  # Envio sem atividade por 1 dia é abandonado
+TEMP_DISK_BUDGET = int(os.getenv('TEMP_DISK_BUDGET', str(256 * 1024 * 1024)))  # 0 = sem limite
 
 # Configurações do Gemini AI
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
@@ -21,13 +57,18 @@ GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
 TRANSCRIPTION_TIMEOUT = int(os.getenv('TRANSCRIPTION_TIMEOUT', '30'))
 TRANSCRIPTION_ENERGY_THRESHOLD = int(os.getenv('TRANSCRIPTION_ENERGY_THRESHOLD', '4000'))
 TRANSCRIPTION_PAUSE_THRESHOLD = float(os.getenv('TRANSCRIPTION_PAUSE_THRESHOLD', '0.8'))
+# Sample rate do PCM mono enviado ao reconhecedor (só reduz; 0 = o da gravação)
+TRANSCRIPTION_SAMPLE_RATE = int(os.getenv('TRANSCRIPTION_SAMPLE_RATE', '16000'))
 
 # Configurações de áudio
 AUDIO_SAMPLE_RATE = int(os.getenv('AUDIO_SAMPLE_RATE', '44100'))  # CORREÇÃO: Padrão 44.1kHz para evitar problemas de velocidade
 AUDIO_CHANNELS = int(os.getenv('AUDIO_CHANNELS', '1'))
-AUDIO_SEGMENT_LENGTH = int(os.getenv('AUDIO_SEGMENT_LENGTH', '30000'))  # 30 segundos em ms
+AUDIO_SEGMENT_LENGTH = int(os.getenv('AUDIO_SEGMENT_LENGTH', '30000'))  # Máximo de fala por envio ao reconhecedor (ms)
 AUDIO_OVERLAP = int(os.getenv('AUDIO_OVERLAP', '2000'))  # 2 segundos em ms
 AUDIO_MIN_SAMPLE_RATE = int(os.getenv('AUDIO_MIN_SAMPLE_RATE', '16000'))  # Sample rate mínimo para conversão
+# Pool de processos para decodificação/normalização/exportação (padrão: um por CPU; 0 = na própria thread)
+AUDIO_POOL_WORKERS = int(os.getenv('AUDIO_POOL_WORKERS', str(os.cpu_count() or 2)))
+AUDIO_TASK_TIMEOUT = int(os.getenv('AUDIO_TASK_TIMEOUT', '300'))  # Segundos por tarefa (0 = sem limite)
 
 # Configurações de exportação
 PDF_PAGE_SIZE = os.getenv('PDF_PAGE_SIZE', 'A4')
@@ -39,6 +80,9 @@ PDF_BODY_FONT_SIZE = int(os.getenv('PDF_BODY_FONT_SIZE', '11'))
 SESSION_SEGMENT_PREFIX = os.getenv('SESSION_SEGMENT_PREFIX', 'segmento')
 SESSION_METADATA_SUFFIX = os.getenv('SESSION_METADATA_SUFFIX', '_metadata.json')
 
+# Configurações do catálogo de gravações (índice SQLite)
+CATALOG_DB_PATH = os.getenv('CATALOG_DB_PATH', os.path.join('data', 'catalog.sqlite3'))
+
 # Configurações de logging
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 LOG_FORMAT = os.getenv('LOG_FORMAT', '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -61,7 +105,41 @@ def get_service_config():
     return {
         'directories': {
             'recordings': RECORDINGS_DIR,
-            'transcriptions': TRANSCRIPTIONS_DIR
+            'transcriptions': TRANSCRIPTIONS_DIR,
+            'layout': STORAGE_LAYOUT,
+            'backend': STORAGE_BACKEND
+        },
+        'object_storage': {
+            'bucket': S3_BUCKET,
+            'prefix': S3_PREFIX,
+            'endpoint_url': S3_ENDPOINT_URL,
+            'region': S3_REGION,
+            'multipart_threshold': S3_MULTIPART_THRESHOLD,
+            'multipart_chunksize': S3_MULTIPART_CHUNKSIZE
+        },
+        'pack_archive': {
+            'enabled': PACK_ARCHIVE_ENABLED,
+            'min_age_days': PACK_MIN_AGE_DAYS,
+            'max_file_size': PACK_MAX_FILE_SIZE,
+            'max_pack_bytes': PACK_MAX_BYTES,
+            'compact_interval': PACK_COMPACT_INTERVAL
+        },
+        'storage_watch': {
+            'enabled': STORAGE_WATCH_ENABLED,
+            'mode': STORAGE_WATCH_MODE,
+            'poll_interval': STORAGE_WATCH_POLL_INTERVAL,
+            'debounce': STORAGE_WATCH_DEBOUNCE
+        },
+        'ingest': {
+            'async_enabled': INGEST_ASYNC_ENABLED,
+            'workers': INGEST_WORKERS,
+            'job_retention_days': INGEST_JOB_RETENTION_DAYS
+        },
+        'temp_janitor': {
+            'enabled': TEMP_JANITOR_ENABLED,
+            'interval': TEMP_JANITOR_INTERVAL,
+            'chunk_ttl': TEMP_CHUNK_TTL,
+            'disk_budget': TEMP_DISK_BUDGET
         },
         'gemini': {
             'api_key': GEMINI_API_KEY,
@@ -70,14 +148,17 @@ def get_service_config():
         'transcription': {
             'timeout': TRANSCRIPTION_TIMEOUT,
             'energy_threshold': TRANSCRIPTION_ENERGY_THRESHOLD,
-            'pause_threshold': TRANSCRIPTION_PAUSE_THRESHOLD
+            'pause_threshold': TRANSCRIPTION_PAUSE_THRESHOLD,
+            'sample_rate': TRANSCRIPTION_SAMPLE_RATE
         },
         'audio': {
             'sample_rate': AUDIO_SAMPLE_RATE,
             'channels': AUDIO_CHANNELS,
             'segment_length': AUDIO_SEGMENT_LENGTH,
             'overlap': AUDIO_OVERLAP,
-            'min_sample_rate': AUDIO_MIN_SAMPLE_RATE
+            'min_sample_rate': AUDIO_MIN_SAMPLE_RATE,
+            'pool_workers': AUDIO_POOL_WORKERS,
+            'task_timeout': AUDIO_TASK_TIMEOUT
         },
         'export': {
             'pdf_page_size': PDF_PAGE_SIZE,
@@ -89,6 +170,9 @@ def get_service_config():
             'segment_prefix': SESSION_SEGMENT_PREFIX,
             'metadata_suffix': SESSION_METADATA_SUFFIX
         },
+        'catalog': {
+            'db_path': CATALOG_DB_PATH
+        },
         'logging': {
             'level': LOG_LEVEL,
             'format': LOG_FORMAT
@@ -129,12 +213,47 @@ def validate_config():
     if not GEMINI_API_KEY:
         errors.append("GEMINI_API_KEY não configurada")
     
+    if STORAGE_LAYOUT not in ('flat', 'user', 'date', 'user_date'):
+        errors.append("STORAGE_LAYOUT deve ser flat, user, date ou user_date")
+    
+    if STORAGE_BACKEND not in ('local', 's3'):
+        errors.append("STORAGE_BACKEND deve ser local ou s3")
+    elif STORAGE_BACKEND == 's3' and not S3_BUCKET:
+        errors.append("S3_BUCKET é obrigatório com STORAGE_BACKEND=s3")
+    
+    if PACK_MIN_AGE_DAYS < 0 or PACK_MAX_FILE_SIZE <= 0 or PACK_MAX_BYTES <= 0:
+        errors.append("PACK_MIN_AGE_DAYS, PACK_MAX_FILE_SIZE e PACK_MAX_BYTES devem ser positivos")
+    
+    if PACK_COMPACT_INTERVAL <= 0:
+        errors.append("PACK_COMPACT_INTERVAL deve ser maior que 0")
+    
+    if STORAGE_WATCH_MODE not in ('auto', 'polling'):
+        errors.append("STORAGE_WATCH_MODE deve ser auto ou polling")
+    
+    if STORAGE_WATCH_POLL_INTERVAL <= 0 or STORAGE_WATCH_DEBOUNCE < 0:
+        errors.append("STORAGE_WATCH_POLL_INTERVAL deve ser maior que 0 e STORAGE_WATCH_DEBOUNCE não negativo")
+    
+    if INGEST_WORKERS <= 0 or INGEST_JOB_RETENTION_DAYS < 0:
+        errors.append("INGEST_WORKERS deve ser maior que 0 e INGEST_JOB_RETENTION_DAYS não negativo")
+    
+    if TEMP_JANITOR_INTERVAL <= 0 or TEMP_CHUNK_TTL < 0 or TEMP_DISK_BUDGET < 0:
+        errors.append("TEMP_JANITOR_INTERVAL deve ser maior que 0 e TEMP_CHUNK_TTL/TEMP_DISK_BUDGET não negativos")
+    
     if TRANSCRIPTION_TIMEOUT <= 0:
         errors.append("TRANSCRIPTION_TIMEOUT deve ser maior que 0")
     
+    if TRANSCRIPTION_SAMPLE_RATE and TRANSCRIPTION_SAMPLE_RATE < 8000:
+        errors.append("TRANSCRIPTION_SAMPLE_RATE deve ser 0 ou pelo menos 8000 (mínimo do reconhecedor)")
+    
     if AUDIO_SAMPLE_RATE <= 0:
         errors.append("AUDIO_SAMPLE_RATE deve ser maior que 0")
     
+    if AUDIO_SEGMENT_LENGTH < 1000:
+        errors.append("AUDIO_SEGMENT_LENGTH deve ser de pelo menos 1000ms")
+    
+    if AUDIO_POOL_WORKERS < 0 or AUDIO_TASK_TIMEOUT < 0:
+        errors.append("AUDIO_POOL_WORKERS e AUDIO_TASK_TIMEOUT não podem ser negativos")
+    
     return errors
 
 def print_config_summary():
@@ -147,6 +266,19 @@ def print_config_summary():
     print(f"📁 Diretórios:")
     print(f"   Gravações: {config['directories']['recordings']}")
     print(f"   Transcrições: {config['directories']['transcriptions']}")
+    print(f"   Layout: {config['directories']['layout']}")
+    print(f"   Backend: {config['directories']['backend']}")
+    print(f"   Pacotes: {'✅ Habilitado' if config['pack_archive']['enabled'] else '❌ Desabilitado'} "
+          f"(após {config['pack_archive']['min_age_days']} dias)")
+    print(f"   Observador: {'✅ ' + config['storage_watch']['mode'] if config['storage_watch']['enabled'] else '❌ Desabilitado'}")
+    
+    print(f"\n📥 Ingestão:")
+    print(f"   Assíncrona: {'✅ Habilitada' if config['ingest']['async_enabled'] else '❌ Desabilitada (use ?async=1)'}")
+    print(f"   Workers: {config['ingest']['workers']}")
+    
+    print(f"\n🧹 Temporários de upload:")
+    print(f"   Limpeza: {'✅ Habilitada' if config['temp_janitor']['enabled'] else '❌ Desabilitada'}")
+    print(f"   TTL: {config['temp_janitor']['chunk_ttl']}s, orçamento: {config['temp_janitor']['disk_budget'] or 'sem limite'} bytes")
     
     print(f"\n🤖 Gemini AI:")
     print(f"   Modelo: {config['gemini']['model']}")
@@ -156,11 +288,14 @@ def print_config_summary():
     print(f"   Timeout: {config['transcription']['timeout']}s")
     print(f"   Energy Threshold: {config['transcription']['energy_threshold']}")
     print(f"   Pause Threshold: {config['transcription']['pause_threshold']}")
+    print(f"   Sample Rate enviado: {str(config['transcription']['sample_rate']) + 'Hz' if config['transcription']['sample_rate'] else 'o da gravação'}")
     
     print(f"\n🔊 Áudio:")
     print(f"   Sample Rate: {config['audio']['sample_rate']}Hz")
     print(f"   Canais: {config['audio']['channels']}")
-    print(f"   Segment Length: {config['audio']['segment_length']}ms")
+    print(f"   Segment Length: {config['audio']['segment_length']}ms (cortes nas pausas, sem sobreposição)")
+    print(f"   Pool de processos: {config['audio']['pool_workers'] or 'desabilitado (na thread da requisição)'}")
+    print(f"   Timeout por tarefa: {config['audio']['task_timeout'] or 'sem limite'}{'s' if config['audio']['task_timeout'] else ''}")
     
     print(f"\n📄 Exportação:")
     print(f"   PDF Page Size: {config['export']['pdf_page_size']}")
@@ -6,14 +6,20 @@ Separa as funcionalidades de sessões do app.py
 import os
 import json
 from datetime import datetime
-from pydub import AudioSegment
+from audio_tasks import run_audio_task, concatenate_wavs
+from catalog_service import RecordingCatalog, probe_audio_file
+from storage_layout import get_layout
+from content_store import get_content_store
 
 class SessionService:
     """Serviço para gerenciamento de sessões de gravação"""
     
-    def __init__(self, recordings_dir, transcriptions_dir):
+    def __init__(self, recordings_dir, transcriptions_dir, catalog=None):
         self.recordings_dir = recordings_dir
         self.transcriptions_dir = transcriptions_dir
+        self.recordings = get_layout(recordings_dir)
+        self.transcriptions = get_layout(transcriptions_dir)
+        self.catalog = catalog or RecordingCatalog(recordings_dir, transcriptions_dir)
     
     def start_new_session(self, user_id):
         """Inicia uma nova sessão de gravação"""
@@ -32,10 +38,11 @@ class SessionService:
             }
             
             metadata_filename = f"{session_id}_{user_id}_metadata.json"
-            metadata_path = os.path.join(self.recordings_dir, metadata_filename)
+            metadata_path = self.recordings.write_path(metadata_filename)
             
             with open(metadata_path, 'w', encoding='utf-8') as f:
                 json.dump(session_metadata, f, indent=2, ensure_ascii=False)
+            self.recordings.commit(metadata_filename)
             
             return {
                 'success': True,
@@ -54,15 +61,18 @@ class SessionService:
         try:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             segment_filename = f"segmento_{segment_number}_{session_id}_{timestamp}_{user_id}.wav"
-            segment_path = os.path.join(self.recordings_dir, segment_filename)
+            segment_path = self.recordings.write_path(segment_filename)
             
             # Salvar segmento de áudio
             with open(segment_path, 'wb') as f:
                 f.write(audio_data)
+            get_content_store().intern(segment_filename, owner=user_id)
+            self.recordings.commit(segment_filename)
+            self.catalog.index_recording(segment_filename, owner=user_id)
             
             # Atualizar metadados da sessão
             metadata_filename = f"{session_id}_{user_id}_metadata.json"
-            metadata_path = os.path.join(self.recordings_dir, metadata_filename)
+            metadata_path = self.recordings.locate(metadata_filename)
             
             if os.path.exists(metadata_path):
                 with open(metadata_path, 'r', encoding='utf-8') as f:
@@ -78,8 +88,9 @@ class SessionService:
                 metadata['segments'].append(segment_info)
                 
                 # Atualizar arquivo de metadados
-                with open(metadata_path, 'w', encoding='utf-8') as f:
+                with open(self.recordings.write_path(metadata_filename), 'w', encoding='utf-8') as f:
                     json.dump(metadata, f, indent=2, ensure_ascii=False)
+                self.recordings.commit(metadata_filename)
             
             return {
                 'success': True,
@@ -97,7 +108,7 @@ class SessionService:
         """Obtém informações detalhadas de uma sessão"""
         try:
             metadata_filename = f"{session_id}_{user_id}_metadata.json"
-            metadata_path = os.path.join(self.recordings_dir, metadata_filename)
+            metadata_path = self.recordings.locate(metadata_filename)
             
             if not os.path.exists(metadata_path):
                 return {
@@ -111,13 +122,10 @@ class SessionService:
             # Calcular duração total dos segmentos
             total_duration = 0
             for segment in metadata['segments']:
-                segment_path = os.path.join(self.recordings_dir, segment['filename'])
+                segment_path = self.recordings.locate(segment['filename'])
                 if os.path.exists(segment_path):
-                    try:
-                        audio = AudioSegment.from_wav(segment_path)
-                        total_duration += len(audio)
-                    except:
-                        pass
+                    # Duração pelo cabeçalho WAV, sem decodificar o segmento
+                    total_duration += probe_audio_file(segment_path)['duration_ms'] or 0
             
             metadata['total_duration_ms'] = total_duration
             metadata['total_duration_seconds'] = total_duration / 1000.0
@@ -153,48 +161,42 @@ class SessionService:
             # Ordenar segmentos por número
             segments.sort(key=lambda x: x['segment_number'])
             
-            # Combinar áudios usando pydub
-            combined_audio = AudioSegment.empty()
-            
+            segment_paths = []
             for segment_info in segments:
-                segment_path = os.path.join(self.recordings_dir, segment_info['filename'])
+                segment_path = self.recordings.locate(segment_info['filename'])
                 if os.path.exists(segment_path):
-                    try:
-                        segment_audio = AudioSegment.from_wav(segment_path)
-                        combined_audio += segment_audio
-                    except Exception as e:
-                        print(f"Erro ao processar segmento {segment_info['filename']}: {e}")
+                    segment_paths.append(segment_path)
+            
+            # Combinar áudios no pool de processos
+            # CORREÇÃO: Exportar com configurações específicas para evitar problemas de velocidade
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            final_filename = f'Sessao_{session_id}_{timestamp}_{user_id}.wav'
+            final_path = self.recordings.write_path(final_filename)
+            combined = run_audio_task(concatenate_wavs, segment_paths, final_path, 44100, skip_errors=True)
             
-            if len(combined_audio) == 0:
+            if combined['duration_ms'] == 0:
                 return {
                     'success': False,
                     'message': 'Não foi possível combinar os segmentos de áudio'
                 }
             
-            # Salvar áudio combinado
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            final_filename = f'Sessao_{session_id}_{timestamp}_{user_id}.wav'
-            final_path = os.path.join(self.recordings_dir, final_filename)
-            
-            # CORREÇÃO: Exportar com configurações específicas para evitar problemas de velocidade
-            combined_audio.export(final_path, format="wav", parameters=[
-                "-acodec", "pcm_s16le",  # PCM 16-bit
-                "-ar", "44100",  # Sample rate padrão
-                "-ac", "1"  # Mono
-            ])
+            get_content_store().intern(final_filename, owner=user_id)
+            self.recordings.commit(final_filename)
+            self.catalog.index_recording(final_filename, owner=user_id)
             
             # Atualizar metadados da sessão
             metadata['status'] = 'finalized'
             metadata['final_filename'] = final_filename
             metadata['finalize_time'] = timestamp
-            metadata['final_duration_ms'] = len(combined_audio)
-            metadata['final_duration_seconds'] = len(combined_audio) / 1000.0
+            metadata['final_duration_ms'] = combined['duration_ms']
+            metadata['final_duration_seconds'] = combined['duration_ms'] / 1000.0
             
             metadata_filename = f"{session_id}_{user_id}_metadata.json"
-            metadata_path = os.path.join(self.recordings_dir, metadata_filename)
+            metadata_path = self.recordings.write_path(metadata_filename)
             
             with open(metadata_path, 'w', encoding='utf-8') as f:
                 json.dump(metadata, f, indent=2, ensure_ascii=False)
+            self.recordings.commit(metadata_filename)
             
             return {
                 'success': True,
@@ -215,10 +217,10 @@ class SessionService:
             sessions = []
             
             # Buscar arquivos de metadados de sessão
-            for filename in os.listdir(self.recordings_dir):
+            for filename in self.recordings.iter_files(owners=[user_id]):
                 if filename.endswith('_metadata.json') and user_id in filename:
                     try:
-                        metadata_path = os.path.join(self.recordings_dir, filename)
+                        metadata_path = self.recordings.locate(filename)
                         with open(metadata_path, 'r', encoding='utf-8') as f:
                             metadata = json.load(f)
                         
@@ -254,26 +256,25 @@ class SessionService:
             
             # Deletar todos os segmentos
             for segment_info in metadata['segments']:
-                segment_path = os.path.join(self.recordings_dir, segment_info['filename'])
-                if os.path.exists(segment_path):
+                if self.recordings.exists(segment_info['filename']):
                     try:
-                        os.remove(segment_path)
+                        self.recordings.remove(segment_info['filename'])
+                        self.catalog.remove_recording(segment_info['filename'])
                     except Exception as e:
                         print(f"Erro ao deletar segmento {segment_info['filename']}: {e}")
             
             # Deletar arquivo de metadados
             metadata_filename = f"{session_id}_{user_id}_metadata.json"
-            metadata_path = os.path.join(self.recordings_dir, metadata_filename)
             
-            if os.path.exists(metadata_path):
-                os.remove(metadata_path)
+            if self.recordings.exists(metadata_filename):
+                self.recordings.remove(metadata_filename)
             
             # Deletar arquivo final se existir
             if 'final_filename' in metadata:
-                final_path = os.path.join(self.recordings_dir, metadata['final_filename'])
-                if os.path.exists(final_path):
+                if self.recordings.exists(metadata['final_filename']):
                     try:
-                        os.remove(final_path)
+                        self.recordings.remove(metadata['final_filename'])
+                        self.catalog.remove_recording(metadata['final_filename'])
                     except Exception as e:
                         print(f"Erro ao deletar arquivo final: {e}")
             
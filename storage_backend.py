@@ -0,0 +1,255 @@
+"""
+Backends de armazenamento de objetos
+Abstrai onde os artefatos (áudio e texto) ficam guardados: disco local ou um
+serviço compatível com S3 (AWS S3, MinIO, moto em testes), permitindo que
+vários nós da aplicação compartilhem os mesmos arquivos. O catálogo SQLite
+continua local a cada nó; o observador de armazenamento (storage_watcher)
+varre o bucket periodicamente para incluir o que outros nós gravaram.
+
+As chaves são caminhos relativos no layout ('u1/2025/03/arquivo.wav').
+Leituras e escritas são feitas em blocos (upload multipart no S3), então
+arquivos WAV grandes nunca são carregados inteiros na memória.
+"""
+
+import os
+import shutil
+import tempfile
+
+from services_config import (
+    STORAGE_BACKEND, S3_BUCKET, S3_PREFIX, S3_ENDPOINT_URL, S3_REGION,
+    S3_MULTIPART_THRESHOLD, S3_MULTIPART_CHUNKSIZE
+)
+
+COPY_BUFFER_SIZE = 1024 * 1024  # 1MB por bloco nas cópias em streaming
+
+class StorageBackend:
+    """Interface comum dos backends de armazenamento"""
+
+    # Backends locais expõem os arquivos diretamente no diretório de trabalho
+    is_local = False
+
+    def exists(self, key):
+        return self.stat(key) is not None
+
+    def stat(self, key):
+        """Retorna {'size', 'mtime'} do objeto ou None se não existir"""
+        raise NotImplementedError
+
+    def open_read(self, key):
+        """Abre o objeto para leitura binária em streaming"""
+        raise NotImplementedError
+
+    def read_head(self, key, length):
+        """Lê apenas os primeiros bytes do objeto (cabeçalhos de áudio)"""
+        with self.open_read(key) as stream:
+            return stream.read(length)
+
+    def write_stream(self, key, stream):
+        """Grava o conteúdo de um arquivo aberto, em blocos"""
+        raise NotImplementedError
+
+    def upload_file(self, key, path):
+        with open(path, 'rb') as stream:
+            self.write_stream(key, stream)
+
+    def download_file(self, key, path):
+        """Copia o objeto para um arquivo local (gravação atômica via arquivo temporário)"""
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.download_')
+        try:
+            with os.fdopen(fd, 'wb') as target, self.open_read(key) as source:
+                shutil.copyfileobj(source, target, COPY_BUFFER_SIZE)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def rename(self, old_key, new_key):
+        raise NotImplementedError
+
+    def iter_keys(self, prefix='', recursive=True):
+        """Percorre as chaves sob o prefixo; sem recursive, só o nível do prefixo"""
+        raise NotImplementedError
+
+    def iter_stats(self, prefix=''):
+        """(chave, tamanho, mtime) de cada objeto sob o prefixo"""
+        for key in self.iter_keys(prefix):
+            stats = self.stat(key)
+            if stats is not None:
+                yield key, stats['size'], stats['mtime']
+
+class LocalStorageBackend(StorageBackend):
+    """Objetos como arquivos comuns sob um diretório raiz"""
+
+    is_local = True
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def stat(self, key):
+        try:
+            stats = os.stat(self.path(key))
+        except FileNotFoundError:
+            return None
+        return {'size': stats.st_size, 'mtime': stats.st_mtime}
+
+    def open_read(self, key):
+        return open(self.path(key), 'rb')
+
+    def write_stream(self, key, stream):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as target:
+            shutil.copyfileobj(stream, target, COPY_BUFFER_SIZE)
+
+    def upload_file(self, key, path):
+        target = self.path(key)
+        if os.path.abspath(target) != os.path.abspath(path):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(path, target)
+
+    def download_file(self, key, path):
+        source = self.path(key)
+        if os.path.abspath(source) != os.path.abspath(path):
+            super().download_file(key, path)
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def rename(self, old_key, new_key):
+        target = self.path(new_key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(self.path(old_key), target)
+
+    def iter_keys(self, prefix='', recursive=True):
+        directory = self.path(prefix.rstrip('/')) if prefix else self.root
+        if not os.path.isdir(directory):
+            return
+        for current_dir, dirnames, filenames in os.walk(directory):
+            if not recursive:
+                dirnames[:] = []
+            relative_dir = os.path.relpath(current_dir, self.root)
+            for name in filenames:
+                key = name if relative_dir == '.' else f"{relative_dir.replace(os.sep, '/')}/{name}"
+                yield key
+
+class S3StorageBackend(StorageBackend):
+    """Objetos em um bucket compatível com S3 (AWS, MinIO, moto)"""
+
+    def __init__(self, bucket, prefix='', client=None, endpoint_url=None, region_name=None,
+                 multipart_threshold=S3_MULTIPART_THRESHOLD, multipart_chunksize=S3_MULTIPART_CHUNKSIZE):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.exceptions import ClientError
+        except ImportError:
+            raise RuntimeError("Backend S3 requer o pacote boto3 (pip install boto3)")
+
+        if not bucket:
+            raise ValueError("S3_BUCKET não configurado")
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = client or boto3.client('s3', endpoint_url=endpoint_url, region_name=region_name)
+        # Acima do limite, uploads/cópias são multipart: partes enviadas em sequência de blocos
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunksize
+        )
+        self._client_error = ClientError
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def stat(self, key):
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except self._client_error as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return {'size': head['ContentLength'], 'mtime': head['LastModified'].timestamp()}
+
+    def open_read(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=self._key(key))['Body']
+
+    def read_head(self, key, length):
+        response = self.client.get_object(
+            Bucket=self.bucket, Key=self._key(key), Range=f'bytes=0-{length - 1}'
+        )
+        with response['Body'] as body:
+            return body.read()
+
+    def write_stream(self, key, stream):
+        self.client.upload_fileobj(stream, self.bucket, self._key(key), Config=self.transfer_config)
+
+    def upload_file(self, key, path):
+        self.client.upload_file(path, self.bucket, self._key(key), Config=self.transfer_config)
+
+    def download_file(self, key, path):
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.download_')
+        os.close(fd)
+        try:
+            self.client.download_file(self.bucket, self._key(key), temp_path, Config=self.transfer_config)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def rename(self, old_key, new_key):
+        # S3 não tem renomeação: cópia no servidor (multipart para objetos grandes) + remoção
+        self.client.copy(
+            {'Bucket': self.bucket, 'Key': self._key(old_key)},
+            self.bucket, self._key(new_key), Config=self.transfer_config
+        )
+        self.delete(old_key)
+
+    def iter_keys(self, prefix='', recursive=True):
+        paginator = self.client.get_paginator('list_objects_v2')
+        options = {'Bucket': self.bucket, 'Prefix': self._key(prefix)}
+        if not recursive:
+            options['Delimiter'] = '/'
+        for page in paginator.paginate(**options):
+            for item in page.get('Contents', []):
+                yield item['Key'][len(self.prefix):]
+
+    def iter_stats(self, prefix=''):
+        # A listagem já traz tamanho e data: nenhum HEAD por objeto
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            for item in page.get('Contents', []):
+                yield item['Key'][len(self.prefix):], item['Size'], item['LastModified'].timestamp()
+
+def create_backend(root, backend=STORAGE_BACKEND):
+    """Backend configurado para um diretório raiz (RECORDINGS_DIR, TRANSCRIPTIONS_DIR)
+
+    No S3 cada diretório vira um prefixo dentro do bucket; o diretório local
+    passa a ser apenas cache de trabalho (pode ser apagado a qualquer momento).
+    """
+    if backend == 'local':
+        return LocalStorageBackend(root)
+    if backend == 's3':
+        return S3StorageBackend(
+            S3_BUCKET,
+            prefix=f"{S3_PREFIX}{os.path.basename(os.path.normpath(root))}/",
+            endpoint_url=S3_ENDPOINT_URL,
+            region_name=S3_REGION
+        )
+    raise ValueError(f"Backend de armazenamento inválido: {backend}")
@@ -0,0 +1,378 @@
+"""
+Layout de armazenamento das gravações e transcrições
+Distribui os arquivos em subdiretórios (por usuário e/ou AAAA/MM) para evitar
+diretórios únicos com dezenas de milhares de entradas.
+
+O subdiretório é derivado apenas do nome do arquivo, então nenhuma consulta
+extra é necessária para encontrar um arquivo. Arquivos ainda no layout plano
+antigo continuam acessíveis até serem migrados:
+
+    python storage_layout.py migrate [--dry-run] [--min-age SEGUNDOS]
+
+Artefatos de texto antigos podem estar arquivados em pacotes (pack_archive.py);
+no backend local as leituras os encontram pelo índice quando o arquivo avulso
+não existe.
+
+Com um backend remoto (STORAGE_BACKEND=s3) o diretório raiz funciona como
+cache local: leituras baixam o objeto quando ausente ou desatualizado e
+escritas são enviadas com commit(). Arquivos existentes são enviados com:
+
+    python storage_layout.py upload
+"""
+
+import argparse
+import io
+import os
+import time
+
+from pack_archive import PackArchive
+from services_config import STORAGE_LAYOUT
+from storage_backend import create_backend
+from utils import RECORDINGS_DIR, TRANSCRIPTIONS_DIR, owner_from_filename, timestamp_from_filename
+
+LAYOUT_MODES = ('flat', 'user', 'date', 'user_date')
+
+# Subdiretórios de trabalho que nunca fazem parte do layout
+RESERVED_DIRS = {'temp_chunks', 'temp_uploads'}
+
+class StorageLayout:
+    """Resolve o caminho de cada arquivo dentro de um diretório raiz"""
+
+    def __init__(self, root, mode=STORAGE_LAYOUT, backend=None):
+        if mode not in LAYOUT_MODES:
+            raise ValueError(f"Layout de armazenamento inválido: {mode}")
+        self.root = root
+        self.mode = mode
+        self.backend = backend or create_backend(root)
+        self.packs = PackArchive(root)
+
+    def shard_for(self, filename):
+        """Subdiretório relativo do arquivo ('' no layout plano ou fora do padrão de nomes)"""
+        parts = []
+        if self.mode in ('user', 'user_date'):
+            owner = owner_from_filename(filename)
+            if owner and not owner.startswith('.') and owner not in RESERVED_DIRS:
+                parts.append(owner)
+        if self.mode in ('date', 'user_date'):
+            created = timestamp_from_filename(filename)
+            if created:
+                parts.extend([created.strftime('%Y'), created.strftime('%m')])
+        return os.path.join(*parts) if parts else ''
+
+    def path_for(self, filename):
+        """Caminho canônico do arquivo no layout configurado"""
+        _check_filename(filename)
+        return os.path.join(self.root, self.shard_for(filename), filename)
+
+    def key_for(self, filename):
+        """Chave do objeto no backend (sempre no layout canônico)"""
+        _check_filename(filename)
+        shard = self.shard_for(filename)
+        return f"{shard.replace(os.sep, '/')}/{filename}" if shard else filename
+
+    def _local_path(self, filename):
+        """Cópia local existente (layout configurado ou plano antigo), senão o caminho canônico"""
+        path = self.path_for(filename)
+        if os.path.exists(path):
+            return path
+        legacy_path = os.path.join(self.root, filename)
+        if legacy_path != path and os.path.exists(legacy_path):
+            return legacy_path
+        return path
+
+    def locate(self, filename):
+        """Caminho local do arquivo: layout configurado, senão layout plano antigo
+
+        Se o arquivo não existir em nenhum dos dois, retorna o caminho canônico
+        (o que também cobre arquivos movidos pela migração entre as checagens).
+        Com backend remoto, o objeto é baixado (em blocos) quando a cópia local
+        não existe ou está desatualizada.
+        """
+        path = self._local_path(filename)
+        if self.backend.is_local:
+            if not os.path.exists(path):
+                return self.packs.extract(filename) or path
+            return path
+
+        remote = self.backend.stat(self.key_for(filename))
+        if remote is None:
+            return path
+        if os.path.exists(path):
+            local = os.stat(path)
+            if local.st_size == remote['size'] and local.st_mtime >= remote['mtime']:
+                return path
+
+        path = self.path_for(filename)
+        self.backend.download_file(self.key_for(filename), path)
+        os.utime(path, (remote['mtime'], remote['mtime']))
+        return path
+
+    def exists(self, filename):
+        if os.path.exists(self._local_path(filename)):
+            return True
+        if self.backend.is_local:
+            return self.packs.contains(filename)
+        return self.backend.exists(self.key_for(filename))
+
+    def stat(self, filename):
+        """Tamanho e datas do arquivo sem baixá-lo ({'size', 'mtime', 'ctime'} ou None)"""
+        path = self._local_path(filename)
+        if self.backend.is_local or os.path.exists(path):
+            if not os.path.exists(path):
+                return self.packs.stat(filename) if self.backend.is_local else None
+            stats = os.stat(path)
+            return {'size': stats.st_size, 'mtime': stats.st_mtime, 'ctime': stats.st_ctime}
+        remote = self.backend.stat(self.key_for(filename))
+        if remote is None:
+            return None
+        return {'size': remote['size'], 'mtime': remote['mtime'], 'ctime': remote['mtime']}
+
+    def read_head(self, filename, length):
+        """Primeiros bytes do arquivo (leitura parcial no backend remoto)"""
+        path = self._local_path(filename)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                return f.read(length)
+        if self.backend.is_local:
+            data = self.packs.read(filename, length)
+            if data is None:
+                raise FileNotFoundError(path)
+            return data
+        return self.backend.read_head(self.key_for(filename), length)
+
+    def read_text(self, filename):
+        """Conteúdo de um arquivo de texto (lido direto do pacote quando arquivado)"""
+        path = self._local_path(filename)
+        if self.backend.is_local and not os.path.exists(path):
+            data = self.packs.read(filename)
+            if data is not None:
+                return io.TextIOWrapper(io.BytesIO(data), encoding='utf-8').read()
+        with open(self.locate(filename), 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def write_path(self, filename):
+        """Caminho local para gravação (cria o subdiretório se necessário)
+
+        Arquivos existentes são sobrescritos onde estão, para não deixar cópias
+        antigas no layout plano; novos arquivos vão direto para o subdiretório.
+        Depois de gravar, chamar commit() para publicar no backend.
+        Arquivos deduplicados (hard link para um blob compartilhado) são
+        desvinculados antes, para a escrita não alterar as outras cópias.
+        """
+        path = self._local_path(filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if self.backend.is_local:
+            # A versão avulsa nova substitui a arquivada em pacote
+            self.packs.forget(filename)
+        try:
+            if os.stat(path).st_nlink > 1:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+        return path
+
+    def commit(self, filename):
+        """Publica no backend um arquivo gravado localmente (nada a fazer no disco local)"""
+        if self.backend.is_local:
+            return
+        path = self._local_path(filename)
+        key = self.key_for(filename)
+        self.backend.upload_file(key, path)
+        # Alinha a data local com a do objeto para não baixá-lo de volta
+        remote = self.backend.stat(key)
+        if remote:
+            os.utime(path, (remote['mtime'], remote['mtime']))
+
+    def rename(self, old_filename, new_filename):
+        """Renomeia arquivo, movendo-o para o subdiretório do novo nome"""
+        old_path = self._local_path(old_filename)
+        if os.path.exists(old_path):
+            new_path = self.path_for(new_filename)
+            os.makedirs(os.path.dirname(new_path), exist_ok=True)
+            os.replace(old_path, new_path)
+        elif self.backend.is_local:
+            self.packs.rename(old_filename, new_filename)
+        if self.backend.is_local:
+            return
+        old_key = self.key_for(old_filename)
+        if self.backend.exists(old_key):
+            self.backend.rename(old_key, self.key_for(new_filename))
+        else:
+            self.commit(new_filename)
+
+    def remove(self, filename):
+        path = self._local_path(filename)
+        if os.path.exists(path):
+            os.remove(path)
+        elif self.backend.is_local:
+            if not self.packs.forget(filename):
+                raise FileNotFoundError(path)
+        if not self.backend.is_local:
+            self.backend.delete(self.key_for(filename))
+
+    def iter_files(self, owners=None):
+        """Percorre os nomes de todos os arquivos do layout
+
+        Com owners nos layouts por usuário, só a raiz e os subdiretórios desses
+        donos são lidos; nos demais layouts o diretório inteiro é percorrido.
+        Com backend remoto a listagem vem do bucket (sem baixar os arquivos);
+        no backend local os arquivos arquivados em pacotes também são listados.
+        """
+        per_owner = owners and self.mode in ('user', 'user_date')
+
+        if not self.backend.is_local:
+            if not per_owner:
+                keys = self.backend.iter_keys()
+            else:
+                keys = self._iter_owner_keys(owners)
+            for key in keys:
+                filename = key.rsplit('/', 1)[-1]
+                if not filename.startswith('.'):
+                    yield filename
+            return
+
+        if not os.path.isdir(self.root):
+            return
+        yield from self.packs.names(owners if per_owner else None)
+        if not per_owner:
+            yield from _walk_files(self.root)
+            return
+
+        for entry in os.scandir(self.root):
+            if entry.is_file():
+                yield entry.name
+        for owner in dict.fromkeys(owners):
+            owner_dir = os.path.join(self.root, owner)
+            if owner and not owner.startswith('.') and os.path.isdir(owner_dir):
+                yield from _walk_files(owner_dir)
+
+    def iter_loose_files(self):
+        """Arquivos avulsos no diretório local (sem os arquivados em pacotes)"""
+        if os.path.isdir(self.root):
+            yield from _walk_files(self.root)
+
+    def _iter_owner_keys(self, owners):
+        yield from self.backend.iter_keys(recursive=False)
+        for owner in dict.fromkeys(owners):
+            if owner and not owner.startswith('.'):
+                yield from self.backend.iter_keys(f'{owner}/')
+
+    def upload_all(self, min_age=300):
+        """Envia ao backend remoto os arquivos locais ainda não publicados"""
+        stats = {'uploaded': 0, 'skipped_recent': 0, 'unchanged': 0}
+        if self.backend.is_local:
+            return stats
+
+        now = time.time()
+        for filename in dict.fromkeys(_walk_files(self.root)):
+            if filename.startswith('temp'):
+                continue
+            path = self._local_path(filename)
+            local = os.stat(path)
+            if now - local.st_mtime < min_age:
+                stats['skipped_recent'] += 1
+                continue
+            remote = self.backend.stat(self.key_for(filename))
+            if remote and remote['size'] == local.st_size:
+                stats['unchanged'] += 1
+                continue
+            self.commit(filename)
+            stats['uploaded'] += 1
+        return stats
+
+    def migrate(self, dry_run=False, min_age=300):
+        """Move arquivos do layout plano para os subdiretórios, sem parar a aplicação
+
+        Cada arquivo é movido com os.replace (atômico no mesmo sistema de arquivos).
+        Arquivos modificados há menos de min_age segundos são ignorados para não
+        interferir em gravações em andamento; basta executar novamente depois.
+        """
+        stats = {'moved': 0, 'skipped_recent': 0, 'conflicts': 0, 'unchanged': 0}
+        if not os.path.isdir(self.root):
+            return stats
+
+        now = time.time()
+        for entry in os.scandir(self.root):
+            if not entry.is_file() or entry.name.startswith(('.', 'temp')):
+                continue
+
+            target = self.path_for(entry.name)
+            if target == entry.path:
+                stats['unchanged'] += 1
+                continue
+            try:
+                if now - entry.stat().st_mtime < min_age:
+                    stats['skipped_recent'] += 1
+                    continue
+            except FileNotFoundError:
+                continue  # Removido durante a migração
+
+            if os.path.exists(target):
+                # A versão no layout novo prevalece nas leituras; manter a antiga para análise
+                print(f"⚠️ Conflito: {entry.name} já existe em {target}")
+                stats['conflicts'] += 1
+                continue
+
+            if not dry_run:
+                try:
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    os.replace(entry.path, target)
+                except FileNotFoundError:
+                    continue
+            stats['moved'] += 1
+
+        return stats
+
+def _check_filename(filename):
+    """Impede que nomes vindos da requisição escapem do diretório raiz"""
+    if not filename or filename != os.path.basename(filename) or filename in ('.', '..'):
+        raise ValueError(f"Nome de arquivo inválido: {filename}")
+
+def _walk_files(directory):
+    for current_dir, dirnames, filenames in os.walk(directory):
+        dirnames[:] = [name for name in dirnames if name not in RESERVED_DIRS and not name.startswith('.')]
+        for name in filenames:
+            if not name.startswith('.'):
+                yield name
+
+recordings_storage = StorageLayout(RECORDINGS_DIR)
+transcriptions_storage = StorageLayout(TRANSCRIPTIONS_DIR)
+
+def get_layout(directory):
+    """Layout configurado para o diretório informado (reaproveita as instâncias globais)"""
+    for storage in (recordings_storage, transcriptions_storage):
+        if os.path.abspath(storage.root) == os.path.abspath(directory):
+            return storage
+    return StorageLayout(directory)
+
+def main():
+    parser = argparse.ArgumentParser(description='Migração do armazenamento do RecPac (layout e backend)')
+    parser.add_argument('command', choices=['migrate', 'status', 'upload'])
+    parser.add_argument('--layout', default=STORAGE_LAYOUT, choices=LAYOUT_MODES)
+    parser.add_argument('--dry-run', action='store_true', help='Apenas contar o que seria movido')
+    parser.add_argument('--min-age', type=int, default=300,
+                        help='Ignorar arquivos modificados há menos de N segundos')
+    args = parser.parse_args()
+
+    for directory in (RECORDINGS_DIR, TRANSCRIPTIONS_DIR):
+        layout = StorageLayout(directory, args.layout)
+        if args.command == 'upload':
+            print(f"☁️ Enviando {directory} para o backend '{type(layout.backend).__name__}'...")
+            stats = layout.upload_all(min_age=args.min_age)
+            print(f"✅ {directory}: {stats['uploaded']} enviados, {stats['unchanged']} já publicados, "
+                  f"{stats['skipped_recent']} recentes ignorados")
+            continue
+
+        if args.command == 'status':
+            stats = layout.migrate(dry_run=True, min_age=0)
+            print(f"📁 {directory} ({args.layout}): {stats['moved']} arquivos no layout plano, "
+                  f"{stats['unchanged']} já no lugar, {stats['conflicts']} conflitos")
+            continue
+
+        print(f"🔄 Migrando {directory} para o layout '{args.layout}'...")
+        stats = layout.migrate(dry_run=args.dry_run, min_age=args.min_age)
+        print(f"✅ {directory}: {stats['moved']} movidos, {stats['skipped_recent']} recentes ignorados, "
+              f"{stats['conflicts']} conflitos")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+"""
+Observador dos diretórios de armazenamento
+Operadores ainda copiam gravações para recordings/ manualmente e executam
+scripts de restauração; sem um observador o catálogo (e a busca) ficaria
+divergente do disco até a próxima varredura completa.
+
+Eventos de criação, alteração, renomeação e remoção são agrupados por arquivo
+durante STORAGE_WATCH_DEBOUNCE segundos (escritas em andamento geram vários
+eventos) e aplicados ao catálogo de forma incremental, conferindo o estado
+atual do arquivo no layout (arquivos arquivados em pacotes continuam válidos).
+
+Usa inotify (pacote watchdog) quando disponível; senão, ou com
+STORAGE_WATCH_MODE=polling (ex.: NFS, onde inotify não recebe eventos de
+outras máquinas), compara listagens a cada STORAGE_WATCH_POLL_INTERVAL
+segundos.
+
+Com backend remoto (STORAGE_BACKEND=s3) o catálogo de cada nó é local, e o
+que outro nó grava no bucket não gera evento aqui: a varredura periódica
+lista o bucket (tamanho e data vêm na própria listagem) a cada
+STORAGE_WATCH_POLL_INTERVAL segundos. Na primeira varredura a listagem é
+comparada com o catálogo, para incluir o que mudou enquanto o nó estava
+parado. Gravações de outros nós aparecem nas listagens e na busca com até
+esse intervalo de atraso.
+
+Também pode rodar em um processo separado:
+
+    python storage_watcher.py
+"""
+
+import os
+import threading
+import time
+
+from catalog_service import AUDIO_EXTENSIONS, get_catalog, text_kind
+from services_config import (
+    STORAGE_WATCH_ENABLED, STORAGE_WATCH_MODE, STORAGE_WATCH_POLL_INTERVAL, STORAGE_WATCH_DEBOUNCE
+)
+from storage_layout import RESERVED_DIRS
+
+FLUSH_INTERVAL = 0.5
+
+class StorageWatcher:
+    """Mantém o catálogo sincronizado com as mudanças feitas diretamente no disco"""
+
+    def __init__(self, catalog, mode=STORAGE_WATCH_MODE, poll_interval=STORAGE_WATCH_POLL_INTERVAL,
+                 debounce=STORAGE_WATCH_DEBOUNCE):
+        self.catalog = catalog
+        self.storages = (catalog.recordings, catalog.transcriptions)
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.backend_name = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self._observer = None
+
+    # ==================== CICLO DE VIDA ====================
+
+    def start(self):
+        for storage in self.storages:
+            os.makedirs(storage.root, exist_ok=True)
+
+        # Mudanças feitas por outros nós no bucket só aparecem na listagem
+        if any(not storage.backend.is_local for storage in self.storages):
+            self.mode = 'polling'
+
+        if self.mode != 'polling':
+            try:
+                self._start_inotify()
+            except (ImportError, OSError) as e:
+                print(f"⚠️ inotify indisponível ({e}); usando varredura periódica")
+        if self._observer is None:
+            self.backend_name = 'polling'
+            self._spawn(self._poll_loop, 'storage-watch-poll')
+
+        self._spawn(self._flush_loop, 'storage-watch-flush')
+        print(f"👀 Observando {', '.join(s.root for s in self.storages)} ({self.backend_name})")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        for thread in self._threads:
+            thread.join()
+        self.flush(force=True)
+
+    def _spawn(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _start_inotify(self):
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def __init__(self, storage):
+                self.storage = storage
+
+            def on_any_event(self, event):
+                if event.is_directory or event.event_type not in ('created', 'modified', 'deleted', 'moved'):
+                    return
+                if event.event_type == 'moved':
+                    watcher.notify(self.storage, event.dest_path, source_path=event.src_path)
+                else:
+                    watcher.notify(self.storage, event.src_path)
+
+        observer = Observer()
+        for storage in self.storages:
+            observer.schedule(Handler(storage), storage.root, recursive=True)
+        observer.start()
+        self._observer = observer
+        self.backend_name = type(observer).__name__
+
+    # ==================== EVENTOS ====================
+
+    def filename_for(self, storage, path):
+        """Nome do arquivo no layout, ou None para diretórios internos (.blobs, .packs, temp_chunks)"""
+        relative = os.path.relpath(path, storage.root)
+        parts = relative.split(os.sep)
+        if parts[0] == '..' or any(part.startswith('.') or part in RESERVED_DIRS for part in parts):
+            return None
+        return parts[-1]
+
+    def notify(self, storage, path, source_path=None):
+        """Registra um evento; a aplicação ocorre após o período de acomodação"""
+        filename = self.filename_for(storage, path)
+        source = self.filename_for(storage, source_path) if source_path else None
+        deadline = time.monotonic() + self.debounce
+        with self._lock:
+            if filename:
+                previous = self._pending.get((storage.root, filename))
+                self._pending[(storage.root, filename)] = (
+                    storage, deadline, source or (previous[2] if previous else None)
+                )
+            if source and source != filename:
+                self._pending.setdefault((storage.root, source), (storage, deadline, None))
+
+    def flush(self, force=False):
+        """Aplica ao catálogo os eventos cujo período de acomodação terminou"""
+        now = time.monotonic()
+        with self._lock:
+            ready = [key for key, (_, deadline, _) in self._pending.items() if force or deadline <= now]
+            batch = [(key[1],) + self._pending.pop(key) for key in ready]
+
+        # Renomeações primeiro, para a origem não ser tratada como remoção
+        batch.sort(key=lambda item: item[3] is None)
+        for filename, storage, _, source in batch:
+            try:
+                self._apply(storage, filename, source)
+            except Exception as e:
+                print(f"⚠️ Erro ao aplicar mudança em {filename}: {e}")
+        return len(batch)
+
+    def _apply(self, storage, filename, source=None):
+        if storage is self.catalog.recordings:
+            extension = os.path.splitext(filename)[1].lstrip('.').lower()
+            if extension not in AUDIO_EXTENSIONS:
+                return
+            if not storage.exists(filename):
+                self.catalog.remove_recording(filename)
+            elif source and not storage.exists(source):
+                self.catalog.rename_recording(source, filename)
+            else:
+                self.catalog.index_recording(filename)
+            return
+
+        if text_kind(filename) is None:
+            return
+        if storage.exists(filename):
+            self.catalog.index_text(filename, storage.read_text(filename))
+        else:
+            self.catalog.remove_text(filename)
+
+    def _flush_loop(self):
+        while not self._stop.wait(FLUSH_INTERVAL):
+            self.flush()
+
+    # ==================== VARREDURA PERIÓDICA ====================
+
+    def snapshot(self, storage):
+        """Tamanho, data e inode de cada arquivo avulso do diretório (inode None no bucket)"""
+        if not storage.backend.is_local:
+            return self._remote_snapshot(storage)
+        files = {}
+        stack = [storage.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.name.startswith('.') or entry.name in RESERVED_DIRS:
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file():
+                        stats = entry.stat()
+                        files[entry.path] = (stats.st_size, stats.st_mtime_ns, stats.st_ino)
+                except FileNotFoundError:
+                    continue
+        return files
+
+    def _remote_snapshot(self, storage):
+        files = {}
+        for key, size, mtime in storage.backend.iter_stats():
+            parts = key.split('/')
+            if any(part.startswith('.') or part in RESERVED_DIRS for part in parts):
+                continue
+            files[os.path.join(storage.root, *parts)] = (size, mtime, None)
+        return files
+
+    def reconcile(self, storage, current):
+        """Compara uma listagem do bucket com o catálogo (nomes e tamanhos)
+
+        Cobre o que outros nós gravaram ou removeram antes da primeira varredura.
+        """
+        recordings, texts = self.catalog.indexed_sizes()
+        indexed = recordings if storage is self.catalog.recordings else texts
+        listed = {}
+        for path, (size, _, _) in current.items():
+            filename = self.filename_for(storage, path)
+            if filename:
+                listed[filename] = size
+                if indexed.get(filename) != size:
+                    self.notify(storage, path)
+        for filename in indexed:
+            if filename not in listed:
+                self.notify(storage, os.path.join(storage.root, filename))
+
+    def _poll_loop(self):
+        snapshots = {}
+        for storage in self.storages:
+            snapshots[storage.root] = self.snapshot(storage)
+            if not storage.backend.is_local:
+                self.reconcile(storage, snapshots[storage.root])
+        while not self._stop.wait(self.poll_interval):
+            for storage in self.storages:
+                try:
+                    current = self.snapshot(storage)
+                except OSError as e:
+                    print(f"⚠️ Erro ao varrer {storage.root}: {e}")
+                    continue
+                self._diff(storage, snapshots[storage.root], current)
+                snapshots[storage.root] = current
+
+    def _diff(self, storage, previous, current):
+        removed = {path: info for path, info in previous.items() if path not in current}
+        removed_by_inode = {info[2]: path for path, info in removed.items() if info[2]}
+        for path, info in current.items():
+            if previous.get(path) == info:
+                continue
+            # Mesmo inode sumiu de outro caminho: renomeação
+            source = removed_by_inode.pop(info[2], None) if path not in previous and info[2] else None
+            if source:
+                removed.pop(source, None)
+            self.notify(storage, path, source_path=source)
+        for path in removed:
+            self.notify(storage, path)
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+def start_storage_watcher():
+    """Inicia o observador (uma vez por processo) quando STORAGE_WATCH_ENABLED"""
+    global _watcher
+    if not STORAGE_WATCH_ENABLED:
+        return None
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = StorageWatcher(get_catalog()).start()
+    return _watcher
+
+if __name__ == '__main__':
+    watcher = StorageWatcher(get_catalog()).start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        watcher.stop()
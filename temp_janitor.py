@@ -0,0 +1,302 @@
+"""
+Limpeza dos temporários de upload
+Os chunks em recordings/temp_chunks só eram apagados por cleanup_temp_chunks
+depois de uma montagem bem-sucedida: envios abandonados (aba fechada, celular
+sem bateria), manifestos mantidos para reenvios e spools de uploads
+interrompidos acumulavam até encher o disco.
+
+O faxineiro agrupa os arquivos de cada envio em chunks (chunks, .incoming,
+.decoded.wav, manifesto e estado da montagem) e trata o grupo como uma
+unidade:
+
+- envios sem atividade há mais de TEMP_CHUNK_TTL segundos são removidos;
+- se o total ainda passar de TEMP_DISK_BUDGET bytes, os envios mais antigos
+  são removidos primeiro até caber no orçamento.
+
+Envios com atividade nos últimos ACTIVE_GRACE_SECONDS nunca são removidos
+pelo orçamento, e a remoção acontece sob o lock da sessão (o mesmo de
+ChunkManifest.accept e da montagem), conferindo de novo a atividade e a
+montagem em andamento antes de apagar. Spools avulsos (*.upload em
+temp_uploads e temp_chunks) seguem as mesmas regras pelo mtime; os uploads
+duráveis da fila de ingestão (temp_uploads/ingest) não são tocados.
+
+    python temp_janitor.py sweep [--dry-run]
+    python temp_janitor.py status
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+
+from chunk_assembly import ChunkAssembler, remove_lock_file, session_lock
+from services_config import (
+    TEMP_JANITOR_ENABLED, TEMP_JANITOR_INTERVAL, TEMP_CHUNK_TTL, TEMP_DISK_BUDGET
+)
+from utils import RECORDINGS_DIR
+
+CHUNKS_SUBDIR = 'temp_chunks'
+UPLOADS_SUBDIR = 'temp_uploads'
+ACTIVE_GRACE_SECONDS = 300
+
+# <sessão>_chunk_NNN.* e os arquivos de manifesto/montagem da sessão
+SESSION_FILE_RE = re.compile(
+    r'^(?P<session_id>.+?)_(?:chunk_\d{3,}\..+|manifest\.json(?:\.part)?'
+    r'|assembly\.(?:json|wav|stream|lock)(?:\.part)?)$'
+)
+
+def session_of(filename):
+    """Sessão de upload em chunks a que o arquivo pertence, ou None (spool avulso)"""
+    match = SESSION_FILE_RE.match(filename)
+    return match.group('session_id') if match else None
+
+class TempJanitor:
+    """Expira envios abandonados e mantém os temporários dentro do orçamento"""
+
+    def __init__(self, recordings_dir=RECORDINGS_DIR, ttl=TEMP_CHUNK_TTL, budget=TEMP_DISK_BUDGET):
+        self.chunks_dir = os.path.join(recordings_dir, CHUNKS_SUBDIR)
+        self.uploads_dir = os.path.join(recordings_dir, UPLOADS_SUBDIR)
+        self.ttl = ttl
+        self.budget = budget
+        self._lock = threading.Lock()
+        self.metrics = {
+            'sweeps': 0,
+            'expired_groups': 0,
+            'evicted_groups': 0,
+            'removed_files': 0,
+            'reclaimed_bytes': 0,
+            'last_sweep': None,
+            'last_usage_bytes': None,
+            'last_over_budget': False
+        }
+
+    # ==================== VARREDURA ====================
+
+    def scan(self):
+        """Grupos de temporários: {'key', 'session_id', 'directory', 'files', 'bytes', 'last_activity'}"""
+        groups = {}
+        for directory in (self.chunks_dir, self.uploads_dir):
+            try:
+                entries = list(os.scandir(directory))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if not entry.is_file(follow_symlinks=False):
+                    continue  # temp_uploads/ingest pertence à fila de ingestão
+                try:
+                    stats = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                session_id = session_of(entry.name) if directory == self.chunks_dir else None
+                key = (directory, session_id or entry.name)
+                group = groups.setdefault(key, {
+                    'key': f"{os.path.basename(directory)}/{session_id or entry.name}",
+                    'session_id': session_id,
+                    'directory': directory,
+                    'files': [],
+                    'bytes': 0,
+                    'last_activity': 0
+                })
+                group['files'].append(entry.name)
+                group['bytes'] += stats.st_size
+                group['last_activity'] = max(group['last_activity'], stats.st_mtime)
+        return sorted(groups.values(), key=lambda group: group['last_activity'])
+
+    def usage(self):
+        groups = self.scan()
+        return {
+            'groups': len(groups),
+            'sessions': sum(1 for group in groups if group['session_id']),
+            'bytes': sum(group['bytes'] for group in groups),
+            'budget_bytes': self.budget,
+            'oldest_activity': groups[0]['last_activity'] if groups else None
+        }
+
+    def sweep(self, now=None, dry_run=False):
+        """Remove grupos expirados e, se preciso, os mais antigos até caber no orçamento"""
+        with self._lock:
+            now = time.time() if now is None else now
+            groups = self.scan()
+            total = sum(group['bytes'] for group in groups)
+            stats = {
+                'expired_groups': 0, 'evicted_groups': 0, 'removed_files': 0, 'reclaimed_bytes': 0,
+                'skipped_active': 0, 'usage_bytes': total, 'over_budget': False
+            }
+
+            remaining = []
+            for group in groups:
+                if self.ttl and now - group['last_activity'] > self.ttl:
+                    removed = self._remove(group, now, self.ttl, dry_run)
+                    if removed is not None:
+                        self._count(stats, 'expired_groups', removed)
+                        total -= removed[1]
+                        continue
+                remaining.append(group)
+
+            # Orçamento: mais antigos primeiro (scan já ordena por última atividade)
+            for group in remaining:
+                if not self.budget or total <= self.budget:
+                    break
+                if now - group['last_activity'] < ACTIVE_GRACE_SECONDS:
+                    stats['skipped_active'] += 1
+                    continue
+                removed = self._remove(group, now, ACTIVE_GRACE_SECONDS, dry_run)
+                if removed is None:
+                    stats['skipped_active'] += 1
+                    continue
+                self._count(stats, 'evicted_groups', removed)
+                total -= removed[1]
+
+            stats['usage_bytes'] = total
+            stats['over_budget'] = bool(self.budget) and total > self.budget
+            if not dry_run:
+                self._record(stats, now)
+            return stats
+
+    def _count(self, stats, reason, removed):
+        files, reclaimed = removed
+        stats[reason] += 1
+        stats['removed_files'] += files
+        stats['reclaimed_bytes'] += reclaimed
+
+    def _remove(self, group, now, min_idle, dry_run):
+        """Apaga o grupo se continuar ocioso há min_idle segundos; (arquivos, bytes) ou None"""
+        if dry_run:
+            return len(group['files']), group['bytes']
+        if not group['session_id']:
+            return self._remove_files(group['directory'], group['files'], now, min_idle)
+
+        session_id = group['session_id']
+        with session_lock(self.chunks_dir, session_id):
+            # Conferir de novo sob o lock: um chunk pode ter chegado desde a varredura
+            # (o arquivo de lock, recém-aberto aqui, só sai quando nada mais restar)
+            files = self._session_files(session_id)
+            if self._assembling(session_id, now):
+                return None
+            removed = self._remove_files(self.chunks_dir, files, now, min_idle)
+            if removed is not None:
+                ChunkAssembler(self.chunks_dir, session_id).discard()
+                if not self._session_files(session_id):
+                    remove_lock_file(self.chunks_dir, session_id)
+        if removed is not None:
+            print(f"🧹 Envio {session_id} removido dos temporários ({removed[1]} bytes)")
+        return removed
+
+    def _session_files(self, session_id):
+        """Arquivos da sessão em temp_chunks, exceto o de lock"""
+        lock_name = f"{session_id}_assembly.lock"
+        return [name for name in os.listdir(self.chunks_dir)
+                if session_of(name) == session_id and name != lock_name]
+
+    def _assembling(self, session_id, now):
+        """Montagem em andamento (manifesto marcado e atualizado dentro do TTL)"""
+        try:
+            with open(os.path.join(self.chunks_dir, f"{session_id}_manifest.json"), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return False
+        updated = manifest.get('updated') or manifest.get('created') or 0
+        return bool(manifest.get('assembling')) and now - updated <= self.ttl
+
+    def _remove_files(self, directory, names, now, min_idle):
+        paths = [os.path.join(directory, name) for name in names]
+        sizes = []
+        for path in paths:
+            try:
+                stats = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if now - stats.st_mtime < min_idle:
+                return None  # Atividade recente: o envio continua em andamento
+            sizes.append((path, stats.st_size))
+
+        files = reclaimed = 0
+        for path, size in sizes:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            files += 1
+            reclaimed += size
+        return files, reclaimed
+
+    def _record(self, stats, now):
+        self.metrics['sweeps'] += 1
+        for key in ('expired_groups', 'evicted_groups', 'removed_files', 'reclaimed_bytes'):
+            self.metrics[key] += stats[key]
+        self.metrics.update({
+            'last_sweep': now,
+            'last_usage_bytes': stats['usage_bytes'],
+            'last_over_budget': stats['over_budget']
+        })
+        if stats['removed_files']:
+            print(f"🧹 Temporários: {stats['expired_groups']} expirados, {stats['evicted_groups']} removidos "
+                  f"pelo orçamento, {stats['reclaimed_bytes']} bytes liberados")
+        if stats['over_budget']:
+            print(f"⚠️ Temporários acima do orçamento ({stats['usage_bytes']} de {self.budget} bytes); "
+                  f"{stats['skipped_active']} envios em andamento preservados")
+
+_janitor = None
+_janitor_lock = threading.Lock()
+_janitor_thread = None
+
+def get_temp_janitor():
+    global _janitor
+    if _janitor is None:
+        with _janitor_lock:
+            if _janitor is None:
+                _janitor = TempJanitor()
+    return _janitor
+
+def get_janitor_metrics():
+    """Métricas acumuladas do processo e uso atual dos temporários"""
+    janitor = get_temp_janitor()
+    return {
+        'enabled': TEMP_JANITOR_ENABLED,
+        'ttl_seconds': janitor.ttl,
+        'metrics': dict(janitor.metrics),
+        'usage': janitor.usage()
+    }
+
+def start_temp_janitor(interval=TEMP_JANITOR_INTERVAL):
+    """Thread daemon que varre os temporários periodicamente (uma por processo)"""
+    global _janitor_thread
+    if not TEMP_JANITOR_ENABLED or _janitor_thread is not None:
+        return None
+
+    janitor = get_temp_janitor()
+
+    def run():
+        while True:
+            try:
+                janitor.sweep()
+            except Exception as e:
+                print(f"⚠️ Erro na limpeza de temporários: {e}")
+            time.sleep(interval)
+
+    _janitor_thread = threading.Thread(target=run, name='temp-janitor', daemon=True)
+    _janitor_thread.start()
+    return _janitor_thread
+
+def main():
+    parser = argparse.ArgumentParser(description='Limpeza dos temporários de upload do RecPac')
+    parser.add_argument('command', choices=['sweep', 'status'])
+    parser.add_argument('--dry-run', action='store_true', help='Apenas contar o que seria removido')
+    args = parser.parse_args()
+
+    janitor = get_temp_janitor()
+    if args.command == 'status':
+        usage = janitor.usage()
+        print(f"🗂️ {usage['sessions']} envios e {usage['groups'] - usage['sessions']} spools avulsos: "
+              f"{usage['bytes']} bytes (orçamento {usage['budget_bytes']})")
+        return
+
+    stats = janitor.sweep(dry_run=args.dry_run)
+    action = 'seriam liberados' if args.dry_run else 'liberados'
+    print(f"✅ {stats['expired_groups']} expirados, {stats['evicted_groups']} pelo orçamento: "
+          f"{stats['removed_files']} arquivos, {stats['reclaimed_bytes']} bytes {action}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+"""
+Testes do núcleo de áudio NumPy (audio_core): reamostragem, normalização de
+pico e segmentação por fala
+
+    python -m pytest tests/test_audio_core.py
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_core import NORMALIZE_HEADROOM_DB, VAD_MIN_SPEECH_MS, AudioBuffer, db_to_ratio
+
+RATE = 16000
+NOISE = 1e-4  # Ruído de fundo a -80 dBFS
+
+
+def tone(seconds, frequency=440, frame_rate=RATE, amplitude=0.5, channels=1):
+    t = np.arange(int(round(seconds * frame_rate))) / frame_rate
+    signal = amplitude * np.sin(2 * np.pi * frequency * t)
+    return np.repeat(signal[:, None], channels, axis=1).astype(np.float32)
+
+
+class ResampleTest(unittest.TestCase):
+
+    RATE_PAIRS = ((48000, 16000), (44100, 16000), (16000, 48000), (44100, 48000), (8000, 22050), (48000, 8000))
+
+    def test_duration_is_preserved(self):
+        for source_rate, target_rate in self.RATE_PAIRS:
+            for seconds in (0.0123, 1, 3.7):
+                with self.subTest(source=source_rate, target=target_rate, seconds=seconds):
+                    buffer = AudioBuffer(tone(seconds, frame_rate=source_rate), source_rate)
+                    resampled = buffer.resample(target_rate)
+                    self.assertEqual(resampled.frame_rate, target_rate)
+                    self.assertEqual(resampled.frames, -(-buffer.frames * target_rate // source_rate))
+                    self.assertLessEqual(abs(resampled.duration_ms - buffer.duration_ms), 1)
+
+    def test_tone_survives_resampling(self):
+        for source_rate, target_rate in self.RATE_PAIRS:
+            with self.subTest(source=source_rate, target=target_rate):
+                resampled = AudioBuffer(tone(1, frame_rate=source_rate), source_rate).resample(target_rate)
+                expected = tone(1, frame_rate=target_rate)[:resampled.frames]
+                # Bordas ficam de fora: o filtro vê zeros antes e depois do sinal
+                margin = target_rate // 50
+                error = np.abs(resampled.samples[margin:-margin] - expected[margin:-margin]).max()
+                self.assertLess(error, 0.01)
+
+    def test_content_above_new_nyquist_is_filtered(self):
+        buffer = AudioBuffer(tone(1, frequency=7000, frame_rate=48000), 48000)
+        resampled = buffer.resample(8000)
+        self.assertLess(resampled[50:950].rms, 0.01 * buffer.rms)
+
+    def test_channels_are_kept(self):
+        samples = np.concatenate([tone(0.5, 300, 44100), tone(0.5, 600, 44100, amplitude=0.2)], axis=1)
+        resampled = AudioBuffer(samples, 44100).resample(16000)
+        self.assertEqual(resampled.channels, 2)
+        alone = AudioBuffer(samples[:, 1], 44100).resample(16000)
+        np.testing.assert_allclose(resampled.samples[:, 1], alone.samples[:, 0])
+
+    def test_same_rate_and_empty(self):
+        buffer = AudioBuffer(tone(0.1), RATE)
+        self.assertIs(buffer.resample(RATE), buffer)
+        empty = AudioBuffer(np.zeros((0, 1)), RATE).resample(8000)
+        self.assertEqual(empty.frames, 0)
+
+
+class NormalizeTest(unittest.TestCase):
+
+    def test_peak_lands_at_headroom(self):
+        target = db_to_ratio(-NORMALIZE_HEADROOM_DB)
+        for amplitude in (0.001, 0.3, 0.99, 1.0):
+            with self.subTest(amplitude=amplitude):
+                normalized = AudioBuffer(tone(0.5, amplitude=amplitude), RATE).normalize()
+                self.assertAlmostEqual(normalized.peak, target, places=5)
+                # Sem saturação no PCM 16-bit
+                pcm = np.abs(normalized.pcm16().astype(np.int32))
+                self.assertLess(pcm.max(), 32767)
+                self.assertGreater(pcm.max(), 32767 * 0.98)
+
+    def test_negative_peak_and_custom_headroom(self):
+        samples = tone(0.5, amplitude=0.2)
+        samples[100] = -0.6
+        normalized = AudioBuffer(samples, RATE).normalize(headroom=3)
+        self.assertAlmostEqual(normalized.peak, db_to_ratio(-3), places=5)
+        self.assertAlmostEqual(float(normalized.samples[100, 0]), -db_to_ratio(-3), places=5)
+
+    def test_silence_is_unchanged(self):
+        silence = AudioBuffer(np.zeros((RATE, 1)), RATE)
+        self.assertIs(silence.normalize(), silence)
+
+    def test_rms_normalization_respects_headroom(self):
+        samples = tone(1, amplitude=0.01)
+        samples[RATE // 2] = 0.5  # Estalo: o alvo de RMS levaria o pico além de 0 dBFS
+        normalized = AudioBuffer(samples, RATE).normalize_rms(target_dbfs=-10)
+        self.assertLessEqual(normalized.peak, db_to_ratio(-NORMALIZE_HEADROOM_DB) + 1e-6)
+
+
+class SpeechSegmentsTest(unittest.TestCase):
+    """Fala sintética (tons) separada por silêncios e pausas curtas conhecidos"""
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.speech = []  # (início, fim) em amostras de cada trecho de tom
+        self.pauses = []  # Pausas curtas dentro de um trecho longo (não separam trechos)
+        parts, position = [], 0
+
+        def add(seconds, voiced):
+            nonlocal position
+            frames = int(seconds * RATE)
+            if voiced:
+                parts.append(tone(seconds)[:frames])
+                self.speech.append((position, position + frames))
+            else:
+                parts.append(np.zeros((frames, 1), dtype=np.float32))
+            position += frames
+
+        add(1.0, False)
+        add(1.5, True)
+        add(1.5, False)
+        add(0.05, True)  # Estalo: descartado
+        add(1.5, False)
+        # Trecho longo (~12 s) com pausas de 300 ms: só pode ser cortado nelas
+        for index in range(10):
+            add(0.9, True)
+            if index < 9:
+                self.pauses.append((position, position + int(0.3 * RATE)))
+                add(0.3, False)
+        add(2.0, False)
+        add(1.2, True)
+        add(1.0, False)
+
+        samples = np.concatenate(parts)
+        samples += (NOISE * rng.standard_normal(samples.shape)).astype(np.float32)
+        self.buffer = AudioBuffer(samples, RATE)
+
+    def regions(self, segments):
+        return [region for segment in segments for region in segment]
+
+    def test_regions_cover_speech_and_drop_clicks(self):
+        regions = self.buffer.speech_regions()
+        self.assertEqual(len(regions), 3)
+        click = self.speech[1]
+        self.assertLess((click[1] - click[0]) * 1000 / RATE, VAD_MIN_SPEECH_MS)
+        for start, end in self.speech:
+            if (start, end) == click:
+                self.assertFalse(any(s < end and start < e for s, e in regions))
+            else:
+                self.assertTrue(any(s <= start and end <= e for s, e in regions), (start, end))
+
+    def test_segments_never_exceed_max_length(self):
+        for max_ms in (1000, 3000, 5000, 30000):
+            with self.subTest(max_ms=max_ms):
+                segments = self.buffer.speech_segments(max_ms)
+                max_frames = max_ms * RATE // 1000
+                for segment in segments:
+                    self.assertLessEqual(sum(end - start for start, end in segment), max_frames)
+                    self.assertLessEqual(self.buffer.join(segment).duration_ms, max_ms)
+
+                # Em ordem, sem sobreposição, e toda a fala continua presente
+                regions = self.regions(segments)
+                self.assertEqual(regions, sorted(regions))
+                for (_, end), (start, _) in zip(regions, regions[1:]):
+                    self.assertLessEqual(end, start)
+                covered = np.zeros(self.buffer.frames, dtype=bool)
+                for start, end in regions:
+                    covered[start:end] = True
+                for start, end in self.speech[:1] + self.speech[2:]:
+                    self.assertTrue(covered[start:end].all())
+
+    def test_cuts_fall_inside_silence(self):
+        for max_ms in (3000, 4000, 5000):
+            with self.subTest(max_ms=max_ms):
+                regions = self.regions(self.buffer.speech_segments(max_ms))
+                cuts = [end for (_, end), (start, _) in zip(regions, regions[1:]) if end == start]
+                self.assertGreater(len(cuts), 0)
+                for cut in cuts:
+                    self.assertTrue(any(start < cut < end for start, end in self.pauses), cut)
+
+                # O que fica de fora entre trechos é silêncio (ou o estalo descartado)
+                dropped = np.ones(self.buffer.frames, dtype=bool)
+                for start, end in regions:
+                    dropped[start:end] = False
+                click_start, click_end = self.speech[1]
+                dropped[click_start:click_end] = False
+                self.assertLess(np.abs(self.buffer.samples[dropped]).max(), 0.001)
+
+    def test_short_audio_fits_in_one_segment(self):
+        segments = self.buffer.speech_segments(60000)
+        self.assertEqual(len(segments), 1)
+        self.assertEqual(len(segments[0]), 3)
+
+    def test_silence_has_no_segments(self):
+        silence = AudioBuffer(np.zeros((RATE * 3, 1)), RATE)
+        self.assertEqual(silence.speech_segments(5000), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
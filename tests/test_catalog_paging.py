@@ -0,0 +1,201 @@
+"""
+Testes da paginação por cursor (keyset) do catálogo
+
+Muitas gravações com valores de ordenação repetidos (mesma data, mesmo
+tamanho, duração desconhecida) distribuídas entre vários donos: percorrer
+todas as páginas deve devolver cada linha exatamente uma vez, na ordem de
+(valor de ordenação, filename).
+
+    python -m pytest tests/test_catalog_paging.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog_service import (
+    RecordingCatalog, InvalidPageRequest, RECORDING_SORT_KEYS, TRANSCRIPTION_SORT_KEYS,
+    encode_cursor, decode_cursor, parse_page_args, recording_row, text_document_row
+)
+
+OWNERS = ('u1', 'u2', 'u3')
+DAYS = (datetime(2025, 3, 1, 10), datetime(2025, 3, 2, 10), datetime(2025, 3, 3, 10))
+
+
+def day_timestamp(index):
+    return DAYS[index].timestamp()
+
+
+def sort_value(row, sort):
+    if sort == 'name':
+        return row['filename']
+    if sort == 'duration':
+        return -1 if row['duration_ms'] is None else row['duration_ms']
+    return row['mtime' if sort == 'date' else 'size']
+
+
+class CatalogPagingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.catalog = RecordingCatalog(
+            os.path.join(self.temp_dir, 'recordings'),
+            os.path.join(self.temp_dir, 'transcriptions'),
+            os.path.join(self.temp_dir, 'catalog.db')
+        )
+
+        self.rows = []
+        recordings, texts = [], []
+        for index in range(45):
+            owner = OWNERS[index % len(OWNERS)]
+            # Poucos valores distintos: cada página corta no meio de um grupo empatado
+            info = {
+                'size': (index % 4) * 1000,
+                'mtime': day_timestamp(index % 3),
+                'ctime': day_timestamp(index % 3),
+                'duration_ms': None if index % 5 == 0 else (index % 2) * 60000,
+                'format': 'wav'
+            }
+            filename = f"consulta_{index:03d}_{owner}.wav"
+            recordings.append(recording_row(filename, info, False, False, owner=owner))
+            self.rows.append(dict(info, filename=filename, owner=owner))
+            texts.append(text_document_row(
+                f"consulta_{index:03d}_{owner}_transcricao.txt", 'texto ' * (index % 3 + 1),
+                {'size': info['size'], 'mtime': info['mtime']}, owner=owner
+            ))
+        self.catalog.replace_all(recordings, texts)
+
+    def expected(self, sort, order, owners=OWNERS, date_from=None, date_to=None):
+        rows = [
+            row for row in self.rows
+            if row['owner'] in owners
+            and (date_from is None or row['mtime'] >= date_from)
+            and (date_to is None or row['mtime'] < date_to)
+        ]
+        rows.sort(key=lambda row: (sort_value(row, sort), row['filename']), reverse=order == 'desc')
+        return [row['filename'] for row in rows]
+
+    def walk(self, args, owners=OWNERS, page=parse_page_args, keys=RECORDING_SORT_KEYS, method=None):
+        """Percorre as páginas como o frontend: cursor da resposta na próxima requisição"""
+        method = method or self.catalog.page_recordings
+        args = dict(args)
+        filenames, pages = [], 0
+        while True:
+            options = page(args, keys)
+            rows, position = method(
+                list(owners), sort=options['sort'], order=options['order'], limit=options['limit'],
+                after=options['after'], date_from=options['date_from'], date_to=options['date_to']
+            )
+            pages += 1
+            self.assertLessEqual(len(rows), options['limit'])
+            filenames.extend(row['filename'] for row in rows)
+            if position is None:
+                return filenames, pages
+            args['cursor'] = encode_cursor(options['sort'], options['order'], *position)
+
+    def test_every_sort_key_in_both_directions(self):
+        for sort in RECORDING_SORT_KEYS:
+            for order in ('asc', 'desc'):
+                with self.subTest(sort=sort, order=order):
+                    filenames, pages = self.walk({'sort': sort, 'order': order, 'limit': '7'})
+                    self.assertEqual(filenames, self.expected(sort, order))
+                    self.assertEqual(pages, 7)
+
+    def test_ties_across_page_boundaries(self):
+        # Página de 1: todo cursor fica dentro de um grupo com o mesmo valor de ordenação
+        filenames, _ = self.walk({'sort': 'size', 'order': 'desc', 'limit': '1'})
+        self.assertEqual(len(filenames), len(set(filenames)))
+        self.assertEqual(filenames, self.expected('size', 'desc'))
+
+    def test_page_size_matching_remaining_rows_has_no_next_cursor(self):
+        rows, position = self.catalog.page_recordings(list(OWNERS), limit=45)
+        self.assertEqual(len(rows), 45)
+        self.assertIsNone(position)
+        rows, position = self.catalog.page_recordings(list(OWNERS), limit=44)
+        self.assertIsNotNone(position)
+
+    def test_owners_are_merged(self):
+        # Cada dono é consultado separadamente; a página mistura os três na ordem global
+        rows, _ = self.catalog.page_recordings(list(OWNERS), sort='name', order='asc', limit=6)
+        self.assertEqual([row['owner'] for row in rows], ['u1', 'u2', 'u3', 'u1', 'u2', 'u3'])
+
+        for owners in (['u2'], ['u3', 'u1']):
+            with self.subTest(owners=owners):
+                filenames, _ = self.walk({'sort': 'date', 'limit': '4'}, owners=owners)
+                self.assertEqual(filenames, self.expected('date', 'desc', owners=owners))
+
+    def test_duplicate_and_empty_owners(self):
+        filenames, _ = self.walk({'sort': 'date', 'limit': '5'}, owners=['u1', 'u1', '', None])
+        self.assertEqual(filenames, self.expected('date', 'desc', owners=['u1']))
+        self.assertEqual(self.catalog.page_recordings([]), ([], None))
+
+    def test_date_range(self):
+        args = {'sort': 'size', 'order': 'asc', 'limit': '4', 'date_from': '2025-03-02', 'date_to': '2025-03-02'}
+        filenames, _ = self.walk(args)
+        expected = self.expected('size', 'asc', date_from=day_timestamp(1) - 10 * 3600,
+                                 date_to=day_timestamp(2) - 10 * 3600)
+        self.assertEqual(len(expected), 15)
+        self.assertEqual(filenames, expected)
+
+        filenames, _ = self.walk({'sort': 'date', 'limit': '10', 'date_from': '2025-03-02'})
+        self.assertEqual(filenames, self.expected('date', 'desc', date_from=day_timestamp(1) - 10 * 3600))
+
+    def test_transcriptions_paging(self):
+        for sort in TRANSCRIPTION_SORT_KEYS:
+            for order in ('asc', 'desc'):
+                with self.subTest(sort=sort, order=order):
+                    filenames, _ = self.walk({'sort': sort, 'order': order, 'limit': '6'},
+                                             keys=TRANSCRIPTION_SORT_KEYS,
+                                             method=self.catalog.page_transcriptions)
+                    # Nomes das transcrições mantêm a ordem relativa dos das gravações
+                    expected = [name.replace('.wav', '_transcricao.txt') for name in self.expected(sort, order)]
+                    self.assertEqual(filenames, expected)
+
+
+class CursorTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        for sort_value in (1741000000.123456, 0, -1, 'consulta_ção_u1.wav', None):
+            with self.subTest(sort_value=sort_value):
+                cursor = encode_cursor('date', 'desc', sort_value, 'consulta_ção_u1.wav')
+                self.assertNotIn('=', cursor)
+                self.assertEqual(decode_cursor(cursor, 'date', 'desc'), (sort_value, 'consulta_ção_u1.wav'))
+
+    def test_cursor_from_other_ordering_is_rejected(self):
+        cursor = encode_cursor('date', 'desc', 1.0, 'a.wav')
+        for sort, order in (('date', 'asc'), ('size', 'desc')):
+            with self.assertRaises(InvalidPageRequest):
+                decode_cursor(cursor, sort, order)
+
+    def test_garbage_cursor_is_rejected(self):
+        for cursor in ('nao-e-um-cursor', encode_cursor('date', 'desc', 1.0, 'a.wav')[:-3], ''):
+            with self.assertRaises(InvalidPageRequest):
+                decode_cursor(cursor, 'date', 'desc')
+
+    def test_parse_page_args(self):
+        options = parse_page_args({}, RECORDING_SORT_KEYS)
+        self.assertEqual((options['sort'], options['order'], options['limit']), ('date', 'desc', None))
+        self.assertEqual(parse_page_args({'sort': 'name'}, RECORDING_SORT_KEYS)['order'], 'asc')
+
+        cursor = encode_cursor('size', 'asc', 1000, 'a.wav')
+        options = parse_page_args({'sort': 'size', 'order': 'asc', 'cursor': cursor}, RECORDING_SORT_KEYS)
+        self.assertEqual(options['limit'], 50)
+        self.assertEqual(options['after'], (1000, 'a.wav'))
+
+        options = parse_page_args({'date_from': '2025-03-02', 'date_to': '2025-03-02'}, RECORDING_SORT_KEYS)
+        self.assertEqual(options['date_to'] - options['date_from'], 24 * 3600)
+
+        for args in ({'sort': 'duration'}, {'order': 'para cima'}, {'limit': '0'}, {'limit': 'x'},
+                     {'date_from': '02/03/2025'}):
+            with self.subTest(args=args), self.assertRaises(InvalidPageRequest):
+                parse_page_args(args, TRANSCRIPTION_SORT_KEYS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+"""
+Testes da montagem incremental de chunks de contêiner (chunk_assembly)
+
+Usam o ffmpeg para gerar gravações reais em Ogg/Opus e WebM/Opus e as dividem
+como os timeslices do MediaRecorder: só o primeiro pedaço traz o cabeçalho.
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydub import AudioSegment
+
+import audio_core
+from chunk_assembly import ChunkAssembler, chunk_filename, sniff_container
+
+FFMPEG = shutil.which(AudioSegment.converter)
+DURATION_S = 6
+
+
+def encode(path, *args):
+    subprocess.run(
+        [FFMPEG, '-v', 'error', '-f', 'lavfi', '-i', f'sine=frequency=440:duration={DURATION_S}',
+         '-ac', '1', '-c:a', 'libopus', *args, '-y', path],
+        check=True
+    )
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@unittest.skipUnless(FFMPEG, "ffmpeg não encontrado")
+class ContainerChunksTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.session_id = 'sessao_teste'
+
+    def write_chunks(self, pieces):
+        for index, piece in enumerate(pieces):
+            with open(os.path.join(self.temp_dir, chunk_filename(self.session_id, index)), 'wb') as f:
+                f.write(piece)
+
+    def assemble(self, pieces):
+        """Acrescenta os chunks um a um (como chegam) e finaliza"""
+        assembler = ChunkAssembler(self.temp_dir, self.session_id)
+        for index, piece in enumerate(pieces):
+            self.write_chunks(pieces[:index + 1])
+            assembler.append_available()
+        target = os.path.join(self.temp_dir, 'final.wav')
+        result = assembler.finalize(len(pieces), target)
+        return assembler, result, target
+
+    def assertDuration(self, result, target):
+        self.assertIsNotNone(result)
+        self.assertAlmostEqual(result['duration_ms'], DURATION_S * 1000, delta=100)
+        with wave.open(target, 'rb') as wav_file:
+            self.assertEqual(wav_file.getnchannels(), 1)
+            self.assertEqual(wav_file.getframerate(), result['frame_rate'])
+            self.assertEqual(wav_file.getnframes(), result['frames'])
+
+    def ogg_pages(self):
+        data = encode(os.path.join(self.temp_dir, 'source.ogg'), '-page_duration', '200000')
+        offsets = [match.start() for match in re.finditer(b'OggS', data)] + [len(data)]
+        return [data[start:end] for start, end in zip(offsets, offsets[1:])]
+
+    def test_ogg_continuation_pages_are_not_new_streams(self):
+        pages = self.ogg_pages()
+        self.assertGreater(len(pages), 10)
+        # Primeiro timeslice com as páginas de cabeçalho (OpusHead/OpusTags) e um pouco de áudio
+        pieces = [b''.join(pages[:4])] + [b''.join(pages[i:i + 5]) for i in range(4, len(pages), 5)]
+        self.write_chunks(pieces)
+
+        self.assertEqual(sniff_container(os.path.join(self.temp_dir, chunk_filename(self.session_id, 0))), 'ogg')
+        for index in range(1, len(pieces)):
+            path = os.path.join(self.temp_dir, chunk_filename(self.session_id, index))
+            self.assertTrue(pieces[index].startswith(b'OggS'))
+            self.assertIsNone(sniff_container(path))
+        self.assertEqual(ChunkAssembler(self.temp_dir, self.session_id).pending_chunks(len(pieces)), [])
+
+        assembler, result, target = self.assemble(pieces)
+        state = assembler._load_state()
+        self.assertFalse(state['failed'])
+        self.assertEqual(state['container'], 'ogg')
+        self.assertEqual(state['container_bytes'], sum(len(piece) for piece in pieces))
+        self.assertDuration(result, target)
+
+    @unittest.skipUnless(shutil.which('ffprobe'), "ffprobe não encontrado (pydub decodifica chunk a chunk com ele)")
+    def test_independent_ogg_files_are_decoded_one_by_one(self):
+        data = encode(os.path.join(self.temp_dir, 'source.ogg'))
+        assembler, result, target = self.assemble([data, data])
+        self.assertEqual(assembler._load_state()['container'], '')
+        self.assertAlmostEqual(result['duration_ms'], 2 * DURATION_S * 1000, delta=200)
+
+    def test_webm_timeslices_stream_decode(self):
+        data = encode(os.path.join(self.temp_dir, 'source.webm'))
+        size = len(data) // 7 + 1
+        pieces = [data[start:start + size] for start in range(0, len(data), size)]
+
+        assembler, result, target = self.assemble(pieces)
+        self.assertEqual(assembler._load_state()['container'], 'webm')
+        self.assertDuration(result, target)
+        self.assertFalse(os.path.exists(assembler.pcm_path))
+
+    def test_corrupt_container_falls_back(self):
+        data = encode(os.path.join(self.temp_dir, 'source.webm'))
+        pieces = [data[:64], b'\0' * 4096]
+        assembler, result, _ = self.assemble(pieces)
+        self.assertIsNone(result)
+        self.assertTrue(assembler._load_state()['failed'])
+
+
+@unittest.skipUnless(FFMPEG, "ffmpeg não encontrado")
+class StreamPcmTest(unittest.TestCase):
+
+    def test_blocks_are_bounded_and_mono(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        path = os.path.join(temp_dir, 'source.ogg')
+        encode(path)
+
+        frame_rate, blocks = audio_core.stream_pcm16_mono(path, format='ogg', block_size=4096)
+        sizes = [len(block) for block in blocks]
+        self.assertEqual(frame_rate, 48000)
+        self.assertLessEqual(max(sizes), 4096)
+        self.assertAlmostEqual(sum(sizes) / 2 / frame_rate, DURATION_S, delta=0.1)
+
+    def test_invalid_input_raises(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        path = os.path.join(temp_dir, 'lixo.webm')
+        with open(path, 'wb') as f:
+            f.write(b'nada de audio aqui' * 100)
+        with self.assertRaises(ValueError):
+            frame_rate, blocks = audio_core.stream_pcm16_mono(path, format='webm')
+            list(blocks)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,230 @@
+"""
+Testes do manifesto de envio em chunks (ChunkManifest) e da consulta
+GET /api/save_chunk/<session_id>
+
+    python -m pytest tests/test_chunk_manifest.py
+"""
+
+import hashlib
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunk_assembly import ChunkManifest, chunk_filename
+
+SESSION_ID = 'sessao_teste'
+
+
+def checksum(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class ChunkManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.manifest = ChunkManifest(self.temp_dir, SESSION_ID)
+        self.incoming = 0
+
+    def put(self, index, data, owner='u1', is_last=False):
+        """Grava o chunk como a rota faz (arquivo .incoming próprio) e o registra"""
+        self.incoming += 1
+        path = os.path.join(self.temp_dir, f"{SESSION_ID}_chunk_{index:03d}.{self.incoming}.incoming")
+        with open(path, 'wb') as f:
+            f.write(data)
+        status, state = self.manifest.accept(index, path, checksum(data), len(data), owner, is_last)
+        self.assertFalse(os.path.exists(path))
+        return status, state
+
+    def chunk_bytes(self, index):
+        with open(os.path.join(self.temp_dir, chunk_filename(SESSION_ID, index)), 'rb') as f:
+            return f.read()
+
+    def test_first_put_is_stored(self):
+        status, state = self.put(0, b'primeiro')
+        self.assertEqual(status, 'stored')
+        self.assertEqual(state['owner'], 'u1')
+        self.assertEqual(state['chunks'], {'0': {'sha256': checksum(b'primeiro'), 'size': 8}})
+        self.assertEqual(self.chunk_bytes(0), b'primeiro')
+
+    def test_same_bytes_again_is_duplicate(self):
+        self.put(0, b'primeiro')
+        chunk_path = os.path.join(self.temp_dir, chunk_filename(SESSION_ID, 0))
+        inode = os.stat(chunk_path).st_ino
+
+        status, state = self.put(0, b'primeiro')
+        self.assertEqual(status, 'duplicate')
+        self.assertEqual(list(state['chunks']), ['0'])
+        # Nada foi regravado
+        self.assertEqual(os.stat(chunk_path).st_ino, inode)
+
+    def test_same_index_other_checksum_is_conflict(self):
+        self.put(0, b'primeiro')
+        status, state = self.put(0, b'outro conteudo')
+        self.assertEqual(status, 'conflict')
+        self.assertEqual(state['chunks']['0']['sha256'], checksum(b'primeiro'))
+        self.assertEqual(self.chunk_bytes(0), b'primeiro')
+
+    def test_index_beyond_announced_total_is_conflict(self):
+        self.put(0, b'a')
+        self.put(1, b'b', is_last=True)
+        status, _ = self.put(2, b'c')
+        self.assertEqual(status, 'conflict')
+
+    def test_other_owner_is_forbidden(self):
+        self.put(0, b'primeiro')
+        status, state = self.put(1, b'segundo', owner='u2')
+        self.assertEqual(status, 'forbidden')
+        self.assertNotIn('1', state['chunks'])
+
+    def test_missing_indices(self):
+        self.assertEqual(ChunkManifest.missing(self.manifest.load()), [])
+        self.put(0, b'a')
+        _, state = self.put(3, b'd')
+        # Sem total anunciado: lacunas até o maior índice recebido
+        self.assertEqual(ChunkManifest.missing(state), [1, 2])
+        _, state = self.put(5, b'f', is_last=True)
+        self.assertEqual(state['total_chunks'], 6)
+        self.assertEqual(ChunkManifest.received(state), [0, 3, 5])
+        self.assertEqual(ChunkManifest.missing(state), [1, 2, 4])
+
+    def test_assembly_waits_for_gaps(self):
+        self.put(0, b'a')
+        status, state = self.put(2, b'c', is_last=True)
+        self.assertEqual(status, 'stored')
+        self.assertFalse(state['assembling'])
+        self.assertEqual(ChunkManifest.missing(state), [1])
+
+        # Reenvio do último chunk com a lacuna ainda aberta não libera a montagem
+        status, state = self.put(2, b'c', is_last=True)
+        self.assertEqual(status, 'duplicate')
+        self.assertFalse(state['assembling'])
+
+        status, state = self.put(1, b'b')
+        self.assertEqual(status, 'ready')
+        self.assertTrue(state['assembling'])
+
+        # Liberada uma única vez
+        status, _ = self.put(1, b'b')
+        self.assertEqual(status, 'duplicate')
+
+    def test_release_allows_retry(self):
+        self.put(0, b'a')
+        status, _ = self.put(1, b'b', is_last=True)
+        self.assertEqual(status, 'ready')
+        self.manifest.release()
+        status, _ = self.put(1, b'b', is_last=True)
+        self.assertEqual(status, 'ready')
+
+    def test_resend_after_completion_returns_final_file(self):
+        self.put(0, b'a', is_last=True)
+        self.manifest.complete('gravacao_final.wav')
+        status, state = self.put(0, b'outro', is_last=True)
+        self.assertEqual(status, 'duplicate')
+        self.assertEqual(state['final_filename'], 'gravacao_final.wav')
+        self.assertFalse(state['assembling'])
+
+
+@unittest.skipUnless(importlib.util.find_spec('auth'), "módulo auth não disponível")
+class ChunkRoutesTest(unittest.TestCase):
+    """POST /api/save_chunk (octet-stream) e GET /api/save_chunk/<session_id>"""
+
+    @classmethod
+    def setUpClass(cls):
+        from flask import Flask
+        import audio_processing
+
+        cls.audio_processing = audio_processing
+        app = Flask(__name__)
+        app.secret_key = 'testes'
+        app.register_blueprint(audio_processing.audio_bp)
+        cls.app = app
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        for name, value in (('RECORDINGS_DIR', self.temp_dir), ('run_audio_task', mock.Mock())):
+            patcher = mock.patch.object(self.audio_processing, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.assemble_chunks = mock.Mock(return_value='gravacao_final.wav')
+        patcher = mock.patch.object(self.audio_processing, 'assemble_chunks', self.assemble_chunks)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = self.login('u1')
+
+    def login(self, user_id):
+        client = self.app.test_client()
+        with client.session_transaction() as flask_session:
+            flask_session['user_id'] = user_id
+        return client
+
+    def send(self, index, data, is_last=False, client=None):
+        return (client or self.client).post('/api/save_chunk', data=data, headers={
+            'Content-Type': 'application/octet-stream',
+            'X-Session-Id': SESSION_ID,
+            'X-Chunk-Index': str(index),
+            'X-Chunk-Last': 'true' if is_last else 'false',
+            'X-Chunk-Sha256': checksum(data)
+        })
+
+    def status(self, client=None):
+        return (client or self.client).get(f'/api/save_chunk/{SESSION_ID}')
+
+    def test_status_of_unknown_session(self):
+        self.assertEqual(self.status().status_code, 404)
+
+    def test_status_lists_received_and_missing(self):
+        self.send(0, b'a')
+        self.send(2, b'c')
+        response = self.status()
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual(body['received'], [0, 2])
+        self.assertEqual(body['missing'], [1])
+        self.assertIsNone(body['total_chunks'])
+        self.assertEqual(body['chunks']['2'], {'sha256': checksum(b'c'), 'size': 1})
+
+    def test_status_of_other_users_session(self):
+        self.send(0, b'a')
+        self.assertEqual(self.status(client=self.login('u2')).status_code, 403)
+
+    def test_duplicate_and_conflict(self):
+        self.send(0, b'a')
+        response = self.send(0, b'a')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.get_json()['duplicate'])
+
+        response = self.send(0, b'b')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.get_json()['chunk_index'], 0)
+
+    def test_last_chunk_with_gaps_does_not_finalize(self):
+        self.send(0, b'a')
+        response = self.send(3, b'd', is_last=True)
+        self.assertEqual(response.status_code, 409)
+        body = response.get_json()
+        self.assertEqual(body['missing'], [1, 2])
+        self.assertEqual(body['total_chunks'], 4)
+        self.assertEqual(self.status().get_json()['missing'], [1, 2])
+
+        self.send(1, b'b')
+        self.assertEqual(self.send(3, b'd', is_last=True).status_code, 409)
+        self.assemble_chunks.assert_not_called()
+
+        response = self.send(2, b'c')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['final_filename'], 'gravacao_final.wav')
+        self.assemble_chunks.assert_called_once_with(SESSION_ID, 'u1', 4)
+        self.assertEqual(self.status().get_json()['final_filename'], 'gravacao_final.wav')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,272 @@
+"""
+Testes do backend S3 (storage_backend) contra o moto
+
+    pip install "moto[s3]"
+    python -m pytest tests/test_s3_storage.py
+"""
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import wave
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import boto3
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+
+from catalog_service import RecordingCatalog
+from storage_backend import S3StorageBackend
+from storage_layout import StorageLayout
+from storage_watcher import StorageWatcher
+
+BUCKET = 'recpac-testes'
+REGION = 'us-east-1'
+
+
+def wav_bytes(seconds=1, frame_rate=8000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(frame_rate)
+        wav_file.writeframes(b'\0\1' * frame_rate * seconds)
+    return buffer.getvalue()
+
+
+@unittest.skipUnless(mock_aws, "moto não instalado")
+class S3TestCase(unittest.TestCase):
+
+    def setUp(self):
+        for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY'):
+            os.environ.setdefault(name, 'testing')
+        mock = mock_aws()
+        mock.start()
+        self.addCleanup(mock.stop)
+        self.client = boto3.client('s3', region_name=REGION)
+        self.client.create_bucket(Bucket=BUCKET)
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+    def backend(self, prefix, **options):
+        return S3StorageBackend(BUCKET, prefix=prefix, client=self.client, **options)
+
+
+MB = 1024 * 1024
+
+
+class S3BackendTest(S3TestCase):
+
+    def test_upload_above_threshold_is_multipart(self):
+        backend = self.backend('recordings/', multipart_threshold=5 * MB, multipart_chunksize=5 * MB)
+        path = os.path.join(self.temp_dir, 'grande.wav')
+        data = os.urandom(12 * MB)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+        backend.upload_file('u1/grande.wav', path)
+        head = self.client.head_object(Bucket=BUCKET, Key='recordings/u1/grande.wav')
+        # ETag de upload multipart termina com o número de partes
+        self.assertTrue(head['ETag'].strip('"').endswith('-3'))
+        self.assertEqual(backend.stat('u1/grande.wav')['size'], len(data))
+
+        target = os.path.join(self.temp_dir, 'copia', 'grande.wav')
+        backend.download_file('u1/grande.wav', target)
+        with open(target, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_small_upload_is_single_part(self):
+        backend = self.backend('recordings/', multipart_threshold=5 * MB, multipart_chunksize=5 * MB)
+        path = os.path.join(self.temp_dir, 'curto.wav')
+        with open(path, 'wb') as f:
+            f.write(wav_bytes())
+        backend.upload_file('curto.wav', path)
+        head = self.client.head_object(Bucket=BUCKET, Key='recordings/curto.wav')
+        self.assertNotIn('-', head['ETag'].strip('"'))
+
+    def test_read_head_requests_only_a_range(self):
+        backend = self.backend('recordings/')
+        data = wav_bytes(5)
+        self.client.put_object(Bucket=BUCKET, Key='recordings/a.wav', Body=data)
+
+        with mock.patch.object(self.client, 'get_object', wraps=self.client.get_object) as get_object:
+            head = backend.read_head('a.wav', 44)
+        self.assertEqual(head, data[:44])
+        get_object.assert_called_once_with(Bucket=BUCKET, Key='recordings/a.wav', Range='bytes=0-43')
+
+    def test_rename_copies_and_deletes(self):
+        backend = self.backend('recordings/')
+        data = wav_bytes()
+        self.client.put_object(Bucket=BUCKET, Key='recordings/u1/antigo.wav', Body=data)
+
+        backend.rename('u1/antigo.wav', 'u2/novo.wav')
+        self.assertFalse(backend.exists('u1/antigo.wav'))
+        body = self.client.get_object(Bucket=BUCKET, Key='recordings/u2/novo.wav')['Body'].read()
+        self.assertEqual(body, data)
+
+    def test_stat_missing_key(self):
+        self.assertIsNone(self.backend('recordings/').stat('nao_existe.wav'))
+
+    def test_iter_keys_recursive_and_top_level(self):
+        backend = self.backend('recordings/')
+        for key in ('raiz.wav', 'u1/2025/03/a.wav', 'u1/b.wav', 'u2/c.wav'):
+            self.client.put_object(Bucket=BUCKET, Key='recordings/' + key, Body=b'x')
+        # Fora do prefixo do backend
+        self.client.put_object(Bucket=BUCKET, Key='transcriptions/t.txt', Body=b'x')
+
+        self.assertEqual(sorted(backend.iter_keys()),
+                         ['raiz.wav', 'u1/2025/03/a.wav', 'u1/b.wav', 'u2/c.wav'])
+        self.assertEqual(list(backend.iter_keys(recursive=False)), ['raiz.wav'])
+        self.assertEqual(list(backend.iter_keys('u1/', recursive=False)), ['u1/b.wav'])
+        self.assertEqual(sorted(key for key, _, _ in backend.iter_stats('u1/')),
+                         ['u1/2025/03/a.wav', 'u1/b.wav'])
+
+
+class S3LayoutCacheTest(S3TestCase):
+    """StorageLayout.locate com o diretório local como cache do bucket"""
+
+    filename = 'consulta_20250301_101500_u1.wav'
+
+    def setUp(self):
+        super().setUp()
+        self.layout = StorageLayout(os.path.join(self.temp_dir, 'recordings'), 'user',
+                                    backend=self.backend('recordings/'))
+        self.key = self.layout.key_for(self.filename)
+
+    def put(self, data):
+        self.client.put_object(Bucket=BUCKET, Key='recordings/' + self.key, Body=data)
+        return self.layout.backend.stat(self.key)['mtime']
+
+    def read_located(self):
+        with open(self.layout.locate(self.filename), 'rb') as f:
+            return f.read()
+
+    def test_missing_local_copy_is_downloaded(self):
+        data = wav_bytes()
+        self.put(data)
+        self.assertEqual(self.read_located(), data)
+
+    def test_fresh_cache_is_not_downloaded_again(self):
+        self.put(wav_bytes())
+        self.layout.locate(self.filename)
+        with mock.patch.object(self.layout.backend, 'download_file') as download_file:
+            self.layout.locate(self.filename)
+        download_file.assert_not_called()
+
+    def test_stale_cache_with_other_size_is_refreshed(self):
+        self.put(wav_bytes(1))
+        self.layout.locate(self.filename)
+        data = wav_bytes(2)
+        self.put(data)
+        self.assertEqual(self.read_located(), data)
+
+    def test_cache_older_than_object_is_refreshed(self):
+        self.put(wav_bytes(1, frame_rate=8000))
+        path = self.layout.locate(self.filename)
+        # Mesmo tamanho, conteúdo novo gravado por outro nó depois da cópia local
+        data = wav_bytes(1, frame_rate=8000)[:-2] + b'\7\7'
+        mtime = self.put(data)
+        os.utime(path, (mtime - 60, mtime - 60))
+        self.assertEqual(self.read_located(), data)
+
+    def test_missing_object_keeps_canonical_path(self):
+        path = self.layout.locate(self.filename)
+        self.assertEqual(path, self.layout.path_for(self.filename))
+        self.assertFalse(os.path.exists(path))
+
+
+class MultiNodeCatalogTest(S3TestCase):
+    """Dois nós com catálogos e caches locais próprios compartilhando o bucket"""
+
+    def node(self, name):
+        root = os.path.join(self.temp_dir, name)
+        recordings_dir = os.path.join(root, 'recordings')
+        transcriptions_dir = os.path.join(root, 'transcriptions')
+        catalog = RecordingCatalog(recordings_dir, transcriptions_dir, os.path.join(root, 'catalog.db'))
+        catalog.recordings = StorageLayout(recordings_dir, 'user', backend=self.backend('recordings/'))
+        catalog.transcriptions = StorageLayout(transcriptions_dir, 'user', backend=self.backend('transcriptions/'))
+        catalog.ensure_synced()
+        return catalog
+
+    def save(self, catalog, filename, data, text=False):
+        layout = catalog.transcriptions if text else catalog.recordings
+        with open(layout.write_path(filename), 'wb') as f:
+            f.write(data)
+        layout.commit(filename)
+        if text:
+            catalog.index_text(filename, data.decode('utf-8'))
+        else:
+            catalog.index_recording(filename)
+
+    def poll(self, catalog):
+        """Varredura inicial do observador, sem as threads: listagem do bucket comparada com o catálogo"""
+        watcher = StorageWatcher(catalog, mode='polling', debounce=0)
+        for storage in watcher.storages:
+            current = watcher.snapshot(storage)
+            watcher.reconcile(storage, current)
+        watcher.flush(force=True)
+
+    def names(self, catalog):
+        return [row['filename'] for row in catalog.list_recordings(['u1'])]
+
+    def test_recording_from_other_node_shows_up(self):
+        node_a, node_b = self.node('a'), self.node('b')
+        filename = 'consulta_20250301_101500_u1.wav'
+        self.save(node_a, filename, wav_bytes())
+        self.save(node_a, 'consulta_20250301_101500_u1_transcricao.txt', 'dor de cabeça'.encode('utf-8'), text=True)
+        self.assertEqual(self.names(node_b), [])
+
+        self.poll(node_b)
+        rows = node_b.list_recordings(['u1'])
+        self.assertEqual([row['filename'] for row in rows], [filename])
+        self.assertEqual(rows[0]['duration_ms'], 1000)
+        self.assertTrue(rows[0]['has_transcription'])
+        self.assertEqual([hit['filename'] for hit in node_b.search_texts('cabeça', ['u1'])],
+                         ['consulta_20250301_101500_u1_transcricao.txt'])
+
+    def test_removal_on_other_node_is_reflected(self):
+        node_a, node_b = self.node('a'), self.node('b')
+        filename = 'consulta_20250301_101500_u1.wav'
+        self.save(node_a, filename, wav_bytes())
+        self.poll(node_b)
+        self.assertEqual(self.names(node_b), [filename])
+
+        node_a.recordings.remove(filename)
+        node_a.remove_recording(filename)
+        self.poll(node_b)
+        self.assertEqual(self.names(node_b), [])
+
+    def test_periodic_listing_diff(self):
+        node_a, node_b = self.node('a'), self.node('b')
+        watcher = StorageWatcher(node_b, mode='polling', debounce=0)
+        storage = node_b.recordings
+        before = watcher.snapshot(storage)
+
+        first, second = 'consulta_20250301_101500_u1.wav', 'retorno_20250302_090000_u1.wav'
+        self.save(node_a, first, wav_bytes())
+        self.save(node_a, second, wav_bytes(2))
+        node_a.recordings.remove(first)
+        after = watcher.snapshot(storage)
+        # Sem inode no bucket: remoção + criação não podem virar uma renomeação
+        watcher._diff(storage, before, after)
+        watcher.flush(force=True)
+        self.assertEqual(self.names(node_b), [second])
+
+    def test_unchanged_bucket_needs_no_reindex(self):
+        node_a = self.node('a')
+        self.save(node_a, 'consulta_20250301_101500_u1.wav', wav_bytes())
+        watcher = StorageWatcher(node_a, mode='polling', debounce=0)
+        for storage in watcher.storages:
+            watcher.reconcile(storage, watcher.snapshot(storage))
+        self.assertEqual(watcher.flush(force=True), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
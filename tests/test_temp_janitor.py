@@ -0,0 +1,234 @@
+"""
+Testes do faxineiro de temporários (temp_janitor) e do lock de sessão
+
+    python -m pytest tests/test_temp_janitor.py
+"""
+
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chunk_assembly
+from chunk_assembly import chunk_filename, lock_path_for, remove_lock_file, session_lock
+from temp_janitor import ACTIVE_GRACE_SECONDS, CHUNKS_SUBDIR, UPLOADS_SUBDIR, TempJanitor
+
+TTL = 3600
+HOUR = 3600
+
+
+class JanitorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.recordings_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.recordings_dir)
+        self.chunks_dir = os.path.join(self.recordings_dir, CHUNKS_SUBDIR)
+        self.uploads_dir = os.path.join(self.recordings_dir, UPLOADS_SUBDIR)
+        os.makedirs(self.chunks_dir)
+        os.makedirs(os.path.join(self.uploads_dir, 'ingest'))
+        self.now = time.time()
+
+    def janitor(self, ttl=TTL, budget=0):
+        return TempJanitor(self.recordings_dir, ttl=ttl, budget=budget)
+
+    def write(self, directory, name, size=1000, age=0):
+        path = os.path.join(directory, name)
+        with open(path, 'wb') as f:
+            f.write(b'\0' * size)
+        os.utime(path, (self.now - age, self.now - age))
+        return path
+
+    def session(self, session_id, chunks=2, size=1000, age=0, manifest=None):
+        """Envio em chunks com manifesto e lock, todos com a mesma idade"""
+        for index in range(chunks):
+            self.write(self.chunks_dir, chunk_filename(session_id, index), size, age)
+        path = self.write(self.chunks_dir, f"{session_id}_manifest.json", 0, age)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(manifest or {'session_id': session_id, 'updated': self.now - age}, f)
+        os.utime(path, (self.now - age, self.now - age))
+        with session_lock(self.chunks_dir, session_id):
+            pass
+        os.utime(lock_path_for(self.chunks_dir, session_id), (self.now - age, self.now - age))
+
+    def files(self, directory=None):
+        return sorted(os.listdir(directory or self.chunks_dir))
+
+    def session_files(self, session_id):
+        return [name for name in self.files() if name.startswith(f"{session_id}_")]
+
+    def session_bytes(self, session_id):
+        return sum(os.path.getsize(os.path.join(self.chunks_dir, name)) for name in self.session_files(session_id))
+
+
+class TempJanitorTest(JanitorTestCase):
+
+    def test_idle_sessions_expire_after_ttl(self):
+        self.session('antigo', age=TTL + 60)
+        self.session('recente', age=TTL - 60)
+        self.write(self.uploads_dir, 'abandonado.upload', 500, age=TTL + 60)
+        self.write(self.uploads_dir, 'em_andamento.upload', 500, age=10)
+        self.write(os.path.join(self.uploads_dir, 'ingest'), 'fila.upload', 500, age=10 * TTL)
+        expected_bytes = self.session_bytes('antigo') + 500
+
+        stats = self.janitor().sweep(now=self.now)
+        self.assertEqual(stats['expired_groups'], 2)
+        self.assertEqual(stats['removed_files'], 4)  # 2 chunks + manifesto + spool
+        self.assertEqual(stats['reclaimed_bytes'], expected_bytes)
+        # O lock sai junto, depois que a sessão não tem mais arquivos
+        self.assertEqual(self.session_files('antigo'), [])
+        self.assertEqual(len(self.session_files('recente')), 4)
+        self.assertEqual(self.files(self.uploads_dir), ['em_andamento.upload', 'ingest'])
+        self.assertEqual(self.files(os.path.join(self.uploads_dir, 'ingest')), ['fila.upload'])
+
+    def test_budget_evicts_oldest_first(self):
+        for quarters, session_id in enumerate(('c', 'b', 'a'), start=1):
+            self.session(session_id, size=1000, age=quarters * HOUR // 4)  # 15, 30 e 45 minutos
+        janitor = self.janitor(ttl=10 * HOUR, budget=2500)  # Cabe um envio (2 chunks + manifesto)
+
+        stats = janitor.sweep(now=self.now, dry_run=True)
+        self.assertEqual(stats['evicted_groups'], 2)
+        self.assertEqual(len(self.files()), 12)
+
+        stats = janitor.sweep(now=self.now)
+        self.assertEqual((stats['expired_groups'], stats['evicted_groups']), (0, 2))
+        self.assertEqual(stats['usage_bytes'], self.session_bytes('c'))
+        self.assertFalse(stats['over_budget'])
+        self.assertEqual(self.session_files('a'), [])
+        self.assertEqual(self.session_files('b'), [])
+        self.assertEqual(len(self.session_files('c')), 4)
+        self.assertEqual(janitor.metrics['evicted_groups'], 2)
+
+    def test_budget_spares_recent_activity(self):
+        self.session('antigo', size=1000, age=ACTIVE_GRACE_SECONDS + 60)
+        self.session('ativo', size=1000, age=ACTIVE_GRACE_SECONDS - 60)
+        self.session('gravando', size=1000, age=5)
+
+        stats = self.janitor(budget=500).sweep(now=self.now)
+        self.assertEqual(stats['evicted_groups'], 1)
+        self.assertEqual(stats['skipped_active'], 2)
+        self.assertTrue(stats['over_budget'])
+        self.assertEqual(self.session_files('antigo'), [])
+        self.assertEqual(len(self.session_files('ativo')), 4)
+        self.assertEqual(len(self.session_files('gravando')), 4)
+
+    def test_assembling_session_is_kept(self):
+        # Arquivos ociosos, mas a montagem marcou o manifesto há pouco
+        self.session('montando', age=TTL + 60, manifest={'assembling': True, 'updated': self.now - 60})
+        # Montagem marcada e abandonada (processo morto) expira normalmente
+        self.session('travado', age=TTL + 60, manifest={'assembling': True, 'updated': self.now - TTL - 60})
+
+        stats = self.janitor(budget=1).sweep(now=self.now)
+        self.assertEqual(stats['expired_groups'], 1)
+        self.assertEqual(stats['evicted_groups'], 0)
+        self.assertEqual(stats['skipped_active'], 1)
+        self.assertEqual(len(self.session_files('montando')), 4)
+        self.assertEqual(self.session_files('travado'), [])
+
+    def test_chunk_arriving_during_sweep_keeps_session(self):
+        self.session('sessao', age=TTL + 60)
+        janitor = self.janitor()
+        result = {}
+
+        # A rota segura o lock da sessão enquanto grava o novo chunk; a varredura espera por ele
+        with session_lock(self.chunks_dir, 'sessao'):
+            sweeper = threading.Thread(target=lambda: result.update(janitor.sweep(now=time.time())))
+            sweeper.start()
+            deadline = time.monotonic() + 5
+            while chunk_assembly._session_locks['sessao'][1] < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(chunk_assembly._session_locks['sessao'][1], 2)
+            with open(os.path.join(self.chunks_dir, chunk_filename('sessao', 2)), 'wb') as f:
+                f.write(b'novo')
+        sweeper.join(5)
+
+        self.assertEqual(result['expired_groups'], 0)
+        self.assertEqual(result['removed_files'], 0)
+        self.assertEqual(len(self.session_files('sessao')), 5)
+
+    def test_usage_groups_files_by_session(self):
+        self.session('s1', chunks=3, size=100)
+        self.write(self.chunks_dir, 's1_chunk_003.abc.incoming', 100)
+        self.write(self.chunks_dir, 's1_assembly.wav', 100)
+        self.write(self.uploads_dir, 'spool.upload', 100)
+        usage = self.janitor().usage()
+        self.assertEqual((usage['groups'], usage['sessions']), (2, 1))
+        self.assertEqual(usage['bytes'], self.session_bytes('s1') + 100)
+
+
+def hold_lock_after_removal(temp_dir, session_id, started_path, entered_path, release_path):
+    """Processo filho: espera pelo lock da sessão e o segura até o pai liberar"""
+    open(started_path, 'w').close()
+    with session_lock(temp_dir, session_id):
+        with open(entered_path, 'w') as f:
+            f.write('1' if os.path.exists(lock_path_for(temp_dir, session_id)) else '0')
+        deadline = time.monotonic() + 10
+        while not os.path.exists(release_path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+def wait_for(path, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return os.path.exists(path)
+
+
+class SessionLockFileTest(JanitorTestCase):
+
+    def test_lock_file_survives_release(self):
+        with session_lock(self.chunks_dir, 'sessao'):
+            pass
+        self.assertTrue(os.path.exists(lock_path_for(self.chunks_dir, 'sessao')))
+        self.assertNotIn('sessao', chunk_assembly._session_locks)
+
+    def test_remove_lock_file(self):
+        with session_lock(self.chunks_dir, 'sessao'):
+            remove_lock_file(self.chunks_dir, 'sessao')
+            self.assertFalse(os.path.exists(lock_path_for(self.chunks_dir, 'sessao')))
+        remove_lock_file(self.chunks_dir, 'sessao')  # Já removido: sem erro
+
+        # O próximo uso recria o arquivo
+        with session_lock(self.chunks_dir, 'sessao'):
+            self.assertTrue(os.path.exists(lock_path_for(self.chunks_dir, 'sessao')))
+
+    @unittest.skipUnless(chunk_assembly.fcntl, "sem fcntl: lock apenas entre threads")
+    def test_waiter_relocks_recreated_file(self):
+        """Quem esperava pelo arquivo removido trava o novo caminho, não o inode antigo"""
+        import fcntl
+
+        markers = {name: os.path.join(self.recordings_dir, name) for name in ('started', 'entered', 'release')}
+        lock_path = lock_path_for(self.chunks_dir, 'sessao')
+        child = multiprocessing.get_context('spawn').Process(
+            target=hold_lock_after_removal,
+            args=(self.chunks_dir, 'sessao', markers['started'], markers['entered'], markers['release'])
+        )
+        with session_lock(self.chunks_dir, 'sessao'):
+            child.start()
+            self.addCleanup(child.join, 10)
+            self.assertTrue(wait_for(markers['started']))
+            time.sleep(0.3)  # Filho bloqueado no flock do arquivo atual
+            self.assertFalse(os.path.exists(markers['entered']))
+            # Limpeza da sessão: o arquivo de lock sai enquanto o filho espera por ele
+            remove_lock_file(self.chunks_dir, 'sessao')
+
+        self.assertTrue(wait_for(markers['entered']))
+        with open(markers['entered']) as f:
+            self.assertEqual(f.read(), '1')
+        # O filho detém o flock do arquivo que está no caminho: um terceiro não entra
+        with open(lock_path, 'a') as lock_file:
+            with self.assertRaises(BlockingIOError):
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        open(markers['release'], 'w').close()
+        child.join(10)
+        self.assertEqual(child.exitcode, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+"""
+Testes do recebimento de uploads em streaming (upload_stream)
+
+    python -m pytest tests
+    python -m unittest discover tests
+"""
+
+import base64
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import upload_stream
+from upload_stream import InvalidUploadPayload, UploadTooLarge, spool_json_audio, spool_upload
+
+AUDIO = bytes(range(256)) * 40  # Contém bytes que viram '+' e '/' no base64
+AUDIO_B64 = base64.b64encode(AUDIO).decode('ascii')
+
+# Blocos pequenos quebram prefixos, escapes e grupos de base64 entre leituras
+BUFFER_SIZES = (3, 7, 64 * 1024)
+
+
+class SpoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.spool_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.spool_dir)
+
+    def spooled_files(self):
+        return os.listdir(self.spool_dir)
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+
+class SpoolUploadTest(SpoolTestCase):
+
+    def test_copies_stream_with_size_and_hash(self):
+        path, size, sha256 = spool_upload(io.BytesIO(AUDIO), self.spool_dir, len(AUDIO))
+        self.assertEqual(self.read(path), AUDIO)
+        self.assertEqual(size, len(AUDIO))
+        self.assertEqual(sha256, hashlib.sha256(AUDIO).hexdigest())
+
+    def test_too_large_removes_spool(self):
+        with self.assertRaises(UploadTooLarge):
+            spool_upload(io.BytesIO(AUDIO), self.spool_dir, len(AUDIO) - 1)
+        self.assertEqual(self.spooled_files(), [])
+
+    def test_read_error_removes_spool(self):
+        stream = mock.Mock()
+        stream.read.side_effect = [AUDIO[:100], OSError("conexão interrompida")]
+        with self.assertRaises(OSError):
+            spool_upload(stream, self.spool_dir, len(AUDIO))
+        self.assertEqual(self.spooled_files(), [])
+
+
+class SpoolJsonAudioTest(SpoolTestCase):
+
+    def spool(self, body, max_size=len(AUDIO)):
+        if isinstance(body, dict):
+            body = json.dumps(body)
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        return spool_json_audio(io.BytesIO(body), self.spool_dir, max_size)
+
+    def assertAudio(self, upload, mime_type='audio/wav'):
+        self.assertEqual(self.read(upload['path']), AUDIO)
+        self.assertEqual(upload['size'], len(AUDIO))
+        self.assertEqual(upload['sha256'], hashlib.sha256(AUDIO).hexdigest())
+        self.assertEqual(upload['mime_type'], mime_type)
+
+    def for_each_buffer_size(self, check):
+        for buffer_size in BUFFER_SIZES:
+            with self.subTest(buffer_size=buffer_size), \
+                    mock.patch.object(upload_stream, 'COPY_BUFFER_SIZE', buffer_size):
+                check()
+                for name in self.spooled_files():
+                    os.remove(os.path.join(self.spool_dir, name))
+
+    def test_plain_base64(self):
+        def check():
+            fields, upload = self.spool({'session_id': 'abc', 'audio': AUDIO_B64, 'chunk_index': 2})
+            self.assertEqual(fields, {'session_id': 'abc', 'chunk_index': 2})
+            self.assertAudio(upload)
+        self.for_each_buffer_size(check)
+
+    def test_data_url(self):
+        def check():
+            fields, upload = self.spool({'audio': f'data:audio/webm;codecs=opus;base64,{AUDIO_B64}'})
+            self.assertEqual(fields, {})
+            self.assertAudio(upload, 'audio/webm')
+        self.for_each_buffer_size(check)
+
+    def test_escaped_slashes(self):
+        # Serializadores como o json_encode do PHP escrevem '/' como '\/'
+        body = '{"audio": "data:audio\\/ogg;base64,%s"}' % AUDIO_B64.replace('/', '\\/')
+        self.assertIn('\\/', body)
+
+        def check():
+            _, upload = self.spool(body)
+            self.assertAudio(upload, 'audio/ogg')
+        self.for_each_buffer_size(check)
+
+    def test_newline_wrapped_base64(self):
+        wrapped = base64.encodebytes(AUDIO).decode('ascii')
+        self.assertIn('\n', wrapped)
+
+        def check():
+            _, upload = self.spool({'audio': wrapped})
+            self.assertAudio(upload)
+        self.for_each_buffer_size(check)
+
+    def test_nested_fields(self):
+        body = {
+            'metadata': {'patient': {'name': 'José "Zé" Silva', 'tags': ['a', {'b': [1, 2]}]}},
+            'audio': AUDIO_B64,
+            'flags': [True, False, None],
+            'duration': 12.5,
+            'is_last': True
+        }
+
+        def check():
+            fields, upload = self.spool(body)
+            expected = dict(body)
+            del expected['audio']
+            self.assertEqual(fields, expected)
+            self.assertAudio(upload)
+        self.for_each_buffer_size(check)
+
+    def test_missing_or_empty_audio(self):
+        fields, upload = self.spool({'session_id': 'abc'})
+        self.assertEqual(fields, {'session_id': 'abc'})
+        self.assertIsNone(upload)
+
+        fields, upload = self.spool({'audio': '', 'session_id': 'abc'})
+        self.assertEqual(fields, {'session_id': 'abc'})
+        self.assertIsNone(upload)
+        self.assertEqual(self.spooled_files(), [])
+
+        self.assertEqual(self.spool('{}'), ({}, None))
+
+    def test_malformed_json(self):
+        bodies = [
+            '',
+            '[]',
+            '{"audio": "%s"' % AUDIO_B64,
+            '{"audio": "%s" "x": 1}' % AUDIO_B64,
+            '{"audio": "%s", "x": }' % AUDIO_B64,
+            '{"session_id": "abc", "audio": "%s", "x": [1, 2}' % AUDIO_B64,
+            '{audio: "%s"}' % AUDIO_B64,
+            '{"audio": "not*base64"}',
+            '{"audio": "\\u00e9%s"}' % AUDIO_B64,
+            '{"audio": "\\x%s"}' % AUDIO_B64,
+        ]
+        for body in bodies:
+            with self.subTest(body=body[:40]):
+                with self.assertRaises(InvalidUploadPayload):
+                    self.spool(body)
+                self.assertEqual(self.spooled_files(), [])
+
+    def test_field_too_large(self):
+        with self.assertRaises(InvalidUploadPayload):
+            self.spool({'notes': 'x' * (upload_stream.MAX_FIELD_SIZE + 1), 'audio': AUDIO_B64})
+        self.assertEqual(self.spooled_files(), [])
+
+    def test_oversized_audio(self):
+        def check():
+            with self.assertRaises(UploadTooLarge):
+                self.spool({'audio': AUDIO_B64}, max_size=len(AUDIO) - 1)
+            self.assertEqual(self.spooled_files(), [])
+        self.for_each_buffer_size(check)
+
+    def test_repeated_audio_key_keeps_last(self):
+        other = base64.b64encode(b'outro').decode('ascii')
+        _, upload = self.spool('{"audio": "%s", "audio": "%s"}' % (other, AUDIO_B64))
+        self.assertAudio(upload)
+        self.assertEqual(self.spooled_files(), [os.path.basename(upload['path'])])
+
+
+if __name__ == '__main__':
+    unittest.main()
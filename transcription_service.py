@@ -4,10 +4,11 @@ Separa as funcionalidades de transcrição do audio_processing.py
 """
 
 import speech_recognition as sr
-from pydub import AudioSegment
-import tempfile
 import os
 
+from audio_core import AudioBuffer
+from services_config import TRANSCRIPTION_SAMPLE_RATE, AUDIO_SEGMENT_LENGTH
+
 class TranscriptionService:
     """Serviço para transcrição de áudio usando Speech Recognition"""
     
@@ -37,10 +38,10 @@ class TranscriptionService:
             
             print("📁 Processando arquivo de áudio...")
             
-            # Processar áudio com pydub
+            # Processar áudio (AudioBuffer; ffmpeg só para decodificar formatos que não são WAV)
             try:
-                print("🔧 Carregando arquivo com pydub...")
-                audio = AudioSegment.from_file(audio_path)
+                print("🔧 Carregando arquivo de áudio...")
+                audio = AudioBuffer.from_file(audio_path)
                 
                 # CORREÇÃO: Manter sample rate original para evitar problemas de velocidade
                 original_frame_rate = audio.frame_rate
@@ -51,77 +52,55 @@ class TranscriptionService:
                 
                 # Converter para mono se necessário (sem alterar sample rate)
                 if audio.channels > 1:
-                    audio = audio.set_channels(1)
+                    audio = audio.downmix()
                 
-                # CORREÇÃO: Só alterar sample rate se for muito baixo (< 16kHz)
-                # Isso evita problemas de velocidade com áudios gravados em alta qualidade
-                if original_frame_rate < 16000:
-                    audio = audio.set_frame_rate(16000)
-                    print(f"🔧 Sample rate aumentado para 16kHz (era {original_frame_rate}Hz)")
+                # Representação para o reconhecedor: mono reduzido para TRANSCRIPTION_SAMPLE_RATE
+                # (sample rates menores são mantidos; reamostrar para cima só aumenta o envio)
+                audio = audio.for_recognition(TRANSCRIPTION_SAMPLE_RATE)
+                if audio.frame_rate != original_frame_rate:
+                    print(f"🔧 Sample rate reduzido para {audio.frame_rate}Hz para o reconhecedor (era {original_frame_rate}Hz)")
                 else:
                     print(f"✅ Mantendo sample rate original: {original_frame_rate}Hz")
                 
                 print(f"🎵 Áudio processado: {len(audio)}ms, {audio.frame_rate}Hz, {audio.channels} canal(is)")
                 
-                # Se o áudio for muito longo (> 5 minutos), segmentar
-                if len(audio) > 300000:  # 5 minutos em ms
+                # Se o áudio for mais longo que um segmento, segmentar pelas pausas
+                if len(audio) > AUDIO_SEGMENT_LENGTH:
                     return self._transcribe_long_audio_in_segments(audio, audio_path)
                 
-                # CORREÇÃO: Exportar para WAV temporário com configurações específicas para evitar problemas de velocidade
-                with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-                    print(f"🔧 Exportando WAV temporário com configurações otimizadas...")
-                    audio.export(temp_file.name, format="wav", parameters=[
-                        "-acodec", "pcm_s16le",  # PCM 16-bit
-                        "-ar", str(audio.frame_rate),  # Manter sample rate
-                        "-ac", "1"  # Mono
-                    ])
-                    temp_path = temp_file.name
+                # Reconhecedor alimentado direto do PCM em memória (sem WAV temporário)
+                print("🎧 Carregando áudio...")
+                audio_data = sr.AudioData(audio.to_pcm16(), audio.frame_rate, 2)
                 
-                try:
-                    # Transcrever com speech_recognition
-                    with sr.AudioFile(temp_path) as source:
-                        print("🎤 Ajustando para ruído ambiente...")
-                        self.recognizer.adjust_for_ambient_noise(source, duration=1)
-                        
-                        print("🎧 Carregando áudio...")
-                        audio_data = self.recognizer.record(source)
-                        
-                        print("🔄 Iniciando transcrição...")
-                        
-                        # Tentar múltiplos engines
-                        engines = [
-                            ('google', lambda: self.recognizer.recognize_google(audio_data, language='pt-BR')),
-                            ('sphinx', lambda: self.recognizer.recognize_sphinx(audio_data, language='pt-BR'))
-                        ]
-                        
-                        for engine_name, recognize_func in engines:
-                            try:
-                                print(f"🔍 Tentando com {engine_name}...")
-                                text = recognize_func()
-                                if text and text.strip():
-                                    print(f"✅ Transcrição bem-sucedida com {engine_name}!")
-                                    return text
-                            except sr.UnknownValueError:
-                                print(f"⚠️ {engine_name}: Não foi possível entender o áudio")
-                                continue
-                            except sr.RequestError as e:
-                                print(f"❌ {engine_name}: Erro na requisição: {e}")
-                                continue
-                            except Exception as e:
-                                print(f"❌ {engine_name}: Erro inesperado: {e}")
-                                continue
-                        
-                        return "[Erro: Não foi possível transcrever o áudio com nenhum engine]"
-                    
-                finally:
-                    # Limpar arquivo temporário
+                print("🔄 Iniciando transcrição...")
+                
+                # Tentar múltiplos engines
+                engines = [
+                    ('google', lambda: self.recognizer.recognize_google(audio_data, language='pt-BR')),
+                    ('sphinx', lambda: self.recognizer.recognize_sphinx(audio_data, language='pt-BR'))
+                ]
+                
+                for engine_name, recognize_func in engines:
                     try:
-                        os.unlink(temp_path)
-                    except:
-                        pass
+                        print(f"🔍 Tentando com {engine_name}...")
+                        text = recognize_func()
+                        if text and text.strip():
+                            print(f"✅ Transcrição bem-sucedida com {engine_name}!")
+                            return text
+                    except sr.UnknownValueError:
+                        print(f"⚠️ {engine_name}: Não foi possível entender o áudio")
+                        continue
+                    except sr.RequestError as e:
+                        print(f"❌ {engine_name}: Erro na requisição: {e}")
+                        continue
+                    except Exception as e:
+                        print(f"❌ {engine_name}: Erro inesperado: {e}")
+                        continue
                 
+                return "[Erro: Não foi possível transcrever o áudio com nenhum engine]"
+            
             except Exception as e:
-                print(f"❌ Erro no processamento com pydub: {e}")
+                print(f"❌ Erro no processamento do áudio: {e}")
                 return f"[Erro no processamento de áudio: {str(e)}]"
         
         except Exception as e:
@@ -133,47 +112,27 @@ class TranscriptionService:
         try:
             print("📝 Iniciando transcrição por segmentos...")
             
-            segment_length = 30 * 1000  # 30 segundos em millisegundos
-            overlap = 2 * 1000  # 2 segundos de sobreposição
-            
             transcriptions = []
-            total_duration = len(audio)
             
-            for start in range(0, total_duration, segment_length - overlap):
-                end = min(start + segment_length, total_duration)
+            # Trechos de fala cortados nas pausas, até AUDIO_SEGMENT_LENGTH cada, sem sobreposição
+            for regions in audio.speech_segments(AUDIO_SEGMENT_LENGTH):
+                start, end = regions[0][0] // audio.frame_rate, regions[-1][1] // audio.frame_rate
+                print(f"🎯 Processando segmento {start}s - {end}s")
                 
-                print(f"🎯 Processando segmento {start//1000}s - {end//1000}s")
-                
-                # Extrair segmento
-                segment = audio[start:end]
-                
-                # Criar arquivo temporário para o segmento
-                with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-                    temp_path = temp_file.name
-                    segment.export(temp_path, format="wav")
+                # Segmento (só os trechos com fala) entregue em memória ao reconhecedor
+                segment = audio.join(regions)
+                audio_data = sr.AudioData(segment.to_pcm16(), segment.frame_rate, 2)
                 
+                # Tentar transcrever o segmento
                 try:
-                    with sr.AudioFile(temp_path) as source:
-                        self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                        audio_data = self.recognizer.record(source)
-                    
-                    # Tentar transcrever o segmento
-                    try:
-                        segment_text = self.recognizer.recognize_google(audio_data, language="pt-BR")
-                        if segment_text and segment_text.strip():
-                            transcriptions.append(segment_text)
-                            print(f"✅ Segmento transcrito: {segment_text[:30]}...")
-                    except sr.UnknownValueError:
-                        print(f"⚠️ Segmento não compreendido")
-                    except sr.RequestError as e:
-                        print(f"❌ Erro na requisição do segmento: {e}")
-                
-                finally:
-                    # Limpar arquivo temporário
-                    try:
-                        os.unlink(temp_path)
-                    except:
-                        pass
+                    segment_text = self.recognizer.recognize_google(audio_data, language="pt-BR")
+                    if segment_text and segment_text.strip():
+                        transcriptions.append(segment_text)
+                        print(f"✅ Segmento transcrito: {segment_text[:30]}...")
+                except sr.UnknownValueError:
+                    print(f"⚠️ Segmento não compreendido")
+                except sr.RequestError as e:
+                    print(f"❌ Erro na requisição do segmento: {e}")
             
             if transcriptions:
                 full_transcription = " ".join(transcriptions)
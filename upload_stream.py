@@ -0,0 +1,273 @@
+"""
+Recebimento de uploads em streaming
+Os arquivos enviados são copiados em blocos para um temporário em disco, com
+o hash calculado durante a cópia e recusa imediata acima do limite de tamanho,
+de modo que a memória usada por requisição não depende do tamanho do áudio.
+
+Clientes antigos enviam a gravação inteira como base64 (às vezes como data
+URL) dentro de um JSON. spool_json_audio lê esse JSON do fluxo da requisição
+sem carregá-lo: os campos pequenos são devolvidos como dicionário e a string
+do áudio é decodificada de base64 aos poucos direto para o arquivo temporário.
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+import os
+import tempfile
+
+COPY_BUFFER_SIZE = 64 * 1024
+MAX_FIELD_SIZE = 64 * 1024  # Demais campos do JSON (nome do paciente, sessão...)
+DATA_URL_MAX_HEADER = 512
+DEFAULT_MIME_TYPE = 'audio/wav'
+
+_WHITESPACE = b' \t\r\n'
+_STRING_ESCAPES = {b'"': b'"', b'\\': b'\\', b'/': b'/', b'b': b'', b'f': b'', b'n': b'', b'r': b'', b't': b''}
+
+class UploadTooLarge(Exception):
+    """Upload maior que o limite configurado (MAX_FILE_SIZE)"""
+
+class InvalidUploadPayload(ValueError):
+    """JSON malformado ou áudio em base64 inválido"""
+
+def spool_upload(stream, spool_dir, max_size):
+    """Copia o upload em blocos para um arquivo temporário em disco
+
+    Calcula o hash durante a cópia e interrompe assim que max_size é
+    ultrapassado (UploadTooLarge). Retorna (caminho, tamanho, sha256).
+    """
+    fd, spool_path = tempfile.mkstemp(suffix='.upload', dir=spool_dir)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while True:
+                block = stream.read(COPY_BUFFER_SIZE)
+                if not block:
+                    break
+                size += len(block)
+                if size > max_size:
+                    raise UploadTooLarge(f"Arquivo maior que {max_size} bytes")
+                f.write(block)
+                digest.update(block)
+    except BaseException:
+        os.remove(spool_path)
+        raise
+    return spool_path, size, digest.hexdigest()
+
+# ==================== JSON COM ÁUDIO EM BASE64 ====================
+
+class _JsonReader:
+    """Leitura byte a byte de um JSON vindo de um fluxo, com buffer em blocos"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffer = b''
+        self.pos = 0
+
+    def _fill(self):
+        block = self.stream.read(COPY_BUFFER_SIZE)
+        if not block:
+            return False
+        self.buffer = self.buffer[self.pos:] + block
+        self.pos = 0
+        return True
+
+    def peek(self):
+        if self.pos >= len(self.buffer) and not self._fill():
+            raise InvalidUploadPayload("JSON incompleto")
+        return self.buffer[self.pos:self.pos + 1]
+
+    def take(self):
+        char = self.peek()
+        self.pos += 1
+        return char
+
+    def skip_whitespace(self):
+        while self.peek() in _WHITESPACE:
+            self.pos += 1
+
+    def expect(self, char):
+        self.skip_whitespace()
+        if self.take() != char:
+            raise InvalidUploadPayload(f"JSON inválido: esperado {char.decode()}")
+
+    def value(self, limit=MAX_FIELD_SIZE):
+        """Lê um valor JSON completo (pequeno) e o converte com json.loads"""
+        self.skip_whitespace()
+        raw = bytearray()
+        depth = 0
+        in_string = escaped = False
+        while True:
+            char = self.take()
+            raw += char
+            if len(raw) > limit:
+                raise InvalidUploadPayload("Campo JSON muito grande")
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == b'\\':
+                    escaped = True
+                elif char == b'"':
+                    in_string = False
+                    if depth == 0:
+                        break
+                continue
+            if char == b'"':
+                in_string = True
+            elif char in b'{[':
+                depth += 1
+            elif char in b'}]':
+                depth -= 1
+                if depth == 0:
+                    break
+            elif depth == 0 and (self.peek() in b',}]' or self.peek() in _WHITESPACE):
+                break  # Fim de número ou literal
+        try:
+            return json.loads(raw.decode('utf-8'))
+        except ValueError as e:
+            raise InvalidUploadPayload(f"JSON inválido: {e}")
+
+    def string_parts(self):
+        """Conteúdo de uma string JSON (já aberta) em blocos, sem as sequências de escape
+
+        Pensado para base64: quebras de linha escapadas são descartadas e \\u
+        só é aceito para caracteres ASCII.
+        """
+        while True:
+            if self.pos >= len(self.buffer) and not self._fill():
+                raise InvalidUploadPayload("JSON incompleto")
+            quote = self.buffer.find(b'"', self.pos)
+            backslash = self.buffer.find(b'\\', self.pos)
+            stops = [index for index in (quote, backslash) if index != -1]
+            if not stops:
+                part = self.buffer[self.pos:]
+                self.pos = len(self.buffer)
+                yield part
+                continue
+
+            stop = min(stops)
+            if stop > self.pos:
+                yield self.buffer[self.pos:stop]
+            self.pos = stop + 1
+            if stop == quote:
+                return
+
+            escape = self.take()
+            if escape == b'u':
+                code = int(b''.join(self.take() for _ in range(4)), 16)
+                if code > 0x7f:
+                    raise InvalidUploadPayload("Caractere inválido no base64")
+                yield bytes([code])
+            elif escape in _STRING_ESCAPES:
+                yield _STRING_ESCAPES[escape]
+            else:
+                raise InvalidUploadPayload("Sequência de escape inválida")
+
+def _split_data_url(header):
+    """(mime_type, resto) quando o prefixo 'data:audio...,' está completo; None se ainda incompleto"""
+    prefix = b'data:audio'
+    if header.startswith(prefix):
+        comma = header.find(b',')
+        if comma != -1:
+            mime_type = header[:comma].split(b':', 1)[1].split(b';', 1)[0]
+            return mime_type.decode('ascii', 'replace'), header[comma + 1:]
+        if len(header) <= DATA_URL_MAX_HEADER:
+            return None
+    elif prefix.startswith(header):
+        return None
+    return DEFAULT_MIME_TYPE, header
+
+def _spool_base64(parts, spool_dir, max_size):
+    """Decodifica a string base64 em blocos para um arquivo temporário
+
+    Retorna {'path', 'size', 'sha256', 'mime_type'} ou None se a string estiver vazia.
+    """
+    fd, spool_path = tempfile.mkstemp(suffix='.upload', dir=spool_dir)
+    digest = hashlib.sha256()
+    size = 0
+    header = b''
+    mime_type = None
+    pending = b''
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            def write(data, final=False):
+                nonlocal pending, size
+                data = pending + data.translate(None, _WHITESPACE)
+                usable = len(data) if final else len(data) - len(data) % 4
+                pending = data[usable:]
+                if not usable:
+                    return
+                try:
+                    decoded = base64.b64decode(data[:usable], validate=True)
+                except binascii.Error as e:
+                    raise InvalidUploadPayload(f"Base64 inválido: {e}")
+                size += len(decoded)
+                if size > max_size:
+                    raise UploadTooLarge(f"Arquivo maior que {max_size} bytes")
+                f.write(decoded)
+                digest.update(decoded)
+
+            for part in parts:
+                if mime_type is None:
+                    # Prefixo de data URL ('data:audio/webm;base64,') ainda sendo lido
+                    header += part
+                    split = _split_data_url(header)
+                    if split is None:
+                        continue
+                    mime_type, part = split
+                write(part)
+            if mime_type is None:
+                mime_type, rest = _split_data_url(header) or (DEFAULT_MIME_TYPE, header)
+                write(rest)
+            write(b'', final=True)
+    except BaseException:
+        os.remove(spool_path)
+        raise
+
+    if not size:
+        os.remove(spool_path)
+        return None
+    return {'path': spool_path, 'size': size, 'sha256': digest.hexdigest(), 'mime_type': mime_type}
+
+def spool_json_audio(stream, spool_dir, max_size, audio_key='audio'):
+    """Lê um objeto JSON do fluxo decodificando o campo de áudio direto para o disco
+
+    Retorna (campos, upload): campos é o dicionário sem o áudio e upload é o
+    resultado de _spool_base64 (None se o campo faltar ou estiver vazio).
+    Levanta InvalidUploadPayload ou UploadTooLarge; o temporário é removido
+    nesses casos e, nos demais, fica a cargo de quem chamou.
+    """
+    reader = _JsonReader(stream)
+    fields = {}
+    upload = None
+    try:
+        reader.expect(b'{')
+        reader.skip_whitespace()
+        if reader.peek() == b'}':
+            return fields, None
+        while True:
+            key = reader.value()
+            if not isinstance(key, str):
+                raise InvalidUploadPayload("JSON inválido: chave deve ser string")
+            reader.expect(b':')
+            reader.skip_whitespace()
+            if key == audio_key and reader.peek() == b'"':
+                reader.take()
+                if upload:
+                    os.remove(upload['path'])
+                upload = _spool_base64(reader.string_parts(), spool_dir, max_size)
+            else:
+                fields[key] = reader.value()
+            reader.skip_whitespace()
+            char = reader.take()
+            if char == b'}':
+                break
+            if char != b',':
+                raise InvalidUploadPayload("JSON inválido: esperado , ou }")
+    except BaseException:
+        if upload:
+            os.remove(upload['path'])
+        raise
+    return fields, upload
@@ -1,5 +1,6 @@
 import os
 import re
+from datetime import datetime
 import google.generativeai as genai
 from dotenv import load_dotenv
 
@@ -8,9 +9,46 @@ RECORDINGS_DIR = 'recordings'
 TRANSCRIPTIONS_DIR = 'transcriptions'
 model = None
 
+# Nomes de arquivo seguem o padrão <nome>_<YYYYmmdd>_<HHMMSS>[_<extra>...]_<user_id>.<ext>
+FILENAME_OWNER_RE = re.compile(r'^(?P<name>.*?)_(?P<date>\d{8})_(?P<time>\d{6})(?:_\d+)*_(?P<owner>.+)$')
+ARTIFACT_SUFFIX_RE = re.compile(r'(_transcricao|_resumo(_editado_\d{8}_\d{6})?|_optimized|_metadata|_\(\d+\))$')
+
 def sanitize_filename(filename):
     return re.sub(r'[^\w\s-]', '', filename).strip()
 
+def base_stem(filename):
+    """Remove extensão e sufixos de artefatos derivados (_transcricao, _resumo, _optimized...)"""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    while True:
+        stripped = ARTIFACT_SUFFIX_RE.sub('', stem)
+        if stripped == stem:
+            return stem
+        stem = stripped
+
+def is_derived_artifact(filename):
+    """Indica se o arquivo é um derivado (_optimized, cópia _(n)...) e não a gravação original"""
+    return base_stem(filename) != os.path.splitext(os.path.basename(filename))[0]
+
+def owner_from_filename(filename):
+    """Extrai o identificador do dono (user_id ou email formatado) a partir do nome do arquivo"""
+    stem = base_stem(filename)
+    match = FILENAME_OWNER_RE.match(stem)
+    if match:
+        return match.group('owner')
+    if '_' in stem:
+        return stem.rsplit('_', 1)[1]
+    return None
+
+def timestamp_from_filename(filename):
+    """Data/hora de criação codificada no nome do arquivo (None se fora do padrão)"""
+    match = FILENAME_OWNER_RE.match(base_stem(filename))
+    if not match:
+        return None
+    try:
+        return datetime.strptime(match.group('date') + match.group('time'), '%Y%m%d%H%M%S')
+    except ValueError:
+        return None
+
 def configure_gemini():
     global model
     gemini_api_key = os.getenv('GEMINI_API_KEY')